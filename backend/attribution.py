@@ -0,0 +1,260 @@
+"""
+Multi-touch attribution of funnel transitions to marketing activities.
+
+/api/v2/marketing/funnel-attribution used to run
+`funnel_transitions LEFT JOIN marketing_activities ON 1=1`. That credited
+every activity to every transition, and its cost grew as transitions ×
+activities. Attribution now follows the lead's actual touchpoints. A
+transition of lead L at time T is linked to the events L was captured at
+(`capture_survey`) within ATTRIBUTION_LOOKBACK_DAYS before T. Each
+touchpoint's credit is split evenly across that event's activities reported
+in the same window (activity_id '' when the event has none):
+
+    first_touch  the earliest touchpoint gets 1.0
+    last_touch   the latest touchpoint gets 1.0
+    linear       every touchpoint gets 1 / touches
+
+The credits are materialized in `attribution_credits`, one row per
+(transition, model, event, activity). refresh() is incremental. It only
+handles transitions above the stored watermark in `attribution_state`.
+record_funnel_transition runs it in the same write transaction, and the read
+endpoints run it when transitions were imported some other way.
+Touchpoints or activities loaded after a transition was credited are picked
+up by rebuild() (POST /api/v2/admin/attribution/rebuild).
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTION_LOOKBACK_DAYS = int(os.getenv("ATTRIBUTION_LOOKBACK_DAYS", "90"))
+ATTRIBUTION_MODELS = ("first_touch", "last_touch", "linear")
+
+ATTRIBUTION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS attribution_credits (
+        transition_id INTEGER NOT NULL,
+        model TEXT NOT NULL,
+        event_id TEXT NOT NULL,
+        activity_id TEXT NOT NULL,
+        lead_key TEXT,
+        to_stage TEXT,
+        credit REAL NOT NULL,
+        transition_at TEXT,
+        PRIMARY KEY (transition_id, model, event_id, activity_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_attribution_credits_model_stage ON attribution_credits (model, to_stage, activity_id)",
+    "CREATE INDEX IF NOT EXISTS idx_attribution_credits_activity ON attribution_credits (activity_id, model)",
+    """
+    CREATE TABLE IF NOT EXISTS attribution_state (
+        name TEXT PRIMARY KEY,
+        last_transition_id INTEGER NOT NULL DEFAULT 0,
+        lookback_days INTEGER,
+        refreshed_at TEXT
+    )
+    """,
+]
+
+
+def ensure_attribution_tables(conn: sqlite3.Connection):
+    for stmt in ATTRIBUTION_SCHEMA:
+        conn.execute(stmt)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _transition_key_column(conn: sqlite3.Connection) -> Optional[str]:
+    cols = _columns(conn, "funnel_transitions")
+    for c in ("prid", "lead_id"):
+        if c in cols:
+            return c
+    return None
+
+
+def _transition_time_expr(conn: sqlite3.Connection) -> Optional[str]:
+    """When a transition happened: `created_at`, else `transition_date` (the prid variant has only the latter)."""
+    present = [c for c in ("created_at", "transition_date") if c in _columns(conn, "funnel_transitions")]
+    if not present:
+        return None
+    return present[0] if len(present) == 1 else f"COALESCE({', '.join(present)})"
+
+
+def _watermark(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT last_transition_id FROM attribution_state WHERE name = 'transitions'").fetchone()
+    return row[0] if row else 0
+
+
+def pending(conn: sqlite3.Connection) -> bool:
+    """True when transitions exist above the watermark (cheap: two primary-key reads)."""
+    try:
+        top = conn.execute("SELECT MAX(transition_id) FROM funnel_transitions").fetchone()[0]
+        return top is not None and top > _watermark(conn)
+    except sqlite3.OperationalError:
+        return False
+
+
+_CREDIT_SQL = """
+    WITH new_t AS (
+        SELECT transition_id, {key} AS lead_key, to_stage, {at} AS at
+        FROM funnel_transitions
+        WHERE transition_id > :after AND transition_id <= :upto AND {key} IS NOT NULL
+    ),
+    touch AS (
+        SELECT t.transition_id, t.lead_key, t.to_stage, t.at, cs.event_id,
+               ROW_NUMBER() OVER (PARTITION BY t.transition_id ORDER BY cs.timestamp, cs.survey_id) AS n,
+               COUNT(*) OVER (PARTITION BY t.transition_id) AS touches
+        FROM new_t t
+        JOIN capture_survey cs ON cs.lead_id = t.lead_key
+        WHERE julianday(cs.timestamp) BETWEEN julianday(t.at) - :lookback AND julianday(t.at)
+    ),
+    weighted AS (
+        SELECT touch.*, 'first_touch' AS model, 1.0 AS weight FROM touch WHERE n = 1
+        UNION ALL
+        SELECT touch.*, 'last_touch', 1.0 FROM touch WHERE n = touches
+        UNION ALL
+        SELECT touch.*, 'linear', 1.0 / touches FROM touch
+    ),
+    spread AS (
+        SELECT w.transition_id, w.model, w.event_id, COALESCE(ma.activity_id, '') AS activity_id,
+               w.lead_key, w.to_stage, w.at,
+               w.weight / MAX(COUNT(ma.activity_id) OVER (PARTITION BY w.transition_id, w.model, w.n), 1) AS credit
+        FROM weighted w
+        LEFT JOIN marketing_activities ma ON ma.event_id = w.event_id
+            AND (ma.reporting_date IS NULL
+                 OR julianday(ma.reporting_date) BETWEEN julianday(w.at) - :lookback AND julianday(w.at))
+    )
+    INSERT INTO attribution_credits (transition_id, model, event_id, activity_id, lead_key, to_stage, credit, transition_at)
+    SELECT transition_id, model, event_id, activity_id, lead_key, to_stage, SUM(credit), at
+    FROM spread
+    GROUP BY transition_id, model, event_id, activity_id
+"""
+
+
+def refresh(conn: sqlite3.Connection, lookback_days: int = ATTRIBUTION_LOOKBACK_DAYS) -> int:
+    """Credit transitions above the watermark; returns how many transitions were processed. Does not commit."""
+    ensure_attribution_tables(conn)
+    key = _transition_key_column(conn)
+    at = _transition_time_expr(conn)
+    if key is None or at is None or not _columns(conn, "capture_survey"):
+        return 0
+    after = _watermark(conn)
+    upto = conn.execute("SELECT MAX(transition_id) FROM funnel_transitions").fetchone()[0] or 0
+    if upto <= after:
+        return 0
+    conn.execute(_CREDIT_SQL.format(key=key, at=at), {"after": after, "upto": upto, "lookback": lookback_days})
+    conn.execute(
+        """
+        INSERT INTO attribution_state (name, last_transition_id, lookback_days, refreshed_at) VALUES ('transitions', ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET last_transition_id = excluded.last_transition_id,
+            lookback_days = excluded.lookback_days, refreshed_at = excluded.refreshed_at
+        """,
+        (upto, lookback_days, datetime.utcnow().isoformat()),
+    )
+    processed = conn.execute(
+        "SELECT COUNT(*) FROM funnel_transitions WHERE transition_id > ? AND transition_id <= ?", (after, upto)
+    ).fetchone()[0]
+    return processed
+
+
+def rebuild(conn: sqlite3.Connection, lookback_days: int = ATTRIBUTION_LOOKBACK_DAYS) -> int:
+    """Recompute every credit from scratch. Does not commit."""
+    ensure_attribution_tables(conn)
+    conn.execute("DELETE FROM attribution_credits")
+    conn.execute("DELETE FROM attribution_state WHERE name = 'transitions'")
+    return refresh(conn, lookback_days)
+
+
+def _credit_filter(model: str, data_source: Optional[str]):
+    sql = ("SELECT ac.to_stage, ac.event_id, ac.activity_id, SUM(ac.credit) AS credit, "
+           "COUNT(DISTINCT ac.transition_id) AS transitions FROM attribution_credits ac")
+    params: List[Any] = []
+    if data_source:
+        sql += " JOIN marketing_activities fma ON fma.activity_id = ac.activity_id AND fma.data_source = ?"
+        params.append(data_source)
+    sql += " WHERE ac.model = ? GROUP BY ac.to_stage, ac.event_id, ac.activity_id"
+    params.append(model)
+    return sql, params
+
+
+def stage_attribution(conn: sqlite3.Connection, model: str = "linear", data_source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per funnel stage: leads that reached it, attributed transitions and the credited activities' metrics."""
+    key = _transition_key_column(conn) or "lead_id"
+    cred_sql, params = _credit_filter(model, data_source)
+    rows = conn.execute(
+        f"""
+        WITH cred AS ({cred_sql}),
+        reached AS (
+            SELECT to_stage, COUNT(DISTINCT {key}) AS leads FROM funnel_transitions GROUP BY to_stage
+        )
+        SELECT fs.stage_name,
+               COALESCE(MAX(reached.leads), 0),
+               SUM(cred.credit),
+               SUM(ma.impressions), SUM(ma.engagement_count), AVG(ma.awareness_metric), SUM(ma.activation_conversions),
+               COUNT(ma.activity_id)
+        FROM funnel_stages fs
+        LEFT JOIN reached ON reached.to_stage = fs.stage_id
+        LEFT JOIN cred ON cred.to_stage = fs.stage_id
+        LEFT JOIN marketing_activities ma ON ma.activity_id = cred.activity_id
+        GROUP BY fs.stage_id, fs.stage_name
+        ORDER BY fs.sequence_order
+        """,
+        params,
+    ).fetchall()
+    return [
+        {
+            "stage": r[0],
+            "leads_in_stage": r[1] or 0,
+            "attributed_transitions": round(r[2] or 0.0, 4),
+            "impressions": r[3] or 0,
+            "engagement": r[4] or 0,
+            "awareness": round(r[5] or 0.0, 2),
+            "activations": r[6] or 0,
+            "credited_activities": r[7] or 0,
+        }
+        for r in rows
+    ]
+
+
+def activity_attribution(
+    conn: sqlite3.Connection,
+    model: str = "linear",
+    data_source: Optional[str] = None,
+    stage: Optional[str] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """Activities ranked by the credit they received, optionally for one `to_stage`.
+
+    Credit given to an event without activities is listed with activity_id None.
+    """
+    cred_sql, params = _credit_filter(model, data_source)
+    sql = f"""
+        SELECT cred.activity_id, cred.event_id, ma.campaign_name, ma.channel, ma.data_source, cred.to_stage,
+               cred.credit, cred.transitions
+        FROM ({cred_sql}) cred
+        LEFT JOIN marketing_activities ma ON ma.activity_id = cred.activity_id
+    """
+    if stage:
+        sql += " WHERE cred.to_stage = ?"
+        params.append(stage)
+    sql += " ORDER BY cred.credit DESC, cred.event_id, cred.activity_id LIMIT ?"
+    params.append(limit)
+    return [
+        {
+            "activity_id": r[0] or None,
+            "event_id": r[1],
+            "campaign_name": r[2],
+            "channel": r[3],
+            "data_source": r[4],
+            "stage": r[5],
+            "credit": round(r[6] or 0.0, 4),
+            "transitions": r[7],
+        }
+        for r in conn.execute(sql, params).fetchall()
+    ]
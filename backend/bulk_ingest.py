@@ -0,0 +1,494 @@
+"""
+Columnar bulk-ingest engine for the /upload/* and /import/* routers.
+
+The uploaders used to walk the DataFrame with `df.iterrows()`. Each row was a
+separate `cursor.execute`, and the age was computed with a per-row
+`pd.to_datetime`. Here an `IngestSpec` describes the target table column by
+column. prepare() builds every column in one vectorized pass: column mapping,
+defaults, type coercion, derived values such as age, and validation.
+write_rows() then inserts the valid rows with chunked `executemany` inside one
+writer-queue transaction.
+
+    LEADS = IngestSpec("leads", [
+        Field("lead_id", derive=generated_ids("LEAD", "lead_id")),
+        Field("date_of_birth", kind="date", required=True),
+        Field("age", derive=lambda df: years_since(df["date_of_birth"])),
+        ...
+    ])
+    result = ingest(db_path, df, LEADS, replace=False)
+
+Optional columns fall back to their default when they are absent or blank.
+A value that fails coercion or a check is reported as a row-level error
+("Row 7: invalid date_of_birth"). Row numbers follow the spreadsheet: the
+header is row 1.
+
+Vendor extracts are re-uploaded daily, mostly unchanged. A spec with a natural
+`key` (prid, lead_id) is upserted instead of appended. Each row carries a
+content hash in `row_hash`. A row is written only when its key is new or its
+hash changed, and the result reports inserted/updated/unchanged counts.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .db_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+BULK_INGEST_CHUNK_SIZE = int(os.getenv("BULK_INGEST_CHUNK_SIZE", "5000"))
+BULK_INGEST_MAX_ERRORS = int(os.getenv("BULK_INGEST_MAX_ERRORS", "1000"))
+UPSERT_LOOKUP_BATCH = int(os.getenv("UPSERT_LOOKUP_BATCH", "500"))
+
+KINDS = ("raw", "text", "int", "float", "date")
+
+
+class PartialIngest(RuntimeError):
+    """A streamed ingest failed after earlier frames were committed.
+
+    `result` holds the counts of the committed frames, in the shape ingest_frames returns.
+    """
+
+    def __init__(self, result: Dict[str, Any], cause: BaseException):
+        super().__init__(str(cause))
+        self.result = result
+        self.cause = cause
+
+
+class Field:
+    """One target column: where its values come from, its default, and how they are coerced."""
+
+    __slots__ = ("column", "source", "default", "kind", "required", "derive", "check", "message", "volatile")
+
+    def __init__(
+        self,
+        column: str,
+        source: Optional[str] = None,
+        default: Any = None,
+        kind: str = "raw",
+        required: bool = False,
+        derive: Optional[Callable[[pd.DataFrame], Any]] = None,
+        check: Optional[Callable[[pd.Series], pd.Series]] = None,
+        message: Optional[str] = None,
+        volatile: bool = False,
+    ):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown field kind: {kind}")
+        self.column = column
+        self.source = source or column
+        self.default = default
+        self.kind = kind
+        self.required = required
+        self.derive = derive
+        self.check = check
+        self.message = message
+        self.volatile = volatile
+
+
+class IngestSpec:
+    """Target table plus its ordered fields; `required` is derived from the fields read from the file.
+
+    With a natural `key` column the spec is ingested as an upsert (see upsert_rows).
+    Fields marked `volatile` (generated ids, load timestamps) are left out of the
+    content hash and are not overwritten when a row is updated.
+    """
+
+    def __init__(self, table: str, fields: Sequence[Field], key: Optional[str] = None, hash_column: str = "row_hash"):
+        self.table = table
+        self.fields = list(fields)
+        self.key = key
+        self.hash_column = hash_column
+
+    @property
+    def columns(self) -> List[str]:
+        return [f.column for f in self.fields]
+
+    @property
+    def required(self) -> List[str]:
+        return [f.source for f in self.fields if f.required and f.derive is None]
+
+    def missing_columns(self, df: pd.DataFrame) -> List[str]:
+        return [c for c in self.required if c not in df.columns]
+
+    def insert_sql(self, with_hash: bool = False) -> str:
+        cols = self.columns + ([self.hash_column] if with_hash else [])
+        marks = ", ".join("?" * len(cols))
+        return f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES ({marks})"
+
+    @property
+    def hashed_columns(self) -> List[str]:
+        return [f.column for f in self.fields if not f.volatile]
+
+    def update_sql(self) -> str:
+        sets = ", ".join(f"{c} = ?" for c in self.hashed_columns if c != self.key)
+        return f"UPDATE {self.table} SET {sets}, {self.hash_column} = ? WHERE {self.key} = ?"
+
+
+# --- derived columns ---
+
+def years_since(values: pd.Series, now: Optional[pd.Timestamp] = None) -> pd.Series:
+    """Whole years between each date and now (days // 365, as the uploaders always computed age)."""
+    now = now or pd.Timestamp.now()
+    parsed = pd.to_datetime(values, errors="coerce", format="mixed")
+    return ((now - parsed).dt.days // 365).astype("Int64")
+
+
+def generated_ids(prefix: str, source: Optional[str] = None) -> Callable[[pd.DataFrame], pd.Series]:
+    """Ids of the form PREFIX-<ms>-<row index>; an existing `source` value wins when present."""
+
+    def _derive(df: pd.DataFrame) -> pd.Series:
+        stamp = int(time.time() * 1000)
+        ids = pd.Series([f"{prefix}-{stamp}-{i}" for i in df.index], index=df.index, dtype=object)
+        if source and source in df.columns:
+            return df[source].where(df[source].notna(), ids)
+        return ids
+
+    return _derive
+
+
+def column_or(source: str, fallback: str) -> Callable[[pd.DataFrame], pd.Series]:
+    """`source` where present and non-blank, otherwise the value of `fallback` on the same row."""
+
+    def _derive(df: pd.DataFrame) -> pd.Series:
+        if source not in df.columns:
+            return df[fallback]
+        return df[source].where(df[source].notna(), df[fallback])
+
+    return _derive
+
+
+# --- coercion ---
+
+def _coerce(series: pd.Series, kind: str) -> Tuple[pd.Series, pd.Series]:
+    """Return (coerced values, mask of non-blank values that failed to coerce)."""
+    present = series.notna()
+    if kind == "int" or kind == "float":
+        num = pd.to_numeric(series, errors="coerce")
+        bad = present & num.isna()
+        if kind == "int":
+            bad |= num.notna() & (num % 1 != 0)
+            num = num.where(~bad).astype("Int64")
+        return num, bad
+    if kind == "date":
+        parsed = pd.to_datetime(series, errors="coerce", format="mixed")
+        bad = present & parsed.isna()
+        return parsed.dt.strftime("%Y-%m-%d"), bad
+    if kind == "text":
+        return series.astype(str).where(present), pd.Series(False, index=series.index)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        # Excel cells parsed as timestamps
+        return series.dt.strftime("%Y-%m-%d %H:%M:%S").str.replace(" 00:00:00", "", regex=False), pd.Series(False, index=series.index)
+    return series, pd.Series(False, index=series.index)
+
+
+def _to_python(series: pd.Series) -> List[Any]:
+    """Native Python values with None for blanks, ready for sqlite3 binding."""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _add_errors(problems: Dict[int, List[str]], mask: pd.Series, message: str):
+    for pos in np.flatnonzero(mask.to_numpy(dtype=bool, na_value=False)):
+        problems.setdefault(int(pos), []).append(message)
+
+
+def prepare(df: pd.DataFrame, spec: IngestSpec) -> Tuple[List[tuple], List[int], List[Tuple[int, str]]]:
+    """Map, coerce and validate `df` for `spec` in one columnar pass.
+
+    Returns (rows, row_numbers, errors): the insertable rows as tuples in
+    `spec.columns` order, the spreadsheet row number of each, and
+    (row_number, message) pairs for the rows that were rejected.
+    """
+    n = len(df)
+    row_numbers = (np.asarray(df.index, dtype=np.int64) + 2) if n else np.empty(0, dtype=np.int64)
+    problems: Dict[int, List[str]] = {}
+    values: List[List[Any]] = []
+    for f in spec.fields:
+        if f.derive is not None:
+            v = f.derive(df)
+            series = v if isinstance(v, pd.Series) else pd.Series([v] * n, index=df.index, dtype=object)
+        elif f.source in df.columns:
+            series = df[f.source]
+        else:
+            series = pd.Series([None] * n, index=df.index, dtype=object)
+        if f.kind == "text" and pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+            # integer codes (zip, cbsa, phone) read as float because of blanks
+            series = series.astype("Int64").astype(object)
+        if f.default is not None and series.isna().any():
+            series = series.astype(object).where(series.notna(), f.default)
+        if f.required:
+            _add_errors(problems, series.isna(), f"missing {f.source}")
+        series, bad = _coerce(series, f.kind)
+        _add_errors(problems, bad, f"invalid {f.source}")
+        if f.check is not None:
+            failed = series.notna() & ~f.check(series).fillna(False).astype(bool)
+            _add_errors(problems, failed, f.message or f"invalid {f.source}")
+        values.append(_to_python(series))
+
+    errors = [(int(row_numbers[pos]), "; ".join(msgs)) for pos, msgs in sorted(problems.items())]
+    if problems:
+        keep = np.ones(n, dtype=bool)
+        keep[list(problems)] = False
+        idx = np.flatnonzero(keep)
+        values = [[col[i] for i in idx] for col in values]
+        row_numbers = row_numbers[idx]
+    rows = list(zip(*values)) if values else []
+    return rows, row_numbers.tolist(), errors
+
+
+def content_hashes(spec: IngestSpec, rows: Sequence[tuple]) -> List[str]:
+    """Hash of each row's non-volatile values, computed column-wise with pandas.
+
+    Values are hashed in their text form so 5 and 5.0 or a re-read date hash the
+    same across uploads.
+    """
+    if not rows:
+        return []
+    frame = pd.DataFrame.from_records(rows, columns=spec.columns)[spec.hashed_columns]
+    frame = frame.astype(object).where(frame.notna(), "").astype(str)
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+    return [format(int(h), "016x") for h in hashes]
+
+
+# --- writes ---
+
+def _insert_chunked(conn: sqlite3.Connection, sql: str, rows: Sequence[tuple], row_numbers: Sequence[int],
+                    chunk_size: int) -> Tuple[int, List[Tuple[int, str]]]:
+    """executemany in chunks; a chunk that violates a constraint is rolled back and retried row by row."""
+    inserted = 0
+    errors: List[Tuple[int, str]] = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        conn.execute("SAVEPOINT bulk_chunk")
+        try:
+            conn.executemany(sql, chunk)
+            conn.execute("RELEASE bulk_chunk")
+            inserted += len(chunk)
+            continue
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO bulk_chunk")
+            conn.execute("RELEASE bulk_chunk")
+        for row, row_number in zip(chunk, row_numbers[start:start + chunk_size]):
+            try:
+                conn.execute(sql, row)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                errors.append((row_number, str(e)))
+    return inserted, errors
+
+
+def write_rows(
+    conn: sqlite3.Connection,
+    spec: IngestSpec,
+    rows: Sequence[tuple],
+    row_numbers: Sequence[int],
+    replace: bool = False,
+    chunk_size: int = BULK_INGEST_CHUNK_SIZE,
+) -> Tuple[int, List[Tuple[int, str]]]:
+    """Insert `rows` with chunked executemany. Runs inside the caller's transaction.
+
+    A chunk that hits a constraint violation is rolled back to its savepoint and
+    retried row by row, so one duplicate key costs one row and not the chunk.
+    Other errors (missing table, schema mismatch) propagate and abort the import.
+    """
+    if replace:
+        conn.execute(f"DELETE FROM {spec.table}")
+    return _insert_chunked(conn, spec.insert_sql(), rows, row_numbers, chunk_size)
+
+
+def ensure_hash_column(conn: sqlite3.Connection, spec: IngestSpec):
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({spec.table})").fetchall()}
+    if not cols:
+        raise sqlite3.OperationalError(f"no such table: {spec.table}")
+    if spec.hash_column not in cols:
+        conn.execute(f"ALTER TABLE {spec.table} ADD COLUMN {spec.hash_column} TEXT")
+
+
+def upsert_rows(
+    conn: sqlite3.Connection,
+    spec: IngestSpec,
+    rows: Sequence[tuple],
+    row_numbers: Sequence[int],
+    hashes: Sequence[str],
+    chunk_size: int = BULK_INGEST_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """Insert new keys, update keys whose content hash changed, skip the rest. Runs inside the caller's transaction.
+
+    Stored hashes are looked up for the incoming keys in batches of
+    UPSERT_LOOKUP_BATCH, using the key column's index. Rows loaded before hashing
+    existed (NULL hash) count as changed once. When a key repeats inside
+    the upload, the last occurrence wins.
+    """
+    ensure_hash_column(conn, spec)
+    key_pos = spec.columns.index(spec.key)
+    latest: Dict[Any, int] = {}
+    for pos, row in enumerate(rows):
+        latest[row[key_pos]] = pos
+    keys = list(latest)
+    stored: Dict[Any, Optional[str]] = {}
+    for start in range(0, len(keys), UPSERT_LOOKUP_BATCH):
+        batch = keys[start:start + UPSERT_LOOKUP_BATCH]
+        marks = ", ".join("?" * len(batch))
+        stored.update(conn.execute(
+            f"SELECT {spec.key}, {spec.hash_column} FROM {spec.table} WHERE {spec.key} IN ({marks})", batch
+        ).fetchall())
+
+    hashed_pos = [spec.columns.index(c) for c in spec.hashed_columns if c != spec.key]
+    inserts, insert_numbers, updates = [], [], []
+    unchanged = 0
+    for key, pos in latest.items():
+        h = hashes[pos]
+        if key not in stored:
+            inserts.append(tuple(rows[pos]) + (h,))
+            insert_numbers.append(row_numbers[pos])
+        elif stored[key] == h:
+            unchanged += 1
+        else:
+            updates.append(tuple(rows[pos][i] for i in hashed_pos) + (h, key))
+
+    inserted, errors = _insert_chunked(conn, spec.insert_sql(with_hash=True), inserts, insert_numbers, chunk_size)
+    update_sql = spec.update_sql()
+    for start in range(0, len(updates), chunk_size):
+        conn.executemany(update_sql, updates[start:start + chunk_size])
+    return {
+        "inserted": inserted,
+        "updated": len(updates),
+        "unchanged": unchanged,
+        "duplicates": len(rows) - len(latest),
+        "errors": errors,
+    }
+
+
+def _delete_missing(conn: sqlite3.Connection, spec: IngestSpec, seen: set) -> int:
+    """Delete rows whose key was not part of this upload (replace on a keyed spec)."""
+    stale = [r[0] for r in conn.execute(f"SELECT {spec.key} FROM {spec.table}").fetchall() if r[0] not in seen]
+    for start in range(0, len(stale), UPSERT_LOOKUP_BATCH):
+        batch = stale[start:start + UPSERT_LOOKUP_BATCH]
+        conn.execute(f"DELETE FROM {spec.table} WHERE {spec.key} IN ({', '.join('?' * len(batch))})", batch)
+    return len(stale)
+
+
+_CREATE_TABLE_NAME = re.compile(
+    r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:"[^"]+"|\[[^\]]+\]|`[^`]+`|[^\s(]+)', re.IGNORECASE
+)
+
+
+def _create_staging(conn: sqlite3.Connection, spec: IngestSpec, staging: str):
+    """Create `staging` from the target table's own DDL, so its constraints reject the same rows."""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (spec.table,)).fetchone()
+    if row is None:
+        raise sqlite3.OperationalError(f"no such table: {spec.table}")
+    conn.execute(_CREATE_TABLE_NAME.sub(f"CREATE TABLE {staging}", row[0], count=1))
+
+
+def _swap_in_staging(conn: sqlite3.Connection, spec: IngestSpec, staging: str):
+    """Replace the target table's rows with the staged ones in the caller's (single) transaction."""
+    cols = ", ".join(spec.columns)
+    conn.execute(f"DELETE FROM {spec.table}")
+    conn.execute(f"INSERT INTO {spec.table} ({cols}) SELECT {cols} FROM {staging}")
+    conn.execute(f"DROP TABLE {staging}")
+
+
+def _drop_staging(conn: sqlite3.Connection, staging: str):
+    conn.execute(f"DROP TABLE IF EXISTS {staging}")
+
+
+def ingest(
+    db_path: str,
+    df: pd.DataFrame,
+    spec: IngestSpec,
+    replace: bool = False,
+    chunk_size: int = BULK_INGEST_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """prepare() then write_rows()/upsert_rows() as one writer-queue transaction for `db_path`."""
+    return ingest_frames(db_path, [df], spec, replace=replace, chunk_size=chunk_size)
+
+
+def ingest_frames(
+    db_path: str,
+    frames: Iterable[pd.DataFrame],
+    spec: IngestSpec,
+    replace: bool = False,
+    chunk_size: int = BULK_INGEST_CHUNK_SIZE,
+    progress=None,
+) -> Dict[str, Any]:
+    """Ingest a stream of DataFrames (e.g. upload_stream.iter_frames), one transaction per frame.
+
+    Specs without a key are appended. With `replace`, the frames are loaded into a
+    staging copy of the table and swapped in (DELETE + INSERT ... SELECT) in one
+    transaction after the last frame, so an import that fails part-way leaves the
+    original rows in place. Keyed specs are upserted by content hash. With
+    `replace`, rows whose key is absent from the upload are deleted at the end,
+    so re-uploading the same extract touches only the delta.
+
+    Appends and keyed upserts are not all-or-nothing. When a frame fails after
+    earlier frames were committed, PartialIngest is raised with their counts.
+    For a keyed replace, the missing keys have then not been deleted.
+    Re-running the same upload converges, because unchanged rows are skipped.
+    Only the first BULK_INGEST_MAX_ERRORS row errors are kept; `error_count` has
+    the total. `progress` (an UploadProgress) is advanced after each committed frame.
+    """
+    pool = get_pool(db_path)
+    if replace and not spec.key:
+        staged = IngestSpec(f"_staging_{spec.table}_{uuid.uuid4().hex[:8]}", spec.fields)
+        pool.write(_create_staging, spec, staged.table)
+        try:
+            result = ingest_frames(db_path, frames, staged, chunk_size=chunk_size, progress=progress)
+            pool.write(_swap_in_staging, spec, staged.table)
+        except BaseException as e:
+            pool.write(_drop_staging, staged.table)
+            if isinstance(e, PartialIngest):
+                raise e.cause  # nothing reached the target table
+            raise
+        result["errors"] = [e.replace(staged.table, spec.table) for e in result["errors"]]
+        return result
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "deleted": 0}
+    total = error_count = 0
+    errors: List[str] = []
+    seen: set = set()
+    key_pos = spec.columns.index(spec.key) if spec.key else None
+
+    def summary() -> Dict[str, Any]:
+        return {
+            "imported": counts["inserted"] + counts["updated"],
+            **counts,
+            "total_rows": total,
+            "errors": errors,
+            "error_count": error_count,
+        }
+
+    try:
+        for df in frames:
+            rows, row_numbers, frame_errors = prepare(df, spec)
+            if spec.key:
+                result = pool.write(upsert_rows, spec, rows, row_numbers, content_hashes(spec, rows), chunk_size)
+                for k in ("inserted", "updated", "unchanged", "duplicates"):
+                    counts[k] += result[k]
+                write_errors = result["errors"]
+                written = result["inserted"] + result["updated"]
+                if replace:
+                    seen.update(row[key_pos] for row in rows)
+            else:
+                written, write_errors = pool.write(write_rows, spec, rows, row_numbers, False, chunk_size)
+                counts["inserted"] += written
+            frame_errors = sorted(frame_errors + write_errors)
+            total += len(df)
+            error_count += len(frame_errors)
+            room = BULK_INGEST_MAX_ERRORS - len(errors)
+            errors.extend(f"Row {n}: {msg}" for n, msg in frame_errors[:max(room, 0)])
+            if progress is not None:
+                progress.advance(len(df), written, len(frame_errors))
+        if spec.key and replace:
+            counts["deleted"] = pool.write(_delete_missing, spec, seen)
+    except Exception as e:
+        if counts["inserted"] or counts["updated"]:
+            raise PartialIngest(summary(), e) from e
+        raise
+    return summary()
@@ -0,0 +1,82 @@
+"""
+Per-table write generations for cache invalidation.
+
+Every tracked table gets AFTER INSERT/UPDATE/DELETE triggers that bump its row in
+`table_generations`. Because the triggers live in the database, every writer
+(API handlers, CSV uploads, routers, other processes) invalidates caches, whether
+or not it knows about them. A cache stores the generation it was computed at and
+compares it with the current one, which is a single primary-key read.
+"""
+
+import logging
+import sqlite3
+from typing import Dict, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACKED_TABLES = (
+    "leads",
+    "funnel_transitions",
+    "marketing_activities",
+    "events",
+    "event_metrics",
+    "projects",
+    "segment_profiles",
+    "market_potential",
+    "budgets",
+)
+
+
+def _existing_tables(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+
+
+def ensure_change_tracking(conn: sqlite3.Connection, tables: Iterable[str] = TRACKED_TABLES):
+    """Create the generations table and the bump triggers for each existing table. Does not commit."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS table_generations (
+            table_name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    existing = _existing_tables(conn)
+    for table in tables:
+        if table not in existing:
+            continue
+        conn.execute("INSERT OR IGNORE INTO table_generations (table_name, generation) VALUES (?, 0)", (table,))
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_gen_{op.lower()} AFTER {op} ON "{table}"
+                BEGIN
+                    UPDATE table_generations SET generation = generation + 1 WHERE table_name = '{table}';
+                END
+                """
+            )
+
+
+def table_generation(conn: sqlite3.Connection, table: str) -> int:
+    """Current write generation of `table` (0 when untracked)."""
+    try:
+        row = conn.execute("SELECT generation FROM table_generations WHERE table_name = ?", (table,)).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def generations(conn: sqlite3.Connection, tables: Iterable[str]) -> Tuple[int, ...]:
+    """Generations for several tables, in the order given."""
+    tables = tuple(tables)
+    if not tables:
+        return ()
+    marks = ", ".join("?" * len(tables))
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, generation FROM table_generations WHERE table_name IN ({marks})", tables
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return tuple(0 for _ in tables)
+    found: Dict[str, int] = {r[0]: r[1] for r in rows}
+    return tuple(found.get(t, 0) for t in tables)
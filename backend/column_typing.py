@@ -0,0 +1,122 @@
+"""
+Column type inference for uploaded datasets.
+
+ingest_dataset() used to create every `uploaded_*` column as TEXT, so numeric and
+date filters compared strings. infer_column_types() looks at a sample of staged
+values and picks INTEGER, REAL, DATE or TEXT for each column. converter() turns
+the staged strings into values of that type while loading. A value that does not
+fit (one the sample never showed) is stored as it came, which SQLite's flexible
+typing allows, so a late outlier does not fail the load.
+
+Identifier and geography columns (prid, rsid, zip, cbsa, *_id, phone) stay TEXT
+even when they look numeric. Leading zeros matter there, and the other
+recruiting tables store them as text. index_columns() picks the columns that get
+an index automatically: identifiers, geography and dates.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+INTEGER = "INTEGER"
+REAL = "REAL"
+DATE = "DATE"
+TEXT = "TEXT"
+
+_INT = re.compile(r"^[+-]?(0|[1-9]\d*)$")
+_LEADING_ZERO = re.compile(r"^[+-]?0\d+$")
+_REAL = re.compile(r"^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$")
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y/%m/%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+_ID_NAME = re.compile(r"^(id|prid|rsid|.*_id)$")
+_GEO_NAME = re.compile(r"^(zip|zip_code|zipcode|postal|postal_code|cbsa|cbsa_code|rsid|stn|station)$")
+_TEXT_NAME = re.compile(r"^(phone|phone_number|.*_code|zip.*|postal.*)$")
+
+
+def _is_identifier(name: str) -> bool:
+    n = name.strip().lower()
+    return bool(_ID_NAME.match(n) or _GEO_NAME.match(n) or _TEXT_NAME.match(n))
+
+
+def parse_date(value: str) -> Optional[str]:
+    """ISO YYYY-MM-DD for the date formats seen in recruiting exports, else None."""
+    v = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(v, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _classify(value: str) -> str:
+    if _LEADING_ZERO.match(value):
+        return TEXT
+    if _INT.match(value):
+        return INTEGER
+    if _REAL.match(value):
+        return REAL
+    if parse_date(value):
+        return DATE
+    return TEXT
+
+
+def infer_column_types(columns: Sequence[str], sample: Iterable[Sequence[Any]]) -> Dict[str, str]:
+    """Pick a SQLite type per column from sample rows (value lists in `columns` order).
+
+    A column is INTEGER/REAL/DATE only if every non-blank sampled value fits;
+    INTEGER widens to REAL when both appear. All-blank columns are TEXT.
+    """
+    seen: List[set] = [set() for _ in columns]
+    for row in sample:
+        for i, v in enumerate(row[:len(columns)]):
+            if v is None:
+                continue
+            s = str(v).strip()
+            if s:
+                seen[i].add(_classify(s))
+    types: Dict[str, str] = {}
+    for name, kinds in zip(columns, seen):
+        if not kinds or _is_identifier(name):
+            types[name] = TEXT
+        elif kinds == {INTEGER}:
+            types[name] = INTEGER
+        elif kinds <= {INTEGER, REAL}:
+            types[name] = REAL
+        elif kinds == {DATE}:
+            types[name] = DATE
+        else:
+            types[name] = TEXT
+    return types
+
+
+def converter(sql_type: str) -> Callable[[Any], Any]:
+    """Value converter for a column of `sql_type`; blanks become NULL for typed columns."""
+    if sql_type == TEXT:
+        return lambda v: v
+
+    def _convert(v):
+        if v is None:
+            return None
+        s = str(v).strip()
+        if not s:
+            return None
+        try:
+            if sql_type == INTEGER:
+                return int(s)
+            if sql_type == REAL:
+                return float(s)
+        except ValueError:
+            return v
+        if sql_type == DATE:
+            return parse_date(s) or v
+        return v
+
+    return _convert
+
+
+def index_columns(types: Dict[str, str], limit: int = 8) -> List[str]:
+    """Columns worth an index: identifiers and geography first, then dates."""
+    keys = [c for c in types if _ID_NAME.match(c.lower()) or _GEO_NAME.match(c.lower())]
+    dates = [c for c, t in types.items() if t == DATE and c not in keys]
+    return (keys + dates)[:limit]
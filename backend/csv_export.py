@@ -0,0 +1,187 @@
+"""
+Streaming CSV export engine.
+
+The CSV exports used to build the whole file in memory before sending it.
+`_stream_csv` wrote every row into one `io.StringIO`, the endpoints
+materialized `[dict(r) for r in cur.fetchall()]` first, and DataExporter
+returned the CSV as a single string. A full-history activities export for
+Power BI could therefore use gigabytes of memory, and the client got nothing
+until the last row was formatted.
+
+The generators here read the cursor EXPORT_FETCH_ROWS rows at a time with
+`fetchmany` and yield encoded CSV chunks of about EXPORT_CHUNK_BYTES, so memory
+use stays flat and the header goes out at once. With `compress=True` the chunks
+pass through an incremental gzip stream, which csv_response() sends with
+`Content-Encoding: gzip`:
+
+    return csv_response(iter_query_csv(DB_FILE, sql, params, compress=gz), "activities.csv", compress=gz)
+
+The pooled connection is returned when the generator finishes or the client
+disconnects.
+"""
+
+import csv
+import io
+import os
+import tempfile
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from .db_pool import get_connection
+
+EXPORT_FETCH_ROWS = int(os.getenv("EXPORT_FETCH_ROWS", "2000"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+
+class _ChunkWriter:
+    """csv.writer target that hands out what has been written so far, then forgets it."""
+
+    def __init__(self):
+        self._buf = io.StringIO()
+
+    def write(self, s: str):
+        return self._buf.write(s)
+
+    def size(self) -> int:
+        return self._buf.tell()
+
+    def take(self) -> bytes:
+        data = self._buf.getvalue().encode("utf-8")
+        self._buf.seek(0)
+        self._buf.truncate()
+        return data
+
+
+def _encode(rows: Iterable[Sequence[Any]], header: Sequence[str], chunk_bytes: int) -> Iterator[bytes]:
+    out = _ChunkWriter()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    yield out.take()
+    for row in rows:
+        writer.writerow(row)
+        if out.size() >= chunk_bytes:
+            yield out.take()
+    tail = out.take()
+    if tail:
+        yield tail
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = EXPORT_GZIP_LEVEL) -> Iterator[bytes]:
+    """Compress a byte stream incrementally into one gzip member.
+
+    The first chunk (the CSV header) is sync-flushed so the client gets bytes right away.
+    """
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)
+    first = True
+    for chunk in chunks:
+        data = z.compress(chunk)
+        if first:
+            data += z.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield z.flush()
+
+
+def iter_dicts_csv(
+    rows: Iterable[Dict[str, Any]],
+    headers: Sequence[str],
+    compress: bool = False,
+    chunk_bytes: int = EXPORT_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """CSV bytes for an iterable of dicts; missing keys are written as empty fields."""
+    chunks = _encode(([r.get(k, "") for k in headers] for r in rows), headers, chunk_bytes)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def iter_query_csv(
+    db_path: str,
+    sql: str,
+    params: Sequence[Any] = (),
+    headers: Optional[Sequence[str]] = None,
+    compress: bool = False,
+    fetch_rows: Optional[int] = None,
+    chunk_bytes: int = EXPORT_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """CSV bytes for a query, read with fetchmany. Column names come from the cursor unless `headers` is given."""
+
+    def _rows():
+        conn = get_connection(db_path, row_factory=None)
+        try:
+            cur = conn.execute(sql, tuple(params))
+            yield headers or [d[0] for d in cur.description]
+            size = fetch_rows or EXPORT_FETCH_ROWS
+            while True:
+                batch = cur.fetchmany(size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            conn.close()
+
+    def _chunks():
+        rows = _rows()
+        try:
+            yield from _encode(rows, next(rows), chunk_bytes)
+        finally:
+            rows.close()
+
+    return gzip_chunks(_chunks()) if compress else _chunks()
+
+
+def accepts_gzip(request) -> bool:
+    if request is None:
+        return False
+    return "gzip" in (request.headers.get("accept-encoding") or "").lower()
+
+
+def _primed(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from rest
+
+
+def csv_response(chunks: Iterable[bytes], filename: Optional[str] = None, compress: bool = False) -> StreamingResponse:
+    """StreamingResponse for CSV chunks; `compress` must match how the chunks were produced.
+
+    The first chunk is produced here, so the query runs inside the endpoint and
+    a bad query still fails with a 500 rather than a truncated body.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(_primed(first, chunks), media_type="text/csv", headers=headers)
+
+
+def write_chunks_atomic(path: str, chunks: Iterable[bytes]) -> str:
+    """Write chunks to a temp file next to `path`, fsync it, then rename it over `path`.
+
+    A reader (e.g. a Power BI refresh) sees either the old file or the new one, never a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def write_query_csv(db_path: str, sql: str, path: str, params: Sequence[Any] = (), headers: Optional[Sequence[str]] = None) -> str:
+    """Stream a query straight into a CSV file (replaced atomically), e.g. for the scheduled exports."""
+    return write_chunks_atomic(path, iter_query_csv(db_path, sql, params, headers=headers))
@@ -1,15 +1,52 @@
+"""
+Staging store for uploaded CSV datasets.
+
+Each dataset lives in its own directory under data/processed/:
+
+    dataset_1a2b3c4d/
+        manifest.json        headers, header -> field mapping, row counts, part list
+        part-00000.ndjson    one JSON array per line, values in header order
+        part-00001.ndjson    ...
+
+Rows are appended in parts of STAGING_PART_ROWS while the CSV is read, so an
+upload never sits in memory as a whole. Values are stored under their original
+headers, and the mapping is applied when rows are read. Re-mapping a dataset
+only rewrites the manifest. Readers (get_dataset, iter_rows, ingest_dataset)
+stream the parts and skip whole parts when an offset is given.
+
+Datasets staged by older versions as one `<dataset>.json` blob are converted on
+first access.
+"""
+
 import csv
+import itertools
 import json
 import os
+import re
 import uuid
-from typing import Dict, List, Tuple, Any
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .column_typing import converter, index_columns, infer_column_types
+from .db_pool import get_pool
+from .schema_registry import invalidate_schema
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
 PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')
 MAPPINGS_FILE = os.path.join(DATA_DIR, 'data_mappings.json')
 
+STAGING_PART_ROWS = int(os.getenv("STAGING_PART_ROWS", "50000"))
+STAGING_FORMAT = "ndjson-rows/1"
+STAGING_TYPE_SAMPLE = int(os.getenv("STAGING_TYPE_SAMPLE", "1000"))
+STAGING_LOAD_CACHE_KB = int(os.getenv("STAGING_LOAD_CACHE_KB", str(256 * 1024)))
+DATASET_PAGE_SIZE = int(os.getenv("DATASET_PAGE_SIZE", "100"))
+DATASET_PAGE_MAX = int(os.getenv("DATASET_PAGE_MAX", "1000"))
+MANIFEST_NAME = "manifest.json"
+
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
+_DATASET_NAME = re.compile(r"^[A-Za-z0-9_\-]+$")
+
 
 def detect_columns(sample_rows: List[Dict[str, str]]) -> Dict[str, str]:
     """Simple heuristic to map incoming CSV columns to canonical fields.
@@ -46,158 +83,334 @@ def detect_columns(sample_rows: List[Dict[str, str]]) -> Dict[str, str]:
     return mapping
 
 
+# --- staging layout ---
+
+def _dataset_dir(dataset_name: str) -> str:
+    if not _DATASET_NAME.match(dataset_name or ""):
+        raise FileNotFoundError(dataset_name)
+    return os.path.join(PROCESSED_DIR, dataset_name)
+
+
+def _write_json_atomic(path: str, obj: Any):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class _PartWriter:
+    """Appends row arrays to numbered NDJSON parts of at most `part_rows` lines."""
+
+    def __init__(self, directory: str, part_rows: Optional[int] = None):
+        self.directory = directory
+        self.part_rows = part_rows or STAGING_PART_ROWS
+        self.parts: List[Dict[str, Any]] = []
+        self.rows = 0
+        self._fh = None
+
+    def append(self, values: Sequence[Any]):
+        if self._fh is None or self.parts[-1]['rows'] >= self.part_rows:
+            self._roll()
+        self._fh.write(json.dumps(values, ensure_ascii=False))
+        self._fh.write('\n')
+        self.parts[-1]['rows'] += 1
+        self.rows += 1
+
+    def _roll(self):
+        if self._fh is not None:
+            self._fh.close()
+        name = f"part-{len(self.parts):05d}.ndjson"
+        self._fh = open(os.path.join(self.directory, name), 'w', encoding='utf-8')
+        self.parts.append({'file': name, 'rows': 0})
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def _write_dataset(dataset_name: str, filename: str, headers: List[str], rows, mapping_for=None) -> Dict[str, Any]:
+    """Stage `rows` (iterable of value lists in header order) and write the manifest last."""
+    directory = _dataset_dir(dataset_name)
+    os.makedirs(directory, exist_ok=True)
+    writer = _PartWriter(directory)
+    sample: List[Dict[str, Any]] = []
+    try:
+        for values in rows:
+            if len(sample) < 5:
+                sample.append(dict(zip(headers, values)))
+            writer.append(values)
+    finally:
+        writer.close()
+    mapping = mapping_for(sample) if mapping_for else {h: h for h in headers}
+    manifest = {
+        'dataset': dataset_name,
+        'format': STAGING_FORMAT,
+        'filename': filename,
+        'headers': headers,
+        'mapping': mapping,
+        'rows': writer.rows,
+        'parts': writer.parts,
+        'created_at': datetime.utcnow().isoformat(),
+    }
+    _write_json_atomic(os.path.join(directory, MANIFEST_NAME), manifest)
+    return manifest
+
+
+def _migrate_legacy(dataset_name: str) -> Optional[Dict[str, Any]]:
+    """Convert an old single-file JSON dataset to the staged layout."""
+    legacy = os.path.join(PROCESSED_DIR, f"{dataset_name}.json")
+    if not os.path.exists(legacy):
+        return None
+    with open(legacy, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    rows = payload.get('rows', [])
+    mapping = payload.get('mapping', {})
+    # legacy rows are keyed by mapped names; recover the original headers from the mapping
+    headers = list(mapping)
+    keys = [mapping[h] for h in headers]
+    for r in rows:
+        for k in r:
+            if k not in keys:
+                headers.append(k)
+                keys.append(k)
+    filename = list_registry().get(dataset_name, {}).get('filename', f"{dataset_name}.json")
+    manifest = _write_dataset(dataset_name, filename, headers, ([r.get(k) for k in keys] for r in rows),
+                              mapping_for=lambda _: {h: k for h, k in zip(headers, keys)})
+    os.remove(legacy)
+    return manifest
+
+
+def read_manifest(dataset_name: str) -> Dict[str, Any]:
+    path = os.path.join(_dataset_dir(dataset_name), MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    manifest = _migrate_legacy(dataset_name)
+    if manifest is None:
+        raise FileNotFoundError(dataset_name)
+    return manifest
+
+
+def mapped_columns(manifest: Dict[str, Any]) -> List[str]:
+    """Output column names after mapping, in header order, without duplicates."""
+    mapping = manifest.get('mapping', {})
+    out: List[str] = []
+    for h in manifest.get('headers', []):
+        name = mapping.get(h, h)
+        if name not in out:
+            out.append(name)
+    return out
+
+
+def _metadata(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'filename': manifest.get('filename'),
+        'stored_path': _dataset_dir(manifest['dataset']),
+        'mapping': manifest.get('mapping', {}),
+        'rows': manifest.get('rows', 0),
+        'columns': mapped_columns(manifest),
+        'format': manifest.get('format'),
+        'created_at': manifest.get('created_at'),
+    }
+
+
+# --- public API ---
+
 def process_csv(file_path: str) -> Tuple[str, Dict[str, Any]]:
-    """Read CSV, detect columns, normalize rows, save processed JSON and mapping.
+    """Stream a CSV into a new staged dataset, detect the column mapping and write its manifest.
 
     Returns (dataset_name, metadata)
     """
     dataset_name = f"dataset_{uuid.uuid4().hex[:8]}"
-    out_path = os.path.join(PROCESSED_DIR, f"{dataset_name}.json")
 
     with open(file_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        rows = [r for r in reader]
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        width = len(headers)
 
-    mapping = detect_columns(rows[:5]) if rows else {}
+        def rows():
+            for r in reader:
+                if not r:
+                    continue
+                values = [v.strip() for v in r[:width]]
+                if len(values) < width:
+                    values.extend([None] * (width - len(values)))
+                yield values
 
-    # Normalize rows according to mapping
-    normalized = []
-    for r in rows:
-        nr = {}
-        for k, v in r.items():
-            mapped = mapping.get(k, k)
-            nr[mapped] = v.strip() if isinstance(v, str) else v
-        normalized.append(nr)
-
-    # Save processed JSON
-    with open(out_path, 'w', encoding='utf-8') as out:
-        json.dump({'mapping': mapping, 'rows': normalized}, out, ensure_ascii=False)
-
-    # Update mappings file
-    mappings = {}
+        manifest = _write_dataset(dataset_name, os.path.basename(file_path), headers, rows(), mapping_for=detect_columns)
+
+    return dataset_name, _metadata(manifest)
+
+
+def list_registry() -> Dict[str, Any]:
+    """Entries from the legacy data_mappings.json registry, if one exists."""
     if os.path.exists(MAPPINGS_FILE):
         try:
             with open(MAPPINGS_FILE, 'r', encoding='utf-8') as mfp:
-                mappings = json.load(mfp)
+                return json.load(mfp)
         except Exception:
-            mappings = {}
-
-    mappings[dataset_name] = {
-        'filename': os.path.basename(file_path),
-        'stored_path': out_path,
-        'mapping': mapping,
-        'rows': len(normalized),
-    }
-
-    with open(MAPPINGS_FILE, 'w', encoding='utf-8') as mfp:
-        json.dump(mappings, mfp, ensure_ascii=False, indent=2)
-
-    metadata = mappings[dataset_name]
-    return dataset_name, metadata
+            return {}
+    return {}
 
 
 def list_datasets() -> Dict[str, Any]:
-    if os.path.exists(MAPPINGS_FILE):
-        with open(MAPPINGS_FILE, 'r', encoding='utf-8') as mfp:
-            return json.load(mfp)
-    return {}
+    datasets = dict(list_registry())
+    for name in sorted(os.listdir(PROCESSED_DIR)):
+        path = os.path.join(PROCESSED_DIR, name, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                datasets[name] = _metadata(json.load(f))
+    return datasets
+
+
+def iter_raw(manifest: Dict[str, Any], offset: int = 0, limit: Optional[int] = None) -> Iterator[List[Any]]:
+    """Yield row value lists in header order, skipping whole parts that end before `offset`."""
+    directory = _dataset_dir(manifest['dataset'])
+    remaining = limit
+    start = 0
+    for part in manifest.get('parts', []):
+        end = start + part['rows']
+        if end <= offset:
+            start = end
+            continue
+        with open(os.path.join(directory, part['file']), 'r', encoding='utf-8') as f:
+            lines = itertools.islice(f, max(offset - start, 0), None)
+            for line in lines:
+                if remaining is not None:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                yield json.loads(line)
+        start = end
+
+
+def iter_rows(dataset_name: str, offset: int = 0, limit: Optional[int] = None,
+              columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Stream rows as dicts keyed by mapped column names, optionally projected to `columns`."""
+    manifest = read_manifest(dataset_name)
+    mapping = manifest.get('mapping', {})
+    keyed = [(i, mapping.get(h, h)) for i, h in enumerate(manifest.get('headers', []))]
+    if columns is not None:
+        wanted = set(columns)
+        keyed = [(i, k) for i, k in keyed if k in wanted]
+    for values in iter_raw(manifest, offset, limit):
+        yield {k: values[i] for i, k in keyed}
 
 
 def get_dataset(dataset_name: str) -> Dict[str, Any]:
-    path = os.path.join(PROCESSED_DIR, f"{dataset_name}.json")
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    raise FileNotFoundError(dataset_name)
+    manifest = read_manifest(dataset_name)
+    return {'mapping': manifest.get('mapping', {}), 'rows': list(iter_rows(dataset_name))}
 
 
-def ingest_dataset(dataset_name: str, db_path: str) -> Dict[str, Any]:
-    """Create a SQL table for the dataset and insert rows. Returns a summary dict.
+def get_dataset_page(dataset_name: str, offset: int = 0, limit: Optional[int] = None,
+                     columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """One page of a staged dataset plus its header, mapping and manifest row count.
 
-    Table name will be `uploaded_{dataset_name}`. Columns are created as TEXT.
+    `limit` defaults to DATASET_PAGE_SIZE and is capped at DATASET_PAGE_MAX; `limit=0`
+    returns only the header. Unknown projected columns raise ValueError.
     """
-    data = get_dataset(dataset_name)
-    rows = data.get('rows', [])
-    mapping = data.get('mapping', {})
-    if not rows:
-        return {'status': 'empty', 'rows': 0}
+    manifest = read_manifest(dataset_name)
+    all_columns = mapped_columns(manifest)
+    if columns:
+        unknown = [c for c in columns if c not in all_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    offset = max(int(offset or 0), 0)
+    limit = DATASET_PAGE_SIZE if limit is None else max(min(int(limit), DATASET_PAGE_MAX), 0)
+    total = manifest.get('rows', 0)
+    rows = list(iter_rows(dataset_name, offset, limit, columns)) if limit else []
+    next_offset = offset + len(rows)
+    return {
+        'mapping': manifest.get('mapping', {}),
+        'columns': list(columns) if columns else all_columns,
+        'rows': rows,
+        'offset': offset,
+        'limit': limit,
+        'total_rows': total,
+        'next_offset': next_offset if next_offset < total and rows else None,
+    }
 
-    table_name = f"uploaded_{dataset_name}"
-    import sqlite3
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-
-    # Determine columns from first row
-    first_row = rows[0] if rows else {}
-    cols = list(first_row.keys())
-
-    # Create table with TEXT columns
-    cols_def = ', '.join([f'"{c}" TEXT' for c in cols])
-    cur.execute(f'CREATE TABLE IF NOT EXISTS "{table_name}" (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols_def})')
-
-    # Insert rows
-    placeholders = ', '.join(['?'] * len(cols))
-    col_list = ', '.join([f'"{c}"' for c in cols])
-    insert_sql = f'INSERT INTO "{table_name}" ({col_list}) VALUES ({placeholders})'
-    values = []
-    for r in rows:
-        values.append([r.get(c) for c in cols])
 
-    cur.executemany(insert_sql, values)
-    conn.commit()
-    cur.execute(f'SELECT COUNT(*) as cnt FROM "{table_name}"')
-    cnt = cur.fetchone()[0]
-    conn.close()
-    return {'status': 'ok', 'table': table_name, 'rows': cnt}
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
 
 
-def save_mapping(dataset_name: str, new_mapping: Dict[str, str]) -> Dict[str, Any]:
-    """Update the mapping for a processed dataset and rename keys in stored rows.
+def ingest_dataset(dataset_name: str, db_path: str, progress=None) -> Dict[str, Any]:
+    """Create a typed SQL table for the dataset and bulk-load its rows. Returns a summary dict.
 
-    This will update the processed JSON and the central mappings registry.
-    Returns the updated metadata for the dataset.
+    Table name will be `uploaded_{dataset_name}`. Columns are the union of the
+    mapped headers. Types are inferred from the first STAGING_TYPE_SAMPLE rows
+    (see column_typing). Re-ingesting into an existing table adds any new
+    columns. Rows are streamed from the staged parts into executemany batches
+    inside one writer transaction. Identifier, geography and date columns are
+    indexed after the load, then the table is ANALYZEd. `progress` (an
+    UploadProgress, e.g. from a background job) is advanced after each batch.
     """
-    path = os.path.join(PROCESSED_DIR, f"{dataset_name}.json")
-    if not os.path.exists(path):
-        raise FileNotFoundError(dataset_name)
-
-    with open(path, 'r', encoding='utf-8') as f:
-        payload = json.load(f)
-
-    old_mapping = payload.get('mapping', {})
-    rows = payload.get('rows', [])
+    manifest = read_manifest(dataset_name)
+    if not manifest.get('rows'):
+        return {'status': 'empty', 'rows': 0}
 
-    # For each original header, if the mapped canonical name changed, rename keys in rows
-    for orig_header, old_mapped in old_mapping.items():
-        new_mapped = new_mapping.get(orig_header, old_mapped)
-        if new_mapped != old_mapped:
-            for r in rows:
-                if old_mapped in r:
-                    # Avoid overwriting an existing value accidentally
-                    if new_mapped in r and r.get(new_mapped) is None:
-                        r[new_mapped] = r.pop(old_mapped)
-                    else:
-                        r[new_mapped] = r.pop(old_mapped)
-
-    # Update payload mapping and save back
-    payload['mapping'] = new_mapping
-    payload['rows'] = rows
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-
-    # Update central mappings file
-    mappings = {}
-    if os.path.exists(MAPPINGS_FILE):
+    table_name = f"uploaded_{dataset_name}"
+    mapping = manifest.get('mapping', {})
+    cols = mapped_columns(manifest)
+    # when several headers map to one column the last one wins, as with dict rows
+    source_index = {mapping.get(h, h): i for i, h in enumerate(manifest.get('headers', []))}
+    picks = [source_index[c] for c in cols]
+
+    sample = ([values[i] for i in picks] for values in iter_raw(manifest, 0, STAGING_TYPE_SAMPLE))
+    types = infer_column_types(cols, sample)
+    converters = [converter(types[c]) for c in cols]
+    indexed = index_columns(types)
+
+    def _load(conn):
+        existing = [r[1] for r in conn.execute(f'PRAGMA table_info({_q(table_name)})').fetchall()]
+        if existing:
+            for c in cols:
+                if c not in existing:
+                    conn.execute(f'ALTER TABLE {_q(table_name)} ADD COLUMN {_q(c)} {types[c]}')
+        else:
+            cols_def = ', '.join([f'{_q(c)} {types[c]}' for c in cols])
+            conn.execute(f'CREATE TABLE {_q(table_name)} (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols_def})')
+        # a bigger page cache for the load; the writer connection's default is restored afterwards
+        cache_size = conn.execute('PRAGMA cache_size').fetchone()[0]
+        conn.execute(f'PRAGMA cache_size = -{STAGING_LOAD_CACHE_KB}')
         try:
-            with open(MAPPINGS_FILE, 'r', encoding='utf-8') as mfp:
-                mappings = json.load(mfp)
-        except Exception:
-            mappings = {}
+            placeholders = ', '.join(['?'] * len(cols))
+            col_list = ', '.join([_q(c) for c in cols])
+            insert_sql = f'INSERT INTO {_q(table_name)} ({col_list}) VALUES ({placeholders})'
+            rows = iter_raw(manifest)
+            while True:
+                batch = [[conv(values[i]) for conv, i in zip(converters, picks)]
+                         for values in itertools.islice(rows, STAGING_PART_ROWS)]
+                if not batch:
+                    break
+                conn.executemany(insert_sql, batch)
+                if progress is not None:
+                    progress.advance(len(batch), len(batch), 0)
+            for c in indexed:
+                index_name = re.sub(r'\W', '_', f'idx_{table_name}_{c}')
+                conn.execute(f'CREATE INDEX IF NOT EXISTS {_q(index_name)} ON {_q(table_name)} ({_q(c)})')
+            conn.execute(f'ANALYZE {_q(table_name)}')
+        finally:
+            conn.execute(f'PRAGMA cache_size = {cache_size}')
+        return conn.execute(f'SELECT COUNT(*) FROM {_q(table_name)}').fetchone()[0]
+
+    cnt = get_pool(db_path).write(_load)
+    invalidate_schema(db_path)
+    return {'status': 'ok', 'table': table_name, 'rows': cnt, 'column_types': types, 'indexes': indexed}
 
-    if dataset_name in mappings:
-        mappings[dataset_name]['mapping'] = new_mapping
-        mappings[dataset_name]['rows'] = len(rows)
-        with open(MAPPINGS_FILE, 'w', encoding='utf-8') as mfp:
-            json.dump(mappings, mfp, ensure_ascii=False, indent=2)
 
-    return mappings.get(dataset_name, {'mapping': new_mapping, 'rows': len(rows)})
+def save_mapping(dataset_name: str, new_mapping: Dict[str, str]) -> Dict[str, Any]:
+    """Update the mapping for a processed dataset.
+
+    Only the manifest is rewritten: rows are stored under their original headers
+    and the mapping is applied on read. Headers missing from `new_mapping` keep
+    their current mapping. Returns the updated metadata for the dataset.
+    """
+    manifest = read_manifest(dataset_name)
+    old_mapping = manifest.get('mapping', {})
+    manifest['mapping'] = {h: new_mapping.get(h, old_mapping.get(h, h)) for h in manifest.get('headers', [])}
+    manifest['updated_at'] = datetime.utcnow().isoformat()
+    _write_json_atomic(os.path.join(_dataset_dir(dataset_name), MANIFEST_NAME), manifest)
+    return _metadata(manifest)
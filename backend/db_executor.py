@@ -0,0 +1,118 @@
+"""
+Awaitable database execution layer for async endpoints.
+
+sqlite3 calls block, so running them directly inside an `async def` handler
+freezes the uvicorn event loop (and every other request and WebSocket) for the
+duration of the query. Async handlers hand their database work to a dedicated,
+bounded thread pool instead:
+
+    rows = await run_db(fetch_rows, rsid)
+
+or declare the handler body as a plain function and wrap it:
+
+    @router.get("/things")
+    @offload
+    def get_things(limit: int = 50): ...
+
+The pool is separate from Starlette's default threadpool so that a burst of slow
+analytic queries cannot starve file uploads or sync endpoints. Its size is
+DB_EXECUTOR_WORKERS (default: the connection pool size plus overflow).
+"""
+
+import asyncio
+import atexit
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Optional
+
+from .db_pool import POOL_SIZE, POOL_MAX_OVERFLOW
+
+logger = logging.getLogger(__name__)
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(POOL_SIZE + POOL_MAX_OVERFLOW)))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="taaip-db")
+    return _executor
+
+
+def bind_event_loop(loop: Optional[asyncio.AbstractEventLoop] = None):
+    """Remember the server's event loop so worker threads can schedule coroutines on it."""
+    global _loop
+    _loop = loop or asyncio.get_running_loop()
+
+
+def _track(fn: Callable, *args, **kwargs):
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """Run blocking `fn(*args, **kwargs)` on the database thread pool and await the result."""
+    loop = asyncio.get_running_loop()
+    if _loop is None:
+        bind_event_loop(loop)
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, _track, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def offload(fn: Callable) -> Callable:
+    """Turn a blocking endpoint function into an async one that runs on the database pool.
+
+    The wrapper keeps the original signature (via functools.wraps) so FastAPI
+    still resolves path/query/body parameters from it.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_db(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def call_in_loop(coro: Coroutine):
+    """Schedule `coro` on the server event loop from any thread (best-effort)."""
+    try:
+        return asyncio.get_running_loop().create_task(coro)
+    except RuntimeError:
+        pass
+    if _loop is not None and not _loop.is_closed():
+        return asyncio.run_coroutine_threadsafe(coro, _loop)
+    coro.close()
+    return None
+
+
+def executor_stats():
+    return {"workers": DB_EXECUTOR_WORKERS, "inflight": _inflight}
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+atexit.register(shutdown_executor)
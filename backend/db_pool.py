@@ -0,0 +1,417 @@
+"""
+Pooled SQLite connection manager shared by taaip_service and the routers.
+
+Each database file gets one `ConnectionPool`: a bounded LIFO set of reusable
+read connections plus a single writer connection owned by a background
+thread that group-commits queued writes. Connections
+handed out by the pool are `PooledConnection` objects, a `sqlite3.Connection`
+subclass whose `close()` returns the connection to the pool instead of
+discarding it, so existing `conn = get_db_conn() ... conn.close()` code keeps
+working while the page cache and parsed schema survive between requests.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from . import storage_config
+from .storage_config import WRITE_BATCH_SIZE, WRITE_BATCH_WINDOW_MS
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+POOL_MAX_OVERFLOW = int(os.getenv("SQLITE_POOL_MAX_OVERFLOW", "16"))
+POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", "30"))
+BUSY_TIMEOUT = storage_config.BUSY_TIMEOUT_MS / 1000.0
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its owning pool."""
+
+    _pool: Optional["ConnectionPool"] = None
+    _leased = False
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+            return
+        pool.release(self)
+
+    def _discard(self):
+        self._pool = None
+        try:
+            super().close()
+        except Exception:
+            pass
+
+    def __del__(self):
+        # A lease dropped without close() (e.g. an exception path in a handler)
+        # must still give its slot back, otherwise the pool slowly drains.
+        pool = self._pool
+        if pool is not None and self._leased:
+            pool._forget(self)
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections for a single database file."""
+
+    def __init__(
+        self,
+        db_path: str,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        timeout: float = POOL_TIMEOUT,
+        row_factory: Any = sqlite3.Row,
+    ):
+        self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.row_factory = row_factory
+        self._idle: List[PooledConnection] = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._file_id = None
+        self._writer: Optional[PooledConnection] = None
+        self._writer_file_id = None
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+
+    # --- connection lifecycle ---
+
+    def _stat_file(self):
+        try:
+            st = os.stat(self.db_path)
+            return (st.st_dev, st.st_ino)
+        except OSError:
+            return None
+
+    def _connect(self) -> PooledConnection:
+        if not os.path.exists(self.db_path):
+            # A -wal left behind by a deleted database would be replayed into the new file.
+            storage_config.remove_wal_files(self.db_path)
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.row_factory = self.row_factory
+        conn._pool = self
+        storage_config.configure_database(conn, self.db_path)
+        storage_config.apply_connection_pragmas(conn)
+        return conn
+
+    def _check_file(self):
+        """Drop idle connections if the database file was deleted or replaced.
+
+        Must be called with `_cond` held.
+        """
+        file_id = self._stat_file()
+        if file_id != self._file_id:
+            for conn in self._idle:
+                self._open -= 1
+                conn._discard()
+            self._idle.clear()
+            self._file_id = file_id
+
+    def acquire(self) -> PooledConnection:
+        """Lease a connection, blocking up to `timeout` seconds when the pool is exhausted."""
+        with self._cond:
+            self._check_file()
+            limit = self.pool_size + self.max_overflow
+            while not self._idle and self._open >= limit:
+                if not self._cond.wait(self.timeout):
+                    raise sqlite3.OperationalError(f"connection pool exhausted for {self.db_path}")
+                self._check_file()
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = self._connect()
+                self._open += 1
+                if self._file_id is None:
+                    self._file_id = self._stat_file()
+            conn._leased = True
+            return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a leased connection; uncommitted work is rolled back like a real close()."""
+        if conn is self._writer or not conn._leased:
+            return
+        conn._leased = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = self.row_factory
+            reusable = True
+        except sqlite3.Error:
+            reusable = False
+        with self._cond:
+            if reusable and len(self._idle) < self.pool_size and self._stat_file() == self._file_id:
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                conn._discard()
+            self._cond.notify()
+
+    def _forget(self, conn: PooledConnection):
+        conn._leased = False
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager form of acquire()/release()."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # --- background writer ---
+
+    def _get_writer(self) -> PooledConnection:
+        """Return the writer connection. Only called on the writer thread."""
+        file_id = self._stat_file()
+        if self._writer is not None and file_id != self._writer_file_id:
+            self._writer._discard()
+            self._writer = None
+        if self._writer is None:
+            self._writer = self._connect()
+            # Transactions on the writer are managed explicitly by _run_batch().
+            self._writer.isolation_level = None
+            self._writer_file_id = self._stat_file()
+        return self._writer
+
+    def _ensure_writer_thread(self):
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer_thread is None or not self._writer_thread.is_alive():
+                t = threading.Thread(
+                    target=self._writer_loop,
+                    name=f"sqlite-writer:{os.path.basename(self.db_path)}",
+                    daemon=True,
+                )
+                self._writer_thread = t
+                t.start()
+
+    def _submit(self, fn, args, kwargs, control: bool = False) -> Future:
+        fut: Future = Future()
+        self._ensure_writer_thread()
+        self._queue.put((fut, fn, args, kwargs, control))
+        return fut
+
+    def submit_write(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue `fn(conn, *args, **kwargs)` for the writer thread and return a Future."""
+        return self._submit(fn, args, kwargs)
+
+    def write(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(conn, *args, **kwargs)` on the writer thread and wait for its commit.
+
+        All mutations for a database file go through one queue and one
+        connection. Writes that pile up while a commit is in flight are folded
+        into the next transaction (group commit); each runs inside its own
+        SAVEPOINT so a failing write only rolls back itself. `fn` must not call
+        commit() or rollback() on the connection it is given.
+        """
+        if threading.current_thread() is self._writer_thread:
+            # Nested write from inside another write: run in the current transaction.
+            return fn(self._writer, *args, **kwargs)
+        return self.submit_write(fn, *args, **kwargs).result()
+
+    def _writer_loop(self):
+        while True:
+            job = self._queue.get()
+            batch = [job]
+            if not job[4]:
+                deadline = time.monotonic() + WRITE_BATCH_WINDOW_MS / 1000.0
+                while len(batch) < WRITE_BATCH_SIZE:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt[4]:
+                        # Control jobs (checkpoint/dispose) run outside a transaction.
+                        self._run_batch(batch)
+                        batch = [nxt]
+                        break
+                    batch.append(nxt)
+            if batch[0][4]:
+                self._run_control(batch[0])
+            else:
+                self._run_batch(batch)
+
+    def _run_control(self, job):
+        fut, fn, args, kwargs, _ = job
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    def _run_batch(self, batch):
+        jobs = [j for j in batch if j[0].set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        try:
+            conn = self._get_writer()
+            conn.execute("BEGIN IMMEDIATE")
+        except BaseException as e:
+            for fut, *_ in jobs:
+                fut.set_exception(e)
+            return
+
+        outcomes = []
+        for fut, fn, args, kwargs, _ in jobs:
+            try:
+                conn.execute("SAVEPOINT taaip_write")
+                result = fn(conn, *args, **kwargs)
+            except BaseException as e:
+                try:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK TO taaip_write")
+                        conn.execute("RELEASE taaip_write")
+                    else:
+                        conn.execute("BEGIN IMMEDIATE")
+                except sqlite3.Error:
+                    logger.exception("Writer failed to roll back savepoint")
+                outcomes.append((fut, None, e))
+                continue
+            if conn.in_transaction:
+                conn.execute("RELEASE taaip_write")
+            else:
+                # fn committed on its own; keep batching in a fresh transaction
+                conn.execute("BEGIN IMMEDIATE")
+            outcomes.append((fut, result, None))
+
+        try:
+            conn.execute("COMMIT")
+        except BaseException as e:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for fut, *_ in outcomes:
+                fut.set_exception(e)
+            return
+        for fut, result, error in outcomes:
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(result)
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer._discard()
+            self._writer = None
+
+    # --- maintenance ---
+
+    def checkpoint(self, mode: str = "TRUNCATE"):
+        """Checkpoint the WAL on the writer thread (e.g. before copying the file)."""
+        def _do():
+            return storage_config.checkpoint(self._get_writer(), mode)
+        return self._submit(_do, (), {}, control=True).result()
+
+    def dispose(self):
+        """Close every idle connection and the writer (e.g. after restoring a backup)."""
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            if threading.current_thread() is self._writer_thread:
+                self._close_writer()
+            else:
+                self._submit(self._close_writer, (), {}, control=True).result()
+        with self._cond:
+            for conn in self._idle:
+                self._open -= 1
+                conn._discard()
+            self._idle.clear()
+            self._file_id = None
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "db_path": self.db_path,
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "writer_open": self._writer is not None,
+                "write_queue": self._queue.qsize(),
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    """Return the process-wide pool for `db_path` (created on first use)."""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(key)
+                _pools[key] = pool
+    return pool
+
+
+def get_connection(db_path: str, row_factory: Any = sqlite3.Row) -> PooledConnection:
+    """Lease a pooled connection for `db_path`; call close() to return it.
+
+    `row_factory` only applies to this lease; the pool restores its default on release.
+    """
+    conn = get_pool(db_path).acquire()
+    conn.row_factory = row_factory
+    return conn
+
+
+def dispose_pools(db_path: Optional[str] = None):
+    """Dispose pools for one database file, or all pools when `db_path` is None."""
+    target = os.path.abspath(db_path) if db_path else None
+    with _pools_lock:
+        pools = [p for path, p in _pools.items() if target is None or path == target]
+    for pool in pools:
+        pool.dispose()
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [p.stats() for p in pools]
+
+
+def checkpoint_database(db_path: str):
+    """Checkpoint the WAL for `db_path` so a plain file copy sees every commit."""
+    return get_pool(db_path).checkpoint()
+
+
+def replace_database_file(src: str, dest: str):
+    """Copy `src` over the live database `dest` without a stale WAL being replayed."""
+    import shutil
+    dispose_pools(dest)
+    storage_config.remove_wal_files(dest)
+    shutil.copy2(src, dest)
+    storage_config.forget_database(dest)
+    dispose_pools(dest)
+    from .schema_registry import invalidate_schema
+    invalidate_schema(dest)
+
+
+atexit.register(dispose_pools)
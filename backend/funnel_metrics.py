@@ -0,0 +1,243 @@
+"""
+Single-pass funnel aggregation for /api/v2/recruiting-funnel/metrics.
+
+The endpoint used to scan `leads` four times: once each for the stage counts,
+the flash-to-bang averages, the no-show rate and the top loss reason. Each scan
+re-applied the fiscal-year filter and re-parsed ISO date strings with JULIANDAY.
+This engine runs one grouped query with conditional aggregates, grouped by
+(stage, loss_reason), and folds the groups in Python.
+
+Stage dates are kept as integer day numbers in `*_day` columns, so the averages
+are plain integer arithmetic. There is no insert trigger: a write-back UPDATE per
+inserted row more than doubled the cost of bulk lead loads, and the upload specs
+do not carry stage dates anyway. A row inserted with dates has NULL day numbers
+until the next startup backfill, and the query falls back to parsing the date
+for those rows. Stage dates are normally set by updates; an update trigger
+recomputes the day numbers, but only when a date actually changed. Results are
+cached per fiscal_year and are dropped when the `leads` write generation changes
+(see change_tracking).
+"""
+
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .change_tracking import table_generation
+
+logger = logging.getLogger(__name__)
+
+# ISO date column -> integer day-number column (backfilled, and kept current on update)
+DAY_COLUMNS = [
+    ("lead_date", "lead_day"),
+    ("prospect_date", "prospect_day"),
+    ("appointment_made_date", "appointment_made_day"),
+    ("appointment_conducted_date", "appointment_conducted_day"),
+    ("test_date", "test_day"),
+    ("test_pass_date", "test_pass_day"),
+    ("enlistment_date", "enlistment_day"),
+    ("ship_date", "ship_day"),
+]
+
+FLASH_COLUMNS = [
+    'prospect_date', 'lead_date', 'appointment_made_date', 'appointment_conducted_date',
+    'test_date', 'test_pass_date', 'enlistment_date', 'ship_date', 'dep_length_days',
+]
+
+# response key -> (later date, earlier date)
+FLASH_INTERVALS = [
+    ("avg_lead_to_prospect_days", "prospect_date", "lead_date"),
+    ("avg_prospect_to_appointment_days", "appointment_made_date", "prospect_date"),
+    ("avg_appointment_to_test_days", "test_date", "appointment_conducted_date"),
+    ("avg_test_to_enlistment_days", "enlistment_date", "test_pass_date"),
+    ("avg_lead_to_enlistment_days", "enlistment_date", "lead_date"),
+    ("avg_enlistment_to_ship_days", "ship_date", "enlistment_date"),
+]
+
+STAGE_KEYS = [
+    ("leads", "lead"),
+    ("prospects", "prospect"),
+    ("appointments_made", "appointment_made"),
+    ("appointments_conducted", "appointment_conducted"),
+    ("tests", "test"),
+    ("test_passes", "test_pass"),
+    ("enlistments", "enlistment"),
+    ("ships", "ship"),
+]
+
+_DAY_EXPR = "CAST(JULIANDAY(DATE({col})) AS INTEGER)"
+
+
+def ensure_day_columns(conn: sqlite3.Connection):
+    """Add the integer day-number columns to `leads`, install the update trigger and backfill. Does not commit."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(leads)").fetchall()}
+    pairs = [(d, n) for d, n in DAY_COLUMNS if d in cols]
+    if not pairs:
+        return
+    for date_col, day_col in pairs:
+        if day_col not in cols:
+            conn.execute(f"ALTER TABLE leads ADD COLUMN {day_col} INTEGER")
+    # the insert trigger and the unguarded update trigger of earlier versions
+    conn.execute("DROP TRIGGER IF EXISTS trg_leads_day_numbers_insert")
+    conn.execute("DROP TRIGGER IF EXISTS trg_leads_day_numbers_update")
+    conn.execute("DROP TRIGGER IF EXISTS trg_leads_day_numbers_changed")
+    assignments = ", ".join(f"{n} = {_DAY_EXPR.format(col='NEW.' + d)}" for d, n in pairs)
+    date_cols = ", ".join(d for d, _ in pairs)
+    changed = " OR ".join(f"NEW.{d} IS NOT OLD.{d}" for d, _ in pairs)
+    conn.execute(
+        f"""
+        CREATE TRIGGER trg_leads_day_numbers_changed AFTER UPDATE OF {date_cols} ON leads
+        WHEN {changed}
+        BEGIN
+            UPDATE leads SET {assignments} WHERE rowid = NEW.rowid;
+        END
+        """
+    )
+    stale = " OR ".join(f"({d} IS NOT NULL AND {n} IS NULL)" for d, n in pairs)
+    backfill = ", ".join(f"{n} = {_DAY_EXPR.format(col=d)}" for d, n in pairs)
+    conn.execute(f"UPDATE leads SET {backfill} WHERE {stale}")
+
+
+def _build_query(schema, stage_col: str, by_fiscal_year: bool) -> Tuple[str, Dict[str, bool]]:
+    has = lambda c: schema.has_column("leads", c)
+    day_of = dict(DAY_COLUMNS)
+
+    def day(date_col: str) -> str:
+        day_col = day_of.get(date_col)
+        expr = _DAY_EXPR.format(col=date_col)
+        if day_col and has(day_col):
+            return f"COALESCE({day_col}, {expr})"
+        return expr
+
+    flash = all(has(c) for c in FLASH_COLUMNS)
+    no_show = has('appointment_made_date') and has('appointment_no_show')
+    loss = has('loss_reason')
+
+    select = [f"{stage_col} AS stage", "loss_reason AS loss_reason" if loss else "NULL AS loss_reason", "COUNT(*) AS n"]
+    if flash:
+        for i, (_, later, earlier) in enumerate(FLASH_INTERVALS):
+            diff = f"CASE WHEN enlistment_date IS NOT NULL THEN {day(later)} - {day(earlier)} END"
+            select.append(f"SUM({diff}) AS s{i}")
+            select.append(f"COUNT({diff}) AS c{i}")
+        dep = "CASE WHEN enlistment_date IS NOT NULL THEN dep_length_days END"
+        select.append(f"SUM({dep}) AS s_dep")
+        select.append(f"COUNT({dep}) AS c_dep")
+    if no_show:
+        select.append("COUNT(appointment_made_date) AS appointments")
+        select.append("SUM(CASE WHEN appointment_made_date IS NOT NULL AND appointment_no_show = 1 THEN 1 ELSE 0 END) AS no_shows")
+
+    where = " WHERE fiscal_year = ?" if by_fiscal_year else ""
+    sql = f"SELECT {', '.join(select)} FROM leads{where} GROUP BY 1, 2"
+    return sql, {"flash": flash, "no_show": no_show, "loss": loss}
+
+
+def _safe_rate(numerator, denominator):
+    return round((numerator / denominator) * 100, 2) if denominator > 0 else 0
+
+
+def _avg_days(total, count):
+    if not count:
+        return 0
+    avg = total / count
+    return round(avg, 1) if avg else 0
+
+
+def empty_metrics() -> Dict[str, Any]:
+    return {
+        "funnel_counts": {"leads":0,"prospects":0,"appointments_made":0,"appointments_conducted":0,"tests":0,"test_passes":0,"enlistments":0,"ships":0,"losses":0,"total_active":0,"total_leads":0},
+        "conversion_rates": {"lead_to_prospect":0,"prospect_to_appointment":0,"appointment_made_to_conducted":0,"appointment_to_test":0,"test_to_pass":0,"test_pass_to_enlistment":0,"enlistment_to_ship":0,"overall_conversion":0},
+        "flash_to_bang": {"avg_lead_to_prospect_days":0,"avg_prospect_to_appointment_days":0,"avg_appointment_to_test_days":0,"avg_test_to_enlistment_days":0,"avg_lead_to_enlistment_days":0,"avg_enlistment_to_ship_days":0,"avg_dep_length_days":0},
+        "appointment_metrics": {"no_show_rate":0},
+        "loss_analysis": {"total_losses":0,"loss_rate":0,"top_loss_reason":"None"},
+    }
+
+
+def compute_funnel_metrics(conn: sqlite3.Connection, schema, fiscal_year: Optional[int] = None) -> Dict[str, Any]:
+    """Compute the funnel metrics payload with a single grouped query over `leads`."""
+    stage_col = schema.resolve("leads", "stage")
+    if not stage_col:
+        return empty_metrics()
+    by_fy = bool(fiscal_year) and schema.has_column("leads", "fiscal_year")
+    sql, parts = schema.sql(("funnel_metrics", stage_col, by_fy), lambda s: _build_query(s, stage_col, by_fy))
+    rows = conn.execute(sql, [fiscal_year] if by_fy else []).fetchall()
+
+    stage_counts: Dict[Any, int] = {}
+    loss_reasons: Dict[Any, int] = {}
+    n_flash = len(FLASH_INTERVALS)
+    sums = [0] * (n_flash + 1)
+    counts = [0] * (n_flash + 1)
+    appointments = no_shows = 0
+    for r in rows:
+        stage, reason, n = r[0], r[1], r[2]
+        stage_counts[stage] = stage_counts.get(stage, 0) + n
+        if reason is not None:
+            loss_reasons[reason] = loss_reasons.get(reason, 0) + n
+        idx = 3
+        if parts["flash"]:
+            for i in range(n_flash + 1):
+                sums[i] += r[idx] or 0
+                counts[i] += r[idx + 1] or 0
+                idx += 2
+        if parts["no_show"]:
+            appointments += r[idx] or 0
+            no_shows += r[idx + 1] or 0
+
+    funnel = {key: stage_counts.get(stage, 0) for key, stage in STAGE_KEYS}
+    losses = stage_counts.get('loss', 0)
+    total_active = sum(funnel.values())
+    total_leads = total_active + losses
+    funnel.update({"losses": losses, "total_active": total_active, "total_leads": total_leads})
+
+    flash_to_bang = {key: _avg_days(sums[i], counts[i]) for i, (key, _, _) in enumerate(FLASH_INTERVALS)}
+    flash_to_bang["avg_dep_length_days"] = _avg_days(sums[n_flash], counts[n_flash])
+
+    top_loss_reason = "None"
+    if loss_reasons:
+        top_loss_reason = sorted(loss_reasons.items(), key=lambda kv: (-kv[1], str(kv[0])))[0][0]
+
+    return {
+        "funnel_counts": funnel,
+        "conversion_rates": {
+            "lead_to_prospect": _safe_rate(funnel["prospects"], funnel["leads"]),
+            "prospect_to_appointment": _safe_rate(funnel["appointments_made"], funnel["prospects"]),
+            "appointment_made_to_conducted": _safe_rate(funnel["appointments_conducted"], funnel["appointments_made"]),
+            "appointment_to_test": _safe_rate(funnel["tests"], funnel["appointments_conducted"]),
+            "test_to_pass": _safe_rate(funnel["test_passes"], funnel["tests"]),
+            "test_pass_to_enlistment": _safe_rate(funnel["enlistments"], funnel["test_passes"]),
+            "enlistment_to_ship": _safe_rate(funnel["ships"], funnel["enlistments"]),
+            "overall_conversion": _safe_rate(funnel["enlistments"], total_leads),
+        },
+        "flash_to_bang": flash_to_bang,
+        "appointment_metrics": {"no_show_rate": _safe_rate(no_shows, appointments)},
+        "loss_analysis": {
+            "total_losses": losses,
+            "loss_rate": _safe_rate(losses, total_leads),
+            "top_loss_reason": top_loss_reason,
+        },
+    }
+
+
+class FunnelMetricsCache:
+    """Funnel metrics per fiscal_year, valid while the `leads` generation is unchanged."""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: Dict[Optional[int], Tuple[int, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, conn: sqlite3.Connection, schema, fiscal_year: Optional[int] = None) -> Dict[str, Any]:
+        generation = table_generation(conn, "leads")
+        with self._lock:
+            hit = self._entries.get(fiscal_year)
+        if hit and hit[0] == generation:
+            return hit[1]
+        metrics = compute_funnel_metrics(conn, schema, fiscal_year)
+        with self._lock:
+            if len(self._entries) >= self.max_entries and fiscal_year not in self._entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[fiscal_year] = (generation, metrics)
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
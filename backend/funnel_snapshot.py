@@ -0,0 +1,155 @@
+"""
+Materialized funnel-stage snapshot.
+
+`lead_current_stage` keeps each lead's latest funnel stage and
+`funnel_stage_counts` keeps the number of leads per stage. record_funnel_transition
+updates both in the same write transaction that inserts the transition, so the stage
+distribution is an O(stages) read instead of a correlated MAX(created_at) scan over
+all of `funnel_transitions`.
+
+rebuild() recomputes both tables from `funnel_transitions` for backfills, imports
+that bypass the API, or after a restore:
+
+    python -m backend.funnel_snapshot [path/to/recruiting.db]
+"""
+
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS lead_current_stage (
+        lead_key TEXT PRIMARY KEY,
+        stage TEXT NOT NULL,
+        transition_at TEXT,
+        updated_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_lead_current_stage_stage ON lead_current_stage (stage)",
+    """
+    CREATE TABLE IF NOT EXISTS funnel_stage_counts (
+        stage TEXT PRIMARY KEY,
+        lead_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+
+def ensure_snapshot_tables(conn: sqlite3.Connection):
+    for stmt in SNAPSHOT_SCHEMA:
+        conn.execute(stmt)
+
+
+def _transition_key_column(conn: sqlite3.Connection) -> Optional[str]:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(funnel_transitions)").fetchall()}
+    for c in ("prid", "lead_id"):
+        if c in cols:
+            return c
+    return None
+
+
+def _transition_time_expr(conn: sqlite3.Connection) -> Optional[str]:
+    """When a transition happened: `created_at`, else `transition_date` (the prid variant has only the latter)."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(funnel_transitions)").fetchall()}
+    present = [c for c in ("created_at", "transition_date") if c in cols]
+    if not present:
+        return None
+    return present[0] if len(present) == 1 else f"COALESCE({', '.join(present)})"
+
+
+def apply_transition(conn: sqlite3.Connection, lead_key: str, to_stage: str, transition_at: str):
+    """Move `lead_key` to `to_stage` in the snapshot and adjust the per-stage counters.
+
+    Runs inside the caller's transaction. Out-of-order transitions (older than the
+    stored one) are ignored so the snapshot matches "latest created_at wins".
+    """
+    row = conn.execute(
+        "SELECT stage, transition_at FROM lead_current_stage WHERE lead_key = ?", (lead_key,)
+    ).fetchone()
+    if row is not None:
+        old_stage, old_at = row[0], row[1]
+        if old_at and transition_at and transition_at < old_at:
+            return
+        if old_stage == to_stage:
+            conn.execute(
+                "UPDATE lead_current_stage SET transition_at = ?, updated_at = ? WHERE lead_key = ?",
+                (transition_at, datetime.utcnow().isoformat(), lead_key),
+            )
+            return
+        conn.execute("UPDATE funnel_stage_counts SET lead_count = lead_count - 1 WHERE stage = ?", (old_stage,))
+    conn.execute(
+        """
+        INSERT INTO lead_current_stage (lead_key, stage, transition_at, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(lead_key) DO UPDATE SET stage = excluded.stage, transition_at = excluded.transition_at, updated_at = excluded.updated_at
+        """,
+        (lead_key, to_stage, transition_at, datetime.utcnow().isoformat()),
+    )
+    conn.execute(
+        """
+        INSERT INTO funnel_stage_counts (stage, lead_count) VALUES (?, 1)
+        ON CONFLICT(stage) DO UPDATE SET lead_count = lead_count + 1
+        """,
+        (to_stage,),
+    )
+
+
+def rebuild(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Recompute the snapshot and counters from funnel_transitions. Does not commit."""
+    ensure_snapshot_tables(conn)
+    conn.execute("DELETE FROM lead_current_stage")
+    conn.execute("DELETE FROM funnel_stage_counts")
+    key = _transition_key_column(conn)
+    at = _transition_time_expr(conn) or "NULL"
+    if key:
+        # Latest transition per lead; rowid breaks timestamp ties in insertion order.
+        conn.execute(
+            f"""
+            INSERT INTO lead_current_stage (lead_key, stage, transition_at, updated_at)
+            SELECT {key}, to_stage, at, ?
+            FROM (
+                SELECT {key}, to_stage, {at} AS at,
+                       ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY {at} DESC, rowid DESC) AS rn
+                FROM funnel_transitions
+                WHERE {key} IS NOT NULL AND to_stage IS NOT NULL
+            )
+            WHERE rn = 1
+            """,
+            (datetime.utcnow().isoformat(),),
+        )
+    conn.execute(
+        "INSERT INTO funnel_stage_counts (stage, lead_count) SELECT stage, COUNT(*) FROM lead_current_stage GROUP BY stage"
+    )
+    return stage_distribution(conn)
+
+
+def needs_backfill(conn: sqlite3.Connection) -> bool:
+    """True when transitions exist but the snapshot has never been built."""
+    if conn.execute("SELECT 1 FROM lead_current_stage LIMIT 1").fetchone():
+        return False
+    try:
+        return conn.execute("SELECT 1 FROM funnel_transitions LIMIT 1").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+
+
+def stage_distribution(conn: sqlite3.Connection) -> Dict[str, int]:
+    rows = conn.execute(
+        "SELECT stage, lead_count FROM funnel_stage_counts WHERE lead_count > 0 ORDER BY stage"
+    ).fetchall()
+    return {r[0]: r[1] for r in rows}
+
+
+if __name__ == "__main__":
+    import sys
+
+    from .db_pool import get_pool
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "recruiting.db"
+    counts = get_pool(db_path).write(rebuild)
+    print(f"Rebuilt funnel snapshot for {db_path}: {sum(counts.values())} leads across {len(counts)} stages")
+    for stage, n in counts.items():
+        print(f"  {stage}: {n}")
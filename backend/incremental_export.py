@@ -0,0 +1,185 @@
+"""
+Incremental file exports for Power BI (exports/activities.csv, exports/kpis.csv).
+
+The export scheduler used to rewrite both files from full-table reads on every
+tick, even when nothing had changed. The files were written in place, so a
+Power BI refresh could read a half-written file. export_incremental() works
+like this instead:
+
+* It skips the run when the write generations (see change_tracking) of
+  marketing_activities, events and budgets are unchanged since the last run.
+* It partitions activities by reporting month into
+  exports/activities/activities_<YYYY-MM>.csv. A month is rewritten only when
+  its newest COALESCE(updated_at, created_at) is past the stored high-watermark,
+  or when its row count changed (which catches deletes). Activities without a
+  usable reporting_date go to the `unknown` partition.
+* It rebuilds exports/activities.csv by concatenating the partition files,
+  without touching the database, and only when a partition changed.
+* It recomputes kpis.csv with the grouped KPI query whenever any of the three
+  tables changed.
+
+Every file is written to a temp file and renamed into place. State
+(generations, watermark, per-month row counts) is kept in
+exports/.export_state.json. An update that does not stamp updated_at is still
+exported on the next forced run (POST /api/v2/exports/run).
+"""
+
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from .change_tracking import generations
+from .csv_export import iter_dicts_csv, iter_query_csv, write_chunks_atomic
+from .db_pool import get_connection
+from .kpi_engine import KPI_FIELDS, event_kpis
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_EXPORT_COLUMNS = [
+    "activity_id", "event_id", "activity_type", "campaign_name", "channel", "data_source", "impressions",
+    "engagement_count", "awareness_metric", "activation_conversions", "cost", "reporting_date", "metadata", "created_at",
+]
+KPI_EXPORT_HEADERS = ["event_id"] + KPI_FIELDS
+EXPORT_TABLES = ("marketing_activities", "events", "budgets")
+STATE_NAME = ".export_state.json"
+UNKNOWN_PARTITION = "unknown"
+
+_PARTITION_EXPR = f"CASE WHEN length(reporting_date) >= 7 THEN substr(reporting_date, 1, 7) ELSE '{UNKNOWN_PARTITION}' END"
+
+
+def _partition_file(exports_dir: str, month: str) -> str:
+    return os.path.join(exports_dir, "activities", f"activities_{re.sub(r'[^0-9A-Za-z_-]', '_', month)}.csv")
+
+
+def _load_state(exports_dir: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(exports_dir, STATE_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(exports_dir: str, state: Dict[str, Any]):
+    data = json.dumps(state, indent=2, sort_keys=True).encode("utf-8")
+    write_chunks_atomic(os.path.join(exports_dir, STATE_NAME), [data])
+
+
+def _has_generations(conn) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'table_generations'").fetchone() is not None
+
+
+def _month_query(month: str):
+    cols = ", ".join(ACTIVITY_EXPORT_COLUMNS)
+    if month == UNKNOWN_PARTITION:
+        return (f"SELECT {cols} FROM marketing_activities WHERE reporting_date IS NULL OR length(reporting_date) < 7 "
+                "ORDER BY activity_id", ())
+    # the range lets the reporting_date index narrow the scan; the substr keeps it exact
+    return (f"SELECT {cols} FROM marketing_activities WHERE reporting_date >= ? AND reporting_date < ? "
+            f"AND substr(reporting_date, 1, 7) = ? ORDER BY reporting_date, activity_id", (month, month + "~", month))
+
+
+def _concat_partitions(paths: List[str]) -> Iterator[bytes]:
+    header_skipped = False
+    for path in paths:
+        with open(path, "rb") as fh:
+            header = fh.readline()
+            if not header_skipped:
+                yield header
+                header_skipped = True
+            while True:
+                block = fh.read(1024 * 1024)
+                if not block:
+                    break
+                yield block
+    if not header_skipped:
+        yield next(iter_dicts_csv([], ACTIVITY_EXPORT_COLUMNS))
+
+
+def _remove_stale_partitions(exports_dir: str, months: Dict[str, int]) -> List[str]:
+    """Delete partition files for months that no longer have activities.
+
+    The directory is listed rather than the saved state, so a forced run (which
+    starts without state) still removes them.
+    """
+    part_dir = os.path.join(exports_dir, "activities")
+    if not os.path.isdir(part_dir):
+        return []
+    expected = {os.path.basename(_partition_file(exports_dir, m)) for m in months}
+    removed = []
+    for name in sorted(os.listdir(part_dir)):
+        if name.startswith("activities_") and name.endswith(".csv") and name not in expected:
+            os.remove(os.path.join(part_dir, name))
+            removed.append(name[len("activities_"):-len(".csv")])
+    return removed
+
+
+def export_incremental(db_path: str, exports_dir: str, force: bool = False) -> Dict[str, Any]:
+    """Bring the export files up to date with the database; see the module docstring."""
+    activities_path = os.path.join(exports_dir, "activities.csv")
+    kpis_path = os.path.join(exports_dir, "kpis.csv")
+    state = {} if force else _load_state(exports_dir)
+    files_present = os.path.exists(activities_path) and os.path.exists(kpis_path)
+
+    conn = get_connection(db_path)
+    try:
+        gens = list(generations(conn, EXPORT_TABLES)) if _has_generations(conn) else None
+        if gens is not None and state.get("generations") == gens and files_present:
+            return {"status": "skipped", "exports": [activities_path, kpis_path], "partitions_written": [], "partitions_removed": []}
+
+        old_gens = state.get("generations") or [None] * len(EXPORT_TABLES)
+        activities_changed = gens is None or old_gens[0] != gens[0] or not os.path.exists(activities_path)
+        watermark = state.get("watermark")
+        old_counts: Dict[str, int] = state.get("partitions", {})
+        months: Dict[str, int] = {}
+        written: List[str] = []
+        removed: List[str] = []
+        new_watermark = watermark
+
+        if activities_changed:
+            rows = conn.execute(
+                f"SELECT {_PARTITION_EXPR} AS month, COUNT(*), MAX(COALESCE(updated_at, created_at)) "
+                "FROM marketing_activities GROUP BY month"
+            ).fetchall()
+            for month, count, newest in rows:
+                months[month] = count
+                stale = (
+                    month not in old_counts
+                    or old_counts[month] != count
+                    or (newest is not None and (watermark is None or newest > watermark))
+                    or not os.path.exists(_partition_file(exports_dir, month))
+                )
+                if stale:
+                    sql, params = _month_query(month)
+                    write_chunks_atomic(_partition_file(exports_dir, month), iter_query_csv(db_path, sql, params, headers=ACTIVITY_EXPORT_COLUMNS))
+                    written.append(month)
+                if newest is not None and (new_watermark is None or newest > new_watermark):
+                    new_watermark = newest
+            removed = _remove_stale_partitions(exports_dir, months)
+            if written or removed or not os.path.exists(activities_path):
+                parts = [_partition_file(exports_dir, m) for m in sorted(months)]
+                write_chunks_atomic(activities_path, _concat_partitions(parts))
+        else:
+            months = old_counts
+
+        kpis = event_kpis(conn)
+    finally:
+        conn.close()
+    write_chunks_atomic(kpis_path, iter_dicts_csv(kpis, KPI_EXPORT_HEADERS))
+
+    _save_state(exports_dir, {
+        "generations": gens,
+        "watermark": new_watermark,
+        "partitions": months,
+        "last_run_at": datetime.utcnow().isoformat(),
+    })
+    if written or removed:
+        logger.info(f"Incremental export wrote {len(written)} and removed {len(removed)} activity partition(s)")
+    return {
+        "status": "ok",
+        "exports": [activities_path, kpis_path],
+        "partitions_written": written,
+        "partitions_removed": removed,
+    }
@@ -0,0 +1,163 @@
+"""
+Managed index set and EXPLAIN QUERY PLAN advisor for recruiting.db.
+
+INDEX_PLAN lists the composite indexes the dashboard queries rely on. They are
+created by init_db() through ensure_indexes(); an index whose table or columns
+do not exist in this deployment's schema is skipped rather than failing startup
+(older databases still use `lead_id`/`stage` instead of `prid`/`current_stage`).
+
+ENDPOINT_QUERIES registers the hot endpoint queries; explain_queries() runs
+EXPLAIN QUERY PLAN over each one and reports which of them still fall back to a
+full table scan. Other modules add their own queries with register_query().
+"""
+
+import logging
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# (index name, table, columns) — column order matters: equality filters first, then range/sort.
+INDEX_PLAN = [
+    ("idx_leads_prid", "leads", ("prid",)),
+    ("idx_leads_rsid", "leads", ("rsid",)),
+    ("idx_leads_brigade", "leads", ("brigade",)),
+    ("idx_leads_fy_stage", "leads", ("fiscal_year", "current_stage")),
+    ("idx_leads_current_stage", "leads", ("current_stage",)),
+    ("idx_leads_lead_date", "leads", ("lead_date",)),
+    ("idx_leads_recruiter", "leads", ("recruiter_id", "current_stage")),
+    ("idx_leads_lead_source", "leads", ("lead_source",)),
+    ("idx_leads_created_at", "leads", ("created_at",)),
+    ("idx_funnel_transitions_prid_created", "funnel_transitions", ("prid", "created_at")),
+    ("idx_funnel_transitions_lead_created", "funnel_transitions", ("lead_id", "created_at")),
+    ("idx_marketing_activities_event", "marketing_activities", ("event_id",)),
+    ("idx_marketing_activities_source_date", "marketing_activities", ("data_source", "reporting_date")),
+    ("idx_marketing_activities_reporting_date", "marketing_activities", ("reporting_date",)),
+    ("idx_segment_profiles_lead", "segment_profiles", ("lead_id",)),
+    ("idx_segment_history_lead", "segment_history", ("lead_id", "changed_at")),
+    ("idx_event_metrics_event", "event_metrics", ("event_id", "date")),
+    ("idx_capture_survey_lead", "capture_survey", ("lead_id", "timestamp")),
+    ("idx_market_potential_fy_q_level", "market_potential", ("fiscal_year", "quarter", "geographic_level")),
+]
+
+# Registered endpoint queries: name -> {"endpoint": ..., "sql": ...}. `?` placeholders are bound to NULL for EXPLAIN.
+ENDPOINT_QUERIES: Dict[str, Dict[str, str]] = {}
+
+
+def register_query(name: str, endpoint: str, sql: str):
+    """Register an endpoint query for the index advisor."""
+    ENDPOINT_QUERIES[name] = {"endpoint": endpoint, "sql": " ".join(sql.split())}
+
+
+register_query("funnel.stage_counts", "/api/v2/recruiting-funnel/metrics",
+               "SELECT current_stage, COUNT(*) FROM leads WHERE fiscal_year = ? GROUP BY current_stage")
+register_query("funnel.loss_reasons", "/api/v2/recruiting-funnel/metrics",
+               "SELECT loss_reason, COUNT(*) FROM leads WHERE fiscal_year = ? AND loss_reason IS NOT NULL GROUP BY loss_reason")
+register_query("funnel.latest_transition", "/api/v2/funnel/metrics",
+               "SELECT to_stage FROM funnel_transitions WHERE prid = ? ORDER BY created_at DESC LIMIT 1")
+register_query("leads.by_stage", "/api/v2/leads/metrics",
+               "SELECT current_stage, COUNT(*) FROM leads GROUP BY current_stage")
+register_query("leads.by_recruiter", "/api/v2/leads/metrics",
+               "SELECT recruiter_id, COUNT(*) FROM leads WHERE recruiter_id IS NOT NULL GROUP BY recruiter_id")
+register_query("leads.by_source", "/api/v2/leads/metrics",
+               "SELECT lead_source, COUNT(*) FROM leads GROUP BY lead_source")
+register_query("leads.date_range", "/api/v2/leads/status",
+               "SELECT prid, current_stage FROM leads WHERE lead_date BETWEEN ? AND ? ORDER BY lead_date DESC")
+register_query("marketing.by_event", "/api/v2/marketing/activities",
+               "SELECT * FROM marketing_activities WHERE event_id = ?")
+register_query("marketing.by_source_date", "/api/v2/marketing/activities",
+               "SELECT * FROM marketing_activities WHERE data_source = ? AND reporting_date >= ? ORDER BY reporting_date DESC")
+register_query("segments.by_lead", "/api/v2/segments/{lead_id}",
+               "SELECT segments, attributes FROM segment_profiles WHERE lead_id = ?")
+register_query("event_metrics.by_event", "/api/v2/events/{event_id}/metrics",
+               "SELECT * FROM event_metrics WHERE event_id = ? ORDER BY date")
+register_query("market_potential.by_period", "/api/v2/market-potential",
+               "SELECT * FROM market_potential WHERE fiscal_year = ? AND quarter = ? AND geographic_level = ?")
+
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set:
+    return {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")').fetchall()}
+
+
+def plan_status(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Describe every planned index as present, missing, or not applicable to this schema."""
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()}
+    cols_cache: Dict[str, set] = {}
+    out = []
+    for name, table, cols in INDEX_PLAN:
+        if table not in cols_cache:
+            cols_cache[table] = _table_columns(conn, table)
+        table_cols = cols_cache[table]
+        if name in existing:
+            state = "present"
+        elif not table_cols or not set(cols) <= table_cols:
+            state = "not_applicable"
+        else:
+            state = "missing"
+        out.append({"name": name, "table": table, "columns": list(cols), "state": state})
+    return out
+
+
+def ensure_indexes(conn: sqlite3.Connection) -> List[str]:
+    """Create the planned indexes that apply to this schema. Returns the names created.
+
+    Does not commit; callers run it inside their own transaction (init_db).
+    """
+    created = []
+    for entry in plan_status(conn):
+        if entry["state"] != "missing":
+            continue
+        cols = ", ".join(entry["columns"])
+        try:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {entry["name"]} ON "{entry["table"]}" ({cols})')
+            created.append(entry["name"])
+        except sqlite3.Error as e:
+            logger.warning(f"Could not create index {entry['name']}: {e}")
+    if created:
+        logger.info(f"Created indexes: {', '.join(created)}")
+    return created
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Optional[Sequence[Any]] = None) -> List[str]:
+    """Return the EXPLAIN QUERY PLAN detail lines for `sql`."""
+    if params is None:
+        params = [None] * sql.count("?")
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def full_scans(plan: Sequence[str]) -> List[str]:
+    """Table names that a plan reads with a full table scan (no index)."""
+    return [m.group(1) for m in (_FULL_SCAN.match(d.strip()) for d in plan) if m]
+
+
+def explain_queries(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """Run EXPLAIN QUERY PLAN over every registered endpoint query."""
+    report = []
+    for name, q in sorted(ENDPOINT_QUERIES.items()):
+        entry = {"name": name, "endpoint": q["endpoint"], "sql": q["sql"]}
+        try:
+            plan = explain(conn, q["sql"])
+            entry["plan"] = plan
+            entry["full_scans"] = full_scans(plan)
+            entry["status"] = "full_scan" if entry["full_scans"] else "indexed"
+        except sqlite3.Error as e:
+            # query references a table/column this deployment does not have
+            entry["status"] = "unavailable"
+            entry["error"] = str(e)
+        report.append(entry)
+    return report
+
+
+def advise(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Index plan state plus the query report, with a summary of full scans."""
+    indexes = plan_status(conn)
+    queries = explain_queries(conn)
+    return {
+        "indexes": indexes,
+        "missing_indexes": [i["name"] for i in indexes if i["state"] == "missing"],
+        "queries": queries,
+        "full_scan_queries": [q["name"] for q in queries if q["status"] == "full_scan"],
+    }
@@ -0,0 +1,277 @@
+"""
+Background jobs for long-running uploads, ingests, exports and forecasts.
+
+Those endpoints used to do all their work inside the HTTP request. A large
+import could outlive the gateway timeout, and the gateway retry then imported
+the file a second time. An endpoint called with `?background=true` now queues
+the work and returns 202 with a job id right away:
+
+    job_id = get_job_queue().submit("upload:leads", _upload_leads_sync, filename, path, ...)
+
+Jobs run on a bounded thread pool of JOB_WORKERS threads inside the API
+process. No broker is involved. Threads rather than processes are used because
+all writes for a database file must go through that process's db_pool writer
+thread. Each job is recorded in the `jobs` table (status, params, result,
+error, timestamps), so GET /api/v2/jobs/{id} still answers after the worker has
+finished. Live progress comes from the upload_stream registry under the same
+id. Jobs left queued or running by a previous process are marked failed on
+first use.
+
+Submitting an id that is already queued, running or completed returns the
+existing job. A client can therefore retry with the same `upload_id` without
+importing the file twice. The id is claimed with a single upsert on the
+writer thread, so two concurrent retries cannot both schedule the work.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .db_pool import get_connection, get_pool
+from .upload_stream import get_progress, start_progress
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(REPO_ROOT, "recruiting.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "64"))
+JOB_SSE_INTERVAL = float(os.getenv("JOB_SSE_INTERVAL", "0.5"))
+
+TERMINAL = ("completed", "failed")
+
+JOB_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        params TEXT,
+        progress TEXT,
+        result TEXT,
+        error TEXT,
+        created_at TEXT,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at)",
+]
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+def ensure_job_table(conn):
+    for stmt in JOB_SCHEMA:
+        conn.execute(stmt)
+
+
+def _fail_interrupted(conn) -> int:
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'failed', error = 'Interrupted by a service restart', finished_at = ? "
+        "WHERE status IN ('queued', 'running')",
+        (datetime.utcnow().isoformat(),),
+    )
+    return cur.rowcount
+
+
+def _claim(conn, job_id: str, kind: str, params: Optional[str]) -> bool:
+    """Insert a queued job, or requeue a failed one; False when `job_id` is already queued, running or completed."""
+    cur = conn.execute(
+        """
+        INSERT INTO jobs (job_id, kind, status, params, created_at) VALUES (?, ?, 'queued', ?, ?)
+        ON CONFLICT(job_id) DO UPDATE SET
+            kind = excluded.kind, status = 'queued', params = excluded.params, progress = NULL, result = NULL,
+            error = NULL, created_at = excluded.created_at, started_at = NULL, finished_at = NULL
+        WHERE jobs.status = 'failed'
+        """,
+        (job_id, kind, params, datetime.utcnow().isoformat()),
+    )
+    return cur.rowcount > 0
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+def _loads(value: Optional[str]) -> Any:
+    return json.loads(value) if value else None
+
+
+class JobQueue:
+    """Persistent job table plus a bounded worker pool for one database file."""
+
+    def __init__(self, db_path: str, workers: int = JOB_WORKERS, max_pending: int = JOB_QUEUE_MAX):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._ready = False
+        self._pending = 0
+
+    def _ensure(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+
+            def _setup(conn):
+                ensure_job_table(conn)
+                return _fail_interrupted(conn)
+
+            interrupted = get_pool(self.db_path).write(_setup)
+            if interrupted:
+                logger.warning(f"Marked {interrupted} interrupted job(s) as failed")
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="taaip-job")
+            self._ready = True
+
+    def _write(self, sql: str, params: tuple):
+        get_pool(self.db_path).write(lambda conn: conn.execute(sql, params))
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[..., Any],
+        *args,
+        job_id: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        with_progress: bool = False,
+        on_duplicate: Optional[Callable[[], Any]] = None,
+        **kwargs,
+    ) -> str:
+        """Record a queued job and schedule `fn(*args, **kwargs)` on the worker pool.
+
+        With `with_progress`, `fn` also receives `progress=` (an UploadProgress
+        registered under the job id). When `job_id` is already queued, running or
+        completed, nothing is scheduled and `on_duplicate` (e.g. discarding the
+        spooled upload) is called instead. Raises JobQueueFull when JOB_QUEUE_MAX
+        jobs are already waiting or running.
+        """
+        self._ensure()
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"Job queue is full ({self._pending} pending)")
+            self._pending += 1
+        scheduled = False
+        try:
+            if get_pool(self.db_path).write(_claim, job_id, kind, _dumps(params)):
+                self._executor.submit(self._run, job_id, kind, fn, args, kwargs, with_progress)
+                scheduled = True
+        finally:
+            if not scheduled:
+                with self._lock:
+                    self._pending -= 1
+        if not scheduled and on_duplicate is not None:
+            on_duplicate()
+        return job_id
+
+    def _run(self, job_id: str, kind: str, fn: Callable[..., Any], args: tuple, kwargs: dict, with_progress: bool):
+        started = time.time()
+        progress = None
+        try:
+            self._write(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+                (datetime.utcnow().isoformat(), job_id),
+            )
+            if with_progress:
+                progress = start_progress(kind, upload_id=job_id)
+                kwargs = dict(kwargs, progress=progress)
+            result = fn(*args, **kwargs)
+            if progress is not None and progress.status == "running":
+                progress.finish("completed")
+            self._finish(job_id, "completed", result=result)
+            logger.info(f"Job {job_id} ({kind}) completed in {time.time() - started:.1f}s")
+        except Exception as e:
+            # HTTPException from the wrapped endpoint helpers carries its message in `detail`
+            detail = getattr(e, "detail", None)
+            message = str(detail.get("message", detail) if isinstance(detail, dict) else detail or e)
+            if progress is not None and progress.status == "running":
+                progress.finish("failed", message)
+            logger.exception(f"Job {job_id} ({kind}) failed")
+            try:
+                self._finish(job_id, "failed", error=message)
+            except Exception:
+                logger.exception(f"Could not record failure of job {job_id}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        self._write(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, progress = ?, finished_at = ? WHERE job_id = ?",
+            (status, _dumps(result), error, _dumps(get_progress(job_id)), datetime.utcnow().isoformat(), job_id),
+        )
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        job = dict(row)
+        for k in ("params", "progress", "result"):
+            job[k] = _loads(job[k])
+        if job["status"] not in TERMINAL:
+            # while the job runs, progress lives in memory under the job id
+            job["progress"] = get_progress(job["job_id"]) or job["progress"]
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure()
+        conn = get_connection(self.db_path)
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        self._ensure()
+        sql = "SELECT * FROM jobs"
+        params: list = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        conn = get_connection(self.db_path)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [self._to_dict(r) for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"db_path": self.db_path, "workers": self.workers, "pending": self._pending, "max_pending": self.max_pending}
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide job queue backed by JOBS_DB_PATH."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(JOBS_DB_PATH)
+    return _queue
+
+
+def queued_response(job_id: str, status: str = "queued") -> Dict[str, Any]:
+    """Body returned (with HTTP 202) by endpoints that ran with `?background=true`."""
+    return {
+        "status": status,
+        "job_id": job_id,
+        "status_url": f"/api/v2/jobs/{job_id}",
+        "events_url": f"/api/v2/jobs/{job_id}/events",
+    }
@@ -0,0 +1,132 @@
+"""
+Set-based KPI computation for marketing activities.
+
+The KPI exports used to loop over every event and call get_kpis(event_id=...)
+for each one. Each call leased a connection and ran two aggregate queries, so
+an export over N events cost 2N queries. event_kpis() computes the same
+figures for every event in one statement. Activities are aggregated with
+`GROUP BY event_id`, budgets are aggregated the same way, and both are
+left-joined to `events`. /api/v2/kpis uses kpi_totals(). Both share the
+filter builder and derive_kpis(), so the exported numbers match the API.
+
+KPIs: the total cost is activity cost plus allocated budget. CPL, CPE and CPC
+are that cost per activation, per engagement and per impression. Each is None
+when its denominator is zero.
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+KPI_FIELDS = [
+    "total_cost", "activity_cost", "budget_total", "total_impressions",
+    "total_engagements", "total_activations", "cpl", "cpe", "cpc",
+]
+
+_ACTIVITY_SUMS = (
+    "SUM(ma.cost) AS activity_cost, SUM(ma.impressions) AS impressions, "
+    "SUM(ma.engagement_count) AS engagements, SUM(ma.activation_conversions) AS activations"
+)
+
+
+def activity_filters(
+    event_id: Optional[str] = None,
+    data_source: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Tuple[List[str], List[Any]]:
+    """WHERE clauses (on alias `ma`) and params for the activity filters of /api/v2/kpis."""
+    where: List[str] = []
+    params: List[Any] = []
+    if event_id:
+        where.append("ma.event_id = ?")
+        params.append(event_id)
+    if data_source:
+        where.append("ma.data_source = ?")
+        params.append(data_source)
+    if start_date:
+        where.append("ma.reporting_date >= ?")
+        params.append(start_date)
+    if end_date:
+        where.append("ma.reporting_date <= ?")
+        params.append(end_date)
+    return where, params
+
+
+def derive_kpis(activity_cost, budget_total, impressions, engagements, activations) -> Dict[str, Any]:
+    activity_cost = activity_cost or 0.0
+    budget_total = budget_total or 0.0
+    impressions = impressions or 0
+    engagements = engagements or 0
+    activations = activations or 0
+    combined_cost = float(activity_cost) + float(budget_total)
+    cpl = (combined_cost / activations) if activations > 0 else None
+    cpe = (combined_cost / engagements) if engagements > 0 else None
+    cpc = (combined_cost / impressions) if impressions > 0 else None
+    return {
+        "total_cost": combined_cost,
+        "budget_total": budget_total,
+        "activity_cost": activity_cost,
+        "total_impressions": impressions,
+        "total_engagements": engagements,
+        "total_activations": activations,
+        "cpl": round(cpl, 2) if cpl is not None else None,
+        "cpe": round(cpe, 2) if cpe is not None else None,
+        "cpc": round(cpc, 4) if cpc is not None else None,
+    }
+
+
+def kpi_totals(
+    conn: sqlite3.Connection,
+    event_id: Optional[str] = None,
+    data_source: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict[str, Any]:
+    """KPIs over the filtered activities. The event's budget is included only when `event_id` is given."""
+    where, params = activity_filters(event_id, data_source, start_date, end_date)
+    budget = "(SELECT SUM(allocated_amount) FROM budgets WHERE event_id = ?)" if event_id else "0.0"
+    sql = f"SELECT {_ACTIVITY_SUMS}, {budget} AS budget_total FROM marketing_activities ma"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    row = conn.execute(sql, ([event_id] if event_id else []) + params).fetchone()
+    return derive_kpis(row[0], row[4], row[1], row[2], row[3])
+
+
+def event_kpis(
+    conn: sqlite3.Connection,
+    event_ids: Optional[Sequence[str]] = None,
+    data_source: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """One KPI row (`event_id` plus KPI_FIELDS) per event in `events`, ordered by event_id, in a single query."""
+    where, params = activity_filters(None, data_source, start_date, end_date)
+    act_where = ("WHERE " + " AND ".join(where)) if where else ""
+    sql = f"""
+        WITH act AS (
+            SELECT ma.event_id, {_ACTIVITY_SUMS}
+            FROM marketing_activities ma {act_where}
+            GROUP BY ma.event_id
+        ),
+        bud AS (
+            SELECT event_id, SUM(allocated_amount) AS budget_total
+            FROM budgets
+            GROUP BY event_id
+        )
+        SELECT e.event_id, act.activity_cost, bud.budget_total, act.impressions, act.engagements, act.activations
+        FROM events e
+        LEFT JOIN act ON act.event_id = e.event_id
+        LEFT JOIN bud ON bud.event_id = e.event_id
+    """
+    if event_ids is not None:
+        if not event_ids:
+            return []
+        sql += f" WHERE e.event_id IN ({', '.join('?' * len(event_ids))})"
+        params = params + list(event_ids)
+    sql += " ORDER BY e.event_id"
+    rows = []
+    for r in conn.execute(sql, params).fetchall():
+        row = {"event_id": r[0]}
+        row.update(derive_kpis(*r[1:]))
+        rows.append(row)
+    return rows
@@ -0,0 +1,157 @@
+"""
+Idempotent vendor syncs into marketing_activities.
+
+POST /api/v2/marketing/sync used to insert one new row, with a fresh random
+activity_id, for every item in the payload. A vendor (or
+mocks/mock_sources.py) that re-sent the same batch duplicated every
+activity, and every KPI query then read the duplicates. Hourly vendor syncs
+are mostly re-sends.
+
+apply_sync() identifies an item by the natural key
+(data_source, source_key, reporting_date). `source_key` is the item's
+`activity_id`/`id`, or its key in `sync_data`. The key is backed by a
+partial unique index. The whole payload goes through one executemany
+upsert in the caller's write transaction:
+
+* an unknown key is inserted;
+* a known key whose fields changed is updated, and its updated_at is bumped
+  so the incremental export picks it up;
+* a known key with identical fields is skipped and not written.
+
+Activities created before this change have source_key NULL and are not
+touched. Each source's `sync_watermark` (the vendor cursor sent as
+`watermark`, kept at its maximum) and last sync time are stored on its
+data_source_mappings row, so pullers can resume from there.
+"""
+
+import json
+import logging
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("campaign", "impressions", "engagement")
+_IN_BATCH = 500
+
+_FIELDS = ("activity_type", "campaign_name", "channel", "impressions", "engagement_count",
+           "awareness_metric", "activation_conversions", "metadata")
+
+_UPSERT_SQL = f"""
+    INSERT INTO marketing_activities
+        (activity_id, activity_type, campaign_name, channel, data_source, source_key,
+         impressions, engagement_count, awareness_metric, activation_conversions,
+         reporting_date, metadata, created_at, updated_at)
+    VALUES
+        (:activity_id, :activity_type, :campaign_name, :channel, :data_source, :source_key,
+         :impressions, :engagement_count, :awareness_metric, :activation_conversions,
+         :reporting_date, :metadata, :now, :now)
+    ON CONFLICT (data_source, source_key, reporting_date) WHERE source_key IS NOT NULL DO UPDATE SET
+        {", ".join(f"{f} = excluded.{f}" for f in _FIELDS)},
+        updated_at = excluded.updated_at
+    WHERE {" OR ".join(f"{f} IS NOT excluded.{f}" for f in _FIELDS)}
+"""
+
+
+def ensure_sync_schema(conn: sqlite3.Connection):
+    """Add source_key and its natural-key index, and the per-source watermark. Does not commit."""
+    activity_cols = {r[1] for r in conn.execute("PRAGMA table_info(marketing_activities)").fetchall()}
+    if activity_cols:
+        if "source_key" not in activity_cols:
+            conn.execute("ALTER TABLE marketing_activities ADD COLUMN source_key TEXT")
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_marketing_activities_sync_key "
+            "ON marketing_activities (data_source, source_key, reporting_date) WHERE source_key IS NOT NULL"
+        )
+    mapping_cols = {r[1] for r in conn.execute("PRAGMA table_info(data_source_mappings)").fetchall()}
+    if mapping_cols and "sync_watermark" not in mapping_cols:
+        conn.execute("ALTER TABLE data_source_mappings ADD COLUMN sync_watermark TEXT")
+
+
+def sync_rows(source_system: str, sync_data: Dict[str, Any], now: str) -> List[Dict[str, Any]]:
+    """Rows for the items of a sync payload; items missing REQUIRED_FIELDS are left out.
+
+    Items sharing a natural key collapse into the last one.
+    """
+    today = now[:10]
+    rows: Dict[tuple, Dict[str, Any]] = {}
+    for key, value in sync_data.items():
+        if not (isinstance(value, dict) and all(k in value for k in REQUIRED_FIELDS)):
+            continue
+        row = {
+            "activity_id": f"mkt_{uuid.uuid4().hex[:12]}",
+            "activity_type": value.get("type", "sync"),
+            "campaign_name": value.get("campaign", key),
+            "channel": value.get("channel", key),
+            "data_source": source_system,
+            "source_key": str(value.get("activity_id") or value.get("id") or key),
+            "impressions": int(value.get("impressions", 0)),
+            "engagement_count": int(value.get("engagement", 0)),
+            "awareness_metric": float(value.get("awareness", 0.0)),
+            "activation_conversions": int(value.get("activation", 0)),
+            "reporting_date": str(value.get("reporting_date") or today),
+            "metadata": json.dumps(value, sort_keys=True),
+            "now": now,
+        }
+        rows[(row["source_key"], row["reporting_date"])] = row
+    return list(rows.values())
+
+
+def _existing_keys(conn: sqlite3.Connection, source_system: str, rows: List[Dict[str, Any]]) -> set:
+    keys = sorted({r["source_key"] for r in rows})
+    found = set()
+    for i in range(0, len(keys), _IN_BATCH):
+        chunk = keys[i:i + _IN_BATCH]
+        found.update((r[0], r[1]) for r in conn.execute(
+            f"SELECT source_key, reporting_date FROM marketing_activities "
+            f"WHERE data_source = ? AND source_key IN ({', '.join('?' * len(chunk))})",
+            [source_system] + chunk,
+        ))
+    return found
+
+
+def apply_sync(
+    conn: sqlite3.Connection,
+    source_system: str,
+    sync_data: Dict[str, Any],
+    watermark: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Upsert a sync payload inside the caller's transaction; see the module docstring.
+
+    Returns {"status": "error", ...} for an unknown source, otherwise the inserted/updated/skipped counts.
+    """
+    if conn.execute("SELECT 1 FROM data_source_mappings WHERE source_system = ?", (source_system,)).fetchone() is None:
+        return {"status": "error", "message": f"Unknown data source: {source_system}"}
+    now = datetime.now().isoformat()
+    rows = sync_rows(source_system, sync_data, now)
+    existing = _existing_keys(conn, source_system, rows) if rows else set()
+    inserted = sum(1 for r in rows if (r["source_key"], r["reporting_date"]) not in existing)
+    # rowcount counts rows written by the statement itself, not the change-tracking triggers
+    changed = conn.executemany(_UPSERT_SQL, rows).rowcount if rows else 0
+    conn.execute(
+        """
+        UPDATE data_source_mappings
+        SET last_sync = ?, sync_status = 'synced', updated_at = ?,
+            sync_watermark = CASE WHEN ? IS NOT NULL AND (sync_watermark IS NULL OR ? > sync_watermark) THEN ? ELSE sync_watermark END
+        WHERE source_system = ?
+        """,
+        (now, now, watermark, watermark, watermark, source_system),
+    )
+    stored = conn.execute(
+        "SELECT sync_watermark FROM data_source_mappings WHERE source_system = ?", (source_system,)
+    ).fetchone()[0]
+    result = {
+        "status": "ok",
+        "source": source_system,
+        "received": len(sync_data),
+        "ignored": len(sync_data) - len(rows),
+        "inserted": inserted,
+        "updated": changed - inserted,
+        "skipped": len(rows) - changed,
+        "watermark": stored,
+        "sync_timestamp": now,
+    }
+    logger.info(f"Sync {source_system}: {inserted} inserted, {result['updated']} updated, {result['skipped']} unchanged")
+    return result
@@ -0,0 +1,339 @@
+"""
+OData v4 query subset for the Power BI feeds under /api/v2/odata/{entity_set}.
+
+The old endpoint accepted a single `eq` filter and raw LIMIT/OFFSET. Power BI
+therefore pulled whole tables and filtered them on the client, and on large
+tables those pulls timed out. compile_query() turns the supported system
+query options into one parameterized statement:
+
+    $select   comma-separated columns (default: every exposed column)
+    $filter   eq ne gt ge lt le, and / or / not, parentheses,
+              contains(col,'x'), startswith(col,'x'), endswith(col,'x');
+              literals: 'text' ('' escapes a quote), numbers, true/false, null,
+              and unquoted dates such as 2025-01-31
+    $orderby  col [asc|desc], ...
+    $top      rows wanted; responses are paged at ODATA_PAGE_SIZE rows
+    $skip     plain offset (kept for old clients; prefer the next link)
+    $skiptoken  opaque keyset cursor taken from @odata.nextLink
+    $count    true adds @odata.count (rows matching $filter)
+
+Comparisons compile to `column op ?` so the table's indexes apply, and
+startswith() becomes a range scan. Pages are cut with a keyset on the
+$orderby columns plus rowid as a unique tie-breaker, so page 500 costs the same
+as page 1. Column names come only from each entity set's whitelist, and every
+value is bound as a parameter. Person-identifying columns (names, phone,
+address, DOB) are not exposed.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .pagination import PaginationError, decode_cursor, encode_cursor, keyset_after
+
+ODATA_PAGE_SIZE = int(os.getenv("ODATA_PAGE_SIZE", "1000"))
+ODATA_MAX_PAGE_SIZE = int(os.getenv("ODATA_MAX_PAGE_SIZE", "5000"))
+
+
+class ODataError(ValueError):
+    pass
+
+
+class EntitySet:
+    """An exposed table: its URL name, SQL table and ordered column whitelist."""
+
+    def __init__(self, name: str, table: str, columns: Sequence[str]):
+        self.name = name
+        self.table = table
+        self.columns = list(columns)
+
+
+ENTITY_SETS = {
+    e.name: e for e in (
+        EntitySet("activities", "marketing_activities", [
+            "activity_id", "event_id", "activity_type", "campaign_name", "channel", "data_source", "impressions",
+            "engagement_count", "awareness_metric", "activation_conversions", "cost", "reporting_date",
+            "created_at", "updated_at",
+        ]),
+        EntitySet("leads", "leads", [
+            "lead_id", "prid", "age", "education_level", "education_code", "cbsa_code", "campaign_source", "lead_source",
+            "propensity_score", "predicted_probability", "score", "recommendation", "converted", "received_at", "created_at",
+        ]),
+        EntitySet("events", "events", [
+            "event_id", "name", "type", "location", "rsid", "brigade", "battalion", "station", "start_date", "end_date",
+            "budget", "team_size", "status", "created_at", "updated_at",
+        ]),
+        EntitySet("projects", "projects", [
+            "project_id", "name", "event_id", "rsid", "brigade", "battalion", "station", "start_date", "target_date",
+            "owner_id", "status", "percent_complete", "funding_amount", "spent_amount", "risk_level", "created_at", "updated_at",
+        ]),
+    )
+}
+
+# --- $filter parsing ---
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<date>\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2})?)?)
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (?P<punct>[(),])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.X)
+
+_COMPARE = {"eq": "=", "ne": "!=", "gt": ">", "ge": ">=", "lt": "<", "le": "<="}
+_FUNCTIONS = ("contains", "startswith", "endswith")
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ODataError(f"Unexpected character in $filter at position {pos}: {text[pos:pos + 10]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        raw = m.group(kind)
+        if kind == "string":
+            tokens.append(("literal", raw[1:-1].replace("''", "'")))
+        elif kind == "date":
+            tokens.append(("literal", raw))
+        elif kind == "number":
+            tokens.append(("literal", float(raw) if any(c in raw for c in ".eE") else int(raw)))
+        elif kind == "punct":
+            tokens.append((raw, raw))
+        else:
+            low = raw.lower()
+            if low in ("true", "false"):
+                tokens.append(("literal", 1 if low == "true" else 0))
+            elif low == "null":
+                tokens.append(("literal", None))
+            elif low in ("and", "or", "not") or low in _COMPARE or low in _FUNCTIONS:
+                tokens.append((low, low))
+            else:
+                tokens.append(("name", raw))
+    return tokens
+
+
+class _FilterParser:
+    """Recursive-descent parser that emits SQL and bound params as it goes."""
+
+    def __init__(self, text: str, columns: Sequence[str]):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.columns = set(columns)
+        self.params: List[Any] = []
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def _take(self, kind: str):
+        if self._peek() != kind:
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else "end of $filter"
+            raise ODataError(f"Expected {kind} in $filter, found {found!r}")
+        value = self.tokens[self.pos][1]
+        self.pos += 1
+        return value
+
+    def _column(self) -> str:
+        name = self._take("name")
+        if name not in self.columns:
+            raise ODataError(f"Unknown property in $filter: {name}")
+        return f'"{name}"'
+
+    def parse(self) -> str:
+        sql = self._or()
+        if self.pos != len(self.tokens):
+            raise ODataError(f"Unexpected {self.tokens[self.pos][1]!r} in $filter")
+        return sql
+
+    def _or(self) -> str:
+        parts = [self._and()]
+        while self._peek() == "or":
+            self.pos += 1
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else "(" + " OR ".join(parts) + ")"
+
+    def _and(self) -> str:
+        parts = [self._unary()]
+        while self._peek() == "and":
+            self.pos += 1
+            parts.append(self._unary())
+        return parts[0] if len(parts) == 1 else "(" + " AND ".join(parts) + ")"
+
+    def _unary(self) -> str:
+        if self._peek() == "not":
+            self.pos += 1
+            return f"NOT ({self._unary()})"
+        if self._peek() == "(":
+            self.pos += 1
+            inner = self._or()
+            self._take(")")
+            return inner if inner.startswith("(") else f"({inner})"
+        if self._peek() in _FUNCTIONS:
+            return self._function()
+        return self._comparison()
+
+    def _function(self) -> str:
+        fn = self._take(self._peek())
+        self._take("(")
+        col = self._column()
+        self._take(",")
+        value = self._take("literal")
+        self._take(")")
+        if not isinstance(value, str):
+            raise ODataError(f"{fn}() needs a string literal")
+        if fn == "contains":
+            self.params.append(value)
+            return f"instr({col}, ?) > 0"
+        if fn == "startswith":
+            # a range on the column can use its index, unlike LIKE 'x%'
+            self.params.extend([value, value + "\U0010ffff"])
+            return f"({col} >= ? AND {col} < ?)"
+        if not value:
+            # substr(col, -0) is the whole value, but every string ends with ''
+            return f"{col} IS NOT NULL"
+        self.params.extend([len(value), value])
+        return f"substr({col}, -?) = ?"
+
+    def _comparison(self) -> str:
+        col = self._column()
+        op = self._peek()
+        if op not in _COMPARE:
+            raise ODataError(f"Expected a comparison operator after {col.strip(chr(34))} in $filter")
+        self.pos += 1
+        value = self._take("literal")
+        if value is None:
+            if op not in ("eq", "ne"):
+                raise ODataError("null can only be compared with eq or ne")
+            return f"{col} IS {'NOT ' if op == 'ne' else ''}NULL"
+        self.params.append(value)
+        return f"{col} {_COMPARE[op]} ?"
+
+
+def parse_filter(text: str, columns: Sequence[str]) -> Tuple[str, List[Any]]:
+    """SQL boolean expression and params for an OData $filter over `columns`."""
+    parser = _FilterParser(text, columns)
+    return parser.parse(), parser.params
+
+
+def parse_orderby(text: Optional[str], columns: Sequence[str]) -> List[Tuple[str, bool]]:
+    """[(column, descending)] for an OData $orderby."""
+    order: List[Tuple[str, bool]] = []
+    for part in (text or "").split(","):
+        bits = part.split()
+        if not bits:
+            continue
+        if len(bits) > 2 or (len(bits) == 2 and bits[1].lower() not in ("asc", "desc")):
+            raise ODataError(f"Invalid $orderby item: {part.strip()}")
+        if bits[0] not in columns:
+            raise ODataError(f"Unknown property in $orderby: {bits[0]}")
+        order.append((bits[0], len(bits) == 2 and bits[1].lower() == "desc"))
+    return order
+
+
+# --- keyset paging ---
+
+def encode_skiptoken(values: Sequence[Any]) -> str:
+    return encode_cursor(values)
+
+
+def decode_skiptoken(token: str, size: int) -> List[Any]:
+    try:
+        return decode_cursor(token, size)
+    except PaginationError:
+        raise ODataError("Invalid $skiptoken")
+
+
+_after = keyset_after
+
+
+class ODataQuery:
+    """Compiled page query plus what is needed to build the next link."""
+
+    def __init__(self, sql: str, params: List[Any], count_sql: str, count_params: List[Any],
+                 select: List[str], key_count: int, page_size: int, remaining: Optional[int]):
+        self.sql = sql
+        self.params = params
+        self.count_sql = count_sql
+        self.count_params = count_params
+        self.select = select
+        self.key_count = key_count
+        self.page_size = page_size
+        self.remaining = remaining
+
+
+def compile_query(
+    entity: EntitySet,
+    available: Sequence[str],
+    select: Optional[str] = None,
+    filter: Optional[str] = None,
+    orderby: Optional[str] = None,
+    top: Optional[int] = None,
+    skip: Optional[int] = None,
+    skiptoken: Optional[str] = None,
+) -> ODataQuery:
+    """Build the page query for one request. `available` is the entity's columns present in this database."""
+    columns = [c for c in entity.columns if c in set(available)]
+    if select and select.strip() != "*":
+        wanted = [c.strip() for c in select.split(",") if c.strip()]
+        unknown = [c for c in wanted if c not in columns]
+        if unknown:
+            raise ODataError(f"Unknown property in $select: {', '.join(unknown)}")
+        chosen = wanted
+    else:
+        chosen = columns
+
+    where, params = [], []
+    if filter and filter.strip():
+        sql, p = parse_filter(filter, columns)
+        where.append(sql)
+        params.extend(p)
+    count_where = list(where)
+    count_params = list(params)
+
+    order = [(f'"{c}"', d) for c, d in parse_orderby(orderby, columns)] + [("rowid", False)]
+    if skiptoken:
+        after, p = _after(order, decode_skiptoken(skiptoken, len(order)))
+        where.append(after)
+        params.extend(p)
+
+    if top is not None and top < 0:
+        raise ODataError("$top must not be negative")
+    if skip is not None and skip < 0:
+        raise ODataError("$skip must not be negative")
+    page_size = min(top if top is not None else ODATA_PAGE_SIZE, ODATA_MAX_PAGE_SIZE)
+    remaining = None if top is None else top - page_size
+
+    keys = ", ".join(f"{c} AS __k{i}" for i, (c, _) in enumerate(order))
+    sql = f"SELECT {', '.join(chr(34) + c + chr(34) for c in chosen)}, {keys} FROM {entity.table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY " + ", ".join(f"{c} {'DESC' if d else 'ASC'}" for c, d in order)
+    # one extra row tells whether another page exists
+    sql += " LIMIT ?"
+    params.append(page_size + 1)
+    if skip:
+        sql += " OFFSET ?"
+        params.append(skip)
+
+    count_sql = f"SELECT COUNT(*) FROM {entity.table}" + (" WHERE " + " AND ".join(count_where) if count_where else "")
+    return ODataQuery(sql, params, count_sql, count_params, chosen, len(order), page_size, remaining)
+
+
+def run_query(conn, query: ODataQuery, count: bool = False) -> Dict[str, Any]:
+    """Execute a compiled query. Returns the page rows, the next $skiptoken (or None) and the optional count."""
+    cur = conn.execute(query.sql, query.params)
+    rows = cur.fetchall()
+    n = len(query.select)
+    more = len(rows) > query.page_size
+    rows = rows[:query.page_size]
+    value = [dict(zip(query.select, tuple(r)[:n])) for r in rows]
+    next_token = None
+    if more and rows and (query.remaining is None or query.remaining > 0):
+        next_token = encode_skiptoken(tuple(rows[-1])[n:n + query.key_count])
+    result: Dict[str, Any] = {"value": value, "skiptoken": next_token}
+    if count:
+        result["count"] = conn.execute(query.count_sql, query.count_params).fetchone()[0]
+    return result
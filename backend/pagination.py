@@ -0,0 +1,146 @@
+"""
+Keyset pagination for list endpoints.
+
+List endpoints such as /api/v2/leads/status, the /api/v2/data/* getters,
+/api/v2/calendar/events, /api/v2/twg/boards and /api/v2/users used to return
+every matching row in one response. fetch_page() returns one bounded page
+instead. The page query is the endpoint's own SELECT, wrapped as a subquery:
+
+    page = fetch_page(conn, "SELECT rowid AS __pk, * FROM events", (),
+                      order=[("start_date", True), ("__pk", True)],
+                      limit=limit, cursor=cursor, include_total=include_total)
+    return {"status": "ok", "data": page.items, "count": len(page.items), **page.envelope()}
+
+Pages are addressed with an opaque cursor that holds the sort key values of
+the last row returned, not with OFFSET. The next page starts with
+`WHERE (sort_key, id) > (last_sort_key, last_id)`, so each page costs the same
+however deep the client reads, and rows inserted meanwhile do not shift or
+repeat. The last `order` column must be unique (an id or rowid), which makes
+the order total. Columns whose names start with `__` are used for ordering
+only and are stripped from the items.
+
+`limit` is clamped to PAGE_SIZE_MAX. The total is a separate COUNT(*) over the
+whole filter, so it is computed only when the caller asks for it.
+"""
+
+import base64
+import json
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+HIDDEN_PREFIX = "__"
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def clamp_limit(limit: Optional[int], default: int = PAGE_SIZE_DEFAULT) -> int:
+    if limit is None:
+        limit = default
+    return max(1, min(int(limit), PAGE_SIZE_MAX))
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values), separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+def keyset_after(order: List[Tuple[str, bool]], values: List[Any]) -> Tuple[str, List[Any]]:
+    """Predicate for rows strictly after `values` in ORDER BY `order` (SQLite sorts NULLs first ascending)."""
+    ors, params = [], []
+    for i, (col, desc) in enumerate(order):
+        ands, p = [], []
+        for (prev, _), v in zip(order[:i], values[:i]):
+            if v is None:
+                ands.append(f"{prev} IS NULL")
+            else:
+                ands.append(f"{prev} = ?")
+                p.append(v)
+        v = values[i]
+        if not desc:
+            if v is None:
+                ands.append(f"{col} IS NOT NULL")
+            else:
+                ands.append(f"{col} > ?")
+                p.append(v)
+        else:
+            if v is None:
+                continue  # NULLs sort last descending: nothing follows on this column
+            ands.append(f"({col} < ? OR {col} IS NULL)")
+            p.append(v)
+        ors.append("(" + " AND ".join(ands) + ")")
+        params.extend(p)
+    return ("(" + " OR ".join(ors) + ")" if ors else "0"), params
+
+
+class Page:
+    """One page of items plus the cursor for the next one."""
+
+    def __init__(self, items: List[Dict[str, Any]], limit: int, next_cursor: Optional[str], total: Optional[int] = None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def envelope(self) -> Dict[str, Any]:
+        """The paging keys every paginated endpoint adds to its response; `total` only when it was asked for."""
+        env: Dict[str, Any] = {"limit": self.limit, "next_cursor": self.next_cursor}
+        if self.total is not None:
+            env["total"] = self.total
+        return env
+
+
+def fetch_page(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: Sequence[Any],
+    order: List[Tuple[str, bool]],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    default_limit: int = PAGE_SIZE_DEFAULT,
+) -> Page:
+    """Run one page of `sql` (without ORDER BY/LIMIT) in `order`, a list of (output column, descending).
+
+    Raises PaginationError for a cursor that does not fit `order`.
+    """
+    limit = clamp_limit(limit, default_limit)
+    order = [(f'"{col}"', desc) for col, desc in order]
+    page_sql = f"SELECT * FROM ({sql}) AS page_src"
+    page_params = list(params)
+    if cursor:
+        after, p = keyset_after(order, decode_cursor(cursor, len(order)))
+        page_sql += f" WHERE {after}"
+        page_params += p
+    page_sql += " ORDER BY " + ", ".join(f"{col} DESC" if desc else col for col, desc in order) + " LIMIT ?"
+    page_params.append(limit + 1)
+
+    cur = conn.execute(page_sql, page_params)
+    names = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    keys = [names.index(col.strip('"')) for col, _ in order]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([tuple(rows[-1])[i] for i in keys])
+    visible = [(i, n) for i, n in enumerate(names) if not n.startswith(HIDDEN_PREFIX)]
+    items = [{n: tuple(r)[i] for i, n in visible} for r in rows]
+
+    total = None
+    if include_total:
+        total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", list(params)).fetchone()[0]
+    return Page(items, limit, next_cursor, total)
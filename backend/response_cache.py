@@ -0,0 +1,154 @@
+"""
+In-process TTL + LRU cache for read-heavy GET endpoints.
+
+Each cached route is registered with the tables it reads (its dependency tags).
+An entry stores the write generations of those tables (see change_tracking) at
+the time it was computed. The entry is served until it expires (TTL) or one of
+its tables' generations moves, so a write to `marketing_activities` invalidates
+only the marketing entries and leaves the project dashboard cached.
+
+Responses carry an ETag derived from the body. A polling client that sends
+If-None-Match with the current tag gets a bodiless 304.
+
+    RESPONSE_CACHE.register("/api/v2/analytics/overview", tags=("leads", "events", "projects"))
+
+    @app.middleware("http")
+    async def response_cache_middleware(request, call_next):
+        return await RESPONSE_CACHE.handle(request, call_next)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .change_tracking import generations
+from .db_executor import run_db
+from .db_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+
+class _Entry:
+    __slots__ = ("generations", "expires_at", "body", "media_type", "etag")
+
+    def __init__(self, generations, expires_at, body, media_type, etag):
+        self.generations = generations
+        self.expires_at = expires_at
+        self.body = body
+        self.media_type = media_type
+        self.etag = etag
+
+
+class ResponseCache:
+    """TTL + LRU response cache keyed by path and query string, invalidated by table generations."""
+
+    def __init__(self, db_path: str, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._routes: Dict[str, Tuple[Tuple[str, ...], float]] = {}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def register(self, path: str, tags: Sequence[str], ttl: Optional[float] = None):
+        self._routes[path] = (tuple(tags), self.ttl if ttl is None else ttl)
+
+    def tracked_tables(self) -> Tuple[str, ...]:
+        """Every table some cached route depends on."""
+        return tuple(sorted({t for tags, _ in self._routes.values() for t in tags}))
+
+    def _generations(self, tags: Tuple[str, ...]):
+        conn = get_connection(self.db_path, row_factory=None)
+        try:
+            return generations(conn, tags)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(request: Request) -> str:
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        return f"{request.url.path}?{query}"
+
+    @staticmethod
+    def _etag_matches(request: Request, etag: str) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        candidates = [c.strip() for c in header.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    def _lookup(self, key: str, gens) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic() or entry.generations != gens:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: str, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _respond(self, request: Request, entry: _Entry, status: str) -> Response:
+        headers = {"ETag": entry.etag, "X-Cache": status, "Cache-Control": "no-cache"}
+        if self._etag_matches(request, entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    async def handle(self, request: Request, call_next):
+        route = self._routes.get(request.url.path) if request.method == "GET" else None
+        if route is None:
+            return await call_next(request)
+        tags, ttl = route
+        key = self._key(request)
+        # Read generations before computing: a write that lands mid-request leaves the entry stale, not wrong.
+        gens = await run_db(self._generations, tags)
+        entry = self._lookup(key, gens)
+        if entry is not None:
+            self.hits += 1
+            return self._respond(request, entry, "HIT")
+
+        self.misses += 1
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        media_type = response.headers.get("content-type", "application/json")
+        entry = _Entry(gens, time.monotonic() + ttl, body, media_type, etag)
+        self._store(key, entry)
+        return self._respond(request, entry, "MISS")
+
+    def invalidate(self, path: Optional[str] = None):
+        """Drop cached entries for one route, or all of them."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k.split("?", 1)[0] == path]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {"entries": size, "routes": len(self._routes), "hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
@@ -9,13 +9,14 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 import sqlite3
 
+from ..db_pool import get_connection
+from ..db_executor import offload
+
 router = APIRouter()
 
 # Database connection
 def get_db():
-    conn = sqlite3.connect('/Users/ambermooney/Desktop/TAAIP/data/taaip.sqlite3', check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection('/Users/ambermooney/Desktop/TAAIP/data/taaip.sqlite3')
 
 
 class BudgetAllocation(BaseModel):
@@ -42,7 +43,8 @@ class BudgetTransaction(BaseModel):
 
 
 @router.get("/budget/allocations")
-async def get_budget_allocations(
+@offload
+def get_budget_allocations(
     fiscal_year: int = 2025,
     unit_id: Optional[str] = None
 ) -> Dict[str, Any]:
@@ -265,7 +267,8 @@ async def get_budget_allocations(
 
 
 @router.get("/budget/transactions")
-async def get_budget_transactions(
+@offload
+def get_budget_transactions(
     unit_id: Optional[str] = None,
     fiscal_year: int = 2025,
     transaction_type: Optional[str] = None,
@@ -285,7 +288,8 @@ async def get_budget_transactions(
 
 
 @router.post("/budget/transaction")
-async def create_budget_transaction(
+@offload
+def create_budget_transaction(
     unit_id: str,
     transaction_type: str,
     description: str,
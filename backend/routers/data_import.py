@@ -6,22 +6,91 @@ Also provides data retrieval endpoints for dynamic dashboard visualization
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
 import io
 import sqlite3
 from datetime import datetime
 
+from ..db_pool import get_connection
+from ..db_executor import offload, run_db
+from ..schema_registry import get_schema
+from ..bulk_ingest import Field, IngestSpec, generated_ids, ingest_frames
+from ..upload_stream import UnsupportedFileType, discard_spool, iter_frames, read_head, spool_upload, start_progress
+from .data_upload import EVENTS_SPEC, PROJECTS_SPEC
+
 router = APIRouter()
 
 # Database connection
+DB_PATH = "data/recruiting.db"
+
+
 def get_db():
-    conn = sqlite3.connect("data/recruiting.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(DB_PATH)
+
+
+def _lead_score(df: pd.DataFrame) -> pd.Series:
+    # Simple score (can be enhanced with ML model)
+    propensity = pd.to_numeric(df["propensity_score"], errors="coerce").fillna(5) if "propensity_score" in df.columns else 5
+    age = pd.to_numeric(df["age"], errors="coerce")
+    return (propensity * 10 + age * 0.5).clip(0, 100)
+
+
+LEADS_SPEC = IngestSpec("leads", [
+    Field("lead_id", derive=generated_ids("LEAD", "lead_id")),
+    Field("age", kind="int", required=True, check=lambda s: s.between(17, 42), message="Age must be between 17 and 42"),
+    Field("education_level", kind="text", required=True),
+    Field("cbsa_code", kind="text", required=True),
+    Field("campaign_source", kind="text", required=True),
+    Field("propensity_score", kind="float", default=5),
+    Field("score", derive=_lead_score),
+    Field("created_at", derive=lambda df: datetime.now().isoformat(), volatile=True),
+], key="lead_id")
+
+
+def _run_import(spec: IngestSpec, label: str, filename: str, path: str, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    progress = start_progress(filename, path, upload_id)
+    try:
+        try:
+            header = read_head(path, filename, rows=0)
+        except UnsupportedFileType as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        missing_cols = spec.missing_columns(header)
+        if missing_cols:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required columns: {', '.join(missing_cols)}"
+            )
+
+        result = ingest_frames(DB_PATH, iter_frames(path, filename), spec, progress=progress)
+        message = f"Successfully imported {result['imported']} of {result['total_rows']} {label}"
+        response = {
+            "status": "success",
+            "upload_id": progress.upload_id,
+            "imported": result["imported"],
+            "total_rows": result["total_rows"],
+            "errors": result["errors"] or None,
+            "error_count": result["error_count"],
+        }
+        if spec.key:
+            message += f" ({result['inserted']} new, {result['updated']} updated, {result['unchanged']} unchanged)"
+            response.update({k: result[k] for k in ("inserted", "updated", "unchanged")})
+        progress.finish("completed", message)
+        response["message"] = message
+        return response
+    except HTTPException as e:
+        progress.finish("failed", str(e.detail))
+        raise
+    except Exception as e:
+        progress.finish("failed", str(e))
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    finally:
+        discard_spool(path)
+
 
 @router.post("/import/events")
-async def import_events(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def import_events(file: UploadFile = File(...), upload_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Import events from CSV/Excel file
     
@@ -36,76 +105,16 @@ async def import_events(file: UploadFile = File(...)) -> Dict[str, Any]:
     - targeting_principles (optional)
     - status (optional, defaults to 'planned')
     """
-    try:
-        # Read file based on extension
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        # Validate required columns
-        required_cols = ['name', 'location', 'start_date', 'end_date']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        # Connect to database
-        db = get_db()
-        cursor = db.cursor()
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                event_id = f"EVT-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                cursor.execute("""
-                    INSERT INTO events (
-                        event_id, name, type, location, start_date, end_date,
-                        budget, team_size, targeting_principles, status, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    event_id,
-                    row['name'],
-                    row.get('type', 'recruitment_event'),
-                    row['location'],
-                    row['start_date'],
-                    row['end_date'],
-                    row.get('budget', 0),
-                    row.get('team_size', 0),
-                    row.get('targeting_principles', ''),
-                    row.get('status', 'planned'),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} events"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    path = await spool_upload(file)
+    return await run_db(_import_events_sync, file.filename, path, upload_id)
+
+
+def _import_events_sync(filename: str, path: str, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_import(EVENTS_SPEC, "events", filename, path, upload_id)
 
 
 @router.post("/import/projects")
-async def import_projects(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def import_projects(file: UploadFile = File(...), upload_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Import projects from CSV/Excel file
     
@@ -119,85 +128,23 @@ async def import_projects(file: UploadFile = File(...)) -> Dict[str, Any]:
     - funding_amount (optional, defaults to 0)
     - status (optional, defaults to 'planning')
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        required_cols = ['name', 'owner_id', 'start_date', 'target_date', 'objectives']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        
-        imported_count = 0
-        errors = []
-        
-        # Detect which columns actually exist in the projects table and only insert available ones
-        cursor.execute("PRAGMA table_info(projects)")
-        existing_cols = {r[1] for r in cursor.fetchall()} if cursor.description is not None else set()
-
-        for index, row in df.iterrows():
-            try:
-                project_id = f"PRJ-{int(datetime.now().timestamp() * 1000)}-{index}"
-
-                # base fields always present in our expectation
-                insert_fields = [
-                    'project_id', 'name', 'event_id', 'start_date', 'target_date', 'owner_id', 'status', 'objectives', 'created_at'
-                ]
-                values = [
-                    project_id,
-                    row['name'],
-                    row.get('event_id', ''),
-                    row['start_date'],
-                    row['target_date'],
-                    row['owner_id'],
-                    row.get('status', 'planning'),
-                    row['objectives'],
-                    datetime.now().isoformat()
-                ]
-
-                # Include funding_amount only if the column exists in the DB schema
-                if 'funding_amount' in existing_cols:
-                    insert_fields.insert(-1, 'funding_amount')
-                    values.insert(-1, row.get('funding_amount', 0))
-
-                placeholders = ', '.join(['?'] * len(insert_fields))
-                fields_sql = ', '.join(insert_fields)
-
-                sql = f"INSERT INTO projects ({fields_sql}) VALUES ({placeholders})"
-                cursor.execute(sql, tuple(values))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} projects"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    path = await spool_upload(file)
+    return await run_db(_import_projects_sync, file.filename, path, upload_id)
+
+
+def _import_projects_sync(filename: str, path: str, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    # Only include funding_amount when the projects table in this deployment has it
+    spec = PROJECTS_SPEC
+    if 'funding_amount' in get_schema(DB_PATH).columns("projects"):
+        spec = IngestSpec("projects", PROJECTS_SPEC.fields[:-1] + [
+            Field("funding_amount", kind="float", default=0),
+            PROJECTS_SPEC.fields[-1],
+        ])
+    return _run_import(spec, "projects", filename, path, upload_id)
 
 
 @router.post("/import/leads")
-async def import_leads(file: UploadFile = File(...)) -> Dict[str, Any]:
+async def import_leads(file: UploadFile = File(...), upload_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Import leads from CSV/Excel file
     
@@ -209,75 +156,12 @@ async def import_leads(file: UploadFile = File(...)) -> Dict[str, Any]:
     - propensity_score (optional, 1-10)
     - lead_id (optional, auto-generated if not provided)
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        required_cols = ['age', 'education_level', 'cbsa_code', 'campaign_source']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Validate age
-                age = int(row['age'])
-                if age < 17 or age > 42:
-                    raise ValueError(f"Age must be between 17 and 42, got {age}")
-                
-                lead_id = row.get('lead_id', f"LEAD-{int(datetime.now().timestamp() * 1000)}-{index}")
-                
-                # Calculate simple score (can be enhanced with ML model)
-                propensity = row.get('propensity_score', 5)
-                score = min(100, max(0, (propensity * 10) + (age * 0.5)))
-                
-                cursor.execute("""
-                    INSERT INTO leads (
-                        lead_id, age, education_level, cbsa_code, campaign_source,
-                        propensity_score, score, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    lead_id,
-                    age,
-                    row['education_level'],
-                    row['cbsa_code'],
-                    row['campaign_source'],
-                    propensity,
-                    score,
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} leads"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    path = await spool_upload(file)
+    return await run_db(_import_leads_sync, file.filename, path, upload_id)
+
+
+def _import_leads_sync(filename: str, path: str, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_import(LEADS_SPEC, "leads", filename, path, upload_id)
 
 
 @router.get("/import/templates")
@@ -325,7 +209,8 @@ async def get_templates() -> Dict[str, Any]:
 # Dynamic Data Retrieval Endpoints for Visualization
 
 @router.get("/events")
-async def get_all_events() -> Dict[str, Any]:
+@offload
+def get_all_events() -> Dict[str, Any]:
     """Get all events data for dynamic dashboard visualization"""
     try:
         conn = get_db()
@@ -346,7 +231,8 @@ async def get_all_events() -> Dict[str, Any]:
 
 
 @router.get("/projects")
-async def get_all_projects() -> Dict[str, Any]:
+@offload
+def get_all_projects() -> Dict[str, Any]:
     """Get all projects data for dynamic dashboard visualization"""
     try:
         conn = get_db()
@@ -367,7 +253,8 @@ async def get_all_projects() -> Dict[str, Any]:
 
 
 @router.get("/leads")
-async def get_all_leads() -> Dict[str, Any]:
+@offload
+def get_all_leads() -> Dict[str, Any]:
     """Get all leads data for dynamic dashboard visualization"""
     try:
         conn = get_db()
@@ -5,15 +5,24 @@ Handles bulk CSV/Excel file uploads for all recruiting pipeline data types
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from fastapi.responses import JSONResponse
-from typing import List, Dict, Any
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Any, Optional
 import pandas as pd
 import io
 import sqlite3
 import os
 import shutil
 import json
+import uuid
 from datetime import datetime
 
+from ..db_pool import get_connection, checkpoint_database
+from ..db_executor import offload, run_db
+from ..bulk_ingest import Field, IngestSpec, PartialIngest, column_or, generated_ids, ingest_frames, years_since
+from ..job_queue import JobQueueFull, get_job_queue, queued_response
+from ..pagination import PaginationError, fetch_page
+from ..upload_stream import UnsupportedFileType, count_rows, discard_spool, get_progress, iter_frames, read_head, spool_upload, start_progress
+
 router = APIRouter()
 
 # Database connection
@@ -25,9 +34,7 @@ def get_db():
         parts = db_path.split(":///")
         if len(parts) == 2:
             db_path = parts[1]
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(db_path)
 
 
 def resolve_db_path() -> str:
@@ -54,207 +61,273 @@ def backup_db_internal() -> str:
     os.makedirs(backups_dir, exist_ok=True)
     ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     dest = os.path.join(backups_dir, f"recruiting.db.backup.{ts}")
+    checkpoint_database(src)
     shutil.copy2(src, dest)
     return dest
 
 
-@router.post("/upload/leads")
-async def upload_leads(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
-    """
-    Import leads from CSV/Excel file
-    
-    Required columns:
-    - first_name
-    - last_name
-    - date_of_birth (format: YYYY-MM-DD)
-    - education_code
-    - phone_number
-    - lead_source
-    - prid
-    
-    Optional columns:
-    - cbsa_code
-    - middle_name
-    - address
-    - asvab_score
+def _now(df: pd.DataFrame) -> str:
+    return datetime.now().isoformat()
+
+
+# Fields shared by the person-level uploads (leads, prospects, applicants, future soldiers)
+_PERSON_FIELDS = [
+    Field("first_name", kind="text", required=True),
+    Field("last_name", kind="text", required=True),
+    Field("middle_name", kind="text", default=""),
+    Field("date_of_birth", kind="date", required=True),
+    Field("age", derive=lambda df: years_since(df["date_of_birth"])),
+    Field("education_code", kind="text", required=True),
+    Field("phone_number", kind="text", required=True),
+    Field("address", kind="text", default=""),
+    Field("cbsa_code", kind="text", default=""),
+    Field("lead_source", kind="text", required=True),
+    Field("prid", kind="text", required=True),
+    Field("asvab_score", kind="float"),
+]
+
+LEADS_SPEC = IngestSpec("leads", [
+    Field("lead_id", derive=generated_ids("LEAD", "lead_id"), volatile=True),
+    *_PERSON_FIELDS,
+    Field("received_at", derive=_now, volatile=True),
+], key="prid")
+
+PROSPECTS_SPEC = IngestSpec("prospects", [
+    Field("prospect_id", derive=generated_ids("PROS"), volatile=True),
+    *_PERSON_FIELDS,
+    Field("prospect_status", kind="text", required=True),
+    Field("last_contact_date", kind="date"),
+    Field("recruiter_assigned", kind="text", default=""),
+    Field("notes", kind="text", default=""),
+    Field("created_at", derive=_now, volatile=True),
+], key="prid")
+
+APPLICANTS_SPEC = IngestSpec("applicants", [
+    Field("applicant_id", derive=generated_ids("APP"), volatile=True),
+    *_PERSON_FIELDS,
+    Field("application_date", kind="date", required=True),
+    Field("applicant_status", kind="text", required=True),
+    Field("meps_scheduled_date", kind="date"),
+    Field("recruiter_assigned", kind="text", default=""),
+    Field("mos_preference", kind="text", default=""),
+    Field("created_at", derive=_now, volatile=True),
+], key="prid")
+
+FUTURE_SOLDIERS_SPEC = IngestSpec("future_soldiers", [
+    Field("fs_id", derive=generated_ids("FS"), volatile=True),
+    *_PERSON_FIELDS,
+    Field("contract_date", kind="date", required=True),
+    Field("ship_date", kind="date", required=True),
+    Field("mos_assigned", kind="text", required=True),
+    Field("future_soldier_status", kind="text", required=True),
+    Field("recruiter_assigned", kind="text", default=""),
+    Field("unit_assignment", kind="text", default=""),
+    Field("created_at", derive=_now, volatile=True),
+], key="prid")
+
+# Also used by the /import/* router (data_import.py)
+EVENTS_SPEC = IngestSpec("events", [
+    Field("event_id", derive=generated_ids("EVT")),
+    Field("name", kind="text", required=True),
+    Field("type", kind="text", default="recruitment_event"),
+    Field("location", kind="text", required=True),
+    Field("start_date", kind="date", required=True),
+    Field("end_date", kind="date", required=True),
+    Field("budget", kind="float", default=0),
+    Field("team_size", kind="int", default=0),
+    Field("targeting_principles", kind="text", default=""),
+    Field("status", kind="text", default="planned"),
+    Field("created_at", derive=_now),
+])
+
+PROJECTS_SPEC = IngestSpec("projects", [
+    Field("project_id", derive=generated_ids("PRJ")),
+    Field("name", kind="text", required=True),
+    Field("event_id", kind="text", default=""),
+    Field("start_date", kind="date", required=True),
+    Field("target_date", kind="date", required=True),
+    Field("owner_id", kind="text", required=True),
+    Field("status", kind="text", default="planning"),
+    Field("objectives", kind="text", required=True),
+    Field("created_at", derive=_now),
+])
+
+MARKETING_ACTIVITIES_SPEC = IngestSpec("marketing_activities", [
+    Field("activity_id", derive=generated_ids("MKT")),
+    Field("activity_name", kind="text", required=True),
+    Field("campaign_type", kind="text", required=True),
+    Field("start_date", kind="date", required=True),
+    Field("end_date", kind="date", required=True),
+    Field("budget_allocated", kind="float", required=True),
+    Field("target_audience", kind="text", default=""),
+    Field("channels", kind="text", default=""),
+    Field("leads_generated", kind="int", default=0),
+    Field("cost_per_lead", kind="float", default=0),
+    Field("status", kind="text", default="active"),
+    Field("created_at", derive=_now),
+])
+
+BUDGETS_SPEC = IngestSpec("budgets", [
+    Field("budget_id", derive=generated_ids("BDG")),
+    Field("event_id", kind="text", default=""),
+    Field("campaign_name", kind="text", required=True),
+    Field("allocated_amount", kind="float", required=True),
+    Field("spent_amount", kind="float", default=0),
+    Field("remaining_amount", kind="float", derive=column_or("remaining_amount", "allocated_amount")),
+    Field("start_date", kind="date", required=True),
+    Field("end_date", kind="date", required=True),
+    Field("fiscal_year", kind="text", default="2025"),
+    Field("created_at", derive=_now),
+    Field("updated_at", derive=_now),
+])
+
+
+def _parse_mapping(mapping: Optional[str]) -> Optional[Dict[str, str]]:
+    # mapping should be JSON: {"csvColumnName": "target_field_name", ...}
+    if not mapping:
+        return None
+    try:
+        m = json.loads(mapping)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    if not isinstance(m, dict):
+        raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    return m
+
+
+def _run_upload(spec: IngestSpec, label: str, filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    """Stream a spooled upload into `spec.table` chunk by chunk, then remove the spool file.
+
+    With `replace`, the DB is backed up first. Unkeyed tables are staged and swapped in
+    at the end, so a failed replace leaves them as they were.
+    Person uploads are keyed on `prid`: re-uploading an extract inserts new
+    PRIDs, updates changed rows and leaves unchanged rows alone. With `replace`,
+    PRIDs missing from the file are deleted. Keyed uploads and appends commit
+    chunk by chunk: if a chunk fails after earlier ones were committed, the
+    500 response has status "partial" and the committed counts, and for a
+    keyed replace nothing has been deleted. Uploading the same file again completes it.
     """
+    progress = start_progress(filename, path, upload_id)
     try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        # apply mapping if provided (mapping should be JSON: {"csvColumnName": "target_field_name", ...})
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
-
-        required_cols = ['first_name', 'last_name', 'date_of_birth', 'education_code', 'phone_number', 'lead_source', 'prid']
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        m = _parse_mapping(mapping)
+        try:
+            header = read_head(path, filename, rows=0)
+        except UnsupportedFileType as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if m:
+            header = header.rename(columns=m)
+        missing_cols = spec.missing_columns(header)
         if missing_cols:
             raise HTTPException(
                 status_code=400,
                 detail=f"Missing required columns: {', '.join(missing_cols)}"
             )
-        
-        db = get_db()
-        cursor = db.cursor()
         if replace:
             # create a backup before destructive replace
             try:
                 backup_db_internal()
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM leads")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                lead_id = row.get('lead_id', f"LEAD-{int(datetime.now().timestamp() * 1000)}-{index}")
-                
-                # Calculate age from date of birth
-                dob = pd.to_datetime(row['date_of_birth'])
-                age = (datetime.now() - dob).days // 365
-                
-                cursor.execute("""
-                    INSERT INTO leads (
-                        lead_id, first_name, last_name, middle_name, date_of_birth,
-                        age, education_code, phone_number, address, cbsa_code,
-                        lead_source, prid, asvab_score, received_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    lead_id,
-                    row['first_name'],
-                    row['last_name'],
-                    row.get('middle_name', ''),
-                    row['date_of_birth'],
-                    age,
-                    row['education_code'],
-                    row['phone_number'],
-                    row.get('address', ''),
-                    row.get('cbsa_code', ''),
-                    row['lead_source'],
-                    row['prid'],
-                    row.get('asvab_score', None),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
+
+        frames = iter_frames(path, filename)
+        if m:
+            frames = (frame.rename(columns=m) for frame in frames)
+        result = ingest_frames(resolve_db_path(), frames, spec, replace=replace, progress=progress)
+        message = f"Successfully imported {result['imported']} of {result['total_rows']} {label}"
+        response = {
             "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} leads"
+            "upload_id": progress.upload_id,
+            "imported": result["imported"],
+            "total_rows": result["total_rows"],
+            "errors": result["errors"] or None,
+            "error_count": result["error_count"],
         }
+        if spec.key:
+            message += f" ({result['inserted']} new, {result['updated']} updated, {result['unchanged']} unchanged)"
+            response.update({k: result[k] for k in ("inserted", "updated", "unchanged", "deleted")})
+        progress.finish("completed", message)
+        response["message"] = message
+        return response
+    except PartialIngest as e:
+        done = e.result
+        message = (f"Import stopped after {done['total_rows']} rows: {e.cause}. "
+                   f"{done['inserted']} new and {done['updated']} updated {label} from earlier chunks were kept"
+                   + ("; no rows were deleted" if replace and spec.key else "")
+                   + ". Upload the file again to complete it.")
+        progress.finish("failed", message)
+        raise HTTPException(status_code=500, detail={
+            "status": "partial",
+            "message": message,
+            "upload_id": progress.upload_id,
+            **{k: done[k] for k in ("imported", "inserted", "updated", "unchanged", "total_rows", "error_count")},
+        })
+    except HTTPException as e:
+        progress.finish("failed", str(e.detail))
+        raise
+    except Exception as e:
+        progress.finish("failed", str(e))
+        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+    finally:
+        discard_spool(path)
 
 
-        # Admin backup management and mapping persistence
-        @router.get("/upload/backups")
-        async def list_backups() -> Dict[str, Any]:
-            """List available DB backups (filename, path, modified)."""
-            try:
-                repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-                backups_dir = os.path.join(repo_root, "data", "backups")
-                if not os.path.exists(backups_dir):
-                    return {"status": "ok", "backups": []}
-
-                entries = []
-                for fname in sorted(os.listdir(backups_dir), reverse=True):
-                    path = os.path.join(backups_dir, fname)
-                    if os.path.isfile(path):
-                        mtime = os.path.getmtime(path)
-                        entries.append({
-                            "filename": fname,
-                            "path": path,
-                            "modified": datetime.utcfromtimestamp(mtime).isoformat()
-                        })
-
-                return {"status": "ok", "backups": entries}
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to list backups: {str(e)}")
+async def _dispatch(sync_fn, filename: str, path: str, replace: bool, mapping: Optional[str], upload_id: Optional[str], background: bool):
+    """Run an upload in the request, or with `background` queue it as a job and answer 202 with the job id.
 
+    A queued upload's job id is its `upload_id`, so a retried request with the same id
+    returns the existing job instead of importing the file again.
+    """
+    if not background:
+        return await run_db(sync_fn, filename, path, replace, mapping, upload_id)
+    queue = get_job_queue()
+    job_id = upload_id or uuid.uuid4().hex
+    existing = await run_db(queue.get, job_id)
+    if existing and existing["status"] != "failed":
+        discard_spool(path)
+        return JSONResponse(status_code=202, content=queued_response(job_id, existing["status"]))
+    try:
+        await run_db(
+            queue.submit, f"upload:{sync_fn.__name__[len('_upload_'):-len('_sync')]}", sync_fn,
+            filename, path, replace, mapping, job_id,
+            job_id=job_id, params={"filename": filename, "replace": replace},
+            on_duplicate=lambda: discard_spool(path),
+        )
+    except JobQueueFull as e:
+        discard_spool(path)
+        raise HTTPException(status_code=503, detail=str(e))
+    return JSONResponse(status_code=202, content=queued_response(job_id))
 
-        @router.post("/upload/restore")
-        async def restore_backup(backup_filename: str = Form(...)) -> Dict[str, Any]:
-            """Restore the active DB from a backup file. Creates a pre-restore backup first."""
-            try:
-                repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-                backups_dir = os.path.join(repo_root, "data", "backups")
-                src = os.path.join(backups_dir, backup_filename)
-                if not os.path.exists(src):
-                    raise HTTPException(status_code=404, detail=f"Backup not found: {backup_filename}")
-
-                # create a pre-restore backup
-                try:
-                    pre_restore = backup_db_internal()
-                except Exception:
-                    pre_restore = None
-
-                dest = resolve_db_path()
-                shutil.copy2(src, dest)
-
-                return {"status": "ok", "restored_from": src, "pre_restore_backup": pre_restore}
-            except HTTPException:
-                raise
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
 
+@router.post("/upload/leads")
+async def upload_leads(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
+    """
+    Import leads from CSV/Excel file
+    
+    Required columns:
+    - first_name
+    - last_name
+    - date_of_birth (format: YYYY-MM-DD)
+    - education_code
+    - phone_number
+    - lead_source
+    - prid
+    
+    Optional columns:
+    - cbsa_code
+    - middle_name
+    - address
+    - asvab_score
+    """
+    path = await spool_upload(file)
+    return await _dispatch(_upload_leads_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        @router.post("/upload/save_mapping")
-        async def save_mapping(data_type: str = Form(...), mapping: str = Form(...)) -> Dict[str, Any]:
-            """Persist a JSON mapping for a given upload `data_type` (e.g. 'leads')."""
-            try:
-                # validate mapping is JSON
-                jm = json.loads(mapping)
-
-                repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-                mappings_dir = os.path.join(repo_root, "data", "mappings")
-                os.makedirs(mappings_dir, exist_ok=True)
-                path = os.path.join(mappings_dir, f"{data_type}.json")
-                with open(path, "w") as f:
-                    json.dump(jm, f, indent=2)
-                return {"status": "ok", "path": path}
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f"Invalid mapping or save failed: {str(e)}")
 
-
-        @router.get("/upload/mappings/{data_type}")
-        async def get_mapping(data_type: str) -> Dict[str, Any]:
-            """Retrieve a saved mapping for a given upload `data_type`, or null if not present."""
-            try:
-                repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-                mappings_dir = os.path.join(repo_root, "data", "mappings")
-                path = os.path.join(mappings_dir, f"{data_type}.json")
-                if not os.path.exists(path):
-                    return {"status": "ok", "mapping": None}
-                with open(path, "r") as f:
-                    jm = json.load(f)
-                return {"status": "ok", "mapping": jm}
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to read mapping: {str(e)}")
-
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+def _upload_leads_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(LEADS_SPEC, "leads", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/prospects")
-async def upload_prospects(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_prospects(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import prospects from CSV/Excel file
     
@@ -274,98 +347,16 @@ async def upload_prospects(file: UploadFile = File(...), replace: bool = False,
     - recruiter_assigned
     - notes
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_prospects_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['first_name', 'last_name', 'date_of_birth', 'education_code', 'phone_number', 'lead_source', 'prid', 'prospect_status']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM prospects")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                prospect_id = f"PROS-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                dob = pd.to_datetime(row['date_of_birth'])
-                age = (datetime.now() - dob).days // 365
-                
-                cursor.execute("""
-                    INSERT INTO prospects (
-                        prospect_id, first_name, last_name, middle_name, date_of_birth,
-                        age, education_code, phone_number, address, cbsa_code,
-                        lead_source, prid, asvab_score, prospect_status,
-                        last_contact_date, recruiter_assigned, notes, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    prospect_id,
-                    row['first_name'],
-                    row['last_name'],
-                    row.get('middle_name', ''),
-                    row['date_of_birth'],
-                    age,
-                    row['education_code'],
-                    row['phone_number'],
-                    row.get('address', ''),
-                    row.get('cbsa_code', ''),
-                    row['lead_source'],
-                    row['prid'],
-                    row.get('asvab_score', None),
-                    row['prospect_status'],
-                    row.get('last_contact_date', None),
-                    row.get('recruiter_assigned', ''),
-                    row.get('notes', ''),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} prospects"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_prospects_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(PROSPECTS_SPEC, "prospects", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/applicants")
-async def upload_applicants(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_applicants(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import applicants from CSV/Excel file
     
@@ -381,99 +372,16 @@ async def upload_applicants(file: UploadFile = File(...), replace: bool = False,
     - recruiter_assigned
     - mos_preference
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_applicants_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['first_name', 'last_name', 'date_of_birth', 'education_code', 'phone_number', 'lead_source', 'prid', 'application_date', 'applicant_status']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM applicants")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                applicant_id = f"APP-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                dob = pd.to_datetime(row['date_of_birth'])
-                age = (datetime.now() - dob).days // 365
-                
-                cursor.execute("""
-                    INSERT INTO applicants (
-                        applicant_id, first_name, last_name, middle_name, date_of_birth,
-                        age, education_code, phone_number, address, cbsa_code,
-                        lead_source, prid, asvab_score, application_date, applicant_status,
-                        meps_scheduled_date, recruiter_assigned, mos_preference, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    applicant_id,
-                    row['first_name'],
-                    row['last_name'],
-                    row.get('middle_name', ''),
-                    row['date_of_birth'],
-                    age,
-                    row['education_code'],
-                    row['phone_number'],
-                    row.get('address', ''),
-                    row.get('cbsa_code', ''),
-                    row['lead_source'],
-                    row['prid'],
-                    row.get('asvab_score', None),
-                    row['application_date'],
-                    row['applicant_status'],
-                    row.get('meps_scheduled_date', None),
-                    row.get('recruiter_assigned', ''),
-                    row.get('mos_preference', ''),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} applicants"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_applicants_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(APPLICANTS_SPEC, "applicants", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/future_soldiers")
-async def upload_future_soldiers(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_future_soldiers(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import future soldiers from CSV/Excel file
     
@@ -490,101 +398,16 @@ async def upload_future_soldiers(file: UploadFile = File(...), replace: bool = F
     - recruiter_assigned
     - unit_assignment
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_future_soldiers_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['first_name', 'last_name', 'date_of_birth', 'education_code', 'phone_number', 'lead_source', 'prid', 'contract_date', 'ship_date', 'mos_assigned', 'future_soldier_status']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM future_soldiers")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                fs_id = f"FS-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                dob = pd.to_datetime(row['date_of_birth'])
-                age = (datetime.now() - dob).days // 365
-                
-                cursor.execute("""
-                    INSERT INTO future_soldiers (
-                        fs_id, first_name, last_name, middle_name, date_of_birth,
-                        age, education_code, phone_number, address, cbsa_code,
-                        lead_source, prid, asvab_score, contract_date, ship_date,
-                        mos_assigned, future_soldier_status, recruiter_assigned,
-                        unit_assignment, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    fs_id,
-                    row['first_name'],
-                    row['last_name'],
-                    row.get('middle_name', ''),
-                    row['date_of_birth'],
-                    age,
-                    row['education_code'],
-                    row['phone_number'],
-                    row.get('address', ''),
-                    row.get('cbsa_code', ''),
-                    row['lead_source'],
-                    row['prid'],
-                    row.get('asvab_score', None),
-                    row['contract_date'],
-                    row['ship_date'],
-                    row['mos_assigned'],
-                    row['future_soldier_status'],
-                    row.get('recruiter_assigned', ''),
-                    row.get('unit_assignment', ''),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} future soldiers"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_future_soldiers_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(FUTURE_SOLDIERS_SPEC, "future soldiers", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/events")
-async def upload_events(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_events(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import events from CSV/Excel file
     
@@ -594,86 +417,16 @@ async def upload_events(file: UploadFile = File(...), replace: bool = False, map
     Optional columns:
     - type, budget, team_size, targeting_principles, status
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_events_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['name', 'location', 'start_date', 'end_date']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM events")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                event_id = f"EVT-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                cursor.execute("""
-                    INSERT INTO events (
-                        event_id, name, type, location, start_date, end_date,
-                        budget, team_size, targeting_principles, status, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    event_id,
-                    row['name'],
-                    row.get('type', 'recruitment_event'),
-                    row['location'],
-                    row['start_date'],
-                    row['end_date'],
-                    row.get('budget', 0),
-                    row.get('team_size', 0),
-                    row.get('targeting_principles', ''),
-                    row.get('status', 'planned'),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} events"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_events_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(EVENTS_SPEC, "events", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/projects")
-async def upload_projects(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_projects(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import projects from CSV/Excel file
     
@@ -683,84 +436,16 @@ async def upload_projects(file: UploadFile = File(...), replace: bool = False, m
     Optional columns:
     - event_id, funding_amount, status
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_projects_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['name', 'owner_id', 'start_date', 'target_date', 'objectives']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM projects")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                project_id = f"PRJ-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                cursor.execute("""
-                    INSERT INTO projects (
-                        project_id, name, event_id, start_date, target_date,
-                        owner_id, status, objectives, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    project_id,
-                    row['name'],
-                    row.get('event_id', ''),
-                    row['start_date'],
-                    row['target_date'],
-                    row['owner_id'],
-                    row.get('status', 'planning'),
-                    row['objectives'],
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} projects"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_projects_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(PROJECTS_SPEC, "projects", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/marketing_activities")
-async def upload_marketing_activities(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_marketing_activities(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import marketing activities from CSV/Excel file
     
@@ -770,88 +455,16 @@ async def upload_marketing_activities(file: UploadFile = File(...), replace: boo
     Optional columns:
     - target_audience, channels, leads_generated, cost_per_lead, status
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_marketing_activities_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['activity_name', 'campaign_type', 'start_date', 'end_date', 'budget_allocated']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM marketing_activities")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                activity_id = f"MKT-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                cursor.execute("""
-                    INSERT INTO marketing_activities (
-                        activity_id, activity_name, campaign_type, start_date, end_date,
-                        budget_allocated, target_audience, channels, leads_generated,
-                        cost_per_lead, status, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    activity_id,
-                    row['activity_name'],
-                    row['campaign_type'],
-                    row['start_date'],
-                    row['end_date'],
-                    row['budget_allocated'],
-                    row.get('target_audience', ''),
-                    row.get('channels', ''),
-                    row.get('leads_generated', 0),
-                    row.get('cost_per_lead', 0),
-                    row.get('status', 'active'),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} marketing activities"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_marketing_activities_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(MARKETING_ACTIVITIES_SPEC, "marketing activities", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/budgets")
-async def upload_budgets(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None)) -> Dict[str, Any]:
+async def upload_budgets(file: UploadFile = File(...), replace: bool = False, mapping: str = Form(None), upload_id: Optional[str] = None, background: bool = False) -> Dict[str, Any]:
     """
     Import budget records from CSV/Excel file
     
@@ -861,115 +474,59 @@ async def upload_budgets(file: UploadFile = File(...), replace: bool = False, ma
     Optional columns:
     - event_id, spent_amount, remaining_amount, fiscal_year
     """
-    try:
-        content = await file.read()
-        
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
-        
-        if mapping:
-            try:
-                m = json.loads(mapping)
-                df = df.rename(columns=m)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Invalid mapping JSON")
+    path = await spool_upload(file)
+    return await _dispatch(_upload_budgets_sync, file.filename, path, replace, mapping, upload_id, background)
 
-        required_cols = ['campaign_name', 'allocated_amount', 'start_date', 'end_date']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {', '.join(missing_cols)}"
-            )
-        
-        db = get_db()
-        cursor = db.cursor()
-        if replace:
-            try:
-                backup_db_internal()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Pre-replace backup failed: {str(e)}")
-            cursor.execute("DELETE FROM budgets")
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                budget_id = f"BDG-{int(datetime.now().timestamp() * 1000)}-{index}"
-                
-                cursor.execute("""
-                    INSERT INTO budgets (
-                        budget_id, event_id, campaign_name, allocated_amount,
-                        spent_amount, remaining_amount, start_date, end_date,
-                        fiscal_year, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    budget_id,
-                    row.get('event_id', ''),
-                    row['campaign_name'],
-                    row['allocated_amount'],
-                    row.get('spent_amount', 0),
-                    row.get('remaining_amount', row['allocated_amount']),
-                    row['start_date'],
-                    row['end_date'],
-                    row.get('fiscal_year', '2025'),
-                    datetime.now().isoformat(),
-                    datetime.now().isoformat()
-                ))
-                imported_count += 1
-            except Exception as e:
-                errors.append(f"Row {index + 2}: {str(e)}")
-        
-        db.commit()
-        db.close()
-        
-        return {
-            "status": "success",
-            "imported": imported_count,
-            "total_rows": len(df),
-            "errors": errors if errors else None,
-            "message": f"Successfully imported {imported_count} of {len(df)} budget records"
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
+
+def _upload_budgets_sync(filename: str, path: str, replace: bool = False, mapping: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    return _run_upload(BUDGETS_SPEC, "budget records", filename, path, replace, mapping, upload_id)
 
 
 @router.post("/upload/preview")
 async def upload_preview(file: UploadFile = File(...)) -> Dict[str, Any]:
     """Preview uploaded CSV/Excel: return columns and first 5 rows for schema inference/UI mapping."""
-    try:
-        content = await file.read()
+    path = await spool_upload(file)
+    return await run_in_threadpool(_upload_preview_sync, file.filename, path)
+
 
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        else:
-            raise HTTPException(status_code=400, detail="Only CSV and Excel files are supported")
+def _upload_preview_sync(filename: str, path: str) -> Dict[str, Any]:
+    try:
+        try:
+            df = read_head(path, filename, rows=5)
+        except UnsupportedFileType as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # Normalize and sample
         cols = [str(c) for c in df.columns]
-        sample = df.head(5).fillna('').to_dict(orient='records')
+        sample = df.fillna('').to_dict(orient='records')
 
         return {
             "status": "ok",
-            "filename": file.filename,
+            "filename": filename,
             "columns": cols,
             "sample_rows": sample,
-            "row_count": len(df)
+            "row_count": count_rows(path, filename)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+    finally:
+        discard_spool(path)
+
+
+@router.get("/upload/progress/{upload_id}")
+async def upload_progress(upload_id: str) -> Dict[str, Any]:
+    """Progress of a streaming upload started with ?upload_id=..."""
+    progress = get_progress(upload_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Unknown upload_id")
+    return {"status": "ok", "progress": progress}
 
 
 @router.post("/upload/backup")
-async def backup_db() -> Dict[str, Any]:
+@offload
+def backup_db() -> Dict[str, Any]:
     """Create a timestamped backup of the active DB file and return path."""
     try:
         src = resolve_db_path()
@@ -981,6 +538,7 @@ async def backup_db() -> Dict[str, Any]:
         os.makedirs(backups_dir, exist_ok=True)
         ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
         dest = os.path.join(backups_dir, f"recruiting.db.backup.{ts}")
+        checkpoint_database(src)
         shutil.copy2(src, dest)
 
         return {"status": "ok", "backup_path": dest}
@@ -1127,121 +685,73 @@ async def get_upload_templates() -> Dict[str, Any]:
 
 
 # Data retrieval endpoints for dynamic dashboard
-@router.get("/data/leads")
-async def get_leads_data() -> Dict[str, Any]:
-    """Get all leads data"""
+def _table_page(table: str, label: str, limit: Optional[int], cursor: Optional[str], include_total: bool) -> Dict[str, Any]:
+    """One keyset page of `table` in insertion (rowid) order."""
     try:
         conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM leads")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
+        try:
+            page = fetch_page(conn, f"SELECT rowid AS __pk, * FROM {table}", (), order=[("__pk", False)],
+                              limit=limit, cursor=cursor, include_total=include_total)
+        finally:
+            conn.close()
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch leads: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch {label}: {str(e)}")
+    return {"data": page.items, "count": len(page.items), **page.envelope()}
+
+
+@router.get("/data/leads")
+@offload
+def get_leads_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get leads data, one page at a time"""
+    return _table_page("leads", "leads", limit, cursor, include_total)
 
 
 @router.get("/data/prospects")
-async def get_prospects_data() -> Dict[str, Any]:
-    """Get all prospects data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM prospects")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch prospects: {str(e)}")
+@offload
+def get_prospects_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get prospects data, one page at a time"""
+    return _table_page("prospects", "prospects", limit, cursor, include_total)
 
 
 @router.get("/data/applicants")
-async def get_applicants_data() -> Dict[str, Any]:
-    """Get all applicants data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM applicants")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch applicants: {str(e)}")
+@offload
+def get_applicants_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get applicants data, one page at a time"""
+    return _table_page("applicants", "applicants", limit, cursor, include_total)
 
 
 @router.get("/data/future_soldiers")
-async def get_future_soldiers_data() -> Dict[str, Any]:
-    """Get all future soldiers data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM future_soldiers")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch future soldiers: {str(e)}")
+@offload
+def get_future_soldiers_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get future soldiers data, one page at a time"""
+    return _table_page("future_soldiers", "future soldiers", limit, cursor, include_total)
 
 
 @router.get("/data/events")
-async def get_events_data() -> Dict[str, Any]:
-    """Get all events data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM events")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch events: {str(e)}")
+@offload
+def get_events_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get events data, one page at a time"""
+    return _table_page("events", "events", limit, cursor, include_total)
 
 
 @router.get("/data/projects")
-async def get_projects_data() -> Dict[str, Any]:
-    """Get all projects data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM projects")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch projects: {str(e)}")
+@offload
+def get_projects_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get projects data, one page at a time"""
+    return _table_page("projects", "projects", limit, cursor, include_total)
 
 
 @router.get("/data/marketing_activities")
-async def get_marketing_data() -> Dict[str, Any]:
-    """Get all marketing activities data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM marketing_activities")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch marketing activities: {str(e)}")
+@offload
+def get_marketing_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get marketing activities data, one page at a time"""
+    return _table_page("marketing_activities", "marketing activities", limit, cursor, include_total)
 
 
 @router.get("/data/budgets")
-async def get_budgets_data() -> Dict[str, Any]:
-    """Get all budgets data"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM budgets")
-        rows = cursor.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        return {"data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch budgets: {str(e)}")
+@offload
+def get_budgets_data(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+    """Get budgets data, one page at a time"""
+    return _table_page("budgets", "budgets", limit, cursor, include_total)
@@ -0,0 +1,61 @@
+"""
+Background job status API
+Polling and Server-Sent Events progress for jobs queued with ?background=true
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..db_executor import offload, run_db
+from ..job_queue import JOB_SSE_INTERVAL, TERMINAL, get_job_queue
+
+router = APIRouter()
+
+
+@router.get("/jobs")
+@offload
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """Most recent jobs first, optionally filtered by status (queued, running, completed, failed)."""
+    queue = get_job_queue()
+    return {"status": "ok", "jobs": queue.list(status=status, limit=max(1, min(limit, 500))), "queue": queue.stats()}
+
+
+@router.get("/jobs/{job_id}")
+@offload
+def get_job(job_id: str) -> Dict[str, Any]:
+    """Status, live progress (rows processed/imported, errors), result and error of one job."""
+    job = get_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    return {"status": "ok", "job": job}
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Server-Sent Events: one `data:` message per change in the job, ending once it completes or fails."""
+    queue = get_job_queue()
+    job = await run_db(queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+    async def events(job):
+        last = None
+        while True:
+            payload = json.dumps(job, default=str)
+            if payload != last:
+                yield f"event: {job['status']}\ndata: {payload}\n\n"
+                last = payload
+            if job["status"] in TERMINAL:
+                return
+            await asyncio.sleep(JOB_SSE_INTERVAL)
+            job = await run_db(queue.get, job_id) or job
+
+    return StreamingResponse(
+        events(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
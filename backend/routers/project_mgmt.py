@@ -18,22 +18,32 @@ import json
 from fastapi.responses import StreamingResponse
 from fastapi import WebSocket, WebSocketDisconnect
 
+from ..db_pool import get_connection, get_pool
+from ..db_executor import run_db
+
 router = APIRouter()
 
 
-def get_db():
+def _db_path():
     # Resolve DB path: prefer environment `DB_FILE`, then common container paths, then local repo path
-    db_path = os.environ.get('DB_FILE') or '/app/recruiting.db' or '/root/TAAIP/data/recruiting.db' or '/Users/ambermooney/Desktop/TAAIP/data/taaip.sqlite3'
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return os.environ.get('DB_FILE') or '/app/recruiting.db' or '/root/TAAIP/data/recruiting.db' or '/Users/ambermooney/Desktop/TAAIP/data/taaip.sqlite3'
 
 
-def run_migrations():
-    conn = get_db()
-    cursor = conn.cursor()
+def get_db():
+    return get_connection(_db_path())
+
+
+def db_write(fn, *args, **kwargs):
+    """Queue `fn(conn, ...)` on the writer thread for this router's database and wait for its commit."""
+    return get_pool(_db_path()).write(fn, *args, **kwargs)
 
-    cursor.executescript(r"""
+
+def _require_project(conn, project_id: str):
+    if not conn.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,)).fetchone():
+        raise HTTPException(status_code=404, detail='project not found')
+
+
+MIGRATIONS = r"""
     CREATE TABLE IF NOT EXISTS projects_pm (
         id TEXT PRIMARY KEY,
         name TEXT,
@@ -103,10 +113,17 @@ def run_migrations():
         emm_event_id TEXT,
         raw_payload TEXT
     );
-    """)
+    """
 
-    conn.commit()
-    conn.close()
+
+def run_migrations():
+    # executescript() would commit the writer's transaction, so run the statements one at a time
+    def _migrate(conn):
+        for stmt in MIGRATIONS.split(';'):
+            if stmt.strip():
+                conn.execute(stmt)
+
+    db_write(_migrate)
 
 
 class ProjectCreate(BaseModel):
@@ -131,16 +148,14 @@ def init_migrations():
 
 @router.post('/projects')
 def create_project(payload: ProjectCreate):
-    conn = get_db()
-    cursor = conn.cursor()
     pid = str(uuid.uuid4())
     created_at = datetime.utcnow().isoformat()
-    cursor.execute(
-        "INSERT INTO projects_pm (id, name, description, start_date, end_date, total_budget, estimated_benefit, units, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (pid, payload.name, payload.description, payload.start_date, payload.end_date, payload.total_budget, payload.estimated_benefit, payload.units, str(payload.metadata) if payload.metadata else None, created_at)
+    db_write(
+        lambda conn: conn.execute(
+            "INSERT INTO projects_pm (id, name, description, start_date, end_date, total_budget, estimated_benefit, units, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (pid, payload.name, payload.description, payload.start_date, payload.end_date, payload.total_budget, payload.estimated_benefit, payload.units, str(payload.metadata) if payload.metadata else None, created_at)
+        )
     )
-    conn.commit()
-    conn.close()
     return {'status': 'ok', 'project_id': pid}
 
 
@@ -183,78 +198,76 @@ def get_project(project_id: str):
 
 @router.post('/projects/{project_id}/budget/transaction')
 def add_budget_transaction(project_id: str, type: str, description: str, amount: float, category: Optional[str] = 'other'):
-    conn = get_db()
-    cursor = conn.cursor()
-    # ensure project exists
-    cursor.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,))
-    if not cursor.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail='project not found')
-
     tid = str(uuid.uuid4())
     date = datetime.utcnow().isoformat()
-    cursor.execute('INSERT INTO budget_transactions (id, project_id, date, type, description, amount, category) VALUES (?, ?, ?, ?, ?, ?, ?)', (tid, project_id, date, type, description, amount, category))
-    conn.commit()
-
-    # update ROI record (simple calc)
-    cursor.execute('SELECT SUM(amount) as cost_total FROM budget_transactions WHERE project_id = ?', (project_id,))
-    crow = cursor.fetchone()
-    cost_total = crow['cost_total'] if crow and crow['cost_total'] is not None else 0.0
-
-    # fetch estimated benefit from project and participant-driven benefit
-    cursor.execute('SELECT estimated_benefit, metadata FROM projects_pm WHERE id = ?', (project_id,))
-    prow = cursor.fetchone()
-    benefit_est = 0.0
-    if prow:
-        benefit_est = prow['estimated_benefit'] if prow['estimated_benefit'] is not None else 0.0
-        # try to extract additional benefit factors from metadata (stored as str)
-        try:
-            meta = prow['metadata']
-            if meta:
-                # metadata stored as str(dict) in MVP; attempt json.loads fallback
-                try:
-                    meta_obj = json.loads(meta)
-                except Exception:
-                    # attempt eval as fallback (not ideal) — safe here in controlled env
+    calculated_at = datetime.utcnow().isoformat()
+
+    # The transaction insert and the ROI recalculation commit together
+    def _apply(conn):
+        cursor = conn.cursor()
+        _require_project(conn, project_id)
+
+        cursor.execute('INSERT INTO budget_transactions (id, project_id, date, type, description, amount, category) VALUES (?, ?, ?, ?, ?, ?, ?)', (tid, project_id, date, type, description, amount, category))
+
+        # update ROI record (simple calc)
+        cursor.execute('SELECT SUM(amount) as cost_total FROM budget_transactions WHERE project_id = ?', (project_id,))
+        crow = cursor.fetchone()
+        cost_total = crow['cost_total'] if crow and crow['cost_total'] is not None else 0.0
+
+        # fetch estimated benefit from project and participant-driven benefit
+        cursor.execute('SELECT estimated_benefit, metadata FROM projects_pm WHERE id = ?', (project_id,))
+        prow = cursor.fetchone()
+        benefit_est = 0.0
+        if prow:
+            benefit_est = prow['estimated_benefit'] if prow['estimated_benefit'] is not None else 0.0
+            # try to extract additional benefit factors from metadata (stored as str)
+            try:
+                meta = prow['metadata']
+                if meta:
+                    # metadata stored as str(dict) in MVP; attempt json.loads fallback
                     try:
-                        meta_obj = eval(meta)
+                        meta_obj = json.loads(meta)
                     except Exception:
-                        meta_obj = {}
-                # support a 'benefit_per_participant' multiplier
-                benefit_per_participant = float(meta_obj.get('benefit_per_participant', 0)) if isinstance(meta_obj, dict) and meta_obj.get('benefit_per_participant') else 0
-            else:
+                        # attempt eval as fallback (not ideal) — safe here in controlled env
+                        try:
+                            meta_obj = eval(meta)
+                        except Exception:
+                            meta_obj = {}
+                    # support a 'benefit_per_participant' multiplier
+                    benefit_per_participant = float(meta_obj.get('benefit_per_participant', 0)) if isinstance(meta_obj, dict) and meta_obj.get('benefit_per_participant') else 0
+                else:
+                    benefit_per_participant = 0
+            except Exception:
                 benefit_per_participant = 0
-        except Exception:
+        else:
             benefit_per_participant = 0
-    else:
-        benefit_per_participant = 0
 
-    # include participants-driven benefit estimate
-    cursor.execute('SELECT COUNT(*) as cnt FROM participants WHERE project_id = ?', (project_id,))
-    part_row = cursor.fetchone()
-    participants_count = part_row['cnt'] if part_row and part_row['cnt'] is not None else 0
-    participants_benefit = participants_count * (benefit_per_participant or 0)
+        # include participants-driven benefit estimate
+        cursor.execute('SELECT COUNT(*) as cnt FROM participants WHERE project_id = ?', (project_id,))
+        part_row = cursor.fetchone()
+        participants_count = part_row['cnt'] if part_row and part_row['cnt'] is not None else 0
+        participants_benefit = participants_count * (benefit_per_participant or 0)
 
-    total_benefit_est = float(benefit_est or 0.0) + float(participants_benefit or 0.0)
+        total_benefit_est = float(benefit_est or 0.0) + float(participants_benefit or 0.0)
 
-    roi_value = None
-    roi_pct = None
-    btr = None
-    if cost_total and cost_total > 0:
-        try:
-            roi_value = (total_benefit_est - cost_total) / cost_total
-            roi_pct = roi_value * 100 if roi_value is not None else None
-            btr = (total_benefit_est / cost_total) if cost_total > 0 else None
-        except Exception:
-            roi_value = None
-            roi_pct = None
-            btr = None
+        roi_value = None
+        roi_pct = None
+        btr = None
+        if cost_total and cost_total > 0:
+            try:
+                roi_value = (total_benefit_est - cost_total) / cost_total
+                roi_pct = roi_value * 100 if roi_value is not None else None
+                btr = (total_benefit_est / cost_total) if cost_total > 0 else None
+            except Exception:
+                roi_value = None
+                roi_pct = None
+                btr = None
 
-    rid = str(uuid.uuid4())
-    calculated_at = datetime.utcnow().isoformat()
-    cursor.execute('INSERT INTO roi_records (id, project_id, calculated_at, cost_total, benefit_est, roi) VALUES (?, ?, ?, ?, ?, ?)', (rid, project_id, calculated_at, cost_total, total_benefit_est, roi_value))
-    conn.commit()
-    conn.close()
+        rid = str(uuid.uuid4())
+        cursor.execute('INSERT INTO roi_records (id, project_id, calculated_at, cost_total, benefit_est, roi) VALUES (?, ?, ?, ?, ?, ?)', (rid, project_id, calculated_at, cost_total, total_benefit_est, roi_value))
+        return total_benefit_est, roi_value, roi_pct, btr
+
+    total_benefit_est, roi_value, roi_pct, btr = db_write(_apply)
 
     # publish budget update to any SSE subscribers
     try:
@@ -287,18 +300,14 @@ def add_budget_transaction(project_id: str, type: str, description: str, amount:
 
 @router.post('/projects/{project_id}/lessons')
 def add_lesson(project_id: str, author: Optional[str] = 'unknown', lesson: str = ''):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,))
-    if not cursor.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail='project not found')
-
     lid = str(uuid.uuid4())
     created_at = datetime.utcnow().isoformat()
-    cursor.execute('INSERT INTO project_lessons (id, project_id, created_at, author, lesson) VALUES (?, ?, ?, ?, ?)', (lid, project_id, created_at, author, lesson))
-    conn.commit()
-    conn.close()
+
+    def _insert(conn):
+        _require_project(conn, project_id)
+        conn.execute('INSERT INTO project_lessons (id, project_id, created_at, author, lesson) VALUES (?, ?, ?, ?, ?)', (lid, project_id, created_at, author, lesson))
+
+    db_write(_insert)
     return {'status': 'ok', 'lesson_id': lid}
 
 
@@ -315,18 +324,14 @@ def list_lessons(project_id: str, limit: int = 100):
 # --- AARs (After Action Reports) ---
 @router.post('/projects/{project_id}/aars')
 def add_aar(project_id: str, summary: str = ''):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,))
-    if not cur.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail='project not found')
-
     aid = str(uuid.uuid4())
     now = datetime.utcnow().isoformat()
-    cur.execute('INSERT INTO project_aars (id, project_id, created_at, summary) VALUES (?, ?, ?, ?)', (aid, project_id, now, summary))
-    conn.commit()
-    conn.close()
+
+    def _insert(conn):
+        _require_project(conn, project_id)
+        conn.execute('INSERT INTO project_aars (id, project_id, created_at, summary) VALUES (?, ?, ?, ?)', (aid, project_id, now, summary))
+
+    db_write(_insert)
     return {'status': 'ok', 'aar_id': aid}
 
 
@@ -356,19 +361,18 @@ async def import_emm_event(project_id: str, request: Request, emm_event_id: Opti
         emm_event_id = body.get('emm_event_id') or body.get('source_id') or None
 
     payload = body.get('payload') if isinstance(body, dict) and 'payload' in body else body
+    return await run_db(_insert_emm_mapping, project_id, emm_event_id, payload)
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,))
-    if not cur.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail='project not found')
 
+def _insert_emm_mapping(project_id: str, emm_event_id: Optional[str], payload: Any):
     mid = str(uuid.uuid4())
     now = datetime.utcnow().isoformat()
-    cur.execute('INSERT INTO emm_mappings (id, project_id, emm_event_id, raw_payload) VALUES (?, ?, ?, ?)', (mid, project_id, emm_event_id, json.dumps(payload)))
-    conn.commit()
-    conn.close()
+
+    def _insert(conn):
+        _require_project(conn, project_id)
+        conn.execute('INSERT INTO emm_mappings (id, project_id, emm_event_id, raw_payload) VALUES (?, ?, ?, ?)', (mid, project_id, emm_event_id, json.dumps(payload)))
+
+    db_write(_insert)
     return {'status': 'ok', 'mapping_id': mid}
 
 
@@ -390,17 +394,13 @@ def list_emm_mappings(project_id: str):
 # --- Scope endpoints ---
 @router.post('/projects/{project_id}/scope')
 def set_scope(project_id: str, scope_text: str = '', milestones: Optional[str] = None):
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,))
-    if not cur.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail='project not found')
-
     sid = str(uuid.uuid4())
-    cur.execute('INSERT INTO project_scope (id, project_id, scope_text, milestones) VALUES (?, ?, ?, ?)', (sid, project_id, scope_text, milestones))
-    conn.commit()
-    conn.close()
+
+    def _insert(conn):
+        _require_project(conn, project_id)
+        conn.execute('INSERT INTO project_scope (id, project_id, scope_text, milestones) VALUES (?, ?, ?, ?)', (sid, project_id, scope_text, milestones))
+
+    db_write(_insert)
     return {'status': 'ok', 'scope_id': sid}
 
 
@@ -433,18 +433,17 @@ async def add_participant(project_id: str, request: Request, person_id: Optional
 
     if not person_id:
         raise HTTPException(status_code=422, detail='person_id required')
+    return await run_db(_insert_participant, project_id, person_id, role, unit, attendance)
 
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute('SELECT 1 FROM projects_pm WHERE id = ?', (project_id,))
-    if not cur.fetchone():
-        conn.close()
-        raise HTTPException(status_code=404, detail='project not found')
 
+def _insert_participant(project_id: str, person_id: str, role: Optional[str], unit: Optional[str], attendance: int):
     pid = str(uuid.uuid4())
-    cur.execute('INSERT INTO participants (id, project_id, person_id, role, unit, attendance) VALUES (?, ?, ?, ?, ?, ?)', (pid, project_id, person_id, role, unit, attendance))
-    conn.commit()
-    conn.close()
+
+    def _insert(conn):
+        _require_project(conn, project_id)
+        conn.execute('INSERT INTO participants (id, project_id, person_id, role, unit, attendance) VALUES (?, ?, ?, ?, ?, ?)', (pid, project_id, person_id, role, unit, attendance))
+
+    db_write(_insert)
     return {'status': 'ok', 'participant_id': pid}
 
 
@@ -10,8 +10,44 @@ from datetime import datetime
 import sqlite3
 import random
 
+from ..db_pool import get_connection, get_pool
+from ..db_executor import offload
+
 router = APIRouter()
 
+DB_PATH = "data/taaip.sqlite3"
+
+HELPDESK_REQUESTS_DDL = """
+    CREATE TABLE IF NOT EXISTS helpdesk_requests (
+        request_id TEXT PRIMARY KEY,
+        type TEXT NOT NULL,
+        priority TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        requested_access_level TEXT,
+        current_access_level TEXT,
+        status TEXT DEFAULT 'pending',
+        submitted_by TEXT NOT NULL,
+        submitted_at TIMESTAMP NOT NULL,
+        assigned_to TEXT,
+        resolved_at TIMESTAMP,
+        resolution_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+USER_ACCESS_DDL = """
+    CREATE TABLE IF NOT EXISTS user_access (
+        user_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT,
+        dod_id TEXT UNIQUE NOT NULL,
+        access_level TEXT DEFAULT 'tier_1',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
 # Pydantic Models
 class CompanyStanding(BaseModel):
     rank: int
@@ -52,8 +88,91 @@ class UserAccess(BaseModel):
     accessLevel: Literal['tier_1', 'tier_2', 'tier_3', 'tier_4']
 
 
+def _ensure_standings(conn):
+    cursor = conn.cursor()
+
+    # Create standings table if it doesn't exist
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS company_standings (
+            company_id TEXT PRIMARY KEY,
+            company_name TEXT NOT NULL,
+            battalion TEXT,
+            brigade TEXT,
+            ytd_mission INTEGER DEFAULT 0,
+            ytd_actual INTEGER DEFAULT 0,
+            ytd_attainment REAL DEFAULT 0.0,
+            monthly_mission INTEGER DEFAULT 0,
+            monthly_actual INTEGER DEFAULT 0,
+            monthly_attainment REAL DEFAULT 0.0,
+            total_enlistments INTEGER DEFAULT 0,
+            future_soldier_losses INTEGER DEFAULT 0,
+            net_gain INTEGER DEFAULT 0,
+            last_enlistment TIMESTAMP,
+            previous_rank INTEGER DEFAULT 999,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Check if we need to seed data
+    cursor.execute("SELECT COUNT(*) as count FROM company_standings")
+    count = cursor.fetchone()['count']
+
+    if count == 0:
+        # Seed with sample company data
+        brigades = ['1st BDE', '2nd BDE', '3rd BDE', '4th BDE', '5th BDE', '6th BDE']
+        companies = []
+        
+        for bde_idx, brigade in enumerate(brigades, 1):
+            for bn in range(1, 4):  # 3 battalions per brigade
+                battalion = f'{bde_idx * 3 - 3 + bn}BN'
+                for co in ['A', 'B', 'C']:  # 3 companies per battalion
+                    company_id = f'{battalion}-{co}CO'
+                    company_name = f'{co} Company, {battalion}'
+                    
+                    ytd_mission = random.randint(80, 150)
+                    ytd_actual = random.randint(50, ytd_mission + 20)
+                    ytd_attainment = (ytd_actual / ytd_mission * 100) if ytd_mission > 0 else 0
+                    
+                    monthly_mission = random.randint(15, 30)
+                    monthly_actual = random.randint(8, monthly_mission + 5)
+                    monthly_attainment = (monthly_actual / monthly_mission * 100) if monthly_mission > 0 else 0
+                    
+                    total_enlistments = ytd_actual
+                    future_soldier_losses = random.randint(0, 15)
+                    net_gain = total_enlistments - future_soldier_losses
+                    
+                    companies.append((
+                        company_id, company_name, battalion, brigade,
+                        ytd_mission, ytd_actual, ytd_attainment,
+                        monthly_mission, monthly_actual, monthly_attainment,
+                        total_enlistments, future_soldier_losses, net_gain,
+                        datetime.now().isoformat() if random.random() > 0.3 else None
+                    ))
+        
+        cursor.executemany("""
+            INSERT INTO company_standings (
+                company_id, company_name, battalion, brigade,
+                ytd_mission, ytd_actual, ytd_attainment,
+                monthly_mission, monthly_actual, monthly_attainment,
+                total_enlistments, future_soldier_losses, net_gain,
+                last_enlistment
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, companies)
+
+    # Ensure optional columns exist (rsid, station) so filters work
+    try:
+        cursor.execute("ALTER TABLE company_standings ADD COLUMN rsid TEXT")
+    except Exception:
+        pass
+    try:
+        cursor.execute("ALTER TABLE company_standings ADD COLUMN station TEXT")
+    except Exception:
+        pass
+
+
 @router.get("/standings/companies")
-async def get_company_standings(
+@offload
+def get_company_standings(
     battalion: Optional[str] = None,
     brigade: Optional[str] = None,
     company_id: Optional[str] = None,
@@ -62,89 +181,10 @@ async def get_company_standings(
 ):
     """Get real-time company standings with YTD and monthly metrics"""
     try:
-        conn = sqlite3.connect("data/taaip.sqlite3")
-        conn.row_factory = sqlite3.Row
+        get_pool(DB_PATH).write(_ensure_standings)
+        conn = get_connection(DB_PATH)
         cursor = conn.cursor()
 
-        # Create standings table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS company_standings (
-                company_id TEXT PRIMARY KEY,
-                company_name TEXT NOT NULL,
-                battalion TEXT,
-                brigade TEXT,
-                ytd_mission INTEGER DEFAULT 0,
-                ytd_actual INTEGER DEFAULT 0,
-                ytd_attainment REAL DEFAULT 0.0,
-                monthly_mission INTEGER DEFAULT 0,
-                monthly_actual INTEGER DEFAULT 0,
-                monthly_attainment REAL DEFAULT 0.0,
-                total_enlistments INTEGER DEFAULT 0,
-                future_soldier_losses INTEGER DEFAULT 0,
-                net_gain INTEGER DEFAULT 0,
-                last_enlistment TIMESTAMP,
-                previous_rank INTEGER DEFAULT 999,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Check if we need to seed data
-        cursor.execute("SELECT COUNT(*) as count FROM company_standings")
-        count = cursor.fetchone()['count']
-
-        if count == 0:
-            # Seed with sample company data
-            brigades = ['1st BDE', '2nd BDE', '3rd BDE', '4th BDE', '5th BDE', '6th BDE']
-            companies = []
-            
-            for bde_idx, brigade in enumerate(brigades, 1):
-                for bn in range(1, 4):  # 3 battalions per brigade
-                    battalion = f'{bde_idx * 3 - 3 + bn}BN'
-                    for co in ['A', 'B', 'C']:  # 3 companies per battalion
-                        company_id = f'{battalion}-{co}CO'
-                        company_name = f'{co} Company, {battalion}'
-                        
-                        ytd_mission = random.randint(80, 150)
-                        ytd_actual = random.randint(50, ytd_mission + 20)
-                        ytd_attainment = (ytd_actual / ytd_mission * 100) if ytd_mission > 0 else 0
-                        
-                        monthly_mission = random.randint(15, 30)
-                        monthly_actual = random.randint(8, monthly_mission + 5)
-                        monthly_attainment = (monthly_actual / monthly_mission * 100) if monthly_mission > 0 else 0
-                        
-                        total_enlistments = ytd_actual
-                        future_soldier_losses = random.randint(0, 15)
-                        net_gain = total_enlistments - future_soldier_losses
-                        
-                        companies.append((
-                            company_id, company_name, battalion, brigade,
-                            ytd_mission, ytd_actual, ytd_attainment,
-                            monthly_mission, monthly_actual, monthly_attainment,
-                            total_enlistments, future_soldier_losses, net_gain,
-                            datetime.now().isoformat() if random.random() > 0.3 else None
-                        ))
-            
-            cursor.executemany("""
-                INSERT INTO company_standings (
-                    company_id, company_name, battalion, brigade,
-                    ytd_mission, ytd_actual, ytd_attainment,
-                    monthly_mission, monthly_actual, monthly_attainment,
-                    total_enlistments, future_soldier_losses, net_gain,
-                    last_enlistment
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, companies)
-            conn.commit()
-
-        # Ensure optional columns exist (rsid, station) so filters work
-        try:
-            cursor.execute("ALTER TABLE company_standings ADD COLUMN rsid TEXT")
-        except Exception:
-            pass
-        try:
-            cursor.execute("ALTER TABLE company_standings ADD COLUMN station TEXT")
-        except Exception:
-            pass
-
         # Build filtered query
         query = """
             SELECT 
@@ -212,16 +252,16 @@ async def get_company_standings(
                 'trend': trend
             })
         
+        conn.close()
+
         # Update previous ranks for next comparison
-        for standing in standings:
-            cursor.execute("""
+        get_pool(DB_PATH).write(
+            lambda conn: conn.executemany("""
                 UPDATE company_standings 
                 SET previous_rank = ?
                 WHERE company_id = ?
-            """, (standing['rank'], standing['company_id']))
-        
-        conn.commit()
-        conn.close()
+            """, [(standing['rank'], standing['company_id']) for standing in standings])
+        )
 
         return {
             "status": "ok",
@@ -235,39 +275,37 @@ async def get_company_standings(
 
 
 @router.post("/standings/update")
-async def update_company_standing(company_id: str, enlistment: Optional[bool] = None, loss: Optional[bool] = None):
+@offload
+def update_company_standing(company_id: str, enlistment: Optional[bool] = None, loss: Optional[bool] = None):
     """Update company standing when an enlistment or loss occurs"""
     try:
-        conn = sqlite3.connect("data/taaip.sqlite3")
-        cursor = conn.cursor()
-
-        if enlistment:
-            cursor.execute("""
-                UPDATE company_standings 
-                SET 
-                    ytd_actual = ytd_actual + 1,
-                    ytd_attainment = (ytd_actual + 1) * 100.0 / ytd_mission,
-                    monthly_actual = monthly_actual + 1,
-                    monthly_attainment = (monthly_actual + 1) * 100.0 / monthly_mission,
-                    total_enlistments = total_enlistments + 1,
-                    net_gain = total_enlistments + 1 - future_soldier_losses,
-                    last_enlistment = ?,
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE company_id = ?
-            """, (datetime.now().isoformat(), company_id))
+        def _apply(conn):
+            if enlistment:
+                conn.execute("""
+                    UPDATE company_standings 
+                    SET 
+                        ytd_actual = ytd_actual + 1,
+                        ytd_attainment = (ytd_actual + 1) * 100.0 / ytd_mission,
+                        monthly_actual = monthly_actual + 1,
+                        monthly_attainment = (monthly_actual + 1) * 100.0 / monthly_mission,
+                        total_enlistments = total_enlistments + 1,
+                        net_gain = total_enlistments + 1 - future_soldier_losses,
+                        last_enlistment = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE company_id = ?
+                """, (datetime.now().isoformat(), company_id))
         
-        if loss:
-            cursor.execute("""
-                UPDATE company_standings 
-                SET 
-                    future_soldier_losses = future_soldier_losses + 1,
-                    net_gain = total_enlistments - (future_soldier_losses + 1),
-                    updated_at = CURRENT_TIMESTAMP
-                WHERE company_id = ?
-            """, (company_id,))
-
-        conn.commit()
-        conn.close()
+            if loss:
+                conn.execute("""
+                    UPDATE company_standings 
+                    SET 
+                        future_soldier_losses = future_soldier_losses + 1,
+                        net_gain = total_enlistments - (future_soldier_losses + 1),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE company_id = ?
+                """, (company_id,))
+
+        get_pool(DB_PATH).write(_apply)
 
         return {
             "status": "ok",
@@ -280,33 +318,14 @@ async def update_company_standing(company_id: str, enlistment: Optional[bool] =
 
 
 @router.get("/helpdesk/requests")
-async def get_helpdesk_requests(status: Optional[str] = None, user_id: Optional[str] = None):
+@offload
+def get_helpdesk_requests(status: Optional[str] = None, user_id: Optional[str] = None):
     """Get helpdesk requests with optional filtering"""
     try:
-        conn = sqlite3.connect("data/taaip.sqlite3")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
         # Create helpdesk_requests table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS helpdesk_requests (
-                request_id TEXT PRIMARY KEY,
-                type TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                requested_access_level TEXT,
-                current_access_level TEXT,
-                status TEXT DEFAULT 'pending',
-                submitted_by TEXT NOT NULL,
-                submitted_at TIMESTAMP NOT NULL,
-                assigned_to TEXT,
-                resolved_at TIMESTAMP,
-                resolution_notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
+        get_pool(DB_PATH).write(lambda conn: conn.execute(HELPDESK_REQUESTS_DDL))
+        conn = get_connection(DB_PATH)
+        cursor = conn.cursor()
 
         query = "SELECT * FROM helpdesk_requests WHERE 1=1"
         params = []
@@ -336,49 +355,29 @@ async def get_helpdesk_requests(status: Optional[str] = None, user_id: Optional[
 
 
 @router.post("/helpdesk/requests")
-async def create_helpdesk_request(request: HelpdeskRequest):
+@offload
+def create_helpdesk_request(request: HelpdeskRequest):
     """Submit a new helpdesk request"""
     try:
-        conn = sqlite3.connect("data/taaip.sqlite3")
-        cursor = conn.cursor()
-
-        # Ensure table exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS helpdesk_requests (
-                request_id TEXT PRIMARY KEY,
-                type TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                requested_access_level TEXT,
-                current_access_level TEXT,
-                status TEXT DEFAULT 'pending',
-                submitted_by TEXT NOT NULL,
-                submitted_at TIMESTAMP NOT NULL,
-                assigned_to TEXT,
-                resolved_at TIMESTAMP,
-                resolution_notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
         # Generate request ID
         request_id = f"req_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{random.randint(1000, 9999)}"
 
-        cursor.execute("""
-            INSERT INTO helpdesk_requests (
-                request_id, type, priority, title, description,
-                requested_access_level, current_access_level,
-                submitted_by, submitted_at, status
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            request_id, request.type, request.priority, request.title, request.description,
-            request.requestedAccessLevel, request.currentAccessLevel,
-            request.submittedBy, request.submittedAt, 'pending'
-        ))
-
-        conn.commit()
-        conn.close()
+        def _insert(conn):
+            # Ensure table exists
+            conn.execute(HELPDESK_REQUESTS_DDL)
+            conn.execute("""
+                INSERT INTO helpdesk_requests (
+                    request_id, type, priority, title, description,
+                    requested_access_level, current_access_level,
+                    submitted_by, submitted_at, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                request_id, request.type, request.priority, request.title, request.description,
+                request.requestedAccessLevel, request.currentAccessLevel,
+                request.submittedBy, request.submittedAt, 'pending'
+            ))
+
+        get_pool(DB_PATH).write(_insert)
 
         return {
             "status": "ok",
@@ -392,26 +391,14 @@ async def create_helpdesk_request(request: HelpdeskRequest):
 
 
 @router.get("/users/{user_id}/access")
-async def get_user_access(user_id: str):
+@offload
+def get_user_access(user_id: str):
     """Get user access level and permissions"""
     try:
-        conn = sqlite3.connect("data/taaip.sqlite3")
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
         # Create users table if it doesn't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_access (
-                user_id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                email TEXT,
-                dod_id TEXT UNIQUE NOT NULL,
-                access_level TEXT DEFAULT 'tier_1',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
+        get_pool(DB_PATH).write(lambda conn: conn.execute(USER_ACCESS_DDL))
+        conn = get_connection(DB_PATH)
+        cursor = conn.cursor()
 
         cursor.execute("SELECT * FROM user_access WHERE user_id = ? OR dod_id = ?", (user_id, user_id))
         user = cursor.fetchone()
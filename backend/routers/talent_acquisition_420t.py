@@ -10,6 +10,9 @@ import sqlite3
 import os
 from pydantic import BaseModel
 
+from ..db_pool import get_connection, get_pool
+from ..db_executor import offload
+
 router = APIRouter()
 
 # Use the same database as the main TAAIP service
@@ -121,173 +124,172 @@ class TargetingBoardItem(BaseModel):
 
 def init_420t_tables():
     """Initialize all 420T-specific database tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Recruiters table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recruiters (
-            recruiter_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            rsid TEXT UNIQUE NOT NULL,
-            zone TEXT,
-            unit_type TEXT,
-            unit_name TEXT,
-            active BOOLEAN DEFAULT 1,
-            hire_date TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Future Soldiers table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS future_soldiers (
-            fs_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            contract_date TEXT NOT NULL,
-            ship_date TEXT,
-            orientation_attended BOOLEAN DEFAULT 0,
-            training_attended BOOLEAN DEFAULT 0,
-            ship_potential TEXT,
-            status TEXT DEFAULT 'Active',
-            loss_reason TEXT,
-            recruiter_id TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (recruiter_id) REFERENCES recruiters (recruiter_id)
-        )
-    """)
-    
-    # Recruiter Performance Metrics table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recruiter_metrics (
-            metric_id TEXT PRIMARY KEY,
-            recruiter_id TEXT NOT NULL,
-            metric_date TEXT NOT NULL,
-            work_ethic_score REAL,
-            conversion_rate REAL,
-            zone_compliance BOOLEAN,
-            contribution_rate REAL,
-            contracts_count INTEGER DEFAULT 0,
-            leads_count INTEGER DEFAULT 0,
-            appointments_count INTEGER DEFAULT 0,
-            FOREIGN KEY (recruiter_id) REFERENCES recruiters (recruiter_id)
-        )
-    """)
-    
-    # Schools table (enhanced)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS schools (
-            school_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            type TEXT,
-            location TEXT,
-            zip_code TEXT,
-            assigned_recruiter TEXT,
-            zone_id TEXT,
-            zone_valid BOOLEAN DEFAULT 1,
-            alrl_milestones INTEGER DEFAULT 0,
-            sasvab_tests_ytd INTEGER DEFAULT 0,
-            leads_ytd INTEGER DEFAULT 0,
-            conversions_ytd INTEGER DEFAULT 0,
-            priority TEXT DEFAULT 'Opportunity',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (assigned_recruiter) REFERENCES recruiters (recruiter_id)
-        )
-    """)
-    
-    # Recruiting Operations Plans table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS recruiting_ops_plans (
-            plan_id TEXT PRIMARY KEY,
-            unit_type TEXT NOT NULL,
-            unit_name TEXT NOT NULL,
-            status TEXT DEFAULT 'Active',
-            compliance_score REAL DEFAULT 0,
-            last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
-            recruiter_work_ethic REAL,
-            conversion_data REAL,
-            zone_compliance REAL,
-            prospecting_compliance REAL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Targeting Board table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS targeting_board (
-            target_id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,
-            location TEXT,
-            expected_roi REAL,
-            payoff_level TEXT DEFAULT 'Medium',
-            status TEXT DEFAULT 'Identified',
-            last_analysis TEXT,
-            assigned_to TEXT,
-            notes TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (assigned_to) REFERENCES recruiters (recruiter_id)
-        )
-    """)
-    
-    # Fusion Process table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS fusion_process (
-            fusion_id TEXT PRIMARY KEY,
-            session_date TEXT NOT NULL,
-            participants TEXT,
-            insights TEXT,
-            actions TEXT,
-            status TEXT DEFAULT 'Planned',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Waivers table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS waivers (
-            waiver_id TEXT PRIMARY KEY,
-            applicant_name TEXT,
-            waiver_type TEXT,
-            status TEXT,
-            submission_date TEXT,
-            decision_date TEXT,
-            approved BOOLEAN,
-            recruiter_id TEXT,
-            FOREIGN KEY (recruiter_id) REFERENCES recruiters (recruiter_id)
-        )
-    """)
-    
-    # Quality Marks table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS quality_marks (
-            mark_id TEXT PRIMARY KEY,
-            unit_type TEXT,
-            unit_name TEXT,
-            month TEXT,
-            score INTEGER,
-            category TEXT,
-            notes TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # SRP Referrals table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS srp_referrals (
-            referral_id TEXT PRIMARY KEY,
-            referring_soldier TEXT,
-            referral_name TEXT,
-            referral_date TEXT,
-            status TEXT DEFAULT 'New',
-            contacted BOOLEAN DEFAULT 0,
-            converted BOOLEAN DEFAULT 0,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    def _create(conn):
+        cursor = conn.cursor()
     
-    conn.commit()
-    conn.close()
+        # Recruiters table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS recruiters (
+                recruiter_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                rsid TEXT UNIQUE NOT NULL,
+                zone TEXT,
+                unit_type TEXT,
+                unit_name TEXT,
+                active BOOLEAN DEFAULT 1,
+                hire_date TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    
+        # Future Soldiers table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS future_soldiers (
+                fs_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                contract_date TEXT NOT NULL,
+                ship_date TEXT,
+                orientation_attended BOOLEAN DEFAULT 0,
+                training_attended BOOLEAN DEFAULT 0,
+                ship_potential TEXT,
+                status TEXT DEFAULT 'Active',
+                loss_reason TEXT,
+                recruiter_id TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (recruiter_id) REFERENCES recruiters (recruiter_id)
+            )
+        """)
+    
+        # Recruiter Performance Metrics table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS recruiter_metrics (
+                metric_id TEXT PRIMARY KEY,
+                recruiter_id TEXT NOT NULL,
+                metric_date TEXT NOT NULL,
+                work_ethic_score REAL,
+                conversion_rate REAL,
+                zone_compliance BOOLEAN,
+                contribution_rate REAL,
+                contracts_count INTEGER DEFAULT 0,
+                leads_count INTEGER DEFAULT 0,
+                appointments_count INTEGER DEFAULT 0,
+                FOREIGN KEY (recruiter_id) REFERENCES recruiters (recruiter_id)
+            )
+        """)
+    
+        # Schools table (enhanced)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schools (
+                school_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                type TEXT,
+                location TEXT,
+                zip_code TEXT,
+                assigned_recruiter TEXT,
+                zone_id TEXT,
+                zone_valid BOOLEAN DEFAULT 1,
+                alrl_milestones INTEGER DEFAULT 0,
+                sasvab_tests_ytd INTEGER DEFAULT 0,
+                leads_ytd INTEGER DEFAULT 0,
+                conversions_ytd INTEGER DEFAULT 0,
+                priority TEXT DEFAULT 'Opportunity',
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (assigned_recruiter) REFERENCES recruiters (recruiter_id)
+            )
+        """)
+    
+        # Recruiting Operations Plans table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS recruiting_ops_plans (
+                plan_id TEXT PRIMARY KEY,
+                unit_type TEXT NOT NULL,
+                unit_name TEXT NOT NULL,
+                status TEXT DEFAULT 'Active',
+                compliance_score REAL DEFAULT 0,
+                last_updated TEXT DEFAULT CURRENT_TIMESTAMP,
+                recruiter_work_ethic REAL,
+                conversion_data REAL,
+                zone_compliance REAL,
+                prospecting_compliance REAL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    
+        # Targeting Board table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS targeting_board (
+                target_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                location TEXT,
+                expected_roi REAL,
+                payoff_level TEXT DEFAULT 'Medium',
+                status TEXT DEFAULT 'Identified',
+                last_analysis TEXT,
+                assigned_to TEXT,
+                notes TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (assigned_to) REFERENCES recruiters (recruiter_id)
+            )
+        """)
+    
+        # Fusion Process table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fusion_process (
+                fusion_id TEXT PRIMARY KEY,
+                session_date TEXT NOT NULL,
+                participants TEXT,
+                insights TEXT,
+                actions TEXT,
+                status TEXT DEFAULT 'Planned',
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    
+        # Waivers table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS waivers (
+                waiver_id TEXT PRIMARY KEY,
+                applicant_name TEXT,
+                waiver_type TEXT,
+                status TEXT,
+                submission_date TEXT,
+                decision_date TEXT,
+                approved BOOLEAN,
+                recruiter_id TEXT,
+                FOREIGN KEY (recruiter_id) REFERENCES recruiters (recruiter_id)
+            )
+        """)
+    
+        # Quality Marks table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS quality_marks (
+                mark_id TEXT PRIMARY KEY,
+                unit_type TEXT,
+                unit_name TEXT,
+                month TEXT,
+                score INTEGER,
+                category TEXT,
+                notes TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    
+        # SRP Referrals table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS srp_referrals (
+                referral_id TEXT PRIMARY KEY,
+                referring_soldier TEXT,
+                referral_name TEXT,
+                referral_date TEXT,
+                status TEXT DEFAULT 'New',
+                contacted BOOLEAN DEFAULT 0,
+                converted BOOLEAN DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    get_pool(DB_PATH).write(_create)
 
 
 # Initialize tables on import
@@ -297,7 +299,8 @@ init_420t_tables()
 # --- API Endpoints ---
 
 @router.get("/kpi-metrics")
-async def get_kpi_metrics(
+@offload
+def get_kpi_metrics(
     rsid: Optional[str] = None,
     zipcode: Optional[str] = None,
     cbsa: Optional[str] = None,
@@ -307,7 +310,7 @@ async def get_kpi_metrics(
     Get all 420T KPI metrics from Enclosure 2
     Filters: RSID, Zip Code, CBSA, Unit
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     # Build filters
@@ -460,13 +463,14 @@ async def get_kpi_metrics(
 
 
 @router.get("/school-targets")
-async def get_school_targets(
+@offload
+def get_school_targets(
     rsid: Optional[str] = None,
     zipcode: Optional[str] = None,
     cbsa: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get school recruiting targets with ALRL milestones"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     filters = []
@@ -514,11 +518,12 @@ async def get_school_targets(
 
 
 @router.get("/recruiting-ops-plans")
-async def get_recruiting_ops_plans(
+@offload
+def get_recruiting_ops_plans(
     unit: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get Recruiting Operations Plans by unit"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     filters = []
@@ -565,12 +570,13 @@ async def get_recruiting_ops_plans(
 
 
 @router.get("/future-soldiers")
-async def get_future_soldiers(
+@offload
+def get_future_soldiers(
     recruiter_id: Optional[str] = None,
     status: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get Future Soldier roster with tracking"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     filters = []
@@ -620,12 +626,13 @@ async def get_future_soldiers(
 
 
 @router.get("/recruiter-performance")
-async def get_recruiter_performance(
+@offload
+def get_recruiter_performance(
     rsid: Optional[str] = None,
     unit: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get recruiter performance metrics"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     filters = []
@@ -683,12 +690,13 @@ async def get_recruiter_performance(
 
 
 @router.get("/targeting-board")
-async def get_targeting_board(
+@offload
+def get_targeting_board(
     payoff_level: Optional[str] = None,
     status: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get targeting board items for high-payoff event identification"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     filters = []
@@ -744,11 +752,12 @@ async def get_targeting_board(
 
 
 @router.get("/fusion-process")
-async def get_fusion_sessions(
+@offload
+def get_fusion_sessions(
     status: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get fusion process sessions"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH, row_factory=None)
     cursor = conn.cursor()
     
     filters = []
@@ -791,155 +800,155 @@ async def get_fusion_sessions(
 # --- Seed Data Functions ---
 
 @router.post("/seed-420t-data")
-async def seed_420t_data():
+@offload
+def seed_420t_data():
     """Seed database with sample 420T data for testing"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Seed recruiters
-    recruiters_data = [
-        ('REC001', 'SSG Martinez', 'RS123456', 'North Dallas', 'Station', 'Dallas Recruiting Station'),
-        ('REC002', 'SFC Johnson', 'RS789012', 'South Houston', 'Station', 'Houston East Station'),
-        ('REC003', 'SSG Williams', 'RS345678', 'Austin Central', 'Station', 'Austin Downtown Station'),
-        ('REC004', 'SFC Davis', 'RS901234', 'San Antonio West', 'Station', 'San Antonio Mil City Station'),
-        ('REC005', 'SSG Brown', 'RS567890', 'Fort Worth', 'Station', 'Fort Worth Station'),
-    ]
+    def _seed(conn):
+        cursor = conn.cursor()
+    
+        # Seed recruiters
+        recruiters_data = [
+            ('REC001', 'SSG Martinez', 'RS123456', 'North Dallas', 'Station', 'Dallas Recruiting Station'),
+            ('REC002', 'SFC Johnson', 'RS789012', 'South Houston', 'Station', 'Houston East Station'),
+            ('REC003', 'SSG Williams', 'RS345678', 'Austin Central', 'Station', 'Austin Downtown Station'),
+            ('REC004', 'SFC Davis', 'RS901234', 'San Antonio West', 'Station', 'San Antonio Mil City Station'),
+            ('REC005', 'SSG Brown', 'RS567890', 'Fort Worth', 'Station', 'Fort Worth Station'),
+        ]
+    
+        for rec_id, name, rsid, zone, unit_type, unit_name in recruiters_data:
+            cursor.execute("""
+                INSERT OR IGNORE INTO recruiters (recruiter_id, name, rsid, zone, unit_type, unit_name, active, hire_date)
+                VALUES (?, ?, ?, ?, ?, ?, 1, date('now', '-2 years'))
+            """, (rec_id, name, rsid, zone, unit_type, unit_name))
+    
+        # Seed schools
+        schools_data = [
+            ('SCH001', 'University of Texas at Austin', 'Post-Secondary', 'Austin, TX', '78712', 'REC003', 'ZONE_ATX', True, 15, 45, 120, 18, 'Must Win'),
+            ('SCH002', 'Texas A&M University', 'Post-Secondary', 'College Station, TX', '77843', 'REC001', 'ZONE_BCS', True, 12, 38, 95, 14, 'Must Win'),
+            ('SCH003', 'Plano East Senior High', 'Secondary', 'Plano, TX', '75074', None, '', False, 0, 0, 0, 0, 'Opportunity'),
+            ('SCH004', 'Houston Community College', 'Post-Secondary', 'Houston, TX', '77002', 'REC002', 'ZONE_HOU', True, 8, 22, 65, 9, 'Must Keep'),
+            ('SCH005', 'Trinity University', 'Post-Secondary', 'San Antonio, TX', '78212', 'REC004', 'ZONE_SAT', True, 10, 28, 75, 11, 'Must Keep'),
+        ]
+    
+        for school_data in schools_data:
+            cursor.execute("""
+                INSERT OR IGNORE INTO schools 
+                (school_id, name, type, location, zip_code, assigned_recruiter, zone_id, zone_valid, alrl_milestones, sasvab_tests_ytd, leads_ytd, conversions_ytd, priority)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, school_data)
+    
+        # Seed recruiting ops plans
+        ops_plans_data = [
+            ('PLAN001', 'Battalion', '4th Brigade, 5th Recruiting Battalion', 'Active', 94.5, 92.0, 88.5, 96.0, 91.0),
+            ('PLAN002', 'Company', 'Houston Recruiting Company', 'Active', 87.3, 85.0, 90.0, 88.0, 86.5),
+            ('PLAN003', 'Station', 'Dallas Recruiting Station', 'Active', 91.8, 90.0, 93.5, 92.0, 90.5),
+        ]
+    
+        for plan_id, unit_type, unit_name, status, compliance, work_ethic, conversion, zone_comp, prospecting in ops_plans_data:
+            cursor.execute("""
+                INSERT OR IGNORE INTO recruiting_ops_plans 
+                (plan_id, unit_type, unit_name, status, compliance_score, recruiter_work_ethic, conversion_data, zone_compliance, prospecting_compliance, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            """, (plan_id, unit_type, unit_name, status, compliance, work_ethic, conversion, zone_comp, prospecting))
+    
+        # Seed future soldiers
+        fs_data = [
+            ('FS001', 'PVT Smith, John', '2024-10-15', '2025-02-20', True, True, 'High', 'Active', 'REC001'),
+            ('FS002', 'PVT Garcia, Maria', '2024-11-03', '2025-03-15', True, False, 'Medium', 'Active', 'REC002'),
+            ('FS003', 'PVT Johnson, Robert', '2024-09-20', '2025-01-10', False, False, 'Low', 'At Risk', 'REC003'),
+            ('FS004', 'PVT Davis, Emily', '2024-10-28', '2025-04-05', True, True, 'High', 'Active', 'REC004'),
+        ]
+    
+        for fs_data_row in fs_data:
+            cursor.execute("""
+                INSERT OR IGNORE INTO future_soldiers 
+                (fs_id, name, contract_date, ship_date, orientation_attended, training_attended, ship_potential, status, recruiter_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, fs_data_row)
+    
+        # Seed targeting board
+        targets_data = [
+            ('TGT001', 'Texas State Fair - Army Booth', 'Event', 'Dallas, TX', 8.5, 'High', 'Approved', '2024-12-01', 'REC001'),
+            ('TGT002', 'UT Austin Engineering Career Fair', 'Event', 'Austin, TX', 7.2, 'High', 'Planning', '2024-11-28', 'REC003'),
+            ('TGT003', 'San Antonio Rodeo Partnership', 'Marketing Initiative', 'San Antonio, TX', 6.8, 'Medium', 'Analysis', '2024-11-20', 'REC004'),
+            ('TGT004', 'Houston Community College SASVAB', 'School Program', 'Houston, TX', 5.5, 'Medium', 'Active', '2024-12-05', 'REC002'),
+        ]
+    
+        for tgt_data in targets_data:
+            cursor.execute("""
+                INSERT OR IGNORE INTO targeting_board 
+                (target_id, name, type, location, expected_roi, payoff_level, status, last_analysis, assigned_to)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, tgt_data)
     
-    for rec_id, name, rsid, zone, unit_type, unit_name in recruiters_data:
+        # Seed fusion process sessions
         cursor.execute("""
-            INSERT OR IGNORE INTO recruiters (recruiter_id, name, rsid, zone, unit_type, unit_name, active, hire_date)
-            VALUES (?, ?, ?, ?, ?, ?, 1, date('now', '-2 years'))
-        """, (rec_id, name, rsid, zone, unit_type, unit_name))
-    
-    # Seed schools
-    schools_data = [
-        ('SCH001', 'University of Texas at Austin', 'Post-Secondary', 'Austin, TX', '78712', 'REC003', 'ZONE_ATX', True, 15, 45, 120, 18, 'Must Win'),
-        ('SCH002', 'Texas A&M University', 'Post-Secondary', 'College Station, TX', '77843', 'REC001', 'ZONE_BCS', True, 12, 38, 95, 14, 'Must Win'),
-        ('SCH003', 'Plano East Senior High', 'Secondary', 'Plano, TX', '75074', None, '', False, 0, 0, 0, 0, 'Opportunity'),
-        ('SCH004', 'Houston Community College', 'Post-Secondary', 'Houston, TX', '77002', 'REC002', 'ZONE_HOU', True, 8, 22, 65, 9, 'Must Keep'),
-        ('SCH005', 'Trinity University', 'Post-Secondary', 'San Antonio, TX', '78212', 'REC004', 'ZONE_SAT', True, 10, 28, 75, 11, 'Must Keep'),
-    ]
-    
-    for school_data in schools_data:
+            INSERT OR IGNORE INTO fusion_process (fusion_id, session_date, participants, insights, actions, status)
+            VALUES 
+            ('FUS001', '2024-12-01', 'Battalion S3, Company Commanders, 420T', 'Identified 3 high-payoff schools in underserved zip codes', 'Assign recruiters to new schools, schedule SASVAB testing', 'Completed'),
+            ('FUS002', '2024-12-08', 'Brigade CDR, Marketing Team, 420T', 'Marketing ROI analysis shows digital campaigns outperforming traditional by 40%', 'Shift 30% of budget to digital, target 18-24 demographic', 'Completed'),
+            ('FUS003', '2024-12-15', 'Battalion leadership, Station CDRs', 'Flash-to-bang metric trending up due to applicant processing delays', 'Implement weekly MEPS coordination, assign processors', 'Planned')
+        """)
+    
+        # Seed recruiter metrics
+        import random
+        for recruiter_id in ['REC001', 'REC002', 'REC003', 'REC004', 'REC005']:
+            for days_ago in [7, 14, 21, 28]:
+                cursor.execute("""
+                    INSERT OR IGNORE INTO recruiter_metrics 
+                    (metric_id, recruiter_id, metric_date, work_ethic_score, conversion_rate, zone_compliance, contribution_rate, contracts_count, leads_count, appointments_count)
+                    VALUES (?, ?, date('now', ? || ' days'), ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    f"MET_{recruiter_id}_{days_ago}",
+                    recruiter_id,
+                    f'-{days_ago}',
+                    random.uniform(85, 98),
+                    random.uniform(12, 25),
+                    random.choice([True, True, True, False]),
+                    random.uniform(80, 95),
+                    random.randint(2, 6),
+                    random.randint(15, 35),
+                    random.randint(8, 18)
+                ))
+    
+        # Seed quality marks
         cursor.execute("""
-            INSERT OR IGNORE INTO schools 
-            (school_id, name, type, location, zip_code, assigned_recruiter, zone_id, zone_valid, alrl_milestones, sasvab_tests_ytd, leads_ytd, conversions_ytd, priority)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, school_data)
-    
-    # Seed recruiting ops plans
-    ops_plans_data = [
-        ('PLAN001', 'Battalion', '4th Brigade, 5th Recruiting Battalion', 'Active', 94.5, 92.0, 88.5, 96.0, 91.0),
-        ('PLAN002', 'Company', 'Houston Recruiting Company', 'Active', 87.3, 85.0, 90.0, 88.0, 86.5),
-        ('PLAN003', 'Station', 'Dallas Recruiting Station', 'Active', 91.8, 90.0, 93.5, 92.0, 90.5),
-    ]
-    
-    for plan_id, unit_type, unit_name, status, compliance, work_ethic, conversion, zone_comp, prospecting in ops_plans_data:
+            INSERT OR IGNORE INTO quality_marks (mark_id, unit_type, unit_name, month, score, category, notes)
+            VALUES 
+            ('QM001', 'Battalion', '5th Recruiting Battalion', '2024-11', 94, 'Contract Quality', 'Exceeded category standards'),
+            ('QM002', 'Company', 'Houston Recruiting Company', '2024-11', 88, 'Contract Quality', 'Met standards'),
+            ('QM003', 'Battalion', '5th Recruiting Battalion', '2024-10', 92, 'Contract Quality', 'Strong performance')
+        """)
+    
+        # Seed SRP referrals
         cursor.execute("""
-            INSERT OR IGNORE INTO recruiting_ops_plans 
-            (plan_id, unit_type, unit_name, status, compliance_score, recruiter_work_ethic, conversion_data, zone_compliance, prospecting_compliance, last_updated)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
-        """, (plan_id, unit_type, unit_name, status, compliance, work_ethic, conversion, zone_comp, prospecting))
-    
-    # Seed future soldiers
-    fs_data = [
-        ('FS001', 'PVT Smith, John', '2024-10-15', '2025-02-20', True, True, 'High', 'Active', 'REC001'),
-        ('FS002', 'PVT Garcia, Maria', '2024-11-03', '2025-03-15', True, False, 'Medium', 'Active', 'REC002'),
-        ('FS003', 'PVT Johnson, Robert', '2024-09-20', '2025-01-10', False, False, 'Low', 'At Risk', 'REC003'),
-        ('FS004', 'PVT Davis, Emily', '2024-10-28', '2025-04-05', True, True, 'High', 'Active', 'REC004'),
-    ]
-    
-    for fs_data_row in fs_data:
+            INSERT OR IGNORE INTO srp_referrals (referral_id, referring_soldier, referral_name, referral_date, status, contacted, converted)
+            VALUES 
+            ('SRP001', 'SGT Miller (1-5 CAV)', 'James Patterson', '2024-12-01', 'Contacted', 1, 0),
+            ('SRP002', 'SPC Rodriguez (3-82 FA)', 'Sarah Chen', '2024-11-28', 'New', 0, 0),
+            ('SRP003', 'SSG Thompson (4-10 IN)', 'Michael Brown', '2024-11-25', 'Converted', 1, 1)
+        """)
+    
+        # Seed waivers
         cursor.execute("""
-            INSERT OR IGNORE INTO future_soldiers 
-            (fs_id, name, contract_date, ship_date, orientation_attended, training_attended, ship_potential, status, recruiter_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, fs_data_row)
-    
-    # Seed targeting board
-    targets_data = [
-        ('TGT001', 'Texas State Fair - Army Booth', 'Event', 'Dallas, TX', 8.5, 'High', 'Approved', '2024-12-01', 'REC001'),
-        ('TGT002', 'UT Austin Engineering Career Fair', 'Event', 'Austin, TX', 7.2, 'High', 'Planning', '2024-11-28', 'REC003'),
-        ('TGT003', 'San Antonio Rodeo Partnership', 'Marketing Initiative', 'San Antonio, TX', 6.8, 'Medium', 'Analysis', '2024-11-20', 'REC004'),
-        ('TGT004', 'Houston Community College SASVAB', 'School Program', 'Houston, TX', 5.5, 'Medium', 'Active', '2024-12-05', 'REC002'),
-    ]
-    
-    for tgt_data in targets_data:
-        cursor.execute("""
-            INSERT OR IGNORE INTO targeting_board 
-            (target_id, name, type, location, expected_roi, payoff_level, status, last_analysis, assigned_to)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, tgt_data)
-    
-    # Seed fusion process sessions
-    cursor.execute("""
-        INSERT OR IGNORE INTO fusion_process (fusion_id, session_date, participants, insights, actions, status)
-        VALUES 
-        ('FUS001', '2024-12-01', 'Battalion S3, Company Commanders, 420T', 'Identified 3 high-payoff schools in underserved zip codes', 'Assign recruiters to new schools, schedule SASVAB testing', 'Completed'),
-        ('FUS002', '2024-12-08', 'Brigade CDR, Marketing Team, 420T', 'Marketing ROI analysis shows digital campaigns outperforming traditional by 40%', 'Shift 30% of budget to digital, target 18-24 demographic', 'Completed'),
-        ('FUS003', '2024-12-15', 'Battalion leadership, Station CDRs', 'Flash-to-bang metric trending up due to applicant processing delays', 'Implement weekly MEPS coordination, assign processors', 'Planned')
-    """)
-    
-    # Seed recruiter metrics
-    import random
-    for recruiter_id in ['REC001', 'REC002', 'REC003', 'REC004', 'REC005']:
-        for days_ago in [7, 14, 21, 28]:
-            cursor.execute("""
-                INSERT OR IGNORE INTO recruiter_metrics 
-                (metric_id, recruiter_id, metric_date, work_ethic_score, conversion_rate, zone_compliance, contribution_rate, contracts_count, leads_count, appointments_count)
-                VALUES (?, ?, date('now', ? || ' days'), ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                f"MET_{recruiter_id}_{days_ago}",
-                recruiter_id,
-                f'-{days_ago}',
-                random.uniform(85, 98),
-                random.uniform(12, 25),
-                random.choice([True, True, True, False]),
-                random.uniform(80, 95),
-                random.randint(2, 6),
-                random.randint(15, 35),
-                random.randint(8, 18)
-            ))
-    
-    # Seed quality marks
-    cursor.execute("""
-        INSERT OR IGNORE INTO quality_marks (mark_id, unit_type, unit_name, month, score, category, notes)
-        VALUES 
-        ('QM001', 'Battalion', '5th Recruiting Battalion', '2024-11', 94, 'Contract Quality', 'Exceeded category standards'),
-        ('QM002', 'Company', 'Houston Recruiting Company', '2024-11', 88, 'Contract Quality', 'Met standards'),
-        ('QM003', 'Battalion', '5th Recruiting Battalion', '2024-10', 92, 'Contract Quality', 'Strong performance')
-    """)
-    
-    # Seed SRP referrals
-    cursor.execute("""
-        INSERT OR IGNORE INTO srp_referrals (referral_id, referring_soldier, referral_name, referral_date, status, contacted, converted)
-        VALUES 
-        ('SRP001', 'SGT Miller (1-5 CAV)', 'James Patterson', '2024-12-01', 'Contacted', 1, 0),
-        ('SRP002', 'SPC Rodriguez (3-82 FA)', 'Sarah Chen', '2024-11-28', 'New', 0, 0),
-        ('SRP003', 'SSG Thompson (4-10 IN)', 'Michael Brown', '2024-11-25', 'Converted', 1, 1)
-    """)
-    
-    # Seed waivers
-    cursor.execute("""
-        INSERT OR IGNORE INTO waivers (waiver_id, applicant_name, waiver_type, status, submission_date, decision_date, approved, recruiter_id)
-        VALUES 
-        ('WAV001', 'Johnson, Alex', 'Medical', 'Approved', '2024-11-15', '2024-11-28', 1, 'REC001'),
-        ('WAV002', 'Smith, Taylor', 'Moral', 'Pending', '2024-12-01', NULL, NULL, 'REC002'),
-        ('WAV003', 'Davis, Jordan', 'Medical', 'Denied', '2024-11-10', '2024-11-20', 0, 'REC003')
-    """)
-    
-    conn.commit()
-    conn.close()
-    
-    return {
-        "status": "ok",
-        "message": "420T data seeded successfully",
-        "counts": {
-            "recruiters": len(recruiters_data),
-            "schools": len(schools_data),
-            "ops_plans": len(ops_plans_data),
-            "future_soldiers": len(fs_data),
-            "targeting_items": len(targets_data),
-            "fusion_sessions": 3
+            INSERT OR IGNORE INTO waivers (waiver_id, applicant_name, waiver_type, status, submission_date, decision_date, approved, recruiter_id)
+            VALUES 
+            ('WAV001', 'Johnson, Alex', 'Medical', 'Approved', '2024-11-15', '2024-11-28', 1, 'REC001'),
+            ('WAV002', 'Smith, Taylor', 'Moral', 'Pending', '2024-12-01', NULL, NULL, 'REC002'),
+            ('WAV003', 'Davis, Jordan', 'Medical', 'Denied', '2024-11-10', '2024-11-20', 0, 'REC003')
+        """)
+    
+        return {
+            "status": "ok",
+            "message": "420T data seeded successfully",
+            "counts": {
+                "recruiters": len(recruiters_data),
+                "schools": len(schools_data),
+                "ops_plans": len(ops_plans_data),
+                "future_soldiers": len(fs_data),
+                "targeting_items": len(targets_data),
+                "fusion_sessions": 3
+            }
         }
-    }
+
+    return get_pool(DB_PATH).write(_seed)
@@ -10,8 +10,29 @@ from datetime import datetime
 import sqlite3
 import random
 
+from ..db_pool import get_connection, get_pool
+from ..db_executor import offload
+
 router = APIRouter()
 
+DB_PATH = "recruiting.db"
+
+TASK_REQUESTS_DDL = """
+    CREATE TABLE IF NOT EXISTS task_requests (
+        request_id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        description TEXT,
+        priority TEXT,
+        assignee TEXT,
+        due_date TEXT,
+        actions TEXT,
+        status TEXT DEFAULT 'open',
+        submitted_by TEXT,
+        submitted_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
 
 class TaskRequest(BaseModel):
     title: str
@@ -25,29 +46,13 @@ class TaskRequest(BaseModel):
 
 
 @router.get("/task_requests")
-async def get_task_requests(status: Optional[str] = None, submitted_by: Optional[str] = None):
+@offload
+def get_task_requests(status: Optional[str] = None, submitted_by: Optional[str] = None):
     try:
-        conn = sqlite3.connect("recruiting.db")
-        conn.row_factory = sqlite3.Row
+        get_pool(DB_PATH).write(lambda conn: conn.execute(TASK_REQUESTS_DDL))
+        conn = get_connection(DB_PATH)
         cursor = conn.cursor()
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS task_requests (
-                request_id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                description TEXT,
-                priority TEXT,
-                assignee TEXT,
-                due_date TEXT,
-                actions TEXT,
-                status TEXT DEFAULT 'open',
-                submitted_by TEXT,
-                submitted_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-
         query = "SELECT * FROM task_requests WHERE 1=1"
         params = []
         if status:
@@ -68,40 +73,23 @@ async def get_task_requests(status: Optional[str] = None, submitted_by: Optional
 
 
 @router.post("/task_requests")
-async def create_task_request(req: TaskRequest):
+@offload
+def create_task_request(req: TaskRequest):
     try:
-        conn = sqlite3.connect("recruiting.db")
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS task_requests (
-                request_id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                description TEXT,
-                priority TEXT,
-                assignee TEXT,
-                due_date TEXT,
-                actions TEXT,
-                status TEXT DEFAULT 'open',
-                submitted_by TEXT,
-                submitted_at TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
         request_id = f"treq_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{random.randint(1000,9999)}"
         submitted_at = req.submitted_at or datetime.now().isoformat()
 
-        cursor.execute("""
-            INSERT INTO task_requests (
-                request_id, title, description, priority, assignee, due_date, actions, status, submitted_by, submitted_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            request_id, req.title, req.description, req.priority, req.assignee, req.due_date, req.actions, 'open', req.submitted_by, submitted_at
-        ))
-
-        conn.commit()
-        conn.close()
+        def _insert(conn):
+            conn.execute(TASK_REQUESTS_DDL)
+            conn.execute("""
+                INSERT INTO task_requests (
+                    request_id, title, description, priority, assignee, due_date, actions, status, submitted_by, submitted_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                request_id, req.title, req.description, req.priority, req.assignee, req.due_date, req.actions, 'open', req.submitted_by, submitted_at
+            ))
+
+        get_pool(DB_PATH).write(_insert)
 
         return {"status": "ok", "message": "Task request created", "request_id": request_id, "timestamp": datetime.now().isoformat()}
     except Exception as e:
@@ -0,0 +1,155 @@
+"""
+Schema registry: cached table/column introspection for SQLite databases.
+
+The recruiting schema differs between deployments (older `lead_id`/`stage`
+columns vs. the migrated `prid`/`current_stage` ones), so handlers used to run
+`PRAGMA table_info(...)` on every request to decide which SQL to build. The
+registry introspects every table once, resolves the known column aliases, and
+memoizes the SQL strings built from them. Because the strings are stable, the
+per-connection statement cache of the pooled connections prepares them once.
+
+The cache is dropped by `invalidate_schema()` whenever this process changes
+DDL (init_db, migrations, dataset ingest). Migrations run from a separate
+process are picked up by a cheap `PRAGMA schema_version` check performed at
+most every `SCHEMA_CHECK_INTERVAL` seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+from .db_pool import get_connection
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CHECK_INTERVAL", "30"))
+
+# Logical column name -> candidates in order of preference.
+COLUMN_ALIASES = {
+    "stage": ("current_stage", "stage", "status"),
+    "lead_key": ("prid", "lead_id"),
+    "score": ("propensity_score", "score"),
+    "source": ("source", "campaign_source", "lead_source", "channel"),
+}
+
+
+class SchemaRegistry:
+    """Column metadata for one database file, loaded lazily and cached."""
+
+    def __init__(self, db_path: str, check_interval: float = SCHEMA_CHECK_INTERVAL):
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._tables: Optional[Dict[str, FrozenSet[str]]] = None
+        self._schema_version: Optional[int] = None
+        self._checked_at = 0.0
+        self._sql: Dict[Any, Any] = {}
+
+    def _load(self):
+        conn = get_connection(self.db_path, row_factory=None)
+        try:
+            version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")]
+            tables = {}
+            for name in names:
+                cols = conn.execute(f'PRAGMA table_info("{name}")').fetchall()
+                tables[name] = frozenset(c[1] for c in cols)
+        finally:
+            conn.close()
+        self._tables = tables
+        self._schema_version = version
+        self._sql = {}
+        self._checked_at = time.monotonic()
+        logger.debug(f"Schema registry loaded {len(tables)} tables from {self.db_path} (schema_version={version})")
+
+    def _current_version(self) -> Optional[int]:
+        conn = get_connection(self.db_path, row_factory=None)
+        try:
+            return conn.execute("PRAGMA schema_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _ensure(self) -> Dict[str, FrozenSet[str]]:
+        with self._lock:
+            if self._tables is None:
+                self._load()
+            elif self.check_interval >= 0 and time.monotonic() - self._checked_at > self.check_interval:
+                self._checked_at = time.monotonic()
+                if self._current_version() != self._schema_version:
+                    self._load()
+            return self._tables
+
+    # --- lookups ---
+
+    def tables(self) -> Dict[str, FrozenSet[str]]:
+        return dict(self._ensure())
+
+    def has_table(self, table: str) -> bool:
+        return table in self._ensure()
+
+    def columns(self, table: str) -> FrozenSet[str]:
+        return self._ensure().get(table, frozenset())
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self.columns(table)
+
+    def first_column(self, table: str, *candidates: str) -> Optional[str]:
+        """Return the first of `candidates` that exists on `table`, or None."""
+        cols = self.columns(table)
+        for c in candidates:
+            if c in cols:
+                return c
+        return None
+
+    def resolve(self, table: str, logical: str) -> Optional[str]:
+        """Resolve a logical column name (see COLUMN_ALIASES) to a physical column on `table`."""
+        return self.first_column(table, *COLUMN_ALIASES.get(logical, (logical,)))
+
+    def sql(self, key: Any, builder: Callable[["SchemaRegistry"], Any]) -> Any:
+        """Return `builder(self)` memoized under `key` until the schema changes."""
+        self._ensure()
+        cache = self._sql
+        if key not in cache:
+            cache[key] = builder(self)
+        return cache[key]
+
+    def invalidate(self):
+        with self._lock:
+            self._tables = None
+            self._sql = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        tables = self._ensure()
+        return {
+            "db_path": self.db_path,
+            "schema_version": self._schema_version,
+            "tables": {name: sorted(cols) for name, cols in sorted(tables.items())},
+        }
+
+
+_registries: Dict[str, SchemaRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_schema(db_path: str) -> SchemaRegistry:
+    """Return the process-wide schema registry for `db_path`."""
+    key = os.path.abspath(db_path)
+    reg = _registries.get(key)
+    if reg is None:
+        with _registries_lock:
+            reg = _registries.get(key)
+            if reg is None:
+                reg = SchemaRegistry(key)
+                _registries[key] = reg
+    return reg
+
+
+def invalidate_schema(db_path: Optional[str] = None):
+    """Drop cached schema for one database file, or for all of them."""
+    target = os.path.abspath(db_path) if db_path else None
+    with _registries_lock:
+        regs = [r for path, r in _registries.items() if target is None or path == target]
+    for reg in regs:
+        reg.invalidate()
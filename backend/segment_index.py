@@ -0,0 +1,101 @@
+"""
+Indexed segment dimension for segment-filtered queries.
+
+`segment_profiles.segments` holds each profile's segments as a JSON object.
+/api/v2/kpis used to filter it with `segments LIKE '%"key": "value"%'`. That
+scanned every profile on every call, and it missed values stored with other
+JSON spacing or as numbers. `segment_attributes` keeps one row per
+(profile, segment key) with the value as text, and
+idx_segment_attributes_kv covers the (key, value) -> lead_id lookup:
+
+    sql, params = segment_filter("age_group", "18-24", "ma.event_id")
+    # ma.event_id IN (SELECT lead_id FROM segment_attributes WHERE key = ? AND value = ?)
+
+Triggers on segment_profiles keep the table in step, like the change_tracking
+triggers. update_segment_profile, the census/social ingests, REPLACE INTO
+(whose implicit delete does not fire DELETE triggers), archival deletes and
+other processes therefore all update it in the same transaction. Values are
+stored as text. Strings are stored unchanged, numbers as their text form,
+true/false/null as those words, and arrays/objects as compact JSON.
+"""
+
+import logging
+import sqlite3
+from typing import Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# json_each() value as the text stored in segment_attributes.value
+_VALUE_EXPR = "CASE je.type WHEN 'text' THEN je.value WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' WHEN 'null' THEN 'null' ELSE CAST(je.value AS TEXT) END"
+
+
+def _index_rows(profile: str, source: str = "") -> str:
+    """INSERT of the segment rows of `profile` (NEW in a trigger, or the alias of `source`)."""
+    return (
+        f"INSERT INTO segment_attributes (profile_id, lead_id, key, value) "
+        f"SELECT {profile}.profile_id, {profile}.lead_id, je.key, {_VALUE_EXPR} "
+        f"FROM {source}json_each(CASE WHEN json_valid({profile}.segments) AND json_type({profile}.segments) = 'object' "
+        f"THEN {profile}.segments ELSE '{{}}' END) AS je"
+    )
+
+
+SEGMENT_INDEX_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS segment_attributes (
+        profile_id TEXT NOT NULL,
+        lead_id TEXT,
+        key TEXT NOT NULL,
+        value TEXT,
+        PRIMARY KEY (profile_id, key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_segment_attributes_kv ON segment_attributes (key, value, lead_id)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_segment_profiles_attr_insert AFTER INSERT ON segment_profiles
+    BEGIN
+        DELETE FROM segment_attributes WHERE profile_id = NEW.profile_id;
+        {_index_rows("NEW")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_segment_profiles_attr_update AFTER UPDATE OF profile_id, lead_id, segments ON segment_profiles
+    BEGIN
+        DELETE FROM segment_attributes WHERE profile_id = OLD.profile_id OR profile_id = NEW.profile_id;
+        {_index_rows("NEW")};
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_segment_profiles_attr_delete AFTER DELETE ON segment_profiles
+    BEGIN
+        DELETE FROM segment_attributes WHERE profile_id = OLD.profile_id;
+    END
+    """,
+]
+
+
+def ensure_segment_index(conn: sqlite3.Connection):
+    """Create the table and triggers, and backfill once from existing profiles. Does not commit."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'segment_profiles'").fetchone() is None:
+        return
+    fresh = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'segment_attributes'").fetchone() is None
+    for stmt in SEGMENT_INDEX_SCHEMA:
+        conn.execute(stmt)
+    if fresh:
+        count = rebuild(conn)
+        if count:
+            logger.info(f"Backfilled {count} segment attribute(s)")
+
+
+def rebuild(conn: sqlite3.Connection) -> int:
+    """Recompute segment_attributes from segment_profiles; returns the number of rows. Does not commit."""
+    conn.execute("DELETE FROM segment_attributes")
+    conn.execute(_index_rows("sp", source="segment_profiles sp, "))
+    return conn.execute("SELECT COUNT(*) FROM segment_attributes").fetchone()[0]
+
+
+def segment_filter(key: str, value: Any, column: str) -> Tuple[str, List[Any]]:
+    """Predicate restricting `column` to lead ids whose segment `key` equals `value`."""
+    return (
+        f"{column} IN (SELECT lead_id FROM segment_attributes WHERE key = ? AND value = ?)",
+        [key, str(value)],
+    )
@@ -0,0 +1,241 @@
+"""
+Batched segment-profile updates with diff history.
+
+update_segment_profile used to SELECT a profile, merge the JSON in Python,
+REPLACE all three columns and append a full snapshot to `segment_history`.
+It did this one lead per HTTP call, so a nightly reclassification of the lead
+base meant hundreds of thousands of requests, and the history grew by a full
+copy of every profile per run, changed or not. apply_segment_updates() takes
+a list of updates and merges each one inside SQLite in a single write
+transaction:
+
+    segments = json_patch(segments, :patch)      -- RFC 7396 merge patch
+
+Keys in the patch overwrite, nested objects merge, and a null value removes a
+key. An update that changes nothing is skipped. It writes no profile row, no
+history and no generation bump. Otherwise the history row stores the patch
+itself in `diff` as {"segments": ..., "attributes": ...}, not a snapshot.
+Rows with `diff` NULL hold full snapshots: older rows, compaction rows, and the
+first change to a profile that has no history yet. A profile's state at any
+row is the last snapshot with the later diffs applied (see replay()).
+
+compact_history() bounds the history. For each profile it keeps the newest
+SEGMENT_HISTORY_KEEP rows, plus any rows younger than
+SEGMENT_HISTORY_RETENTION_DAYS. Rows that are both outside the newest KEEP and
+older than the retention window are folded into one snapshot row. Batches compact the profiles they touched. A full pass runs via
+POST /api/v2/segments/history/compact or:
+
+    python -m backend.segment_store [path/to/recruiting.db]
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_BATCH_MAX = int(os.getenv("SEGMENT_BATCH_MAX", "10000"))
+SEGMENT_HISTORY_KEEP = int(os.getenv("SEGMENT_HISTORY_KEEP", "20"))
+SEGMENT_HISTORY_RETENTION_DAYS = int(os.getenv("SEGMENT_HISTORY_RETENTION_DAYS", "365"))
+
+_IN_BATCH = 500
+
+
+def _valid(col: str) -> str:
+    return f"CASE WHEN json_valid({col}) THEN {col} ELSE '{{}}' END"
+
+
+def _changed(alias: str) -> str:
+    seg, attr = _valid(f"{alias}.segments"), _valid(f"{alias}.attributes")
+    return f"(json_patch({seg}, :segments) IS NOT json({seg}) OR json_patch({attr}, :attributes) IS NOT json({attr}))"
+
+
+# A profile that exists but has no history yet gets a full snapshot, so replay() has a base.
+_BASELINE = "(sp.profile_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM segment_history h WHERE h.profile_id = :profile_id))"
+
+_HISTORY_SQL = f"""
+    INSERT INTO segment_history (profile_id, lead_id, segments, attributes, changed_at, source, notes, diff)
+    SELECT :profile_id, :lead_id,
+        CASE WHEN {_BASELINE} THEN json_patch({_valid("sp.segments")}, :segments) END,
+        CASE WHEN {_BASELINE} THEN json_patch({_valid("sp.attributes")}, :attributes) END,
+        :now, :source, :notes,
+        CASE WHEN {_BASELINE} THEN NULL ELSE json_object('segments', json(:segments), 'attributes', json(:attributes)) END
+    FROM (SELECT 1) LEFT JOIN segment_profiles sp ON sp.profile_id = :profile_id
+    WHERE sp.profile_id IS NULL OR {_changed("sp")}
+"""
+
+_UPSERT_SQL = f"""
+    INSERT INTO segment_profiles (profile_id, lead_id, segments, attributes, last_updated, created_at)
+    VALUES (:profile_id, :lead_id, json_patch('{{}}', :segments), json_patch('{{}}', :attributes), :now, :now)
+    ON CONFLICT(profile_id) DO UPDATE SET
+        lead_id = COALESCE(excluded.lead_id, segment_profiles.lead_id),
+        segments = json_patch({_valid('segments')}, :segments),
+        attributes = json_patch({_valid('attributes')}, :attributes),
+        last_updated = excluded.last_updated
+    WHERE {_changed("segment_profiles")}
+"""
+
+
+def ensure_segment_history(conn: sqlite3.Connection):
+    """Add the `diff` column and the per-profile history index. Does not commit."""
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(segment_history)").fetchall()}
+    if not cols:
+        return
+    if "diff" not in cols:
+        conn.execute("ALTER TABLE segment_history ADD COLUMN diff TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_segment_history_profile ON segment_history (profile_id, history_id)")
+
+
+def profile_id_for(lead_id: str) -> str:
+    return f"profile_{lead_id}"
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """Python equivalent of SQLite json_patch (RFC 7396)."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for k, v in patch.items():
+        if v is None:
+            result.pop(k, None)
+        else:
+            result[k] = merge_patch(result.get(k), v)
+    return result
+
+
+def _rounds(updates: Sequence[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split updates so no profile appears twice in one executemany, keeping their order per profile."""
+    rounds: List[List[Dict[str, Any]]] = []
+    seen: Dict[str, int] = {}
+    for u in updates:
+        n = seen.get(u["profile_id"], 0)
+        seen[u["profile_id"]] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(u)
+    return rounds
+
+
+def apply_segment_updates(
+    conn: sqlite3.Connection,
+    updates: Iterable[Dict[str, Any]],
+    source: str = "batch",
+    compact: bool = True,
+) -> Dict[str, Any]:
+    """Merge updates ({lead_id or profile_id, segments, attributes, source, notes}) into segment_profiles.
+
+    Runs inside the caller's transaction (use it through the db_pool writer).
+    Returns counts of received, changed and unchanged updates, plus history rows compacted.
+    """
+    now = datetime.utcnow().isoformat()
+    rows = []
+    for u in updates:
+        profile_id = u.get("profile_id") or profile_id_for(u["lead_id"])
+        rows.append({
+            "profile_id": profile_id,
+            "lead_id": u.get("lead_id"),
+            "segments": json.dumps(u.get("segments") or {}),
+            "attributes": json.dumps(u.get("attributes") or {}),
+            "source": u.get("source") or source,
+            "notes": u.get("notes"),
+            "now": now,
+        })
+    changed = 0
+    for batch in _rounds(rows):
+        # history first: its NOT EXISTS test sees the profile as it was before this update
+        changed += conn.executemany(_HISTORY_SQL, batch).rowcount
+        conn.executemany(_UPSERT_SQL, batch)
+    compacted = 0
+    if compact and changed:
+        compacted = compact_history(conn, profile_ids={r["profile_id"] for r in rows})
+    return {"received": len(rows), "changed": changed, "unchanged": len(rows) - changed, "history_compacted": compacted}
+
+
+def replay(rows: Iterable[Sequence[Any]]) -> Dict[str, Any]:
+    """State after history rows of one profile (segments, attributes, diff), oldest first."""
+    state: Dict[str, Any] = {"segments": {}, "attributes": {}}
+    for segments, attributes, diff in rows:
+        if diff is None:
+            state = {"segments": _loads(segments), "attributes": _loads(attributes)}
+        else:
+            d = _loads(diff)
+            state = {k: merge_patch(state[k], d.get(k) or {}) for k in ("segments", "attributes")}
+    return state
+
+
+def _loads(value: Optional[str]) -> Dict[str, Any]:
+    try:
+        parsed = json.loads(value) if value else {}
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def compact_history(
+    conn: sqlite3.Connection,
+    profile_ids: Optional[Iterable[str]] = None,
+    keep: int = SEGMENT_HISTORY_KEEP,
+    retention_days: int = SEGMENT_HISTORY_RETENTION_DAYS,
+) -> int:
+    """Fold rows outside the newest `keep` and older than `retention_days` into one snapshot per profile.
+
+    Runs inside the caller's transaction. Returns the number of history rows removed.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    having = "HAVING COUNT(*) > ? AND MIN(changed_at) < ?"
+    candidates: List[str] = []
+    if profile_ids is None:
+        candidates = [r[0] for r in conn.execute(
+            f"SELECT profile_id FROM segment_history GROUP BY profile_id {having}", (keep, cutoff)
+        ).fetchall()]
+    else:
+        ids = list(profile_ids)
+        for i in range(0, len(ids), _IN_BATCH):
+            chunk = ids[i:i + _IN_BATCH]
+            candidates += [r[0] for r in conn.execute(
+                f"SELECT profile_id FROM segment_history WHERE profile_id IN ({', '.join('?' * len(chunk))}) "
+                f"GROUP BY profile_id {having}", chunk + [keep, cutoff]
+            ).fetchall()]
+
+    removed = 0
+    for profile_id in candidates:
+        rows = conn.execute(
+            "SELECT history_id, lead_id, segments, attributes, diff, changed_at FROM segment_history "
+            "WHERE profile_id = ? ORDER BY history_id", (profile_id,)
+        ).fetchall()
+        fold = 0
+        for i, r in enumerate(rows):
+            if i < len(rows) - keep and (r[5] or "") < cutoff:
+                fold = i + 1
+        if fold == 0 or (fold == 1 and rows[0][4] is None):
+            continue
+        state = replay([(r[2], r[3], r[4]) for r in rows[:fold]])
+        last = rows[fold - 1]
+        conn.execute(
+            "DELETE FROM segment_history WHERE profile_id = ? AND history_id <= ?", (profile_id, last[0])
+        )
+        conn.execute(
+            "INSERT INTO segment_history (history_id, profile_id, lead_id, segments, attributes, changed_at, source, notes, diff) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'compaction', ?, NULL)",
+            (last[0], profile_id, last[1], json.dumps(state["segments"]), json.dumps(state["attributes"]),
+             last[5], f"compacted {fold} change(s)"),
+        )
+        removed += fold - 1
+    return removed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "recruiting.db")
+    c = sqlite3.connect(path)
+    try:
+        ensure_segment_history(c)
+        n = compact_history(c)
+        c.commit()
+    finally:
+        c.close()
+    logger.info(f"Compacted {n} segment history row(s) in {path}")
@@ -0,0 +1,99 @@
+"""
+SQLite storage configuration for recruiting.db and the router databases.
+
+Every pooled connection gets the per-connection pragmas below; the
+persistent settings (WAL journal mode) are applied once per database file.
+WAL lets dashboard readers keep reading while the single writer commits, so
+reads no longer stall behind "database is locked" retries.
+
+Tunables come from the environment, e.g.
+    SQLITE_JOURNAL_MODE=WAL SQLITE_CACHE_SIZE_KB=65536 SQLITE_MMAP_SIZE=268435456
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))      # 64 MB page cache per connection
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # 256 MB memory-mapped reads
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+WAL_AUTOCHECKPOINT = int(os.getenv("SQLITE_WAL_AUTOCHECKPOINT", "1000"))
+
+# Group commit: the writer thread folds up to WRITE_BATCH_SIZE queued writes into one
+# transaction. With a zero window it only batches writes that queued up while the
+# previous commit was running; a small positive window trades latency for bigger batches.
+WRITE_BATCH_SIZE = int(os.getenv("SQLITE_WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_WINDOW_MS = float(os.getenv("SQLITE_WRITE_BATCH_WINDOW_MS", "0"))
+
+CONNECTION_PRAGMAS = [
+    f"PRAGMA synchronous = {SYNCHRONOUS}",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT}",
+]
+
+_configured = set()
+_configured_lock = threading.Lock()
+
+
+def configure_database(conn: sqlite3.Connection, db_path: str):
+    """Apply persistent, file-level settings once per database file."""
+    key = os.path.abspath(db_path)
+    if key in _configured:
+        return
+    with _configured_lock:
+        if key in _configured:
+            return
+        try:
+            mode = conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}").fetchone()[0]
+            if str(mode).upper() != JOURNAL_MODE:
+                logger.warning(f"SQLite journal_mode for {key} is {mode}, requested {JOURNAL_MODE}")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not set journal_mode on {key}: {e}")
+        _configured.add(key)
+
+
+def apply_connection_pragmas(conn: sqlite3.Connection):
+    """Apply per-connection tuning; failures are logged and ignored."""
+    for stmt in CONNECTION_PRAGMAS:
+        try:
+            conn.execute(stmt)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to apply '{stmt}': {e}")
+
+
+def forget_database(db_path: str):
+    """Force configure_database() to run again (the file was replaced)."""
+    with _configured_lock:
+        _configured.discard(os.path.abspath(db_path))
+
+
+def checkpoint(conn: sqlite3.Connection, mode: str = "TRUNCATE"):
+    """Fold the WAL back into the main database file.
+
+    File-level copies (backups, restores) only see committed data that has been
+    checkpointed, so call this before copying the .db file.
+    """
+    try:
+        return conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"wal_checkpoint({mode}) failed: {e}")
+        return None
+
+
+def remove_wal_files(db_path: str):
+    """Delete leftover -wal/-shm files so a restored database is not replayed over."""
+    for suffix in ("-wal", "-shm"):
+        path = db_path + suffix
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove {path}: {e}")
@@ -0,0 +1,185 @@
+"""
+Streaming upload pipeline: spool to disk, parse in chunks, report progress.
+
+Upload handlers used to `await file.read()` the whole body and parse it with
+`pd.read_csv(io.BytesIO(content))`. The raw bytes and the full DataFrame were
+both held in RAM, so multi-hundred-MB EMM / iKrome exports could OOM the
+container. Now a handler copies the request body to a spool file in
+UPLOAD_SPOOL_CHUNK_BYTES pieces and hands the path to a worker:
+
+    path = await spool_upload(file)
+    return await run_db(_upload_leads_sync, file.filename, path, ...)
+
+The worker reads the file with iter_frames(), which yields DataFrames of at most
+UPLOAD_CSV_CHUNK_ROWS rows. Peak memory is one chunk, whatever the file size.
+Excel workbooks cannot be read incrementally by pandas, so they are still loaded
+whole.
+
+Progress is recorded per upload id in an in-process registry. A client that
+passes `?upload_id=...` can poll GET /api/v2/upload/progress/{upload_id} while the
+import runs.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(REPO_ROOT, "data", "uploads", ".spool"))
+UPLOAD_SPOOL_CHUNK_BYTES = int(os.getenv("UPLOAD_SPOOL_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_CSV_CHUNK_ROWS = int(os.getenv("UPLOAD_CSV_CHUNK_ROWS", "50000"))
+UPLOAD_PROGRESS_MAX_ENTRIES = int(os.getenv("UPLOAD_PROGRESS_MAX_ENTRIES", "256"))
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+def _copy_stream(src, dest_path: str, chunk_bytes: int) -> int:
+    total = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            block = src.read(chunk_bytes)
+            if not block:
+                break
+            out.write(block)
+            total += len(block)
+    return total
+
+
+async def spool_upload(file: UploadFile, dest_path: Optional[str] = None, chunk_bytes: int = UPLOAD_SPOOL_CHUNK_BYTES) -> str:
+    """Copy an upload body to disk in fixed-size chunks and return the file path.
+
+    Without `dest_path` the file goes to UPLOAD_SPOOL_DIR and the caller removes
+    it with discard_spool() when done.
+    """
+    if dest_path is None:
+        os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+        _, ext = os.path.splitext(file.filename or "")
+        fd, dest_path = tempfile.mkstemp(suffix=ext.lower(), dir=UPLOAD_SPOOL_DIR)
+        os.close(fd)
+    else:
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    try:
+        # Starlette already buffers large bodies in a temporary file; copy it without loading it.
+        await file.seek(0)
+        await run_in_threadpool(_copy_stream, file.file, dest_path, chunk_bytes)
+    except Exception:
+        discard_spool(dest_path)
+        raise
+    return dest_path
+
+
+def discard_spool(path: Optional[str]):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove spooled upload {path}: {e}")
+
+
+def iter_frames(path: str, filename: str, chunk_rows: Optional[int] = None, **read_kwargs) -> Iterator[pd.DataFrame]:
+    """Yield the file as DataFrames of at most `chunk_rows` rows.
+
+    The index runs on across chunks (0..n-1 over the whole file), so row numbers
+    stay meaningful in error messages.
+    """
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        with pd.read_csv(path, chunksize=chunk_rows or UPLOAD_CSV_CHUNK_ROWS, **read_kwargs) as reader:
+            for chunk in reader:
+                yield chunk
+    elif name.endswith((".xlsx", ".xls")):
+        yield pd.read_excel(path, **read_kwargs)
+    else:
+        raise UnsupportedFileType("Only CSV and Excel files are supported")
+
+
+def read_head(path: str, filename: str, rows: int = 5) -> pd.DataFrame:
+    """First `rows` rows only, for previews and header checks."""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return pd.read_csv(path, nrows=rows)
+    if name.endswith((".xlsx", ".xls")):
+        return pd.read_excel(path, nrows=rows)
+    raise UnsupportedFileType("Only CSV and Excel files are supported")
+
+
+def count_rows(path: str, filename: str, chunk_rows: Optional[int] = None) -> int:
+    """Data row count, streaming through the file one chunk at a time."""
+    return sum(len(frame) for frame in iter_frames(path, filename, chunk_rows))
+
+
+class UploadProgress:
+    """Mutable progress record for one streaming upload."""
+
+    def __init__(self, upload_id: str, filename: str, total_bytes: int = 0):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.total_bytes = total_bytes
+        self.status = "running"
+        self.chunks = 0
+        self.rows_processed = 0
+        self.rows_imported = 0
+        self.errors = 0
+        self.message: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def advance(self, rows: int, imported: int, errors: int):
+        self.chunks += 1
+        self.rows_processed += rows
+        self.rows_imported += imported
+        self.errors += errors
+
+    def finish(self, status: str = "completed", message: Optional[str] = None):
+        self.status = status
+        self.message = message
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "upload_id": self.upload_id,
+            "filename": self.filename,
+            "status": self.status,
+            "total_bytes": self.total_bytes,
+            "chunks": self.chunks,
+            "rows_processed": self.rows_processed,
+            "rows_imported": self.rows_imported,
+            "errors": self.errors,
+            "message": self.message,
+            "elapsed_seconds": round(end - self.started_at, 3),
+        }
+
+
+_progress: "OrderedDict[str, UploadProgress]" = OrderedDict()
+_progress_lock = threading.Lock()
+
+
+def start_progress(filename: str, path: Optional[str] = None, upload_id: Optional[str] = None) -> UploadProgress:
+    upload_id = upload_id or uuid.uuid4().hex
+    size = os.path.getsize(path) if path and os.path.exists(path) else 0
+    progress = UploadProgress(upload_id, filename, size)
+    with _progress_lock:
+        _progress[upload_id] = progress
+        while len(_progress) > UPLOAD_PROGRESS_MAX_ENTRIES:
+            _progress.popitem(last=False)
+    return progress
+
+
+def get_progress(upload_id: str) -> Optional[Dict[str, Any]]:
+    with _progress_lock:
+        progress = _progress.get(upload_id)
+    return progress.to_dict() if progress else None
@@ -5,7 +5,7 @@ import {
   ChevronLeft, ChevronRight, Filter, Download, RefreshCw
 } from 'lucide-react';
 import { UniversalFilter, FilterState } from './UniversalFilter';
-import { API_BASE } from '../config/api';
+import { API_BASE, fetchAllPages } from '../config/api';
 
 // Event type colors
 const EVENT_TYPE_COLORS: { [key: string]: string } = {
@@ -95,8 +95,7 @@ export const CalendarSchedulerDashboard: React.FC = () => {
 
   const fetchCalendarData = async () => {
     try {
-      const res = await fetch(`${API_BASE}/api/v2/calendar/events`);
-      const data = await res.json();
+      const data = await fetchAllPages(`${API_BASE}/api/v2/calendar/events`, 'events');
       if (data.status === 'ok') {
         setEvents(data.events || []);
         setSummary(data.summary);
@@ -41,7 +41,7 @@ export default function DataUploadManager(){
   async function editMapping(name:string){
     setMessage('Loading mapping...');
     try{
-      const r = await fetch(`/api/v2/data/${name}`);
+      const r = await fetch(`/api/v2/data/${name}?limit=5`);
       const j = await r.json();
       if(r.ok && j.dataset){
         const mapping = j.dataset.mapping || {};
@@ -7,7 +7,7 @@ import {
   BarChart, Bar, LineChart, Line, PieChart, Pie, Cell,
   XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, Area, AreaChart
 } from 'recharts';
-import { API_BASE } from '../config/api';
+import { API_BASE, fetchAllPages } from '../config/api';
 
 interface Lead {
   lead_id: string;
@@ -91,14 +91,9 @@ export const LeadStatusReport: React.FC = () => {
       if (selectedRecruiter !== 'all') params.append('recruiter', selectedRecruiter);
       if (selectedSource !== 'all') params.append('source', selectedSource);
 
-      const [leadsRes, metricsRes] = await Promise.all([
-        fetch(`${API_BASE}/api/v2/leads/status?${params.toString()}`),
-        fetch(`${API_BASE}/api/v2/leads/metrics?${params.toString()}`)
-      ]);
-
       const [leadsData, metricsData] = await Promise.all([
-        leadsRes.json(),
-        metricsRes.json()
+        fetchAllPages(`${API_BASE}/api/v2/leads/status?${params.toString()}`),
+        fetch(`${API_BASE}/api/v2/leads/metrics?${params.toString()}`).then(res => res.json())
       ]);
 
       if (leadsData.status === 'ok') {
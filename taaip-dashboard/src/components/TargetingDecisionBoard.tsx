@@ -7,7 +7,7 @@ import {
   BarChart, Bar, PieChart, Pie, Cell, LineChart, Line,
   XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer
 } from 'recharts';
-import { API_BASE } from '../config/api';
+import { API_BASE, fetchAllPages } from '../config/api';
 
 interface ReviewBoard {
   board_id: string;
@@ -103,8 +103,7 @@ export const TargetingDecisionBoard: React.FC = () => {
 
   const fetchBoards = async () => {
     try {
-      const res = await fetch(`${API_BASE}/api/v2/twg/boards`);
-      const data = await res.json();
+      const data = await fetchAllPages(`${API_BASE}/api/v2/twg/boards`);
       if (data.status === 'ok') {
         setBoards(data.data);
       }
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Upload, FileText, CheckCircle, AlertCircle, Database, Target, Users, TrendingUp, Map, Calendar, DollarSign, X, Clock, Eye } from 'lucide-react';
 import Papa from 'papaparse';
-import { API_BASE } from '../config/api';
+import { API_BASE, fetchAllPages } from '../config/api';
 
 interface UploadResult {
   success: boolean;
@@ -119,8 +119,7 @@ export const UniversalDataUpload: React.FC = () => {
 
   const fetchUploadHistory = async () => {
     try {
-      const response = await fetch(`${API_BASE}/api/v2/upload/history`);
-      const data = await response.json();
+      const data = await fetchAllPages(`${API_BASE}/api/v2/upload/history`, 'history');
       if (data.status === 'ok') {
         setUploadHistory(data.history || []);
       }
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Shield, Users, Key, Plus, Edit, Trash2, Check, X, UserPlus, Lock, Unlock } from 'lucide-react';
+import { fetchAllPages } from '../config/api';
 import { User, UserRole, Permission, AccessTier, ROLE_TEMPLATES, hasPermission, canDelegatePermission, hasTierAccess } from '../types/auth';
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL || 'http://localhost:3000';
@@ -31,8 +32,7 @@ export const UserManagement: React.FC<UserManagementProps> = ({ currentUser }) =
 
   const loadUsers = async () => {
     try {
-      const response = await fetch(`${API_BASE}/api/v2/users`);
-      const data = await response.json();
+      const data = await fetchAllPages(`${API_BASE}/api/v2/users`, 'users');
       if (data.status === 'ok') {
         // Transform backend data to match frontend User type
         const transformedUsers: User[] = data.users.map((u: any) => ({
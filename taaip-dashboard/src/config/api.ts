@@ -26,3 +26,28 @@ const getBrowserOrigin = (): string => {
 export const API_BASE = import.meta.env.VITE_API_URL || getBrowserOrigin();
 
 console.log('API_BASE configured as:', API_BASE);
+
+/**
+ * GET a paginated list endpoint and follow `next_cursor` until the last page.
+ *
+ * List endpoints return one page (100 rows by default) plus a `next_cursor`.
+ * This returns the first page's JSON with `key` holding the rows of every page,
+ * so callers that expect the whole list can keep reading `data[key]`.
+ */
+export const fetchAllPages = async (url: string, key: string = 'data', pageSize: number = 1000): Promise<any> => {
+  const sep = url.includes('?') ? '&' : '?';
+  let first: any = null;
+  let items: any[] = [];
+  let cursor: string | null = null;
+  do {
+    const res = await fetch(`${url}${sep}limit=${pageSize}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`);
+    const page = await res.json();
+    if (first === null) first = page;
+    if (!res.ok || page.status !== 'ok') return page;
+    items = items.concat(page[key] || []);
+    cursor = page.next_cursor || null;
+  } while (cursor);
+  const merged = { ...first, [key]: items, next_cursor: null };
+  if ('count' in first) merged.count = items.length;
+  return merged;
+};
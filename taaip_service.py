@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Request, Form, WebSocket, WebSocketDisconnect, UploadFile, File, Body
+from fastapi import FastAPI, HTTPException, Request, Form, WebSocket, WebSocketDisconnect, UploadFile, File, Body, Query
 from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import io
 import csv
 from pathlib import Path
@@ -9,17 +10,37 @@ import uvicorn
 import logging
 from logging.handlers import RotatingFileHandler
 import random
+import numpy as np
 import os
 import json
 import sqlite3
 import shutil
 import secrets
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import threading
 import asyncio
-from backend.data_pipeline import process_csv, list_datasets, get_dataset
-from backend.data_pipeline import ingest_dataset, save_mapping
+from backend.data_pipeline import process_csv, list_datasets, get_dataset_page, read_manifest
+from backend.data_pipeline import ingest_dataset, save_mapping as save_dataset_mapping
+from backend.db_pool import get_connection, get_pool, pool_stats, checkpoint_database, replace_database_file
+from backend.db_executor import run_db, offload, bind_event_loop, call_in_loop, executor_stats
+from backend.schema_registry import get_schema, invalidate_schema
+from backend.index_plan import ensure_indexes, advise
+from backend.change_tracking import ensure_change_tracking, TRACKED_TABLES
+from backend.response_cache import ResponseCache
+from backend.funnel_metrics import ensure_day_columns, FunnelMetricsCache
+from backend.upload_stream import spool_upload
+from backend.job_queue import JobQueueFull, get_job_queue, queued_response
+from backend.kpi_engine import activity_filters, event_kpis, kpi_totals
+from backend.csv_export import accepts_gzip, csv_response, iter_dicts_csv, iter_query_csv
+from backend.incremental_export import KPI_EXPORT_HEADERS, export_incremental
+from backend.pagination import PaginationError, fetch_page
+from backend.segment_index import ensure_segment_index, segment_filter
+from backend.attribution import ATTRIBUTION_MODELS, activity_attribution, ensure_attribution_tables, pending as attribution_pending, rebuild as rebuild_attribution, refresh as refresh_attribution, stage_attribution
+from backend.marketing_sync import apply_sync, ensure_sync_schema
+from backend.segment_store import SEGMENT_BATCH_MAX, apply_segment_updates, compact_history, ensure_segment_history
+from backend.odata import ENTITY_SETS as ODATA_ENTITY_SETS, ODataError, compile_query as compile_odata, run_query as run_odata
+from backend.funnel_snapshot import ensure_snapshot_tables, needs_backfill, apply_transition, stage_distribution as funnel_stage_distribution, rebuild as rebuild_funnel_snapshot
 
 
 # --- Configuration & Initialization ---
@@ -83,6 +104,13 @@ async def log_upload_requests(request: Request, call_next):
         logging.exception(f"Error in upload logging middleware: {e}")
         return await call_next(request)
 
+# Serve cached analytics responses (RESPONSE_CACHE is configured below, next to DB_FILE).
+# Registered before CORS so CORS headers are still added to cache hits and 304s.
+@app.middleware("http")
+async def response_cache_middleware(request: Request, call_next):
+    return await RESPONSE_CACHE.handle(request, call_next)
+
+
 # Allow CORS for local development (adjust origins for production)
 app.add_middleware(
     CORSMiddleware,
@@ -102,11 +130,40 @@ PILOT_FILE = os.path.join(DATA_DIR, "pilot_state.json")
 DB_FILE = os.path.join(os.path.dirname(__file__), "recruiting.db")
 
 
+# Response cache for read-heavy analytics endpoints; entries are tagged with the tables
+# they read and dropped when those tables' write generations change.
+RESPONSE_CACHE = ResponseCache(DB_FILE)
+RESPONSE_CACHE.register("/api/v2/analytics/overview", tags=("leads", "events", "projects"))
+RESPONSE_CACHE.register("/api/v2/analytics/dashboard", tags=("event_metrics",))
+RESPONSE_CACHE.register("/api/v2/marketing/analytics", tags=("marketing_activities",))
+RESPONSE_CACHE.register("/api/v2/g2-zones/summary", tags=("g2_zone_performance",))
+RESPONSE_CACHE.register("/api/v2/projects/dashboard/summary", tags=("projects", "tasks"))
+RESPONSE_CACHE.register("/api/v2/funnel/metrics", tags=("funnel_stage_counts",))
+# /api/v2/recruiting-funnel/metrics is not registered: FUNNEL_METRICS_CACHE already caches it per fiscal year
+RESPONSE_CACHE.register("/api/v2/meta/last-updated", tags=(
+    "events", "event_metrics", "leads", "projects", "general_actions",
+    "marketing_activities", "funnel_stages", "recruiters", "recruiter_metrics",
+))
+
+
 # --- SQLite helpers ---
 def get_db_conn():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Lease a pooled connection to DB_FILE; conn.close() returns it to the pool."""
+    return get_connection(DB_FILE)
+
+
+def db_write(fn, *args, **kwargs):
+    """Queue `fn(conn, ...)` on the DB_FILE writer thread and wait for its group commit."""
+    return get_pool(DB_FILE).write(fn, *args, **kwargs)
+
+
+def queue_job(kind: str, fn, *args, params: Optional[dict] = None, with_progress: bool = False, **kwargs):
+    """Run `fn` as a background job; the 202 response carries the job id for GET /api/v2/jobs/{id}."""
+    try:
+        job_id = get_job_queue().submit(kind, fn, *args, params=params, with_progress=with_progress, **kwargs)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return JSONResponse(status_code=202, content=queued_response(job_id))
 
 
 def model_to_dict(m):
@@ -490,6 +547,28 @@ def init_db():
                 )
     except Exception as e:
         logging.warning(f"USAREC funnel stages already initialized: {e}")
+
+    # Materialized current-stage snapshot; backfilled once from existing transitions
+    ensure_snapshot_tables(conn)
+    if needs_backfill(conn):
+        rebuild_funnel_snapshot(conn)
+
+    # Trigger-maintained (lead, segment key, value) rows for segment-filtered queries, and diff history
+    ensure_segment_index(conn)
+    ensure_segment_history(conn)
+
+    # Materialized touchpoint attribution, credited incrementally as transitions arrive
+    ensure_attribution_tables(conn)
+
+    # Natural key for vendor syncs and per-source sync watermarks
+    ensure_sync_schema(conn)
+
+    # Integer day numbers for the funnel stage dates, and write generations for caches
+    ensure_day_columns(conn)
+    ensure_change_tracking(conn, TRACKED_TABLES + RESPONSE_CACHE.tracked_tables())
+
+    # Managed index set for the dashboard queries (skips columns this schema lacks)
+    ensure_indexes(conn)
     
     conn.commit()
     conn.close()
@@ -554,6 +633,9 @@ def migrate_json_to_db():
 
 # Ensure DB exists and migrate any JSON demo data
 init_db()
+# Introspect the schema once at startup; handlers read columns from the registry
+invalidate_schema(DB_FILE)
+get_schema(DB_FILE).tables()
 # migrate_json_to_db()  # DEPRECATED: Old leads table schema, now using PRID-based recruiting funnel
 
 
@@ -633,22 +715,58 @@ def compute_score_from_dict(d: Dict[str, Any]) -> Dict[str, Any]:
         "score": final_score,
         "recommendation": recommendation,
     }
+
+
+SCORING_BATCH_MAX = int(os.getenv("SCORING_BATCH_MAX", "100000"))
+_RECOMMENDATIONS = np.array([
+    "Low Priority: Monitor and Re-evaluate",
+    "Medium Priority: Add to Nurture Campaign Queue",
+    "High Priority: Immediate Recruiter Engagement Required",
+])
+
+
+def compute_scores_batch(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Vectorized compute_score_from_dict: one feature matrix and one predict_proba call for all records."""
+    n = len(records)
+    if n == 0:
+        return []
+    ages = np.fromiter((float(r.get("age", 30)) for r in records), dtype=float, count=n)
+    edu = np.fromiter((r.get("education_level") in ("Bachelors", "Masters") for r in records), dtype=bool, count=n)
+    campaign = np.fromiter((r.get("campaign_source") == "High-Impact-Targeting-Campaign" for r in records), dtype=bool, count=n)
+
+    probs = None
+    if ML_MODEL.get("model") is not None:
+        try:
+            features = np.column_stack([ages, edu.astype(float), campaign.astype(float)])
+            probs = np.asarray(ML_MODEL["model"].predict_proba(features), dtype=float)[:, 1]
+            scores = np.clip(np.rint(probs * 100), 1, 100).astype(int)
+        except Exception as e:
+            logging.warning(f"Batch model scoring failed, falling back to simulated logic: {e}")
+            probs = None
+    if probs is None:
+        scores = np.random.randint(30, 86, size=n) + np.where(edu, 5, 0) + np.where(campaign, 10, 0)
+        scores = np.minimum(100, scores)
+        probs = scores / 100.0
+
+    tiers = np.where(scores >= 85, 2, np.where(scores >= 60, 1, 0))
+    recs = _RECOMMENDATIONS[tiers]
+    probs = np.round(probs, 4)
+    return [
+        {"lead_id": r.get("lead_id"), "predicted_probability": float(p), "score": int(s), "recommendation": str(rec)}
+        for r, p, s, rec in zip(records, probs.tolist(), scores.tolist(), recs.tolist())
+    ]
+
+
 @app.get("/api/v2/market/potential")
 def get_market_potential():
     """Get market segmentation and potential analysis."""
     conn = get_db_conn()
     cur = conn.cursor()
     
-    # Inspect leads columns
-    cur.execute("PRAGMA table_info(leads)")
-    lead_cols = {row[1] for row in cur.fetchall()}
-    # Choose a source-like column if available
-    source_col = None
-    for cand in ("source", "campaign_source", "lead_source", "channel"):
-        if cand in lead_cols:
-            source_col = cand
-            break
-    stage_col = 'current_stage' if 'current_stage' in lead_cols else ('stage' if 'stage' in lead_cols else None)
+    # Resolve schema-dependent columns from the cached registry
+    schema = get_schema(DB_FILE)
+    source_col = schema.resolve("leads", "source")
+    stage_col = schema.first_column("leads", "current_stage", "stage")
     
     # Get lead source statistics
     sources = []
@@ -696,19 +814,14 @@ def get_targeting_recommendations():
     conn = get_db_conn()
     cur = conn.cursor()
     
-    # Inspect leads columns to adjust query
-    cur.execute("PRAGMA table_info(leads)")
-    lead_cols = {row[1] for row in cur.fetchall()}
-    stage_col = 'current_stage' if 'current_stage' in lead_cols else ('stage' if 'stage' in lead_cols else None)
-    score_col = 'propensity_score' if 'propensity_score' in lead_cols else ('score' if 'score' in lead_cols else None)
-    name_first = 'first_name' if 'first_name' in lead_cols else None
-    name_last = 'last_name' if 'last_name' in lead_cols else None
-    source_col = None
-    for cand in ("source", "campaign_source", "lead_source", "channel"):
-        if cand in lead_cols:
-            source_col = cand
-            break
-    days_col = 'days_in_stage' if 'days_in_stage' in lead_cols else None
+    # Adjust the query to the leads columns known to the schema registry
+    schema = get_schema(DB_FILE)
+    stage_col = schema.first_column("leads", "current_stage", "stage")
+    score_col = schema.resolve("leads", "score")
+    name_first = schema.first_column("leads", "first_name")
+    name_last = schema.first_column("leads", "last_name")
+    source_col = schema.resolve("leads", "source")
+    days_col = schema.first_column("leads", "days_in_stage")
     
     # Get high-potential leads (high propensity score, early stage)
     high_potential = []
@@ -804,6 +917,11 @@ class LeadData(BaseModel):
     campaign_source: str = Field(..., description="Marketing channel/campaign that generated the lead.")
 
 
+class LeadBatch(BaseModel):
+    """Batch of leads for the :batch scoring/ingest endpoints."""
+    leads: List[LeadData]
+
+
 class ScoringResult(BaseModel):
     """Schema for the output data returned by the scoring engine."""
     lead_id: str
@@ -849,30 +967,81 @@ def ingest_lead(data: LeadData):
     """Score the lead and persist it to the SQLite store."""
     result = compute_score_from_dict(model_to_dict(data))
     received_at = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO leads (lead_id, age, education_level, cbsa_code, campaign_source, received_at, predicted_probability, score, recommendation, converted, raw_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO leads (lead_id, age, education_level, cbsa_code, campaign_source, received_at, predicted_probability, score, recommendation, converted, raw_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                data.lead_id,
+                data.age,
+                data.education_level,
+                data.cbsa_code,
+                data.campaign_source,
+                received_at,
+                result["predicted_probability"],
+                result["score"],
+                result["recommendation"],
+                0,
+                json.dumps(model_to_dict(data)),
+            ),
+        )
+    )
+    return {"status": "ok", "lead": {**result, "received_at": received_at}}
+
+
+def _check_batch_size(batch: LeadBatch):
+    if len(batch.leads) > SCORING_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(batch.leads)} leads (max {SCORING_BATCH_MAX})")
+
+
+@app.post("/api/v1/scoreLeads:batch")
+def score_leads_batch(batch: LeadBatch):
+    """Score many leads with a single model call."""
+    _check_batch_size(batch)
+    try:
+        results = compute_scores_batch([model_to_dict(lead) for lead in batch.leads])
+        logging.info(f"Scored batch of {len(results)} leads.")
+        return {"status": "ok", "count": len(results), "results": results}
+    except Exception as e:
+        logging.error(f"Error during batch lead scoring: {e}")
+        raise HTTPException(status_code=500, detail="Internal processing error in ML service.")
+
+
+@app.post("/api/v1/ingestLeads:batch")
+def ingest_leads_batch(batch: LeadBatch):
+    """Score a batch of leads and persist them with one executemany in a single transaction."""
+    _check_batch_size(batch)
+    records = [model_to_dict(lead) for lead in batch.leads]
+    results = compute_scores_batch(records)
+    received_at = datetime.utcnow().isoformat()
+    rows = [
         (
-            data.lead_id,
-            data.age,
-            data.education_level,
-            data.cbsa_code,
-            data.campaign_source,
+            d["lead_id"],
+            d["age"],
+            d["education_level"],
+            d["cbsa_code"],
+            d["campaign_source"],
             received_at,
-            result["predicted_probability"],
-            result["score"],
-            result["recommendation"],
+            res["predicted_probability"],
+            res["score"],
+            res["recommendation"],
             0,
-            json.dumps(model_to_dict(data)),
-        ),
+            json.dumps(d),
+        )
+        for d, res in zip(records, results)
+    ]
+    db_write(
+        lambda conn: conn.executemany(
+            """
+            INSERT INTO leads (lead_id, age, education_level, cbsa_code, campaign_source, received_at, predicted_probability, score, recommendation, converted, raw_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
     )
-    conn.commit()
-    conn.close()
-    return {"status": "ok", "lead": {**result, "received_at": received_at}}
+    return {"status": "ok", "count": len(results), "received_at": received_at, "leads": results}
 
 
 @app.get("/api/v1/metrics")
@@ -886,14 +1055,12 @@ def start_pilot(payload: Optional[Dict[str, Any]] = None):
     started_at = datetime.utcnow().isoformat()
     config = payload.get("config", {})
     status = payload.get("status", "running")
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "REPLACE INTO pilot_state (id, started_at, config, status) VALUES (1, ?, ?, ?)",
-        (started_at, json.dumps(config), status),
+    db_write(
+        lambda conn: conn.execute(
+            "REPLACE INTO pilot_state (id, started_at, config, status) VALUES (1, ?, ?, ?)",
+            (started_at, json.dumps(config), status),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "started_at": started_at, "config": config, "pilot_status": status}
 
 
@@ -912,7 +1079,13 @@ def pilot_status():
 @app.get("/health")
 def health_check():
     """Returns the status of the service and the loaded ML model."""
-    return {"status": "ok", "service": "TAAIP - Talent Acquisition Analytics and Intelligence Platform", "model_status": ML_MODEL.get("status", "unknown")}
+    return {"status": "ok", "service": "TAAIP - Talent Acquisition Analytics and Intelligence Platform", "model_status": ML_MODEL.get("status", "unknown"), "db_pools": pool_stats(), "db_executor": executor_stats(), "response_cache": RESPONSE_CACHE.stats()}
+
+
+@app.on_event("startup")
+async def _bind_db_executor_loop():
+    # lets sync handlers running on worker threads schedule WebSocket broadcasts
+    bind_event_loop()
 
 
 # ========== EXTENDED API (v2): ROI, Funnel, Project Management, M-IPOE, Targeting, Forecasting ==========
@@ -1013,6 +1186,7 @@ class MarketingActivityCreate(BaseModel):
 class DataSourceSync(BaseModel):
     source_system: str  # 'emm', 'ikrome', 'vantage', 'g2_report_zone', 'aiem', 'usarec_systems'
     sync_data: Dict[str, Any]  # Flexible JSON for source-specific data
+    watermark: Optional[str] = None  # vendor cursor (e.g. last-modified); the highest one is kept per source
 
 
 # --- Segmentation & Ingest Models ---
@@ -1062,17 +1236,15 @@ def create_event(event: EventCreate):
     import uuid
     event_id = f"evt_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO events (event_id, name, type, location, start_date, end_date, budget, team_size, targeting_principles, status, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'planned', ?, ?)
-        """,
-        (event_id, event.name, event.type, event.location, event.start_date, event.end_date, event.budget, event.team_size, event.targeting_principles, now, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO events (event_id, name, type, location, start_date, end_date, budget, team_size, targeting_principles, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'planned', ?, ?)
+            """,
+            (event_id, event.name, event.type, event.location, event.start_date, event.end_date, event.budget, event.team_size, event.targeting_principles, now, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "event_id": event_id}
 
 
@@ -1080,8 +1252,7 @@ def create_event(event: EventCreate):
 def list_events(event_type: Optional[str] = None, rsid: Optional[str] = None, limit: int = 100):
     """List events with predicted fields for dashboards."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cur = conn.cursor()
         query = (
             "SELECT event_id, name, COALESCE(event_type_category, type) AS event_type_category, "
@@ -1095,14 +1266,9 @@ def list_events(event_type: Optional[str] = None, rsid: Optional[str] = None, li
             params.extend([event_type, event_type])
         if rsid:
             # Include if schema has rsid column; ignore if not
-            try:
-                cur.execute("PRAGMA table_info(events)")
-                cols = [r[1] for r in cur.fetchall()]
-                if "rsid" in cols:
-                    query += " AND rsid = ?"
-                    params.append(rsid)
-            except Exception:
-                pass
+            if get_schema(DB_FILE).has_column("events", "rsid"):
+                query += " AND rsid = ?"
+                params.append(rsid)
         query += " ORDER BY start_date DESC LIMIT ?"
         params.append(max(1, min(limit, 500)))
         cur.execute(query, params)
@@ -1130,58 +1296,57 @@ def _now_iso():
 
 
 def update_segment_profile(lead_id: Optional[str], segments: Optional[Dict[str, Any]], attributes: Optional[Dict[str, Any]], source: str = "ingest", notes: Optional[str] = None):
-    """Merge incoming segment/attribute data into segment_profiles and record history."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    now = _now_iso()
-
-    profile_id = None
+    """Merge incoming segment/attribute data into segment_profiles (JSON merge patch) and record the diff."""
     if lead_id:
         profile_id = f"profile_{lead_id}"
     else:
         import uuid
         profile_id = f"profile_{uuid.uuid4().hex[:12]}"
 
-    # Fetch existing
-    cur.execute("SELECT segments, attributes FROM segment_profiles WHERE profile_id = ?", (profile_id,))
-    row = cur.fetchone()
-    existing_segments = {}
-    existing_attrs = {}
-    if row:
-        try:
-            existing_segments = json.loads(row[0]) if row[0] else {}
-        except Exception:
-            existing_segments = {}
-        try:
-            existing_attrs = json.loads(row[1]) if row[1] else {}
-        except Exception:
-            existing_attrs = {}
+    def _merge(conn):
+        # The merge runs in SQL on the writer so concurrent updates cannot lose keys.
+        apply_segment_updates(conn, [{"profile_id": profile_id, "lead_id": lead_id, "segments": segments, "attributes": attributes, "notes": notes}], source=source)
+        return conn.execute("SELECT segments, attributes FROM segment_profiles WHERE profile_id = ?", (profile_id,)).fetchone()
 
-    # Merge (simple overwrite semantics for keys)
-    merged_segments = existing_segments.copy()
-    if segments:
-        for k, v in segments.items():
-            merged_segments[k] = v
+    row = db_write(_merge)
+    return {"profile_id": profile_id, "segments": json.loads(row[0]), "attributes": json.loads(row[1])}
 
-    merged_attrs = existing_attrs.copy()
-    if attributes:
-        for k, v in attributes.items():
-            merged_attrs[k] = v
 
-    # Upsert profile
-    cur.execute(
-        "REPLACE INTO segment_profiles (profile_id, lead_id, segments, attributes, last_updated, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (profile_id, lead_id, json.dumps(merged_segments), json.dumps(merged_attrs), now, now),
-    )
+class SegmentUpdate(BaseModel):
+    lead_id: str
+    segments: Optional[Dict[str, Any]] = None
+    attributes: Optional[Dict[str, Any]] = None
+    source: Optional[str] = None
+    notes: Optional[str] = None
 
-    # Insert history
-    cur.execute(
-        "INSERT INTO segment_history (profile_id, lead_id, segments, attributes, changed_at, source, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (profile_id, lead_id, json.dumps(merged_segments), json.dumps(merged_attrs), now, source, notes),
-    )
-    conn.commit()
-    conn.close()
-    return {"profile_id": profile_id, "segments": merged_segments, "attributes": merged_attrs}
+
+class SegmentBatch(BaseModel):
+    updates: List[SegmentUpdate]
+    source: Optional[str] = "batch"
+
+
+@app.post("/api/v2/segments/batch")
+def update_segments_batch(payload: SegmentBatch, background: bool = False):
+    """Merge many segment updates in one write transaction; unchanged profiles are skipped.
+
+    Each update is a JSON merge patch: keys overwrite, nested objects merge, null removes a key.
+    """
+    if len(payload.updates) > SEGMENT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SEGMENT_BATCH_MAX} updates per batch")
+    updates = [model_to_dict(u) for u in payload.updates]
+    source = payload.source or "batch"
+    if background:
+        return queue_job("segments:batch", db_write, apply_segment_updates, updates, source=source,
+                         params={"updates": len(updates), "source": source})
+    result = db_write(apply_segment_updates, updates, source=source)
+    return {"status": "ok", **result}
+
+
+@app.post("/api/v2/segments/history/compact")
+def compact_segment_history():
+    """Fold old segment history into one snapshot per profile (see backend/segment_store.py)."""
+    removed = db_write(compact_history)
+    return {"status": "ok", "removed": removed}
 
 
 @app.post("/api/v2/ingest/survey")
@@ -1215,19 +1380,19 @@ def ingest_census(payload: CensusIngest):
     received_at = payload.received_at or _now_iso()
     # For this prototype, we will store the census attributes as a standalone segment profile under geography code
     profile_id = f"census_{payload.geography_code}"
-    conn = get_db_conn()
-    cur = conn.cursor()
     now = _now_iso()
-    cur.execute(
-        "REPLACE INTO segment_profiles (profile_id, lead_id, segments, attributes, last_updated, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (profile_id, None, json.dumps({}), json.dumps(payload.attributes), now, now),
-    )
-    cur.execute(
-        "INSERT INTO segment_history (profile_id, lead_id, segments, attributes, changed_at, source, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (profile_id, None, json.dumps({}), json.dumps(payload.attributes), now, payload.source, "census_import"),
-    )
-    conn.commit()
-    conn.close()
+
+    def _store(conn):
+        conn.execute(
+            "REPLACE INTO segment_profiles (profile_id, lead_id, segments, attributes, last_updated, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (profile_id, None, json.dumps({}), json.dumps(payload.attributes), now, now),
+        )
+        conn.execute(
+            "INSERT INTO segment_history (profile_id, lead_id, segments, attributes, changed_at, source, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (profile_id, None, json.dumps({}), json.dumps(payload.attributes), now, payload.source, "census_import"),
+        )
+
+    db_write(_store)
     return {"status": "ok", "profile_id": profile_id}
 
 
@@ -1237,51 +1402,47 @@ def ingest_social(payload: SocialSignalIngest):
     received_at = payload.received_at or _now_iso()
     # Map external_id/handle to a profile
     profile_id = f"social_{payload.external_id}"
-    conn = get_db_conn()
-    cur = conn.cursor()
     now = _now_iso()
-    cur.execute(
-        "REPLACE INTO segment_profiles (profile_id, lead_id, segments, attributes, last_updated, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (profile_id, None, json.dumps({}), json.dumps(payload.signals), now, now),
-    )
-    cur.execute(
-        "INSERT INTO segment_history (profile_id, lead_id, segments, attributes, changed_at, source, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (profile_id, None, json.dumps({}), json.dumps(payload.signals), now, payload.source, "social_import"),
-    )
-    conn.commit()
-    conn.close()
+
+    def _store(conn):
+        conn.execute(
+            "REPLACE INTO segment_profiles (profile_id, lead_id, segments, attributes, last_updated, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (profile_id, None, json.dumps({}), json.dumps(payload.signals), now, now),
+        )
+        conn.execute(
+            "INSERT INTO segment_history (profile_id, lead_id, segments, attributes, changed_at, source, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (profile_id, None, json.dumps({}), json.dumps(payload.signals), now, payload.source, "social_import"),
+        )
+
+    db_write(_store)
     return {"status": "ok", "profile_id": profile_id}
 
 
 @app.post("/api/v2/ingest/engagements")
 def ingest_engagements(payload: EngagementIngest):
     """Ingest bulk engagement/impression updates and optionally create marketing activity entries or update existing ones."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    created = 0
+    import uuid
     now = _now_iso()
-    # If activity_id provided, update that activity
-    if payload.activity_id:
-        cur.execute("SELECT activity_id FROM marketing_activities WHERE activity_id = ?", (payload.activity_id,))
-        if cur.fetchone():
-            cur.execute(
+
+    def _apply(conn):
+        # If activity_id provided, update that activity
+        if payload.activity_id:
+            cur = conn.execute(
                 "UPDATE marketing_activities SET impressions = impressions + ?, engagement_count = engagement_count + ?, updated_at = ? WHERE activity_id = ?",
                 (payload.impressions or 0, payload.engagement_count or 0, now, payload.activity_id),
             )
-            conn.commit()
-            conn.close()
-            return {"status": "ok", "updated": payload.activity_id}
+            if cur.rowcount:
+                return {"status": "ok", "updated": payload.activity_id}
+
+        # Otherwise, create a lightweight activity record
+        activity_id = f"mkt_{uuid.uuid4().hex[:12]}"
+        conn.execute(
+            "INSERT INTO marketing_activities (activity_id, event_id, activity_type, campaign_name, channel, data_source, impressions, engagement_count, awareness_metric, activation_conversions, reporting_date, metadata, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (activity_id, payload.event_id, 'engagement_batch', None, None, payload.data_source, payload.impressions or 0, payload.engagement_count or 0, 0.0, 0, payload.reporting_date or now, None, now, now),
+        )
+        return {"status": "ok", "activity_id": activity_id}
 
-    # Otherwise, create a lightweight activity record
-    import uuid
-    activity_id = f"mkt_{uuid.uuid4().hex[:12]}"
-    cur.execute(
-        "INSERT INTO marketing_activities (activity_id, event_id, activity_type, campaign_name, channel, data_source, impressions, engagement_count, awareness_metric, activation_conversions, reporting_date, metadata, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (activity_id, payload.event_id, 'engagement_batch', None, None, payload.data_source, payload.impressions or 0, payload.engagement_count or 0, 0.0, 0, payload.reporting_date or now, None, now, now),
-    )
-    conn.commit()
-    conn.close()
-    return {"status": "ok", "activity_id": activity_id}
+    return db_write(_apply)
 
 
 @app.get("/api/v2/segments/{lead_id}")
@@ -1308,17 +1469,15 @@ def get_segment_profile(lead_id: str):
 def add_event_metrics(event_id: str, metrics: EventMetricsCreate):
     """Record event metrics (live update from TA technician)."""
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO event_metrics (event_id, date, leads_generated, leads_qualified, conversion_count, cost_per_lead, roi, engagement_rate, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (event_id, metrics.date, metrics.leads_generated, metrics.leads_qualified, metrics.conversion_count, metrics.cost_per_lead, metrics.roi, metrics.engagement_rate, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO event_metrics (event_id, date, leads_generated, leads_qualified, conversion_count, cost_per_lead, roi, engagement_rate, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (event_id, metrics.date, metrics.leads_generated, metrics.leads_qualified, metrics.conversion_count, metrics.cost_per_lead, metrics.roi, metrics.engagement_rate, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "message": "Metrics recorded"}
 
 
@@ -1328,17 +1487,15 @@ def capture_survey(event_id: str, survey: CaptureSurveyCreate):
     import uuid
     survey_id = f"sur_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO capture_survey (survey_id, event_id, lead_id, timestamp, technician_id, effectiveness_rating, feedback, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (survey_id, event_id, survey.lead_id, now, survey.technician_id, survey.effectiveness_rating, survey.feedback, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO capture_survey (survey_id, event_id, lead_id, timestamp, technician_id, effectiveness_rating, feedback, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (survey_id, event_id, survey.lead_id, now, survey.technician_id, survey.effectiveness_rating, survey.feedback, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "survey_id": survey_id}
 
 
@@ -1370,89 +1527,52 @@ def get_funnel_stages():
 def record_funnel_transition(transition: FunnelTransitionCreate):
     """Move a lead between funnel stages."""
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    # Insert using whichever identifier column exists in the DB (`lead_id` or `prid`).
-    cur.execute("PRAGMA table_info(funnel_transitions)")
-    existing_cols = [r[1] for r in cur.fetchall()]
-    if "prid" in existing_cols:
-        cur.execute(
-            """
-            INSERT INTO funnel_transitions (prid, from_stage, to_stage, transition_date, transition_reason, technician_id, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (transition.lead_id, transition.from_stage, transition.to_stage, now, transition.transition_reason, transition.technician_id, now),
-        )
-    else:
-        cur.execute(
-            """
-            INSERT INTO funnel_transitions (lead_id, from_stage, to_stage, transition_date, transition_reason, technician_id, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (transition.lead_id, transition.from_stage, transition.to_stage, now, transition.transition_reason, transition.technician_id, now),
-        )
-    conn.commit()
-    conn.close()
+
+    def _insert(conn):
+        cur = conn.cursor()
+        # Insert using whichever identifier column exists in the DB (`lead_id` or `prid`).
+        if get_schema(DB_FILE).resolve("funnel_transitions", "lead_key") == "prid":
+            cur.execute(
+                """
+                INSERT INTO funnel_transitions (prid, from_stage, to_stage, transition_date, transition_reason, technician_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (transition.lead_id, transition.from_stage, transition.to_stage, now, transition.transition_reason, transition.technician_id, now),
+            )
+        else:
+            cur.execute(
+                """
+                INSERT INTO funnel_transitions (lead_id, from_stage, to_stage, transition_date, transition_reason, technician_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (transition.lead_id, transition.from_stage, transition.to_stage, now, transition.transition_reason, transition.technician_id, now),
+            )
+        apply_transition(conn, transition.lead_id, transition.to_stage, now)
+        refresh_attribution(conn)
+
+    db_write(_insert)
     return {"status": "ok", "message": f"Lead {transition.lead_id} transitioned to {transition.to_stage}"}
 
 
 @app.get("/api/v2/funnel/metrics")
 def get_funnel_metrics():
     """Get conversion metrics across all funnel stages."""
+    # Stage counts come from the materialized snapshot maintained by record_funnel_transition.
     conn = get_db_conn()
-    cur = conn.cursor()
-    
-    # Count leads in each stage (via most recent transition).
-    # The DB schema may use `lead_id` (older) or `prid` (migrated). Attempt
-    # the `lead_id`-based query first, and fall back to a `prid`-based
-    # equivalent if the column doesn't exist.
     try:
-        cur.execute("""
-            SELECT on_stage, COUNT(*) as count
-            FROM (
-                SELECT lead_id, to_stage as on_stage
-                FROM funnel_transitions
-                WHERE (lead_id, created_at) IN (
-                    SELECT lead_id, MAX(created_at)
-                    FROM funnel_transitions
-                    GROUP BY lead_id
-                )
-            ) latest_stage
-            GROUP BY on_stage
-            ORDER BY on_stage
-        """)
-        stage_counts = {row[0]: row[1] for row in cur.fetchall()}
-    except sqlite3.OperationalError:
-        # Likely no `lead_id` column — try using `prid` instead.
-        try:
-            cur.execute("""
-                SELECT on_stage, COUNT(*) as count
-                FROM (
-                    SELECT prid, to_stage as on_stage
-                    FROM funnel_transitions
-                    WHERE (prid, created_at) IN (
-                        SELECT prid, MAX(created_at)
-                        FROM funnel_transitions
-                        GROUP BY prid
-                    )
-                ) latest_stage
-                GROUP BY on_stage
-                ORDER BY on_stage
-            """)
-            stage_counts = {row[0]: row[1] for row in cur.fetchall()}
-        except Exception:
-            # Final fallback: count distinct identifiers per stage.
-            cur.execute("""
-                SELECT to_stage, COUNT(DISTINCT prid) as count
-                FROM funnel_transitions
-                GROUP BY to_stage
-            """)
-            stage_counts = {row[0]: row[1] for row in cur.fetchall()}
-    
-    conn.close()
+        stage_counts = funnel_stage_distribution(conn)
+    finally:
+        conn.close()
     return {"stage_distribution": stage_counts}
 
 
+@app.post("/api/v2/admin/funnel-snapshot/rebuild")
+def rebuild_funnel_snapshot_endpoint():
+    """Recompute lead_current_stage and the per-stage counters from funnel_transitions."""
+    stage_counts = db_write(rebuild_funnel_snapshot)
+    return {"status": "ok", "leads": sum(stage_counts.values()), "stage_distribution": stage_counts}
+
+
 # --- Project Management Endpoints ---
 
 @app.post("/api/v2/projects")
@@ -1461,17 +1581,15 @@ def create_project(project: ProjectCreate):
     import uuid
     project_id = f"prj_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO projects (project_id, name, event_id, start_date, target_date, owner_id, objectives, success_criteria, status, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'planning', ?, ?)
-        """,
-        (project_id, project.name, project.event_id, project.start_date, project.target_date, project.owner_id, project.objectives, project.success_criteria, now, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO projects (project_id, name, event_id, start_date, target_date, owner_id, objectives, success_criteria, status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'planning', ?, ?)
+            """,
+            (project_id, project.name, project.event_id, project.start_date, project.target_date, project.owner_id, project.objectives, project.success_criteria, now, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "project_id": project_id}
 
 
@@ -1481,17 +1599,15 @@ def create_task(project_id: str, task: TaskCreate):
     import uuid
     task_id = f"tsk_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO tasks (task_id, project_id, title, description, assigned_to, due_date, status, priority, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?, ?)
-        """,
-        (task_id, project_id, task.title, task.description, task.assigned_to, task.due_date, task.priority, now, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO tasks (task_id, project_id, title, description, assigned_to, due_date, status, priority, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?, ?)
+            """,
+            (task_id, project_id, task.title, task.description, task.assigned_to, task.due_date, task.priority, now, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "task_id": task_id}
 
 
@@ -1499,16 +1615,12 @@ def create_task(project_id: str, task: TaskCreate):
 def update_task(project_id: str, task_id: str, updates: Dict[str, Any]):
     """Update task status, due date, etc."""
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
     
     set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
     set_clause += ", updated_at = ?"
     values = list(updates.values()) + [now, task_id]
     
-    cur.execute(f"UPDATE tasks SET {set_clause} WHERE task_id = ?", values)
-    conn.commit()
-    conn.close()
+    db_write(lambda conn: conn.execute(f"UPDATE tasks SET {set_clause} WHERE task_id = ?", values))
     return {"status": "ok", "message": "Task updated"}
 
 
@@ -1531,17 +1643,15 @@ def create_mipoe(mipoe: MIPOECreate):
     import uuid
     mipoe_id = f"mip_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO mipoe (mipoe_id, event_id, phase, content, owner_id, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        (mipoe_id, mipoe.event_id, mipoe.phase, json.dumps(mipoe.content), mipoe.owner_id, now, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO mipoe (mipoe_id, event_id, phase, content, owner_id, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (mipoe_id, mipoe.event_id, mipoe.phase, json.dumps(mipoe.content), mipoe.owner_id, now, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "mipoe_id": mipoe_id}
 
 
@@ -1574,17 +1684,15 @@ def create_targeting_profile(profile: TargetingProfileCreate):
     import uuid
     profile_id = f"tgt_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO targeting_profiles (profile_id, event_id, target_age_min, target_age_max, target_education_level, target_locations, message_themes, contact_frequency, conversion_target, cost_per_lead_target, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (profile_id, profile.event_id, profile.target_age_min, profile.target_age_max, profile.target_education_level, profile.target_locations, profile.message_themes, profile.contact_frequency, profile.conversion_target, profile.cost_per_lead_target, now, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO targeting_profiles (profile_id, event_id, target_age_min, target_age_max, target_education_level, target_locations, message_themes, contact_frequency, conversion_target, cost_per_lead_target, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (profile_id, profile.event_id, profile.target_age_min, profile.target_age_max, profile.target_education_level, profile.target_locations, profile.message_themes, profile.contact_frequency, profile.conversion_target, profile.cost_per_lead_target, now, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {"status": "ok", "profile_id": profile_id}
 
 
@@ -1643,8 +1751,10 @@ def get_forecast(quarter: int, year: int):
 
 
 @app.post("/api/v2/forecasts/generate")
-def generate_forecast(quarter: int, year: int):
+def generate_forecast(quarter: int, year: int, background: bool = False):
     """Trigger forecast generation (can use historical data or ML model)."""
+    if background:
+        return queue_job("generate_forecast", generate_forecast, quarter, year, params={"quarter": quarter, "year": year})
     import uuid
     forecast_id = f"fct_{uuid.uuid4().hex[:12]}"
     now = datetime.utcnow().isoformat()
@@ -1654,6 +1764,7 @@ def generate_forecast(quarter: int, year: int):
     cur = conn.cursor()
     cur.execute("SELECT COUNT(*), AVG(conversion_count), AVG(roi) FROM event_metrics")
     row = cur.fetchone()
+    conn.close()
     
     total_events = row[0] or 1
     avg_conversions = row[1] or 5
@@ -1665,15 +1776,15 @@ def generate_forecast(quarter: int, year: int):
     projected_roi = avg_roi
     confidence = 0.75
     
-    cur.execute(
-        """
-        INSERT OR REPLACE INTO forecasts (forecast_id, quarter, year, projected_leads, projected_conversions, projected_roi, confidence_level, methodology, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (forecast_id, quarter, year, projected_leads, projected_conversions, projected_roi, confidence, "historical_average", now, now),
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT OR REPLACE INTO forecasts (forecast_id, quarter, year, projected_leads, projected_conversions, projected_roi, confidence_level, methodology, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (forecast_id, quarter, year, projected_leads, projected_conversions, projected_roi, confidence, "historical_average", now, now),
+        )
     )
-    conn.commit()
-    conn.close()
     return {
         "status": "ok",
         "forecast_id": forecast_id,
@@ -1722,29 +1833,26 @@ def get_dashboard_snapshot():
 def record_marketing_activity(data: MarketingActivityCreate):
     """Record marketing activity metrics (impressions, engagement, awareness, activation)."""
     import uuid
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
     activity_id = f"mkt_{uuid.uuid4().hex[:12]}"
     now = datetime.now().isoformat()
     
-    cur.execute(
-        """
-        INSERT INTO marketing_activities 
-        (activity_id, event_id, activity_type, campaign_name, channel, data_source, 
-         impressions, engagement_count, awareness_metric, activation_conversions, 
-         reporting_date, metadata, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            activity_id, data.event_id, data.activity_type, data.campaign_name, 
-            data.channel, data.data_source, data.impressions, data.engagement_count, 
-            data.awareness_metric, data.activation_conversions, data.reporting_date, 
-            data.metadata, now, now
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO marketing_activities 
+            (activity_id, event_id, activity_type, campaign_name, channel, data_source, 
+             impressions, engagement_count, awareness_metric, activation_conversions, 
+             reporting_date, metadata, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                activity_id, data.event_id, data.activity_type, data.campaign_name, 
+                data.channel, data.data_source, data.impressions, data.engagement_count, 
+                data.awareness_metric, data.activation_conversions, data.reporting_date, 
+                data.metadata, now, now
+            )
         )
     )
-    conn.commit()
-    conn.close()
     
     return {"status": "ok", "activity_id": activity_id}
 
@@ -1841,80 +1949,21 @@ def get_kpis(event_id: Optional[str] = None, start_date: Optional[str] = None, e
 
     - If `event_id` provided, scope to that event.
     - Optionally filter by `start_date`/`end_date` (reporting_date on activities).
-    - `segment_key` and `segment_value` perform a simple substring match against serialized segment JSON in `segment_profiles`.
+    - `segment_key` and `segment_value` restrict the segment breakdown to events whose segment profile has that value,
+      looked up through the indexed `segment_attributes` table.
     """
     conn = get_db_conn()
     cur = conn.cursor()
 
-    params = []
-    where_clauses = []
-
-    if event_id:
-        where_clauses.append("ma.event_id = ?")
-        params.append(event_id)
-
-    if data_source:
-        where_clauses.append("ma.data_source = ?")
-        params.append(data_source)
-
-    if start_date:
-        where_clauses.append("ma.reporting_date >= ?")
-        params.append(start_date)
-    if end_date:
-        where_clauses.append("ma.reporting_date <= ?")
-        params.append(end_date)
-
-    base_where = ""
-    if where_clauses:
-        base_where = "WHERE " + " AND ".join(where_clauses)
-
-    # Aggregate activity-level sums
-    query = f"SELECT SUM(ma.cost) as total_cost, SUM(ma.impressions) as impressions, SUM(ma.engagement_count) as engagements, SUM(ma.activation_conversions) as activations FROM marketing_activities ma {base_where}"
-    cur.execute(query, params)
-    row = cur.fetchone()
-    total_cost = row[0] or 0.0
-    total_impressions = row[1] or 0
-    total_engagements = row[2] or 0
-    total_activations = row[3] or 0
-
-    # Include budgets for event-level if event_id provided
-    budget_total = 0.0
-    if event_id:
-        cur.execute("SELECT SUM(allocated_amount) FROM budgets WHERE event_id = ?", (event_id,))
-        brow = cur.fetchone()
-        if brow and brow[0]:
-            budget_total = brow[0]
-
-    # Combine costs (activity-level cost + budgets)
-    combined_cost = float(total_cost or 0.0) + float(budget_total or 0.0)
-
-    # Compute derived KPIs with safe guards
-    cpl = (combined_cost / total_activations) if total_activations > 0 else None
-    cpe = (combined_cost / total_engagements) if total_engagements > 0 else None
-    cpc = (combined_cost / total_impressions) if total_impressions > 0 else None
+    where_clauses, params = activity_filters(event_id, data_source, start_date, end_date)
+    result = {"status": "ok"}
+    result.update(kpi_totals(conn, event_id, data_source, start_date, end_date))
 
-    result = {
-        "status": "ok",
-        "total_cost": combined_cost,
-        "budget_total": budget_total,
-        "activity_cost": total_cost,
-        "total_impressions": total_impressions,
-        "total_engagements": total_engagements,
-        "total_activations": total_activations,
-        "cpl": round(cpl, 2) if cpl is not None else None,
-        "cpe": round(cpe, 2) if cpe is not None else None,
-        "cpc": round(cpc, 4) if cpc is not None else None,
-    }
-
-    # If segment filter provided, compute segment-level KPIs by joining segment_profiles
+    # If segment filter provided, compute segment-level KPIs for activities whose event_id has a matching profile
     if segment_key and segment_value:
-        seg_clause = f"AND sp.segments LIKE ?"
-        seg_param = f'%"{segment_key}": "{segment_value}"%'
-        # Need to run a join query
-        seg_query = f"SELECT SUM(ma.cost) as total_cost, SUM(ma.impressions) as impressions, SUM(ma.engagement_count) as engagements, SUM(ma.activation_conversions) as activations FROM marketing_activities ma JOIN segment_profiles sp ON sp.lead_id = ma.event_id {('WHERE ' + ' AND '.join(where_clauses) + ' ') if where_clauses else 'WHERE '} AND sp.segments LIKE ?"
-        # Build params for seg_query
-        seg_params = params.copy()
-        seg_params.append(seg_param)
+        seg_clause, seg_params = segment_filter(segment_key, segment_value, "ma.event_id")
+        seg_query = f"SELECT SUM(ma.cost) as total_cost, SUM(ma.impressions) as impressions, SUM(ma.engagement_count) as engagements, SUM(ma.activation_conversions) as activations FROM marketing_activities ma WHERE {' AND '.join(where_clauses + [seg_clause])}"
+        seg_params = params + seg_params
         try:
             cur.execute(seg_query, seg_params)
             srow = cur.fetchone()
@@ -1944,15 +1993,9 @@ def get_kpis(event_id: Optional[str] = None, start_date: Optional[str] = None, e
     return result
 
 
-def _stream_csv(rows, headers):
-    """Helper to stream CSV from rows (iterable of dict) and headers list."""
-    buffer = io.StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=headers)
-    writer.writeheader()
-    for r in rows:
-        writer.writerow({k: r.get(k, "") for k in headers})
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="text/csv")
+def _stream_csv(rows, headers, compress: bool = False):
+    """Helper to stream CSV from rows (iterable of dict) and headers list, encoded as the client reads it."""
+    return csv_response(iter_dicts_csv(rows, headers, compress=compress), compress=compress)
 
 
 # --- Simple token-based auth for export endpoints ---
@@ -1971,6 +2014,7 @@ def _verify_export_token(request: Request):
 
 
 # --- Export scheduler (background thread) ---
+EXPORTS_DIR = os.path.join(os.path.dirname(__file__), "exports")
 _export_scheduler = {"thread": None, "stop_event": None, "interval": None}
 
 
@@ -1978,8 +2022,8 @@ def _export_worker(interval: int, stop_event: "threading.Event"):
     import time
     while not stop_event.is_set():
         try:
-            # call internal export runner
-            run_exports()
+            # incremental: skips unchanged data and rewrites only changed activity months
+            export_incremental(DB_FILE, EXPORTS_DIR)
         except Exception:
             logging.exception("Scheduled export failed")
         # wait for interval or stop
@@ -1993,8 +2037,6 @@ def export_activities_csv(event_id: Optional[str] = None, data_source: Optional[
     """Return a CSV of marketing activities optionally filtered by event_id or data_source."""
     if request is not None:
         _verify_export_token(request)
-    conn = get_db_conn()
-    cur = conn.cursor()
     params = []
     where = []
     if event_id:
@@ -2007,11 +2049,10 @@ def export_activities_csv(event_id: Optional[str] = None, data_source: Optional[
     q = "SELECT ma.activity_id, ma.event_id, ma.activity_type, ma.campaign_name, ma.channel, ma.data_source, ma.impressions, ma.engagement_count, ma.awareness_metric, ma.activation_conversions, ma.cost, ma.reporting_date, ma.metadata, ma.created_at, (SELECT sp.segments FROM segment_profiles sp WHERE sp.lead_id = ma.event_id LIMIT 1) as segments, (SELECT sp.attributes FROM segment_profiles sp WHERE sp.lead_id = ma.event_id LIMIT 1) as attributes FROM marketing_activities ma"
     if where:
         q += " WHERE " + " AND ".join(where)
-    cur.execute(q, params)
-    rows = [dict(row) for row in cur.fetchall()]
-    conn.close()
     headers = ["activity_id", "event_id", "activity_type", "campaign_name", "channel", "data_source", "impressions", "engagement_count", "awareness_metric", "activation_conversions", "cost", "reporting_date", "metadata", "created_at", "segments", "attributes"]
-    return _stream_csv(rows, headers)
+    # rows are read with fetchmany while the response is sent, so full-history exports stay flat in memory
+    gz = accepts_gzip(request)
+    return csv_response(iter_query_csv(DB_FILE, q, params, headers=headers, compress=gz), compress=gz)
 
 
 @app.get("/api/v2/exports/kpis.csv")
@@ -2019,102 +2060,32 @@ def export_kpis_csv(event_id: Optional[str] = None, request: Request = None):
     """Return a CSV with KPI rows (per event or overall)."""
     if request is not None:
         _verify_export_token(request)
+    gz = accepts_gzip(request)
     conn = get_db_conn()
-    cur = conn.cursor()
-    if event_id:
-        cur.execute("SELECT event_id FROM events WHERE event_id = ?", (event_id,))
-        if not cur.fetchone():
-            conn.close()
-            raise HTTPException(status_code=404, detail="event not found")
-        # return a single-row CSV for the event
-        kpi = get_kpis(event_id=event_id)
-        row = {
-            "event_id": event_id,
-            "total_cost": kpi.get("total_cost"),
-            "activity_cost": kpi.get("activity_cost"),
-            "budget_total": kpi.get("budget_total"),
-            "total_impressions": kpi.get("total_impressions"),
-            "total_engagements": kpi.get("total_engagements"),
-            "total_activations": kpi.get("total_activations"),
-            "cpl": kpi.get("cpl"),
-            "cpe": kpi.get("cpe"),
-            "cpc": kpi.get("cpc"),
-        }
+    try:
+        if event_id:
+            # return a single-row CSV for the event
+            rows = event_kpis(conn, [event_id])
+            if not rows:
+                raise HTTPException(status_code=404, detail="event not found")
+        else:
+            # otherwise, return KPIs for all events (one grouped query)
+            rows = event_kpis(conn)
+    finally:
         conn.close()
-        return _stream_csv([row], list(row.keys()))
-    # otherwise, return KPIs for all events
-    cur.execute("SELECT event_id FROM events")
-    events = [r[0] for r in cur.fetchall()]
-    rows = []
-    for ev in events:
-        kpi = get_kpis(event_id=ev)
-        rows.append({
-            "event_id": ev,
-            "total_cost": kpi.get("total_cost"),
-            "activity_cost": kpi.get("activity_cost"),
-            "budget_total": kpi.get("budget_total"),
-            "total_impressions": kpi.get("total_impressions"),
-            "total_engagements": kpi.get("total_engagements"),
-            "total_activations": kpi.get("total_activations"),
-            "cpl": kpi.get("cpl"),
-            "cpe": kpi.get("cpe"),
-            "cpc": kpi.get("cpc"),
-        })
-    conn.close()
-    headers = ["event_id", "total_cost", "activity_cost", "budget_total", "total_impressions", "total_engagements", "total_activations", "cpl", "cpe", "cpc"]
-    return _stream_csv(rows, headers)
+    return _stream_csv(rows, KPI_EXPORT_HEADERS, compress=gz)
 
 
 @app.post("/api/v2/exports/run")
-def run_exports(request: Request = None):
+def run_exports(request: Request = None, background: bool = False):
     """Run exports and write CSV files to the `exports/` folder inside project root."""
     if request is not None:
         _verify_export_token(request)
-    exports_dir = Path(os.path.join(os.path.dirname(__file__), "exports"))
-    exports_dir.mkdir(parents=True, exist_ok=True)
-    # Write activities.csv
-    act_resp = export_activities_csv()
-    # act_resp is a StreamingResponse backed by StringIO; read its body
-    act_body = act_resp.body_iterator
-    # To write, call export endpoint logic directly to obtain rows
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT activity_id, event_id, activity_type, campaign_name, channel, data_source, impressions, engagement_count, awareness_metric, activation_conversions, cost, reporting_date, metadata, created_at FROM marketing_activities")
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    activities_path = exports_dir / "activities.csv"
-    with activities_path.open("w", newline='') as fh:
-        writer = csv.DictWriter(fh, fieldnames=["activity_id", "event_id", "activity_type", "campaign_name", "channel", "data_source", "impressions", "engagement_count", "awareness_metric", "activation_conversions", "cost", "reporting_date", "metadata", "created_at"]) 
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
-
-    # Write kpis.csv
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT event_id FROM events")
-    events = [r[0] for r in cur.fetchall()]
-    kpis_path = exports_dir / "kpis.csv"
-    with kpis_path.open("w", newline='') as fh:
-        headers = ["event_id", "total_cost", "activity_cost", "budget_total", "total_impressions", "total_engagements", "total_activations", "cpl", "cpe", "cpc"]
-        writer = csv.DictWriter(fh, fieldnames=headers)
-        writer.writeheader()
-        for ev in events:
-            kpi = get_kpis(event_id=ev)
-            writer.writerow({
-                "event_id": ev,
-                "total_cost": kpi.get("total_cost"),
-                "activity_cost": kpi.get("activity_cost"),
-                "budget_total": kpi.get("budget_total"),
-                "total_impressions": kpi.get("total_impressions"),
-                "total_engagements": kpi.get("total_engagements"),
-                "total_activations": kpi.get("total_activations"),
-                "cpl": kpi.get("cpl"),
-                "cpe": kpi.get("cpe"),
-                "cpc": kpi.get("cpc"),
-            })
-
-    return {"status": "ok", "exports": [str(activities_path), str(kpis_path)]}
+    if background:
+        return queue_job("run_exports", run_exports)
+    # a manual run rebuilds every partition; the scheduler only refreshes what changed
+    result = export_incremental(DB_FILE, EXPORTS_DIR, force=True)
+    return {"status": "ok", "exports": result["exports"], "partitions_written": result["partitions_written"]}
 
 
 @app.post("/api/v2/exports/schedule")
@@ -2151,51 +2122,64 @@ def stop_export_scheduler(request: Request = None):
     return {"status": "ok", "message": "scheduler stopped"}
 
 
-@app.get("/api/v2/odata/activities")
-def odata_activities(select: Optional[str] = None, filter: Optional[str] = None, top: Optional[int] = None, skip: Optional[int] = None, request: Request = None):
-    """Simple OData-like endpoint for marketing activities supporting select, filter (single equality), top, skip.
+@app.get("/api/v2/odata/{entity_set}")
+def odata_query(
+    entity_set: str,
+    request: Request,
+    select_: Optional[str] = Query(None, alias="$select"),
+    filter_: Optional[str] = Query(None, alias="$filter"),
+    orderby: Optional[str] = Query(None, alias="$orderby"),
+    top_: Optional[int] = Query(None, alias="$top"),
+    skip_: Optional[int] = Query(None, alias="$skip"),
+    skiptoken: Optional[str] = Query(None, alias="$skiptoken"),
+    count: bool = Query(False, alias="$count"),
+    select: Optional[str] = None,
+    filter: Optional[str] = None,
+    top: Optional[int] = None,
+    skip: Optional[int] = None,
+):
+    """OData v4 feed (activities, leads, events, projects) for Power BI; see backend/odata for the supported subset.
 
-    Example: /api/v2/odata/activities?select=activity_id,activity_type&filter=activity_type eq 'social_media'&top=10
+    Example: /api/v2/odata/activities?$select=activity_id,cost&$filter=data_source eq 'emm' and cost gt 100&$orderby=reporting_date desc&$count=true
+    The un-prefixed select/filter/top/skip parameters of the earlier endpoint are still accepted.
     """
-    if request is not None:
-        _verify_export_token(request)
+    _verify_export_token(request)
+    entity = ODATA_ENTITY_SETS.get(entity_set)
+    if entity is None:
+        raise HTTPException(status_code=404, detail=f"Unknown entity set: {entity_set}")
+    schema = get_schema(DB_FILE)
+    if not schema.has_table(entity.table):
+        raise HTTPException(status_code=404, detail=f"Entity set {entity_set} has no table in this database")
+    top = top_ if top_ is not None else top
+    try:
+        query = compile_odata(
+            entity, schema.columns(entity.table),
+            select=select_ or select, filter=filter_ or filter, orderby=orderby,
+            top=top, skip=skip_ if skip_ is not None else skip, skiptoken=skiptoken,
+        )
+    except ODataError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     conn = get_db_conn()
-    cur = conn.cursor()
-
-    allowed_cols = {"activity_id", "event_id", "activity_type", "campaign_name", "channel", "data_source", "impressions", "engagement_count", "reporting_date", "cost"}
-
-    if select:
-        cols = [c.strip() for c in select.split(',') if c.strip() and c.strip() in allowed_cols]
-        if not cols:
-            cols = ["activity_id", "event_id", "activity_type", "campaign_name", "channel", "data_source", "impressions", "engagement_count", "reporting_date"]
+    try:
+        result = run_odata(conn, query, count=count)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=400, detail=f"Query failed: {e}")
+    finally:
+        conn.close()
 
-    params = []
-    where_clauses = []
-    if filter:
-        parts = filter.split(" eq ")
-        if len(parts) == 2:
-            field = parts[0].strip()
-            val = parts[1].strip().strip("'\"")
-            if field in allowed_cols:
-                where_clauses.append(f"{field} = ?")
-                params.append(val)
-
-    q = f"SELECT {', '.join(cols)} FROM marketing_activities"
-    if where_clauses:
-        q += " WHERE " + " AND ".join(where_clauses)
-
-    if top is not None:
-        q += f" LIMIT {top}"
-    if skip is not None:
-        if "LIMIT" in q:
-            q += f" OFFSET {skip}"
-        else:
-            q += f" LIMIT -1 OFFSET {skip}"
-
-    cur.execute(q, params)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return {"count": len(rows), "items": rows}
+    # no @odata.context: this feed serves no $metadata document for it to point at
+    body = {}
+    if count:
+        body["@odata.count"] = result["count"]
+    body["value"] = result["value"]
+    if result["skiptoken"]:
+        # keyset paging replaces any offset; $top shrinks by what this page returned
+        url = request.url.remove_query_params(["$skip", "skip", "$skiptoken", "top", "$top", "$count"])
+        extra = {"$skiptoken": result["skiptoken"]}
+        if query.remaining is not None:
+            extra["$top"] = query.remaining
+        body["@odata.nextLink"] = str(url.include_query_params(**extra))
+    return body
 
 
 @app.get("/api/v2/marketing/sources")
@@ -2213,127 +2197,62 @@ def get_data_sources():
 
 
 @app.post("/api/v2/marketing/sync")
-def sync_data_source(data: DataSourceSync):
-    """Sync data from a USAREC data source (EMM, iKrome, Vantage, G2, AIEM, USAREC Systems)."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
-    now = datetime.now().isoformat()
-    
-    # Validate data source
-    cur.execute("SELECT mapping_id FROM data_source_mappings WHERE source_system = ?", (data.source_system,))
-    if not cur.fetchone():
-        conn.close()
-        return {"status": "error", "message": f"Unknown data source: {data.source_system}"}
-    
-    # Update sync status
-    cur.execute(
-        "UPDATE data_source_mappings SET last_sync = ?, sync_status = ?, updated_at = ? WHERE source_system = ?",
-        (now, "synced", now, data.source_system)
-    )
-    
-    # Parse incoming data and create marketing activities
-    activities_created = 0
-    if isinstance(data.sync_data, dict):
-        for key, value in data.sync_data.items():
-            if isinstance(value, dict) and all(k in value for k in ['campaign', 'impressions', 'engagement']):
-                import uuid
-                activity_id = f"mkt_{uuid.uuid4().hex[:12]}"
-                
-                cur.execute(
-                    """
-                    INSERT INTO marketing_activities 
-                    (activity_id, activity_type, campaign_name, channel, data_source, 
-                     impressions, engagement_count, awareness_metric, activation_conversions, 
-                     reporting_date, metadata, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        activity_id, value.get('type', 'sync'), value.get('campaign', key), 
-                        value.get('channel', key), data.source_system,
-                        int(value.get('impressions', 0)), int(value.get('engagement', 0)),
-                        float(value.get('awareness', 0.0)), int(value.get('activation', 0)),
-                        datetime.now().date().isoformat(), json.dumps(value),
-                        now, now
-                    )
-                )
-                activities_created += 1
-    
-    conn.commit()
-    conn.close()
-    
-    return {
-        "status": "ok",
-        "source": data.source_system,
-        "activities_created": activities_created,
-        "sync_timestamp": now
-    }
-
-
-@app.get("/api/v2/marketing/funnel-attribution")
-def get_funnel_attribution(data_source: Optional[str] = None):
-    """Get marketing attribution by recruiting funnel stage."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
-    if data_source:
-        cur.execute(
-            """
-            SELECT 
-                fs.stage_name,
-                COUNT(DISTINCT ft.lead_id) as leads_in_stage,
-                SUM(ma.impressions) as total_impressions,
-                SUM(ma.engagement_count) as total_engagement,
-                AVG(ma.awareness_metric) as avg_awareness,
-                SUM(ma.activation_conversions) as activations
-            FROM funnel_stages fs
-            LEFT JOIN funnel_transitions ft ON fs.stage_id = ft.to_stage
-            LEFT JOIN marketing_activities ma ON ma.data_source = ?
-            GROUP BY fs.stage_id, fs.stage_name
-            ORDER BY fs.sequence_order
-            """,
-            (data_source,)
-        )
-    else:
-        cur.execute(
-            """
-            SELECT 
-                fs.stage_name,
-                COUNT(DISTINCT ft.lead_id) as leads_in_stage,
-                SUM(ma.impressions) as total_impressions,
-                SUM(ma.engagement_count) as total_engagement,
-                AVG(ma.awareness_metric) as avg_awareness,
-                SUM(ma.activation_conversions) as activations
-            FROM funnel_stages fs
-            LEFT JOIN funnel_transitions ft ON fs.stage_id = ft.to_stage
-            LEFT JOIN marketing_activities ma ON 1=1
-            GROUP BY fs.stage_id, fs.stage_name
-            ORDER BY fs.sequence_order
-            """
-        )
-    
-    rows = cur.fetchall()
-    conn.close()
-    
-    attribution = [
-        {
-            "stage": row[0],
-            "leads_in_stage": row[1] or 0,
-            "impressions": row[2] or 0,
-            "engagement": row[3] or 0,
-            "awareness": round(row[4] or 0.0, 2),
-            "activations": row[5] or 0
-        }
-        for row in rows
-    ]
-    
-    return {"status": "ok", "attribution": attribution}
+def sync_data_source(data: DataSourceSync):
+    """Sync data from a USAREC data source (EMM, iKrome, Vantage, G2, AIEM, USAREC Systems).
+
+    Items are upserted on (data_source, source key, reporting_date) in one transaction, so re-sent
+    batches update or skip rows instead of duplicating them (see backend/marketing_sync.py).
+    """
+    result = db_write(apply_sync, data.source_system, data.sync_data, data.watermark)
+    if result["status"] == "ok":
+        result["activities_created"] = result["inserted"]
+    return result
+
+
+def _attribution_conn(model: str):
+    if model not in ATTRIBUTION_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown attribution model: {model}")
+    conn = get_db_conn()
+    if attribution_pending(conn):
+        # transitions imported without going through record_funnel_transition
+        db_write(refresh_attribution)
+    return conn
+
+
+@app.get("/api/v2/marketing/funnel-attribution")
+def get_funnel_attribution(data_source: Optional[str] = None, model: str = "linear"):
+    """Get marketing attribution by recruiting funnel stage (first_touch, last_touch or linear; see backend/attribution.py)."""
+    conn = _attribution_conn(model)
+    try:
+        attribution = stage_attribution(conn, model, data_source)
+    finally:
+        conn.close()
+    return {"status": "ok", "model": model, "attribution": attribution}
+
+
+@app.get("/api/v2/marketing/attribution")
+def get_activity_attribution(model: str = "linear", data_source: Optional[str] = None, stage: Optional[str] = None, limit: int = 100):
+    """Marketing activities ranked by the funnel-transition credit they received."""
+    conn = _attribution_conn(model)
+    try:
+        activities = activity_attribution(conn, model, data_source, stage, max(1, min(limit, 1000)))
+    finally:
+        conn.close()
+    return {"status": "ok", "model": model, "activities": activities}
+
+
+@app.post("/api/v2/admin/attribution/rebuild")
+def rebuild_attribution_endpoint():
+    """Recompute all attribution credits, e.g. after touchpoints or activities were back-loaded."""
+    transitions = db_write(rebuild_attribution)
+    return {"status": "ok", "transitions": transitions}
 
 
 # === AI PIPELINE ENDPOINTS ===
 
 @app.post("/api/v2/ai/train")
-async def train_ai_model(request: Request):
+@offload
+def train_ai_model(request: Request):
     """Train lead propensity model on historical leads from database."""
     try:
         from taaip_ai_pipeline import train_lead_propensity_model
@@ -2368,7 +2287,7 @@ async def predict_leads(request: Request):
         if not leads:
             return {"status": "error", "message": "No leads provided"}
         
-        predictions = predict_lead_propensity(leads)
+        predictions = await run_db(predict_lead_propensity, leads)
         return {
             "status": "ok",
             "predictions": predictions,
@@ -2387,7 +2306,8 @@ async def predict_leads(request: Request):
 
 
 @app.get("/api/v2/ai/model-status")
-async def get_model_status():
+@offload
+def get_model_status():
     """Get current AI model status and metadata."""
     try:
         from taaip_ai_pipeline import get_model_status
@@ -2424,7 +2344,7 @@ async def enroll_user_lms(request: Request):
             return {"status": "error", "message": "user_id and course_id required"}
         
         lms = get_lms_manager(DB_FILE)
-        enrollment_id = lms.enroll_user(user_id, course_id)
+        enrollment_id = await run_db(lms.enroll_user, user_id, course_id)
         
         return {
             "status": "ok",
@@ -2456,7 +2376,7 @@ async def update_lms_progress(request: Request):
             return {"status": "error", "message": "progress_percent must be 0-100"}
         
         lms = get_lms_manager(DB_FILE)
-        lms.update_progress(enrollment_id, progress_percent)
+        await run_db(lms.update_progress, enrollment_id, progress_percent)
         
         return {
             "status": "ok",
@@ -2472,7 +2392,8 @@ async def update_lms_progress(request: Request):
 
 
 @app.get("/api/v2/lms/enrollments/{user_id}")
-async def get_user_enrollments(user_id: str):
+@offload
+def get_user_enrollments(user_id: str):
     """Get all courses enrolled by a user."""
     try:
         from taaip_lms import get_lms_manager
@@ -2493,7 +2414,8 @@ async def get_user_enrollments(user_id: str):
 
 
 @app.get("/api/v2/lms/stats")
-async def get_lms_stats():
+@offload
+def get_lms_stats():
     """Get overall LMS statistics."""
     try:
         from taaip_lms import get_lms_manager
@@ -2512,12 +2434,13 @@ async def get_lms_stats():
 
 
 @app.get("/api/v2/lms/courses")
-async def get_all_courses():
+@offload
+def get_all_courses():
     """Get all available courses."""
     try:
         from taaip_lms import get_lms_manager
         lms = get_lms_manager(DB_FILE)
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_db_conn()
         cur = conn.cursor()
         cur.execute("SELECT course_id, title, description FROM courses ORDER BY created_at DESC")
         courses = [{"course_id": row[0], "title": row[1], "description": row[2]} for row in cur.fetchall()]
@@ -2767,10 +2690,8 @@ def get_analytics_overview():
     conn = get_db_conn()
     cur = conn.cursor()
     
-    # Inspect columns to choose score field dynamically
-    cur.execute("PRAGMA table_info(leads)")
-    lead_cols = {row[1] for row in cur.fetchall()}
-    score_col = 'propensity_score' if 'propensity_score' in lead_cols else ('score' if 'score' in lead_cols else None)
+    # Choose score field dynamically
+    score_col = get_schema(DB_FILE).resolve("leads", "score")
     
     # Get lead statistics
     if score_col:
@@ -2841,13 +2762,7 @@ def get_all_projects(status: Optional[str] = None):
     cur = conn.cursor()
     
     # detect whether the `is_archived` column exists in the schema
-    try:
-        cur.execute("PRAGMA table_info(projects)")
-        cols = [r['name'] for r in cur.fetchall()]
-    except Exception:
-        cols = []
-
-    has_is_archived = 'is_archived' in cols
+    has_is_archived = get_schema(DB_FILE).has_column("projects", "is_archived")
 
     params: List[Any] = []
     if has_is_archived:
@@ -2938,9 +2853,6 @@ def get_project_detail(project_id: str):
 @app.put("/api/v2/projects/{project_id}")
 def update_project(project_id: str, updates: Dict[str, Any]):
     """Update project details including status, budget, progress."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
     # Build dynamic update query
     set_parts = []
     values = []
@@ -2954,9 +2866,7 @@ def update_project(project_id: str, updates: Dict[str, Any]):
     values.append(project_id)
     
     query = f"UPDATE projects SET {', '.join(set_parts)} WHERE project_id = ?"
-    cur.execute(query, values)
-    conn.commit()
-    conn.close()
+    db_write(lambda conn: conn.execute(query, values))
     
     return {"status": "ok", "message": "Project updated successfully"}
 
@@ -2965,21 +2875,18 @@ def update_project(project_id: str, updates: Dict[str, Any]):
 def create_milestone(project_id: str, milestone: Dict[str, Any]):
     """Create a project milestone."""
     import uuid
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
     milestone_id = f"ms_{uuid.uuid4().hex[:12]}"
     now = datetime.now().isoformat()
     
-    cur.execute(
-        """
-        INSERT INTO milestones (milestone_id, project_id, name, target_date, created_at, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (milestone_id, project_id, milestone.get('name'), milestone.get('target_date'), now, now)
+    db_write(
+        lambda conn: conn.execute(
+            """
+            INSERT INTO milestones (milestone_id, project_id, name, target_date, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (milestone_id, project_id, milestone.get('name'), milestone.get('target_date'), now, now)
+        )
     )
-    conn.commit()
-    conn.close()
     
     return {"status": "ok", "milestone_id": milestone_id}
 
@@ -2987,9 +2894,6 @@ def create_milestone(project_id: str, milestone: Dict[str, Any]):
 @app.put("/api/v2/projects/{project_id}/milestones/{milestone_id}")
 def update_milestone(project_id: str, milestone_id: str, updates: Dict[str, Any]):
     """Update milestone (e.g., mark as completed)."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
     set_parts = []
     values = []
     
@@ -3002,9 +2906,7 @@ def update_milestone(project_id: str, milestone_id: str, updates: Dict[str, Any]
     values.append(milestone_id)
     
     query = f"UPDATE milestones SET {', '.join(set_parts)} WHERE milestone_id = ?"
-    cur.execute(query, values)
-    conn.commit()
-    conn.close()
+    db_write(lambda conn: conn.execute(query, values))
     
     return {"status": "ok", "message": "Milestone updated"}
 
@@ -3039,9 +2941,6 @@ def get_project_tasks(project_id: str, status: Optional[str] = None):
 @app.post("/api/v2/projects/{project_id}/budget")
 def update_project_budget(project_id: str, budget_update: Dict[str, Any]):
     """Update project budget/spending."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
     spent_amount = budget_update.get('spent_amount')
     funding_amount = budget_update.get('funding_amount')
     
@@ -3062,10 +2961,7 @@ def update_project_budget(project_id: str, budget_update: Dict[str, Any]):
         values.append(project_id)
         
         query = f"UPDATE projects SET {', '.join(updates)} WHERE project_id = ?"
-        cur.execute(query, values)
-        conn.commit()
-    
-    conn.close()
+        db_write(lambda conn: conn.execute(query, values))
     
     return {"status": "ok", "message": "Budget updated"}
 
@@ -3090,6 +2986,16 @@ async def _broadcast_project_budget(project_id: str, payload: Dict[str, Any]):
             pass
 
 
+def _fetch_project_budget(project_id: str):
+    conn = get_db_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT funding_amount, spent_amount FROM projects WHERE project_id = ?", (project_id,))
+        return cur.fetchone()
+    finally:
+        conn.close()
+
+
 @app.websocket("/api/v2/projects/{project_id}/ws/budget")
 async def project_budget_ws(websocket: WebSocket, project_id: str):
     """WebSocket endpoint to receive live budget updates for a project."""
@@ -3098,10 +3004,7 @@ async def project_budget_ws(websocket: WebSocket, project_id: str):
     subs.append(websocket)
     try:
         # Send initial snapshot
-        conn = get_db_conn()
-        cur = conn.cursor()
-        cur.execute("SELECT funding_amount, spent_amount FROM projects WHERE project_id = ?", (project_id,))
-        row = cur.fetchone()
+        row = await run_db(_fetch_project_budget, project_id)
         if row:
             snap = {
                 "type": "snapshot",
@@ -3139,99 +3042,94 @@ def add_project_budget_transaction(project_id: str, txn: Dict[str, Any]):
     """
     import uuid
 
-    conn = get_db_conn()
-    cur = conn.cursor()
-
-    # ensure supporting tables
-    cur.execute(
-        """CREATE TABLE IF NOT EXISTS budget_transactions (
-            txn_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            amount REAL,
-            type TEXT,
-            description TEXT,
-            created_at TEXT
-        )"""
-    )
-    cur.execute(
-        """CREATE TABLE IF NOT EXISTS roi_records (
-            roi_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            benefit_est REAL,
-            total_spent REAL,
-            roi REAL,
-            computed_at TEXT
-        )"""
-    )
-
     now = datetime.now().isoformat()
     txn_id = f"txn_{uuid.uuid4().hex[:12]}"
     amount = float(txn.get("amount", 0) or 0)
     ttype = txn.get("type", "spend")
     desc = txn.get("description")
 
-    cur.execute(
-        "INSERT INTO budget_transactions (txn_id, project_id, amount, type, description, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (txn_id, project_id, amount, ttype, desc, now),
-    )
+    def _apply(conn):
+        cur = conn.cursor()
 
-    # reflect change on project record if columns exist
-    try:
-        cur.execute("PRAGMA table_info(projects)")
-        pcols = [r[1] for r in cur.fetchall()]
-    except Exception:
-        pcols = []
+        # ensure supporting tables
+        cur.execute(
+            """CREATE TABLE IF NOT EXISTS budget_transactions (
+                txn_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                amount REAL,
+                type TEXT,
+                description TEXT,
+                created_at TEXT
+            )"""
+        )
+        cur.execute(
+            """CREATE TABLE IF NOT EXISTS roi_records (
+                roi_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                benefit_est REAL,
+                total_spent REAL,
+                roi REAL,
+                computed_at TEXT
+            )"""
+        )
 
-    if ttype == "spend" and "spent_amount" in pcols:
-        cur.execute("UPDATE projects SET spent_amount = COALESCE(spent_amount, 0) + ?, updated_at = ? WHERE project_id = ?", (amount, now, project_id))
-    elif ttype == "fund" and "funding_amount" in pcols:
-        cur.execute("UPDATE projects SET funding_amount = COALESCE(funding_amount, 0) + ?, updated_at = ? WHERE project_id = ?", (amount, now, project_id))
+        cur.execute(
+            "INSERT INTO budget_transactions (txn_id, project_id, amount, type, description, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (txn_id, project_id, amount, ttype, desc, now),
+        )
 
-    conn.commit()
+        # reflect change on project record if columns exist
+        pcols = get_schema(DB_FILE).columns("projects")
 
-    # Recompute ROI: estimate benefit = benefit_per_participant * participant_count
-    cur.execute("SELECT spent_amount, funding_amount, metadata FROM projects WHERE project_id = ?", (project_id,))
-    prow = cur.fetchone()
-    total_spent = float(prow[0] or 0) if prow else 0.0
+        if ttype == "spend" and "spent_amount" in pcols:
+            cur.execute("UPDATE projects SET spent_amount = COALESCE(spent_amount, 0) + ?, updated_at = ? WHERE project_id = ?", (amount, now, project_id))
+        elif ttype == "fund" and "funding_amount" in pcols:
+            cur.execute("UPDATE projects SET funding_amount = COALESCE(funding_amount, 0) + ?, updated_at = ? WHERE project_id = ?", (amount, now, project_id))
 
-    # participant count
-    participant_count = 0
-    try:
-        cur.execute("SELECT COUNT(*) FROM participants WHERE project_id = ?", (project_id,))
-        participant_count = cur.fetchone()[0] or 0
-    except Exception:
-        participant_count = 0
+        # Recompute ROI: estimate benefit = benefit_per_participant * participant_count
+        cur.execute("SELECT spent_amount, funding_amount, metadata FROM projects WHERE project_id = ?", (project_id,))
+        prow = cur.fetchone()
+        total_spent = float(prow[0] or 0) if prow else 0.0
 
-    # default benefit per participant
-    benefit_per_participant = 1000.0
-    # try to read from project columns/metadata
-    try:
-        if prow:
-            # prow[2] is metadata if present
-            if prow[2]:
-                try:
-                    md = json.loads(prow[2])
-                    benefit_per_participant = float(md.get("benefit_per_participant", benefit_per_participant))
-                except Exception:
-                    pass
-    except Exception:
-        pass
+        # participant count
+        participant_count = 0
+        try:
+            cur.execute("SELECT COUNT(*) FROM participants WHERE project_id = ?", (project_id,))
+            participant_count = cur.fetchone()[0] or 0
+        except Exception:
+            participant_count = 0
 
-    benefit_est = benefit_per_participant * (participant_count or 0)
-    roi = None
-    if total_spent > 0:
+        # default benefit per participant
+        benefit_per_participant = 1000.0
+        # try to read from project columns/metadata
         try:
-            roi = round((benefit_est - total_spent) / total_spent, 4)
+            if prow:
+                # prow[2] is metadata if present
+                if prow[2]:
+                    try:
+                        md = json.loads(prow[2])
+                        benefit_per_participant = float(md.get("benefit_per_participant", benefit_per_participant))
+                    except Exception:
+                        pass
         except Exception:
-            roi = None
+            pass
 
-    roi_id = f"roi_{uuid.uuid4().hex[:12]}"
-    cur.execute(
-        "INSERT INTO roi_records (roi_id, project_id, benefit_est, total_spent, roi, computed_at) VALUES (?, ?, ?, ?, ?, ?)",
-        (roi_id, project_id, benefit_est, total_spent, roi, now),
-    )
-    conn.commit()
-    conn.close()
+        benefit_est = benefit_per_participant * (participant_count or 0)
+        roi = None
+        if total_spent > 0:
+            try:
+                roi = round((benefit_est - total_spent) / total_spent, 4)
+            except Exception:
+                roi = None
+
+        roi_id = f"roi_{uuid.uuid4().hex[:12]}"
+        cur.execute(
+            "INSERT INTO roi_records (roi_id, project_id, benefit_est, total_spent, roi, computed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (roi_id, project_id, benefit_est, total_spent, roi, now),
+        )
+        return total_spent, benefit_est, roi
+
+    total_spent, benefit_est, roi = db_write(_apply)
 
     payload = {
         "type": "budget_transaction",
@@ -3244,9 +3142,9 @@ def add_project_budget_transaction(project_id: str, txn: Dict[str, Any]):
         "roi": roi,
     }
 
-    # broadcast to websocket subscribers (best-effort)
+    # broadcast to websocket subscribers (best-effort); may run on a worker thread
     try:
-        asyncio.create_task(_broadcast_project_budget(project_id, payload))
+        call_in_loop(_broadcast_project_budget(project_id, payload))
     except Exception:
         pass
 
@@ -3255,9 +3153,10 @@ def add_project_budget_transaction(project_id: str, txn: Dict[str, Any]):
 
 @app.get("/api/v2/projects/{project_id}/roi")
 def get_project_roi(project_id: str):
+    if not get_schema(DB_FILE).has_table("roi_records"):
+        return {"status": "ok", "count": 0, "records": []}
     conn = get_db_conn()
     cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS roi_records (roi_id TEXT PRIMARY KEY, project_id TEXT, benefit_est REAL, total_spent REAL, roi REAL, computed_at TEXT)")
     cur.execute("SELECT roi_id, benefit_est, total_spent, roi, computed_at FROM roi_records WHERE project_id = ? ORDER BY computed_at DESC", (project_id,))
     rows = cur.fetchall()
     conn.close()
@@ -3270,31 +3169,32 @@ def import_emm_event(project_id: str, payload: Dict[str, Any]):
     """Stub endpoint to import/store EMM event mappings for a project."""
     import uuid
 
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """CREATE TABLE IF NOT EXISTS emm_mappings (
-            mapping_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            source_id TEXT,
-            payload TEXT,
-            created_at TEXT
-        )"""
-    )
     now = datetime.now().isoformat()
     mapping_id = f"emm_{uuid.uuid4().hex[:12]}"
     source_id = payload.get("source_id") or payload.get("emm_id") or None
-    cur.execute("INSERT INTO emm_mappings (mapping_id, project_id, source_id, payload, created_at) VALUES (?, ?, ?, ?, ?)", (mapping_id, project_id, source_id, json.dumps(payload), now))
-    conn.commit()
-    conn.close()
+
+    def _store(conn):
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS emm_mappings (
+                mapping_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                source_id TEXT,
+                payload TEXT,
+                created_at TEXT
+            )"""
+        )
+        conn.execute("INSERT INTO emm_mappings (mapping_id, project_id, source_id, payload, created_at) VALUES (?, ?, ?, ?, ?)", (mapping_id, project_id, source_id, json.dumps(payload), now))
+
+    db_write(_store)
     return {"status": "ok", "mapping_id": mapping_id}
 
 
 @app.get("/api/v2/projects/{project_id}/emm")
 def list_emm_mappings(project_id: str):
+    if not get_schema(DB_FILE).has_table("emm_mappings"):
+        return {"status": "ok", "count": 0, "mappings": []}
     conn = get_db_conn()
     cur = conn.cursor()
-    cur.execute("CREATE TABLE IF NOT EXISTS emm_mappings (mapping_id TEXT PRIMARY KEY, project_id TEXT, source_id TEXT, payload TEXT, created_at TEXT)")
     cur.execute("SELECT mapping_id, source_id, payload, created_at FROM emm_mappings WHERE project_id = ? ORDER BY created_at DESC", (project_id,))
     rows = cur.fetchall()
     conn.close()
@@ -3312,74 +3212,75 @@ def list_emm_mappings(project_id: str):
 @app.post("/api/v2/projects_pm/init_migrations")
 def projects_pm_init_migrations():
     """Create/ensure project management-related tables and columns exist."""
-    conn = get_db_conn()
-    cur = conn.cursor()
-    # Ensure participants table
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS participants (
-            participant_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            person_id TEXT,
-            role TEXT,
-            unit TEXT,
-            attendance INTEGER,
-            created_at TEXT
+
+    def _migrate(conn):
+        cur = conn.cursor()
+        # Ensure participants table
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS participants (
+                participant_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                person_id TEXT,
+                role TEXT,
+                unit TEXT,
+                attendance INTEGER,
+                created_at TEXT
+            )
+            """
         )
-        """
-    )
-    # Ensure budget/roi/emm tables
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS budget_transactions (
-            txn_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            amount REAL,
-            type TEXT,
-            description TEXT,
-            created_at TEXT
+        # Ensure budget/roi/emm tables
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS budget_transactions (
+                txn_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                amount REAL,
+                type TEXT,
+                description TEXT,
+                created_at TEXT
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS roi_records (
-            roi_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            benefit_est REAL,
-            total_spent REAL,
-            roi REAL,
-            computed_at TEXT
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS roi_records (
+                roi_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                benefit_est REAL,
+                total_spent REAL,
+                roi REAL,
+                computed_at TEXT
+            )
+            """
         )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS emm_mappings (
-            mapping_id TEXT PRIMARY KEY,
-            project_id TEXT,
-            source_id TEXT,
-            payload TEXT,
-            created_at TEXT
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS emm_mappings (
+                mapping_id TEXT PRIMARY KEY,
+                project_id TEXT,
+                source_id TEXT,
+                payload TEXT,
+                created_at TEXT
+            )
+            """
         )
-        """
-    )
 
-    # Add optional columns to projects if missing
-    try:
-        cur.execute("PRAGMA table_info(projects)")
-        existing = [r[1] for r in cur.fetchall()]
-        if 'funding_amount' not in existing:
-            cur.execute("ALTER TABLE projects ADD COLUMN funding_amount REAL DEFAULT 0")
-        if 'spent_amount' not in existing:
-            cur.execute("ALTER TABLE projects ADD COLUMN spent_amount REAL DEFAULT 0")
-        if 'metadata' not in existing:
-            cur.execute("ALTER TABLE projects ADD COLUMN metadata TEXT DEFAULT NULL")
-    except Exception:
-        pass
+        # Add optional columns to projects if missing
+        try:
+            cur.execute("PRAGMA table_info(projects)")
+            existing = [r[1] for r in cur.fetchall()]
+            if 'funding_amount' not in existing:
+                cur.execute("ALTER TABLE projects ADD COLUMN funding_amount REAL DEFAULT 0")
+            if 'spent_amount' not in existing:
+                cur.execute("ALTER TABLE projects ADD COLUMN spent_amount REAL DEFAULT 0")
+            if 'metadata' not in existing:
+                cur.execute("ALTER TABLE projects ADD COLUMN metadata TEXT DEFAULT NULL")
+        except Exception:
+            pass
 
-    conn.commit()
-    conn.close()
+    db_write(_migrate)
+    invalidate_schema(DB_FILE)
     return {"status": "ok", "message": "migrations applied"}
 
 
@@ -3392,7 +3293,7 @@ async def projects_pm_create_project(request: Request):
     # reuse existing create_project
     try:
         pc = ProjectCreate(**data)
-        return create_project(pc)
+        return await run_db(create_project, pc)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -3417,14 +3318,10 @@ async def projects_pm_add_participant(project_id: str, request: Request):
 
     pid = f"ptc_{uuid.uuid4().hex[:12]}"
     now = datetime.now().isoformat()
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
+    await run_db(db_write, lambda conn: conn.execute(
         "INSERT INTO participants (participant_id, project_id, person_id, role, unit, attendance, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
         (pid, project_id, person_id, role, unit, attendance, now)
-    )
-    conn.commit()
-    conn.close()
+    ))
     return {"status": "ok", "participant_id": pid}
 
 
@@ -3434,7 +3331,7 @@ async def projects_pm_budget_transaction(project_id: str, request: Request):
         txn = await request.json()
     except Exception:
         txn = {k: v for k, v in request.query_params.items()} if request.query_params else {}
-    return add_project_budget_transaction(project_id, txn)
+    return await run_db(add_project_budget_transaction, project_id, txn)
 
 
 @app.post("/api/v2/projects_pm/projects/{project_id}/emm/import")
@@ -3443,7 +3340,7 @@ async def projects_pm_emm_import(project_id: str, request: Request):
         payload = await request.json()
     except Exception:
         payload = {k: v for k, v in request.query_params.items()} if request.query_params else {}
-    return import_emm_event(project_id, payload)
+    return await run_db(import_emm_event, project_id, payload)
 
 
 @app.get("/api/v2/projects_pm/projects/{project_id}/emm")
@@ -3463,12 +3360,7 @@ def get_project_dashboard_summary():
     cur = conn.cursor()
     
     # detect whether the `is_archived` column exists and adjust queries
-    try:
-        cur.execute("PRAGMA table_info(projects)")
-        cols = [r['name'] for r in cur.fetchall()]
-    except Exception:
-        cols = []
-
+    cols = get_schema(DB_FILE).columns("projects")
     has_is_archived = 'is_archived' in cols
 
     # Overall statistics
@@ -3581,11 +3473,9 @@ def get_project_dashboard_summary():
 # ============================================================================
 
 @app.get("/api/v2/export/projects")
-def export_projects(rsid: str = None, status: str = None, format: str = "csv"):
+def export_projects(rsid: str = None, status: str = None, format: str = "csv", request: Request = None):
     """Export projects data as CSV or JSON"""
     from utils.data_export import DataExporter
-    import io
-    from fastapi.responses import StreamingResponse
     
     exporter = DataExporter(DB_FILE)
     
@@ -3594,7 +3484,8 @@ def export_projects(rsid: str = None, status: str = None, format: str = "csv"):
         return JSONResponse(content={"data": data})
     else:
         # CSV export
-        csv_data = exporter.export_projects(rsid=rsid, status=status, format='csv')
+        gz = accepts_gzip(request)
+        chunks = exporter.stream_projects_csv(rsid=rsid, status=status, compress=gz)
         
         # Create filename
         filename = f"taaip_projects"
@@ -3604,19 +3495,13 @@ def export_projects(rsid: str = None, status: str = None, format: str = "csv"):
             filename += f"_{status}"
         filename += f"_{datetime.now().strftime('%Y%m%d')}.csv"
         
-        return StreamingResponse(
-            io.StringIO(csv_data),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return csv_response(chunks, filename, compress=gz)
 
 
 @app.get("/api/v2/export/tasks")
-def export_tasks(project_id: str = None, status: str = None, assigned_to: str = None, format: str = "csv"):
+def export_tasks(project_id: str = None, status: str = None, assigned_to: str = None, format: str = "csv", request: Request = None):
     """Export tasks data as CSV or JSON"""
     from utils.data_export import DataExporter
-    import io
-    from fastapi.responses import StreamingResponse
     
     exporter = DataExporter(DB_FILE)
     
@@ -3624,23 +3509,18 @@ def export_tasks(project_id: str = None, status: str = None, assigned_to: str =
         data = exporter.export_tasks(project_id=project_id, status=status, assigned_to=assigned_to, format='json')
         return JSONResponse(content={"data": data})
     else:
-        csv_data = exporter.export_tasks(project_id=project_id, status=status, assigned_to=assigned_to, format='csv')
+        gz = accepts_gzip(request)
+        chunks = exporter.stream_tasks_csv(project_id=project_id, status=status, assigned_to=assigned_to, compress=gz)
         
         filename = f"taaip_tasks_{datetime.now().strftime('%Y%m%d')}.csv"
         
-        return StreamingResponse(
-            io.StringIO(csv_data),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return csv_response(chunks, filename, compress=gz)
 
 
 @app.get("/api/v2/export/budget-analysis")
-def export_budget_analysis(rsid: str = None, format: str = "csv"):
+def export_budget_analysis(rsid: str = None, format: str = "csv", request: Request = None):
     """Export budget analysis as CSV or JSON"""
     from utils.data_export import DataExporter
-    import io
-    from fastapi.responses import StreamingResponse
     
     exporter = DataExporter(DB_FILE)
     
@@ -3648,18 +3528,15 @@ def export_budget_analysis(rsid: str = None, format: str = "csv"):
         data = exporter.export_budget_analysis(rsid=rsid, format='json')
         return JSONResponse(content={"data": data})
     else:
-        csv_data = exporter.export_budget_analysis(rsid=rsid, format='csv')
+        gz = accepts_gzip(request)
+        chunks = exporter.stream_budget_analysis_csv(rsid=rsid, compress=gz)
         
         filename = f"taaip_budget_analysis"
         if rsid:
             filename += f"_{rsid}"
         filename += f"_{datetime.now().strftime('%Y%m%d')}.csv"
         
-        return StreamingResponse(
-            io.StringIO(csv_data),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return csv_response(chunks, filename, compress=gz)
 
 
 @app.get("/api/v2/export/dashboard-summary")
@@ -3693,8 +3570,13 @@ def export_dashboard_summary(rsid: str = None, format: str = "csv"):
 # RECRUITING FUNNEL ENDPOINTS
 # ============================================================================
 
+# Funnel metrics per fiscal_year, recomputed when the leads table changes
+FUNNEL_METRICS_CACHE = FunnelMetricsCache()
+
+
 @app.get("/api/v2/recruiting-funnel/metrics")
-async def get_recruiting_funnel_metrics(fiscal_year: Optional[int] = None):
+@offload
+def get_recruiting_funnel_metrics(fiscal_year: Optional[int] = None):
     """
     Get recruiting funnel metrics with conversion rates and flash-to-bang data.
     Army Recruiting Process: Lead → Prospect → Appointment Made → Appointment Conducted → Test → Test Pass → Enlistment → Ship
@@ -3710,198 +3592,11 @@ async def get_recruiting_funnel_metrics(fiscal_year: Optional[int] = None):
     - Loss analysis (loss rate, top loss reason)
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # Inspect leads table columns to adapt to schema differences
-        cursor.execute("PRAGMA table_info(leads)")
-        lead_cols = {row[1] for row in cursor.fetchall()}
-        def has(col: str) -> bool:
-            return col in lead_cols
-        
-        # Choose stage column dynamically
-        # Choose stage column dynamically (include 'status' as last resort)
-        stage_col = 'current_stage' if has('current_stage') else ('stage' if has('stage') else ('status' if has('status') else None))
-        if not stage_col:
-            # Return empty metrics rather than error to avoid blank UI
-            empty = {
-                "funnel_counts": {"leads":0,"prospects":0,"appointments_made":0,"appointments_conducted":0,"tests":0,"test_passes":0,"enlistments":0,"ships":0,"losses":0,"total_active":0,"total_leads":0},
-                "conversion_rates": {"lead_to_prospect":0,"prospect_to_appointment":0,"appointment_made_to_conducted":0,"appointment_to_test":0,"test_to_pass":0,"test_pass_to_enlistment":0,"enlistment_to_ship":0,"overall_conversion":0},
-                "flash_to_bang": {"avg_lead_to_prospect_days":0,"avg_prospect_to_appointment_days":0,"avg_appointment_to_test_days":0,"avg_test_to_enlistment_days":0,"avg_lead_to_enlistment_days":0,"avg_enlistment_to_ship_days":0,"avg_dep_length_days":0},
-                "appointment_metrics": {"no_show_rate":0},
-                "loss_analysis": {"total_losses":0,"loss_rate":0,"top_loss_reason":"None"}
-            }
-            return JSONResponse(content={"status":"ok","metrics":empty})
-        
-        # Build WHERE clause for fiscal year filtering
-        where_clause = ""
-        params: list = []
-        if fiscal_year and has('fiscal_year'):
-            where_clause = " WHERE fiscal_year = ?"
-            params.append(fiscal_year)
-        
-        # Get stage counts
-        query = f"""
-            SELECT 
-                {stage_col} as stage,
-                COUNT(*) as count
-            FROM leads
-            {where_clause}
-            GROUP BY {stage_col}
-        """
-        cursor.execute(query, params)
-        stage_counts = {row['stage']: row['count'] for row in cursor.fetchall()}
-        
-        # Extract counts for each stage (default to 0 if stage doesn't exist)
-        leads_count = stage_counts.get('lead', 0)
-        prospects_count = stage_counts.get('prospect', 0)
-        appointments_made_count = stage_counts.get('appointment_made', 0)
-        appointments_conducted_count = stage_counts.get('appointment_conducted', 0)
-        tests_count = stage_counts.get('test', 0)
-        test_passes_count = stage_counts.get('test_pass', 0)
-        enlistments_count = stage_counts.get('enlistment', 0)
-        ships_count = stage_counts.get('ship', 0)
-        losses_count = stage_counts.get('loss', 0)
-        
-        # Calculate total active leads (not including losses)
-        total_active = (leads_count + prospects_count + appointments_made_count + 
-                       appointments_conducted_count + tests_count + test_passes_count + 
-                       enlistments_count + ships_count)
-        total_leads = total_active + losses_count
-        
-        # Calculate conversion rates (avoid division by zero)
-        def safe_rate(numerator, denominator):
-            return round((numerator / denominator) * 100, 2) if denominator > 0 else 0
-        
-        lead_to_prospect_rate = safe_rate(prospects_count, leads_count)
-        prospect_to_appointment_rate = safe_rate(appointments_made_count, prospects_count)
-        appointment_made_to_conducted_rate = safe_rate(appointments_conducted_count, appointments_made_count)
-        appointment_to_test_rate = safe_rate(tests_count, appointments_conducted_count)
-        test_to_pass_rate = safe_rate(test_passes_count, tests_count)
-        test_pass_to_enlistment_rate = safe_rate(enlistments_count, test_passes_count)
-        enlistment_to_ship_rate = safe_rate(ships_count, enlistments_count)
-        overall_conversion_rate = safe_rate(enlistments_count, total_leads)
-        
-        # Calculate flash-to-bang metrics (average days between stages)
-        # Flash-to-bang supports only if required columns exist
-        flash_supported = all(has(c) for c in [
-            'prospect_date','lead_date','appointment_made_date','appointment_conducted_date',
-            'test_date','test_pass_date','enlistment_date','ship_date','dep_length_days'
-        ])
-        avg_lead_to_prospect_days = avg_prospect_to_appointment_days = 0
-        avg_appointment_to_test_days = avg_test_to_enlistment_days = 0
-        avg_lead_to_enlistment_days = avg_enlistment_to_ship_days = 0
-        avg_dep_length_days = 0
-        if flash_supported:
-            flash_to_bang_query = f"""
-                SELECT 
-                    AVG(JULIANDAY(prospect_date) - JULIANDAY(lead_date)) as avg_lead_to_prospect,
-                    AVG(JULIANDAY(appointment_made_date) - JULIANDAY(prospect_date)) as avg_prospect_to_appointment,
-                    AVG(JULIANDAY(test_date) - JULIANDAY(appointment_conducted_date)) as avg_appointment_to_test,
-                    AVG(JULIANDAY(enlistment_date) - JULIANDAY(test_pass_date)) as avg_test_to_enlistment,
-                    AVG(JULIANDAY(enlistment_date) - JULIANDAY(lead_date)) as avg_lead_to_enlistment,
-                    AVG(JULIANDAY(ship_date) - JULIANDAY(enlistment_date)) as avg_enlistment_to_ship,
-                    AVG(dep_length_days) as avg_dep_length
-                FROM leads
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} enlistment_date IS NOT NULL
-            """
-            cursor.execute(flash_to_bang_query, params)
-            flash_row = cursor.fetchone()
-            if flash_row:
-                avg_lead_to_prospect_days = round(flash_row['avg_lead_to_prospect'], 1) if flash_row['avg_lead_to_prospect'] else 0
-                avg_prospect_to_appointment_days = round(flash_row['avg_prospect_to_appointment'], 1) if flash_row['avg_prospect_to_appointment'] else 0
-                avg_appointment_to_test_days = round(flash_row['avg_appointment_to_test'], 1) if flash_row['avg_appointment_to_test'] else 0
-                avg_test_to_enlistment_days = round(flash_row['avg_test_to_enlistment'], 1) if flash_row['avg_test_to_enlistment'] else 0
-                avg_lead_to_enlistment_days = round(flash_row['avg_lead_to_enlistment'], 1) if flash_row['avg_lead_to_enlistment'] else 0
-                avg_enlistment_to_ship_days = round(flash_row['avg_enlistment_to_ship'], 1) if flash_row['avg_enlistment_to_ship'] else 0
-                avg_dep_length_days = round(flash_row['avg_dep_length'], 1) if flash_row['avg_dep_length'] else 0
-        
-        # Calculate appointment no-show rate
-        # Appointment no-show rate only if columns exist
-        appointment_no_show_rate = 0
-        if has('appointment_made_date') and has('appointment_no_show'):
-            no_show_query = f"""
-                SELECT 
-                    COUNT(*) as total_appointments,
-                    SUM(CASE WHEN appointment_no_show = 1 THEN 1 ELSE 0 END) as no_shows
-                FROM leads
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} appointment_made_date IS NOT NULL
-            """
-            cursor.execute(no_show_query, params)
-            no_show_row = cursor.fetchone()
-            appointment_no_show_rate = safe_rate(no_show_row['no_shows'] if no_show_row else 0, 
-                                                no_show_row['total_appointments'] if no_show_row else 0)
-        
-        # Calculate loss metrics
-        loss_rate = safe_rate(losses_count, total_leads)
-        
-        # Get top loss reason
-        top_loss_reason = "None"
-        if has('loss_reason'):
-            loss_reason_query = f"""
-                SELECT 
-                    loss_reason,
-                    COUNT(*) as count
-                FROM leads
-                {where_clause}
-                {"AND" if where_clause else "WHERE"} loss_reason IS NOT NULL
-                GROUP BY loss_reason
-                ORDER BY count DESC
-                LIMIT 1
-            """
-            cursor.execute(loss_reason_query, params)
-            loss_reason_row = cursor.fetchone()
-            top_loss_reason = loss_reason_row['loss_reason'] if loss_reason_row else "None"
-        
-        conn.close()
-        
-        # Build response with new Army recruiting funnel stages
-        metrics = {
-            "funnel_counts": {
-                "leads": leads_count,
-                "prospects": prospects_count,
-                "appointments_made": appointments_made_count,
-                "appointments_conducted": appointments_conducted_count,
-                "tests": tests_count,
-                "test_passes": test_passes_count,
-                "enlistments": enlistments_count,
-                "ships": ships_count,
-                "losses": losses_count,
-                "total_active": total_active,
-                "total_leads": total_leads
-            },
-            "conversion_rates": {
-                "lead_to_prospect": lead_to_prospect_rate,
-                "prospect_to_appointment": prospect_to_appointment_rate,
-                "appointment_made_to_conducted": appointment_made_to_conducted_rate,
-                "appointment_to_test": appointment_to_test_rate,
-                "test_to_pass": test_to_pass_rate,
-                "test_pass_to_enlistment": test_pass_to_enlistment_rate,
-                "enlistment_to_ship": enlistment_to_ship_rate,
-                "overall_conversion": overall_conversion_rate
-            },
-            "flash_to_bang": {
-                "avg_lead_to_prospect_days": avg_lead_to_prospect_days,
-                "avg_prospect_to_appointment_days": avg_prospect_to_appointment_days,
-                "avg_appointment_to_test_days": avg_appointment_to_test_days,
-                "avg_test_to_enlistment_days": avg_test_to_enlistment_days,
-                "avg_lead_to_enlistment_days": avg_lead_to_enlistment_days,
-                "avg_enlistment_to_ship_days": avg_enlistment_to_ship_days,
-                "avg_dep_length_days": avg_dep_length_days
-            },
-            "appointment_metrics": {
-                "no_show_rate": appointment_no_show_rate
-            },
-            "loss_analysis": {
-                "total_losses": losses_count,
-                "loss_rate": loss_rate,
-                "top_loss_reason": top_loss_reason
-            }
-        }
-        
+        conn = get_db_conn()
+        try:
+            metrics = FUNNEL_METRICS_CACHE.get(conn, get_schema(DB_FILE), fiscal_year)
+        finally:
+            conn.close()
         return JSONResponse(content={"status": "ok", "metrics": metrics})
         
     except Exception as e:
@@ -3916,7 +3611,8 @@ async def get_recruiting_funnel_metrics(fiscal_year: Optional[int] = None):
 # ============================================================================
 
 @app.get("/api/v2/market-potential")
-async def get_market_potential(
+@offload
+def get_market_potential(
     geographic_level: Optional[str] = None,
     geographic_id: Optional[str] = None,
     fiscal_year: Optional[int] = None,
@@ -3940,8 +3636,7 @@ async def get_market_potential(
     - Market share analysis
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         
         # Build WHERE clause
@@ -4068,7 +3763,8 @@ async def get_market_potential(
 
 
 @app.get("/api/v2/dod-comparison")
-async def get_dod_branch_comparison(
+@offload
+def get_dod_branch_comparison(
     branch: Optional[str] = None,
     geographic_level: Optional[str] = None,
     geographic_id: Optional[str] = None,
@@ -4092,8 +3788,7 @@ async def get_dod_branch_comparison(
     - Market penetration
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         
         where_conditions = []
@@ -4180,7 +3875,8 @@ async def get_dod_branch_comparison(
 
 
 @app.get("/api/v2/mission-analysis")
-async def get_mission_analysis(
+@offload
+def get_mission_analysis(
     analysis_level: Optional[str] = None,
     brigade: Optional[str] = None,
     battalion: Optional[str] = None,
@@ -4208,8 +3904,7 @@ async def get_mission_analysis(
     - Efficiency metrics
     """
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         
         where_conditions = []
@@ -4386,27 +4081,32 @@ def _ensure_twg_tables(conn):
                 )
                 """
         )
-        conn.commit()
+
+_TWG_TABLES = ("twg_events", "twg_agenda_items", "twg_aar_reports", "twg_budget")
 
 def _get_conn_with_twg():
-        conn = sqlite3.connect(DB_FILE)
-        _ensure_twg_tables(conn)
-        conn.row_factory = sqlite3.Row
-        return conn
+        # Create missing TWG tables on the writer; readers only lease a connection
+        schema = get_schema(DB_FILE)
+        if not all(schema.has_table(t) for t in _TWG_TABLES):
+            db_write(_ensure_twg_tables)
+            invalidate_schema(DB_FILE)
+        return get_db_conn()
 
 @app.get("/api/v2/twg/boards")
-async def get_twg_boards(
+@offload
+def get_twg_boards(
     status: Optional[str] = None,
     review_type: Optional[str] = None,
-    rsid: Optional[str] = None
+    rsid: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False
 ):
-    """Get all TWG review boards with optional filters"""
+    """Get TWG review boards with optional filters, latest scheduled first, one page at a time"""
     try:
         conn = _get_conn_with_twg()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         
-        query = "SELECT * FROM twg_review_boards WHERE 1=1"
+        query = "SELECT rowid AS __pk, * FROM twg_review_boards WHERE 1=1"
         params = []
         
         if status:
@@ -4419,13 +4119,11 @@ async def get_twg_boards(
             query += " AND rsid = ?"
             params.append(rsid)
         
-        query += " ORDER BY scheduled_date DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        page = fetch_page(conn, query, params, order=[("scheduled_date", True), ("__pk", True)],
+                          limit=limit, cursor=cursor, include_total=include_total)
         
         results = []
-        for row in rows:
+        for row in page.items:
             results.append({
                 "board_id": row["board_id"],
                 "name": row["name"],
@@ -4444,8 +4142,10 @@ async def get_twg_boards(
         
         conn.close()
         
-        return JSONResponse(content={"status": "ok", "data": results, "count": len(results)})
+        return JSONResponse(content={"status": "ok", "data": results, "count": len(results), **page.envelope()})
         
+    except PaginationError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -4454,7 +4154,8 @@ async def get_twg_boards(
 
 
 @app.get("/api/v2/twg/analysis")
-async def get_twg_analysis(board_id: Optional[str] = None, status: Optional[str] = None):
+@offload
+def get_twg_analysis(board_id: Optional[str] = None, status: Optional[str] = None):
     """Get TWG analysis items"""
     try:
         conn = _get_conn_with_twg()
@@ -4504,7 +4205,8 @@ async def get_twg_analysis(board_id: Optional[str] = None, status: Optional[str]
 
 
 @app.get("/api/v2/twg/decisions")
-async def get_twg_decisions(board_id: Optional[str] = None, decision_type: Optional[str] = None):
+@offload
+def get_twg_decisions(board_id: Optional[str] = None, decision_type: Optional[str] = None):
     """Get TWG decisions"""
     try:
         conn = _get_conn_with_twg()
@@ -4552,7 +4254,8 @@ async def get_twg_decisions(board_id: Optional[str] = None, decision_type: Optio
 
 
 @app.get("/api/v2/twg/actions")
-async def get_twg_actions(board_id: Optional[str] = None, status: Optional[str] = None):
+@offload
+def get_twg_actions(board_id: Optional[str] = None, status: Optional[str] = None):
     """Get TWG action items"""
     try:
         conn = _get_conn_with_twg()
@@ -4600,11 +4303,11 @@ async def get_twg_actions(board_id: Optional[str] = None, status: Optional[str]
         )
 
 @app.post("/api/v2/twg/events")
-async def create_or_update_twg_event(payload: Dict[str, Any]):
-    try:
-        conn = _get_conn_with_twg()
-        cur = conn.cursor()
-        cur.execute(
+@offload
+def create_or_update_twg_event(payload: Dict[str, Any]):
+    def _save(conn):
+        _ensure_twg_tables(conn)
+        conn.execute(
             """
             INSERT INTO twg_events (event_id, name, date, location, type, target_audience, expected_leads, budget, status, priority)
             VALUES (:event_id, :name, :date, :location, :type, :target_audience, :expected_leads, :budget, :status, :priority)
@@ -4621,17 +4324,19 @@ async def create_or_update_twg_event(payload: Dict[str, Any]):
             """,
             payload,
         )
-        conn.commit()
+
+    try:
+        db_write(_save)
         return JSONResponse(content={"status": "ok", "event_id": payload.get("event_id")})
     except Exception as e:
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.post("/api/v2/twg/aar")
-async def submit_twg_aar(payload: Dict[str, Any]):
-    try:
-        conn = _get_conn_with_twg()
-        cur = conn.cursor()
-        cur.execute(
+@offload
+def submit_twg_aar(payload: Dict[str, Any]):
+    def _save(conn):
+        _ensure_twg_tables(conn)
+        conn.execute(
             """
             INSERT INTO twg_aar_reports (event_id, event_name, date, due_date, hours_since_event, status, submitted_by, content)
             VALUES (:event_id, :event_name, :date, :due_date, :hours_since_event, :status, :submitted_by, :content)
@@ -4646,17 +4351,19 @@ async def submit_twg_aar(payload: Dict[str, Any]):
             """,
             payload,
         )
-        conn.commit()
+
+    try:
+        db_write(_save)
         return JSONResponse(content={"status": "ok", "event_id": payload.get("event_id")})
     except Exception as e:
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.post("/api/v2/twg/agenda")
-async def save_twg_agenda_item(item: Dict[str, Any]):
-    try:
-        conn = _get_conn_with_twg()
-        cur = conn.cursor()
-        cur.execute(
+@offload
+def save_twg_agenda_item(item: Dict[str, Any]):
+    def _save(conn):
+        _ensure_twg_tables(conn)
+        conn.execute(
             """
             INSERT INTO twg_agenda_items (id, meeting_id, section, presenter, status, notes, order_index)
             VALUES (:id, :meeting_id, :section, :presenter, :status, :notes, :order_index)
@@ -4670,13 +4377,16 @@ async def save_twg_agenda_item(item: Dict[str, Any]):
             """,
             item,
         )
-        conn.commit()
+
+    try:
+        db_write(_save)
         return JSONResponse(content={"status": "ok", "id": item.get("id")})
     except Exception as e:
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.get("/api/v2/twg/agenda")
-async def get_twg_agenda(meeting_id: Optional[str] = None):
+@offload
+def get_twg_agenda(meeting_id: Optional[str] = None):
     try:
         conn = _get_conn_with_twg()
         cur = conn.cursor()
@@ -4707,11 +4417,11 @@ async def get_twg_agenda(meeting_id: Optional[str] = None):
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.post("/api/v2/twg/budget")
-async def update_twg_budget(budget: Dict[str, Any]):
-    try:
-        conn = _get_conn_with_twg()
-        cur = conn.cursor()
-        cur.execute(
+@offload
+def update_twg_budget(budget: Dict[str, Any]):
+    def _save(conn):
+        _ensure_twg_tables(conn)
+        conn.execute(
             """
             INSERT INTO twg_budget (fy, total_budget, allocated, spent, remaining, q1, q2, q3, q4)
             VALUES (:fy, :total_budget, :allocated, :spent, :remaining, :q1, :q2, :q3, :q4)
@@ -4727,7 +4437,9 @@ async def update_twg_budget(budget: Dict[str, Any]):
             """,
             budget,
         )
-        conn.commit()
+
+    try:
+        db_write(_save)
         return JSONResponse(content={"status": "ok", "fy": budget.get("fy")})
     except Exception as e:
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
@@ -4738,21 +4450,24 @@ async def update_twg_budget(budget: Dict[str, Any]):
 # ====================
 
 @app.get("/api/v2/leads/status")
-async def get_lead_status(
+@offload
+def get_lead_status(
     days: Optional[int] = None,
     stage: Optional[str] = None,
     recruiter: Optional[str] = None,
-    source: Optional[str] = None
+    source: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False
 ):
-    """Get detailed lead status information"""
+    """Get detailed lead status information, newest leads first, one page at a time"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        conn = get_db_conn()
         
         # Build query with filters
         query = """
             SELECT 
+                l.rowid as __pk,
                 l.prid as lead_id,
                 l.first_name,
                 l.last_name,
@@ -4795,13 +4510,11 @@ async def get_lead_status(
             query += " AND l.lead_source = ?"
             params.append(source)
         
-        query += " ORDER BY l.lead_date DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        page = fetch_page(conn, query, params, order=[("created_date", True), ("__pk", True)],
+                          limit=limit, cursor=cursor, include_total=include_total)
         
         results = []
-        for row in rows:
+        for row in page.items:
             results.append({
                 "lead_id": row["lead_id"],
                 "first_name": row["first_name"],
@@ -4819,8 +4532,10 @@ async def get_lead_status(
         
         conn.close()
         
-        return JSONResponse(content={"status": "ok", "data": results, "count": len(results)})
+        return JSONResponse(content={"status": "ok", "data": results, "count": len(results), **page.envelope()})
         
+    except PaginationError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -4829,15 +4544,15 @@ async def get_lead_status(
 
 
 @app.get("/api/v2/leads/metrics")
-async def get_lead_metrics(
+@offload
+def get_lead_metrics(
     days: Optional[int] = None,
     stage: Optional[str] = None,
     recruiter: Optional[str] = None
 ):
     """Get aggregated lead metrics"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         
         base_filter = "WHERE 1=1"
@@ -4966,6 +4681,10 @@ app.include_router(project_mgmt_router, prefix="/api/v2/projects_pm", tags=["Pro
 from backend.routers.data_upload import router as data_upload_router
 app.include_router(data_upload_router, prefix="/api/v2", tags=["Data Upload"])
 
+# --- Background Jobs (status and SSE progress for ?background=true requests) ---
+from backend.routers.jobs import router as jobs_router
+app.include_router(jobs_router, prefix="/api/v2", tags=["Jobs"])
+
 # --- Task Requests (separate workflow from Helpdesk) ---
 from backend.routers.task_requests import router as task_requests_router
 app.include_router(task_requests_router, prefix="/api/v2", tags=["Task Requests"])
@@ -5006,10 +4725,16 @@ def restore_backup(backup_filename: str = Form(...)):
         try:
             ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
             pre = os.path.join(backups_dir, f"pre_restore.{ts}.db")
+            checkpoint_database(DB_FILE)
             shutil.copy2(DB_FILE, pre)
         except Exception:
             pre = None
-        shutil.copy2(src, DB_FILE)
+        replace_database_file(src, DB_FILE)
+        # bring the restored file up to the current schema (snapshot, triggers, indexes)
+        init_db()
+        invalidate_schema(DB_FILE)
+        FUNNEL_METRICS_CACHE.clear()
+        RESPONSE_CACHE.invalidate()
         return {"status": "ok", "restored_from": src, "pre_restore_backup": pre}
     except HTTPException:
         raise
@@ -5056,11 +4781,9 @@ async def upload_data(file: UploadFile = File(...)):
         repo_root = os.path.abspath(os.path.dirname(__file__))
         uploads_dir = os.path.join(repo_root, 'data', 'uploads')
         os.makedirs(uploads_dir, exist_ok=True)
-        dest = os.path.join(uploads_dir, file.filename)
-        with open(dest, 'wb') as out:
-            content = await file.read()
-            out.write(content)
-        dataset_name, metadata = process_csv(dest)
+        dest = os.path.join(uploads_dir, os.path.basename(file.filename))
+        await spool_upload(file, dest)
+        dataset_name, metadata = await run_in_threadpool(process_csv, dest)
         return {'status': 'ok', 'dataset': dataset_name, 'metadata': metadata}
     except HTTPException:
         raise
@@ -5077,49 +4800,71 @@ def api_list_datasets():
 
 
 @app.get('/api/v2/data/{dataset_name}')
-def api_get_dataset(dataset_name: str):
+def api_get_dataset(dataset_name: str, offset: int = 0, limit: Optional[int] = None, columns: Optional[str] = None):
+    """Page through a processed dataset.
+
+    ?offset=&limit= select the rows (limit defaults to DATASET_PAGE_SIZE, capped at
+    DATASET_PAGE_MAX; limit=0 returns just the header and mapping). ?columns=a,b
+    projects mapped column names. total_rows comes from the dataset manifest.
+    """
     try:
-        data = get_dataset(dataset_name)
+        projection = [c.strip() for c in columns.split(',') if c.strip()] if columns else None
+        data = get_dataset_page(dataset_name, offset, limit, projection)
         return {'status': 'ok', 'dataset': data}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail='Dataset not found')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Failed to read dataset: {str(e)}')
 
 
 @app.post('/api/v2/data/ingest/{dataset_name}')
-def api_ingest_dataset(dataset_name: str):
+def api_ingest_dataset(dataset_name: str, background: bool = False):
     """Create a SQL table from a processed dataset and insert rows."""
     try:
+        if background:
+            read_manifest(dataset_name)
+            return queue_job('ingest_dataset', ingest_dataset, dataset_name, DB_FILE, params={'dataset_name': dataset_name}, with_progress=True)
         db_path = DB_FILE
         result = ingest_dataset(dataset_name, db_path)
         return {'status': 'ok', 'result': result}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail='Dataset not found')
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Ingest failed: {str(e)}')
 
 
 @app.post('/api/v2/upload/ingest/{dataset_name}')
-def api_upload_ingest(dataset_name: str):
+def api_upload_ingest(dataset_name: str, background: bool = False):
     """Alternate ingest route under /api/v2/upload to align with gateway routing."""
     try:
+        if background:
+            read_manifest(dataset_name)
+            return queue_job('ingest_dataset', ingest_dataset, dataset_name, DB_FILE, params={'dataset_name': dataset_name}, with_progress=True)
         db_path = DB_FILE
         result = ingest_dataset(dataset_name, db_path)
         return {'status': 'ok', 'result': result}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail='Dataset not found')
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Ingest failed: {str(e)}')
 
 
 @app.post('/api/v2/upload/ingest_dataset')
-def api_upload_ingest_dataset(body: dict = Body(...)):
+def api_upload_ingest_dataset(body: dict = Body(...), background: bool = False):
     """Server-side ingestion: accepts JSON {"dataset_name": "dataset_xxx"} and creates uploaded_{dataset} table."""
     try:
         dataset_name = body.get('dataset_name') if isinstance(body, dict) else None
         if not dataset_name:
             raise HTTPException(status_code=400, detail='Missing dataset_name')
+        if background:
+            read_manifest(dataset_name)
+            return queue_job('ingest_dataset', ingest_dataset, dataset_name, DB_FILE, params={'dataset_name': dataset_name}, with_progress=True)
         db_path = DB_FILE
         result = ingest_dataset(dataset_name, db_path)
         return {'status': 'ok', 'result': result}
@@ -5132,12 +4877,15 @@ def api_upload_ingest_dataset(body: dict = Body(...)):
 
 # Use a non-colliding action path so it isn't matched by the generic /api/v2/upload/{category} route
 @app.post('/api/v2/upload/actions/ingest_dataset')
-def api_upload_ingest_dataset_action(body: dict = Body(...)):
+def api_upload_ingest_dataset_action(body: dict = Body(...), background: bool = False):
     """Server-side ingestion (alternate path): accepts JSON {"dataset_name": "dataset_xxx"} and creates uploaded_{dataset} table."""
     try:
         dataset_name = body.get('dataset_name') if isinstance(body, dict) else None
         if not dataset_name:
             raise HTTPException(status_code=400, detail='Missing dataset_name')
+        if background:
+            read_manifest(dataset_name)
+            return queue_job('ingest_dataset', ingest_dataset, dataset_name, DB_FILE, params={'dataset_name': dataset_name}, with_progress=True)
         db_path = DB_FILE
         result = ingest_dataset(dataset_name, db_path)
         return {'status': 'ok', 'result': result}
@@ -5190,6 +4938,28 @@ def api_get_table_rows(table_name: str, limit: int = 20):
         raise HTTPException(status_code=500, detail=f'Failed to read table: {str(e)}')
 
 
+@app.get('/api/v2/admin/index-advisor')
+def api_admin_index_advisor(apply: bool = False):
+    """Report planned indexes and EXPLAIN QUERY PLAN results for the registered endpoint queries.
+
+    With ?apply=true the missing planned indexes are created first.
+    """
+    try:
+        if apply:
+            created = db_write(ensure_indexes)
+            invalidate_schema(DB_FILE)
+        else:
+            created = []
+        conn = get_db_conn()
+        try:
+            report = advise(conn)
+        finally:
+            conn.close()
+        return {'status': 'ok', 'created': created, **report}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Index advisor failed: {str(e)}')
+
+
 @app.post('/api/v2/admin/query')
 def api_admin_query(body: dict = Body(...)):
     """Safe read-only SQL query executor for inspection.
@@ -5255,7 +5025,7 @@ def api_save_mapping(dataset_name: str, body: dict = Body(...)):
         if not mapping or not isinstance(mapping, dict):
             raise HTTPException(status_code=400, detail='Missing mapping payload')
 
-        updated = save_mapping(dataset_name, mapping)
+        updated = save_dataset_mapping(dataset_name, mapping)
         return {'status': 'ok', 'dataset': dataset_name, 'metadata': updated}
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail='Dataset not found')
@@ -5273,7 +5043,8 @@ if __name__ == "__main__":
 # ====================
 
 @app.post("/api/v2/events/{event_id}/predict")
-async def predict_event_performance(event_id: str):
+@offload
+def predict_event_performance(event_id: str):
     """Generate ML prediction for event performance"""
     try:
         from ml_prediction_engine import generate_event_prediction
@@ -5285,11 +5056,11 @@ async def predict_event_performance(event_id: str):
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.get("/api/v2/events/performance")
-async def get_events_performance(event_type: Optional[str] = None, rsid: Optional[str] = None):
+@offload
+def get_events_performance(event_type: Optional[str] = None, rsid: Optional[str] = None):
     """Get events with predicted vs actual performance comparison"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         query = "SELECT event_id, name, event_type_category, location, start_date, budget, status, predicted_leads, predicted_conversions, predicted_roi, predicted_cost_per_lead, prediction_confidence, actual_leads, actual_conversions, actual_roi, actual_cost_per_lead, leads_variance, roi_variance, prediction_accuracy, rsid, brigade FROM events WHERE 1=1"
         params = []
@@ -5311,11 +5082,11 @@ async def get_events_performance(event_type: Optional[str] = None, rsid: Optiona
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.get("/api/v2/nominations")
-async def get_marketing_nominations(status: Optional[str] = None, nomination_type: Optional[str] = None, rsid: Optional[str] = None):
+@offload
+def get_marketing_nominations(status: Optional[str] = None, nomination_type: Optional[str] = None, rsid: Optional[str] = None):
     """Get marketing nominations with predictions"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         query = "SELECT * FROM marketing_nominations WHERE 1=1"
         params = []
@@ -5340,11 +5111,11 @@ async def get_marketing_nominations(status: Optional[str] = None, nomination_typ
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.get("/api/v2/g2-zones")
-async def get_g2_zone_performance(rsid: Optional[str] = None, trend: Optional[str] = None):
+@offload
+def get_g2_zone_performance(rsid: Optional[str] = None, trend: Optional[str] = None):
     """Get G2 Zone lead performance data"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         query = "SELECT * FROM g2_zone_performance WHERE 1=1"
         params = []
@@ -5366,11 +5137,11 @@ async def get_g2_zone_performance(rsid: Optional[str] = None, trend: Optional[st
         return JSONResponse(status_code=500, content={"status": "error", "message": str(e)})
 
 @app.get("/api/v2/g2-zones/summary")
-async def get_g2_zones_summary(rsid: Optional[str] = None):
+@offload
+def get_g2_zones_summary(rsid: Optional[str] = None):
     """Get aggregated G2 Zone performance summary"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
+        conn = get_db_conn()
         cursor = conn.cursor()
         query = "SELECT COUNT(*) as total_zones, SUM(lead_count) as total_leads, SUM(qualified_leads) as total_qualified, SUM(enlistment_count) as total_enlistments, AVG(qualification_rate) as avg_qualification_rate, AVG(conversion_rate) as avg_conversion_rate, AVG(market_penetration_rate) as avg_penetration, COUNT(CASE WHEN trend_direction = 'up' THEN 1 END) as zones_trending_up, COUNT(CASE WHEN trend_direction = 'down' THEN 1 END) as zones_trending_down FROM g2_zone_performance WHERE 1=1"
         params = []
@@ -5391,20 +5162,25 @@ async def get_g2_zones_summary(rsid: Optional[str] = None):
 # ============================================================================
 
 @app.get("/api/v2/calendar/events")
-async def get_calendar_events(
+@offload
+def get_calendar_events(
     start_date: str = None,
     end_date: str = None,
     event_type: str = None,
     priority: str = None,
     status: str = None,
-    rsid: str = None
+    rsid: str = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False
 ):
-    """Get calendar events with optional filters"""
+    """Get calendar events with optional filters, one page at a time (the summary covers all events)"""
     try:
         conn = get_db_conn()
+        page_cursor = cursor
         cursor = conn.cursor()
         
-        query = "SELECT * FROM calendar_events WHERE 1=1"
+        query = "SELECT rowid AS __pk, * FROM calendar_events WHERE 1=1"
         params = []
         
         if start_date:
@@ -5426,10 +5202,9 @@ async def get_calendar_events(
             query += " AND rsid = ?"
             params.append(rsid)
         
-        query += " ORDER BY start_datetime ASC"
-        
-        cursor.execute(query, params)
-        events = [dict(row) for row in cursor.fetchall()]
+        page = fetch_page(conn, query, params, order=[("start_datetime", False), ("__pk", False)],
+                          limit=limit, cursor=page_cursor, include_total=include_total)
+        events = page.items
         
         # Calculate summary statistics
         cursor.execute("""
@@ -5478,8 +5253,11 @@ async def get_calendar_events(
         return JSONResponse({
             "status": "ok",
             "events": events,
-            "summary": summary
+            "summary": summary,
+            **page.envelope()
         })
+    except PaginationError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
     except Exception as e:
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
@@ -5488,12 +5266,16 @@ async def create_calendar_event(request: Request):
     """Create a new calendar event"""
     try:
         data = await request.json()
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+    return await run_db(_create_calendar_event_sync, data)
+
+
+def _create_calendar_event_sync(data: Dict[str, Any]):
+    try:
         event_id = f"cal_{secrets.token_hex(6)}"
         
-        cursor.execute("""
+        db_write(lambda conn: conn.execute("""
             INSERT INTO calendar_events (
                 event_id, title, description, event_type, category,
                 start_datetime, end_datetime, all_day, location, attendees,
@@ -5525,10 +5307,7 @@ async def create_calendar_event(request: Request):
             data.get('rsid'),
             data.get('brigade'),
             data.get('battalion')
-        ))
-        
-        conn.commit()
-        conn.close()
+        )))
         
         return JSONResponse({
             "status": "ok",
@@ -5539,150 +5318,153 @@ async def create_calendar_event(request: Request):
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.post("/api/v2/calendar/events/{calendar_event_id}/create-project")
-async def create_project_from_calendar_event(calendar_event_id: str):
+@offload
+def create_project_from_calendar_event(calendar_event_id: str):
     """Automatically create a project from a calendar event (EMM integration)"""
     try:
         import uuid
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        # Fetch calendar event
-        cursor.execute("SELECT * FROM calendar_events WHERE event_id = ?", (calendar_event_id,))
-        row = cursor.fetchone()
+
+        # Existence check and inserts share one writer transaction
+        def _create(conn):
+            cursor = conn.cursor()
         
-        if not row:
-            return JSONResponse({"status": "error", "message": "Calendar event not found"}, status_code=404)
+            # Fetch calendar event
+            cursor.execute("SELECT * FROM calendar_events WHERE event_id = ?", (calendar_event_id,))
+            row = cursor.fetchone()
         
-        calendar_event = dict(row)
+            if not row:
+                return JSONResponse({"status": "error", "message": "Calendar event not found"}, status_code=404)
         
-        # Check if project already exists for this calendar event
-        cursor.execute("""
-            SELECT project_id FROM projects 
-            WHERE name = ? AND event_id IS NULL
-            LIMIT 1
-        """, (f"{calendar_event['title']} - Planning",))
+            calendar_event = dict(row)
         
-        existing = cursor.fetchone()
-        if existing:
-            return JSONResponse({
-                "status": "ok",
-                "project_id": existing['project_id'],
-                "message": "Project already exists for this event"
-            })
+            # Check if project already exists for this calendar event
+            cursor.execute("""
+                SELECT project_id FROM projects 
+                WHERE name = ? AND event_id IS NULL
+                LIMIT 1
+            """, (f"{calendar_event['title']} - Planning",))
+        
+            existing = cursor.fetchone()
+            if existing:
+                return JSONResponse({
+                    "status": "ok",
+                    "project_id": existing['project_id'],
+                    "message": "Project already exists for this event"
+                })
         
-        # Create a recruiting event entry first (optional, for tracking)
-        recruiting_event_id = None
-        if calendar_event.get('event_type') in ['event', 'marketing']:
-            recruiting_event_id = f"evt_{uuid.uuid4().hex[:12]}"
-            now = datetime.utcnow().isoformat()
+            # Create a recruiting event entry first (optional, for tracking)
+            recruiting_event_id = None
+            if calendar_event.get('event_type') in ['event', 'marketing']:
+                recruiting_event_id = f"evt_{uuid.uuid4().hex[:12]}"
+                now = datetime.utcnow().isoformat()
             
+                cursor.execute("""
+                    INSERT INTO events (
+                        event_id, name, type, location, start_date, end_date, 
+                        status, created_at, updated_at, rsid, brigade, battalion
+                    ) VALUES (?, ?, ?, ?, ?, ?, 'planned', ?, ?, ?, ?, ?)
+                """, (
+                    recruiting_event_id,
+                    calendar_event['title'],
+                    calendar_event.get('event_type', 'In-Person-Meeting'),
+                    calendar_event.get('location', ''),
+                    calendar_event.get('start_datetime', '')[:10],  # Extract date
+                    calendar_event.get('end_datetime', '')[:10],
+                    now, now,
+                    calendar_event.get('rsid'),
+                    calendar_event.get('brigade'),
+                    calendar_event.get('battalion')
+                ))
+        
+            # Create project
+            project_id = f"prj_{uuid.uuid4().hex[:12]}"
+            now = datetime.utcnow().isoformat()
+        
+            # Calculate dates (start 2 weeks before event, target on event date)
+            from datetime import datetime as dt, timedelta
+            event_start = dt.fromisoformat(calendar_event['start_datetime'].replace('Z', '+00:00'))
+            project_start = (event_start - timedelta(days=14)).isoformat()
+            project_target = event_start.isoformat()
+        
             cursor.execute("""
-                INSERT INTO events (
-                    event_id, name, type, location, start_date, end_date, 
-                    status, created_at, updated_at, rsid, brigade, battalion
-                ) VALUES (?, ?, ?, ?, ?, ?, 'planned', ?, ?, ?, ?, ?)
+                INSERT INTO projects (
+                    project_id, name, event_id, start_date, target_date, 
+                    owner_id, objectives, success_criteria, status, 
+                    created_at, updated_at, rsid, brigade, battalion
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'planning', ?, ?, ?, ?, ?)
             """, (
+                project_id,
+                f"{calendar_event['title']} - Planning",
                 recruiting_event_id,
-                calendar_event['title'],
-                calendar_event.get('event_type', 'In-Person-Meeting'),
-                calendar_event.get('location', ''),
-                calendar_event.get('start_datetime', '')[:10],  # Extract date
-                calendar_event.get('end_datetime', '')[:10],
+                project_start[:10],
+                project_target[:10],
+                calendar_event.get('created_by', 'system'),
+                f"Plan and execute {calendar_event['title']}. {calendar_event.get('description', '')}",
+                "Successfully execute event and achieve target metrics",
                 now, now,
                 calendar_event.get('rsid'),
                 calendar_event.get('brigade'),
                 calendar_event.get('battalion')
             ))
         
-        # Create project
-        project_id = f"prj_{uuid.uuid4().hex[:12]}"
-        now = datetime.utcnow().isoformat()
-        
-        # Calculate dates (start 2 weeks before event, target on event date)
-        from datetime import datetime as dt, timedelta
-        event_start = dt.fromisoformat(calendar_event['start_datetime'].replace('Z', '+00:00'))
-        project_start = (event_start - timedelta(days=14)).isoformat()
-        project_target = event_start.isoformat()
-        
-        cursor.execute("""
-            INSERT INTO projects (
-                project_id, name, event_id, start_date, target_date, 
-                owner_id, objectives, success_criteria, status, 
-                created_at, updated_at, rsid, brigade, battalion
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'planning', ?, ?, ?, ?, ?)
-        """, (
-            project_id,
-            f"{calendar_event['title']} - Planning",
-            recruiting_event_id,
-            project_start[:10],
-            project_target[:10],
-            calendar_event.get('created_by', 'system'),
-            f"Plan and execute {calendar_event['title']}. {calendar.event.get('description', '')}",
-            "Successfully execute event and achieve target metrics",
-            now, now,
-            calendar.event.get('rsid'),
-            calendar.event.get('brigade'),
-            calendar.event.get('battalion')
-        ))
-        
-        # Create default tasks for event planning
-        default_tasks = [
-            {
-                "title": "Finalize Event Logistics",
-                "description": "Confirm venue, setup, and equipment",
-                "priority": "high",
-                "days_before": 7
-            },
-            {
-                "title": "Prepare Marketing Materials",
-                "description": "Design and print promotional materials",
-                "priority": "high",
-                "days_before": 10
-            },
-            {
-                "title": "Coordinate Team Assignments",
-                "description": "Assign roles and responsibilities to team members",
-                "priority": "medium",
-                "days_before": 5
-            },
-            {
-                "title": "Conduct Pre-Event Briefing",
-                "description": "Brief team on objectives and procedures",
-                "priority": "high",
-                "days_before": 1
-            }
-        ]
+            # Create default tasks for event planning
+            default_tasks = [
+                {
+                    "title": "Finalize Event Logistics",
+                    "description": "Confirm venue, setup, and equipment",
+                    "priority": "high",
+                    "days_before": 7
+                },
+                {
+                    "title": "Prepare Marketing Materials",
+                    "description": "Design and print promotional materials",
+                    "priority": "high",
+                    "days_before": 10
+                },
+                {
+                    "title": "Coordinate Team Assignments",
+                    "description": "Assign roles and responsibilities to team members",
+                    "priority": "medium",
+                    "days_before": 5
+                },
+                {
+                    "title": "Conduct Pre-Event Briefing",
+                    "description": "Brief team on objectives and procedures",
+                    "priority": "high",
+                    "days_before": 1
+                }
+            ]
         
-        for task_template in default_tasks:
-            task_id = f"tsk_{uuid.uuid4().hex[:12]}"
-            task_due = (event_start - timedelta(days=task_template['days_before'])).isoformat()[:10]
+            for task_template in default_tasks:
+                task_id = f"tsk_{uuid.uuid4().hex[:12]}"
+                task_due = (event_start - timedelta(days=task_template['days_before'])).isoformat()[:10]
             
-            cursor.execute("""
-                INSERT INTO tasks (
-                    task_id, project_id, title, description, 
-                    assigned_to, due_date, status, priority, created_at
-                ) VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?)
-            """, (
-                task_id, project_id, task_template['title'], task_template['description'],
-                calendar.event.get('assigned_to', 'team'), task_due, task_template['priority'], now
-            ))
-        
-        conn.commit()
-        conn.close()
+                cursor.execute("""
+                    INSERT INTO tasks (
+                        task_id, project_id, title, description, 
+                        assigned_to, due_date, status, priority, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, 'open', ?, ?)
+                """, (
+                    task_id, project_id, task_template['title'], task_template['description'],
+                    calendar_event.get('assigned_to', 'team'), task_due, task_template['priority'], now
+                ))
         
-        return JSONResponse({
-            "status": "ok",
-            "project_id": project_id,
-            "event_id": recruiting_event_id,
-            "message": "Project created successfully from calendar event",
-            "tasks_created": len(default_tasks)
-        })
+            return JSONResponse({
+                "status": "ok",
+                "project_id": project_id,
+                "event_id": recruiting_event_id,
+                "message": "Project created successfully from calendar event",
+                "tasks_created": len(default_tasks)
+            })
+
+        return db_write(_create)
         
     except Exception as e:
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/calendar/reports")
-async def get_status_reports(
+@offload
+def get_status_reports(
     report_type: str = None,
     report_category: str = None,
     status: str = None,
@@ -5730,6 +5512,13 @@ async def generate_status_report(request: Request):
     """Generate a status report based on type and category"""
     try:
         data = await request.json()
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+    return await run_db(_generate_status_report_sync, data)
+
+
+def _generate_status_report_sync(data: Dict[str, Any]):
+    try:
         report_type = data.get('report_type', 'monthly')  # daily, weekly, monthly, quarterly, annual
         report_category = data.get('report_category', 'overall')  # events, marketing, recruiting, etc.
         
@@ -5796,10 +5585,12 @@ async def generate_status_report(request: Request):
             recruiting_metrics = dict(cursor.fetchone() or {})
             key_metrics['recruiting'] = recruiting_metrics
         
+        conn.close()
+        
         # Create report
         report_id = f"rpt_{secrets.token_hex(6)}"
         
-        cursor.execute("""
+        db_write(lambda conn: conn.execute("""
             INSERT INTO status_reports (
                 report_id, report_type, report_category,
                 report_period_start, report_period_end, generated_date,
@@ -5815,10 +5606,7 @@ async def generate_status_report(request: Request):
             'completed',
             summary,
             json.dumps(key_metrics)
-        ))
-        
-        conn.commit()
-        conn.close()
+        )))
         
         return JSONResponse({
             "status": "ok",
@@ -5831,7 +5619,8 @@ async def generate_status_report(request: Request):
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/calendar/upcoming")
-async def get_upcoming_events(days: int = 7, rsid: str = None):
+@offload
+def get_upcoming_events(days: int = 7, rsid: str = None):
     """Get upcoming events for the next N days"""
     try:
         conn = get_db_conn()
@@ -5864,7 +5653,8 @@ async def get_upcoming_events(days: int = 7, rsid: str = None):
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/calendar/notifications")
-async def get_notifications(status: str = None, limit: int = 50):
+@offload
+def get_notifications(status: str = None, limit: int = 50):
     """Get notifications for the user"""
     try:
         conn = get_db_conn()
@@ -5922,11 +5712,16 @@ class PermissionRequest(BaseModel):
     action: str  # "grant" or "revoke"
 
 @app.get("/api/v2/users")
-async def get_users(is_active: Optional[bool] = None):
-    """Get all users with their permissions"""
+@offload
+def get_users(
+    is_active: Optional[bool] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False
+):
+    """Get users with their permissions, by id, one page at a time"""
     try:
         conn = get_db_conn()
-        cursor = conn.cursor()
         
         query = "SELECT id, username, email, rank, role, tier, is_active, created_at, updated_at, last_login FROM users"
         params = []
@@ -5935,29 +5730,38 @@ async def get_users(is_active: Optional[bool] = None):
             query += " WHERE is_active = ?"
             params.append(1 if is_active else 0)
         
-        cursor.execute(query, params)
-        users = [dict(row) for row in cursor.fetchall()]
-        
-        # Get permissions for each user
+        page = fetch_page(conn, query, params, order=[("id", False)],
+                          limit=limit, cursor=cursor, include_total=include_total)
+        users = page.items
+        
+        # Permissions for the whole page in one query
+        permissions: Dict[Any, List[str]] = {user['id']: [] for user in users}
+        if users:
+            rows = conn.execute(
+                f"SELECT user_id, permission FROM user_permissions WHERE user_id IN ({', '.join('?' * len(users))})",
+                [user['id'] for user in users],
+            ).fetchall()
+            for row in rows:
+                permissions[row['user_id']].append(row['permission'])
         for user in users:
-            cursor.execute("""
-                SELECT permission FROM user_permissions 
-                WHERE user_id = ?
-            """, (user['id'],))
-            user['permissions'] = [row['permission'] for row in cursor.fetchall()]
+            user['permissions'] = permissions[user['id']]
         
         conn.close()
         
         return JSONResponse({
             "status": "ok",
-            "users": users
+            "users": users,
+            **page.envelope()
         })
+    except PaginationError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
     except Exception as e:
         logging.error(f"Error fetching users: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/users/{user_id}")
-async def get_user(user_id: int):
+@offload
+def get_user(user_id: int):
     """Get a single user by ID"""
     try:
         conn = get_db_conn()
@@ -5994,226 +5798,223 @@ async def get_user(user_id: int):
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.post("/api/v2/users")
-async def create_user(request: CreateUserRequest):
+@offload
+def create_user(request: CreateUserRequest):
     """Create a new user"""
     try:
         import hashlib
         import secrets
         
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        # Check if username or email already exists
-        cursor.execute("SELECT id FROM users WHERE username = ? OR email = ?", 
-                      (request.username, request.email))
-        if cursor.fetchone():
-            conn.close()
-            return JSONResponse(
-                {"status": "error", "message": "Username or email already exists"}, 
-                status_code=400
-            )
+        # Duplicate check and inserts share one writer transaction
+        def _apply(conn):
+            cursor = conn.cursor()
+        
+            # Check if username or email already exists
+            cursor.execute("SELECT id FROM users WHERE username = ? OR email = ?", 
+                          (request.username, request.email))
+            if cursor.fetchone():
+                return JSONResponse(
+                    {"status": "error", "message": "Username or email already exists"}, 
+                    status_code=400
+                )
         
-        # Hash password
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.sha256(f"{request.password}{salt}".encode()).hexdigest()
+            # Hash password
+            salt = secrets.token_hex(16)
+            password_hash = hashlib.sha256(f"{request.password}{salt}".encode()).hexdigest()
         
-        now = datetime.now().isoformat()
+            now = datetime.now().isoformat()
         
-        # Create user
-        cursor.execute("""
-            INSERT INTO users 
-            (username, email, password_hash, password_salt, first_name, last_name, rank, role, tier, start_date, end_date, is_active, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            request.username,
-            request.email,
-            password_hash,
-            salt,
-            request.first_name,
-            request.last_name,
-            request.rank,
-            request.role,
-            request.tier,
-            request.start_date,
-            request.end_date,
-            1,
-            now,
-            now
-        ))
-        
-        user_id = cursor.lastrowid
-        
-        # Grant permissions
-        for perm in request.permissions:
+            # Create user
             cursor.execute("""
-                INSERT INTO user_permissions (user_id, permission, granted_by, granted_at)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, perm, 1, now))  # granted_by = 1 (admin)
+                INSERT INTO users 
+                (username, email, password_hash, password_salt, first_name, last_name, rank, role, tier, start_date, end_date, is_active, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                request.username,
+                request.email,
+                password_hash,
+                salt,
+                request.first_name,
+                request.last_name,
+                request.rank,
+                request.role,
+                request.tier,
+                request.start_date,
+                request.end_date,
+                1,
+                now,
+                now
+            ))
         
-        # Log action
-        cursor.execute("""
-            INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, ("create_user", user_id, 1, json.dumps({"username": request.username}), now))
+            user_id = cursor.lastrowid
         
-        conn.commit()
-        conn.close()
+            # Grant permissions
+            for perm in request.permissions:
+                cursor.execute("""
+                    INSERT INTO user_permissions (user_id, permission, granted_by, granted_at)
+                    VALUES (?, ?, ?, ?)
+                """, (user_id, perm, 1, now))  # granted_by = 1 (admin)
         
-        return JSONResponse({
-            "status": "ok",
-            "message": "User created successfully",
-            "user_id": user_id
-        })
+            # Log action
+            cursor.execute("""
+                INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, ("create_user", user_id, 1, json.dumps({"username": request.username}), now))
+        
+            return JSONResponse({
+                "status": "ok",
+                "message": "User created successfully",
+                "user_id": user_id
+            })
+
+        return db_write(_apply)
     except Exception as e:
         logging.error(f"Error creating user: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.put("/api/v2/users/{user_id}")
-async def update_user(user_id: int, request: UpdateUserRequest):
+@offload
+def update_user(user_id: int, request: UpdateUserRequest):
     """Update user details"""
     try:
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return JSONResponse({"status": "error", "message": "User not found"}, status_code=404)
-        
-        # Build update query
-        updates = []
-        params = []
-        
-        if request.email is not None:
-            updates.append("email = ?")
-            params.append(request.email)
-        if request.rank is not None:
-            updates.append("rank = ?")
-            params.append(request.rank)
-        if request.role is not None:
-            updates.append("role = ?")
-            params.append(request.role)
-        if request.tier is not None:
-            updates.append("tier = ?")
-            params.append(request.tier)
-        if request.is_active is not None:
-            updates.append("is_active = ?")
-            params.append(1 if request.is_active else 0)
-        
-        updates.append("updated_at = ?")
-        params.append(datetime.now().isoformat())
-        params.append(user_id)
-        
-        cursor.execute(f"""
-            UPDATE users SET {', '.join(updates)}
-            WHERE id = ?
-        """, params)
-        
-        # Log action
-        cursor.execute("""
-            INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, ("update_user", user_id, 1, json.dumps(request.dict(exclude_none=True)), datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        def _apply(conn):
+            cursor = conn.cursor()
+        
+            # Check if user exists
+            cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
+            if not cursor.fetchone():
+                return JSONResponse({"status": "error", "message": "User not found"}, status_code=404)
+        
+            # Build update query
+            updates = []
+            params = []
+        
+            if request.email is not None:
+                updates.append("email = ?")
+                params.append(request.email)
+            if request.rank is not None:
+                updates.append("rank = ?")
+                params.append(request.rank)
+            if request.role is not None:
+                updates.append("role = ?")
+                params.append(request.role)
+            if request.tier is not None:
+                updates.append("tier = ?")
+                params.append(request.tier)
+            if request.is_active is not None:
+                updates.append("is_active = ?")
+                params.append(1 if request.is_active else 0)
+        
+            updates.append("updated_at = ?")
+            params.append(datetime.now().isoformat())
+            params.append(user_id)
+        
+            cursor.execute(f"""
+                UPDATE users SET {', '.join(updates)}
+                WHERE id = ?
+            """, params)
+        
+            # Log action
+            cursor.execute("""
+                INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, ("update_user", user_id, 1, json.dumps(request.dict(exclude_none=True)), datetime.now().isoformat()))
         
-        return JSONResponse({
-            "status": "ok",
-            "message": "User updated successfully"
-        })
+            return JSONResponse({
+                "status": "ok",
+                "message": "User updated successfully"
+            })
+
+        return db_write(_apply)
     except Exception as e:
         logging.error(f"Error updating user: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.post("/api/v2/users/{user_id}/permissions")
-async def manage_permissions(user_id: int, request: PermissionRequest):
+@offload
+def manage_permissions(user_id: int, request: PermissionRequest):
     """Grant or revoke permissions for a user"""
     try:
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-        if not cursor.fetchone():
-            conn.close()
-            return JSONResponse({"status": "error", "message": "User not found"}, status_code=404)
-        
-        now = datetime.now().isoformat()
-        
-        if request.action == "grant":
-            for perm in request.permissions:
-                cursor.execute("""
-                    INSERT OR REPLACE INTO user_permissions (user_id, permission, granted_by, granted_at)
-                    VALUES (?, ?, ?, ?)
-                """, (user_id, perm, 1, now))
+        def _apply(conn):
+            cursor = conn.cursor()
+        
+            # Check if user exists
+            cursor.execute("SELECT id FROM users WHERE id = ?", (user_id,))
+            if not cursor.fetchone():
+                return JSONResponse({"status": "error", "message": "User not found"}, status_code=404)
+        
+            now = datetime.now().isoformat()
+        
+            if request.action == "grant":
+                for perm in request.permissions:
+                    cursor.execute("""
+                        INSERT OR REPLACE INTO user_permissions (user_id, permission, granted_by, granted_at)
+                        VALUES (?, ?, ?, ?)
+                    """, (user_id, perm, 1, now))
             
-            action_log = "grant_permissions"
-        elif request.action == "revoke":
-            for perm in request.permissions:
-                cursor.execute("""
-                    DELETE FROM user_permissions 
-                    WHERE user_id = ? AND permission = ?
-                """, (user_id, perm))
+                action_log = "grant_permissions"
+            elif request.action == "revoke":
+                for perm in request.permissions:
+                    cursor.execute("""
+                        DELETE FROM user_permissions 
+                        WHERE user_id = ? AND permission = ?
+                    """, (user_id, perm))
             
-            action_log = "revoke_permissions"
-        else:
-            conn.close()
-            return JSONResponse({"status": "error", "message": "Invalid action"}, status_code=400)
-        
-        # Log action
-        cursor.execute("""
-            INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (action_log, user_id, 1, json.dumps({"permissions": request.permissions}), now))
+                action_log = "revoke_permissions"
+            else:
+                return JSONResponse({"status": "error", "message": "Invalid action"}, status_code=400)
         
-        conn.commit()
-        conn.close()
+            # Log action
+            cursor.execute("""
+                INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, (action_log, user_id, 1, json.dumps({"permissions": request.permissions}), now))
         
-        return JSONResponse({
-            "status": "ok",
-            "message": f"Permissions {request.action}ed successfully"
-        })
+            return JSONResponse({
+                "status": "ok",
+                "message": f"Permissions {request.action}ed successfully"
+            })
+
+        return db_write(_apply)
     except Exception as e:
         logging.error(f"Error managing permissions: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.post("/api/v2/users/{user_id}/deactivate")
-async def deactivate_user(user_id: int):
+@offload
+def deactivate_user(user_id: int):
     """Deactivate a user account"""
     try:
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        # Check if user exists
-        cursor.execute("SELECT id, is_active FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
-        if not user:
-            conn.close()
-            return JSONResponse({"status": "error", "message": "User not found"}, status_code=404)
+        # Read-and-toggle runs in one writer transaction so concurrent toggles cannot race
+        def _apply(conn):
+            cursor = conn.cursor()
         
-        # Toggle active status
-        new_status = 0 if user['is_active'] else 1
+            # Check if user exists
+            cursor.execute("SELECT id, is_active FROM users WHERE id = ?", (user_id,))
+            user = cursor.fetchone()
+            if not user:
+                return JSONResponse({"status": "error", "message": "User not found"}, status_code=404)
         
-        cursor.execute("""
-            UPDATE users SET is_active = ?, updated_at = ?
-            WHERE id = ?
-        """, (new_status, datetime.now().isoformat(), user_id))
+            # Toggle active status
+            new_status = 0 if user['is_active'] else 1
         
-        # Log action
-        cursor.execute("""
-            INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, ("deactivate_user" if new_status == 0 else "activate_user", user_id, 1, json.dumps({}), datetime.now().isoformat()))
+            cursor.execute("""
+                UPDATE users SET is_active = ?, updated_at = ?
+                WHERE id = ?
+            """, (new_status, datetime.now().isoformat(), user_id))
         
-        conn.commit()
-        conn.close()
+            # Log action
+            cursor.execute("""
+                INSERT INTO user_audit_log (action, user_id, performed_by, details, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, ("deactivate_user" if new_status == 0 else "activate_user", user_id, 1, json.dumps({}), datetime.now().isoformat()))
         
-        return JSONResponse({
-            "status": "ok",
-            "message": f"User {'deactivated' if new_status == 0 else 'activated'} successfully"
-        })
+            return JSONResponse({
+                "status": "ok",
+                "message": f"User {'deactivated' if new_status == 0 else 'activated'} successfully"
+            })
+
+        return db_write(_apply)
     except Exception as e:
         logging.error(f"Error deactivating user: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
@@ -6224,7 +6025,8 @@ async def deactivate_user(user_id: int):
 # ============================================================================
 
 @app.get("/api/v2/marketing/campaigns")
-async def get_marketing_campaigns(
+@offload
+def get_marketing_campaigns(
     status: Optional[str] = None,
     platform: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -6268,7 +6070,8 @@ async def get_marketing_campaigns(
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/marketing/engagement-metrics")
-async def get_engagement_metrics(
+@offload
+def get_engagement_metrics(
     campaign_id: Optional[str] = None,
     platform: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -6314,19 +6117,21 @@ async def get_engagement_metrics(
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/marketing/social-media-posts")
-async def get_social_media_posts(
+@offload
+def get_social_media_posts(
     platform: Optional[str] = None,
     campaign_id: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: int = 50
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_total: bool = False
 ):
-    """Get social media posts with engagement data"""
+    """Get social media posts with engagement data, newest first, one page at a time"""
     try:
         conn = get_db_conn()
-        cursor = conn.cursor()
         
-        query = "SELECT * FROM social_media_posts WHERE 1=1"
+        query = "SELECT rowid AS __pk, * FROM social_media_posts WHERE 1=1"
         params = []
         
         if platform:
@@ -6342,25 +6147,27 @@ async def get_social_media_posts(
             query += " AND posted_date <= ?"
             params.append(end_date)
         
-        query += " ORDER BY posted_date DESC LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        posts = [dict(row) for row in cursor.fetchall()]
+        page = fetch_page(conn, query, params, order=[("posted_date", True), ("__pk", True)],
+                          limit=limit, cursor=cursor, include_total=include_total)
+        posts = page.items
         
         conn.close()
         
         return JSONResponse({
             "status": "ok",
             "posts": posts,
-            "count": len(posts)
+            "count": len(posts),
+            **page.envelope()
         })
+    except PaginationError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
     except Exception as e:
         logging.error(f"Error fetching social media posts: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/marketing/platforms")
-async def get_marketing_platforms():
+@offload
+def get_marketing_platforms():
     """Get all marketing platform integrations"""
     try:
         conn = get_db_conn()
@@ -6380,7 +6187,8 @@ async def get_marketing_platforms():
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/marketing/overview")
-async def get_marketing_overview(days: int = 30):
+@offload
+def get_marketing_overview(days: int = 30):
     """Get marketing performance overview"""
     try:
         conn = get_db_conn()
@@ -6467,7 +6275,8 @@ async def get_marketing_overview(days: int = 30):
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/marketing/email-metrics")
-async def get_email_metrics(
+@offload
+def get_email_metrics(
     campaign_id: Optional[str] = None,
     platform: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -6513,7 +6322,8 @@ async def get_email_metrics(
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
 @app.get("/api/v2/marketing/digital-ads")
-async def get_digital_ads(
+@offload
+def get_digital_ads(
     campaign_id: Optional[str] = None,
     platform: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -6567,36 +6377,31 @@ class UniversalUploadRequest(BaseModel):
     category: str
 
 @app.post("/api/v2/upload/{category}")
-async def upload_data(category: str, request: UniversalUploadRequest):
+@offload
+def upload_data(category: str, request: UniversalUploadRequest):
     """Universal data upload endpoint that routes to appropriate tables"""
     try:
-        conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        rows_inserted = 0
         now = datetime.now().isoformat()
         
         # Store in generic import table for all categories
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS data_imports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category TEXT,
-            data TEXT,
-            rows_count INTEGER,
-            imported_at TEXT
-        )
-        """)
-        
-        cursor.execute("""
-        INSERT INTO data_imports (category, data, rows_count, imported_at)
-        VALUES (?, ?, ?, ?)
-        """, (category, json.dumps(request.data), len(request.data), now))
+        def _store(conn):
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS data_imports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category TEXT,
+                data TEXT,
+                rows_count INTEGER,
+                imported_at TEXT
+            )
+            """)
+            conn.execute("""
+            INSERT INTO data_imports (category, data, rows_count, imported_at)
+            VALUES (?, ?, ?, ?)
+            """, (category, json.dumps(request.data), len(request.data), now))
         
+        db_write(_store)
         rows_inserted = len(request.data)
         
-        conn.commit()
-        conn.close()
-        
         return JSONResponse({
             "status": "ok",
             "message": f"Successfully imported {rows_inserted} rows for {category}",
@@ -6609,41 +6414,39 @@ async def upload_data(category: str, request: UniversalUploadRequest):
 
 
 @app.get("/api/v2/upload/history")
-async def get_upload_history():
-    """Retrieve upload history from data_imports table"""
+@offload
+def get_upload_history(limit: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = False):
+    """Retrieve upload history from data_imports table, newest first, one page at a time"""
     try:
         conn = get_db_conn()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-        SELECT id, category, data, rows_count, imported_at 
-        FROM data_imports 
-        ORDER BY imported_at DESC 
-        LIMIT 100
-        """)
         
-        rows = cursor.fetchall()
+        page = fetch_page(conn, "SELECT id, category, data, rows_count, imported_at FROM data_imports", (),
+                          order=[("imported_at", True), ("id", True)],
+                          limit=limit, cursor=cursor, include_total=include_total)
         conn.close()
         
         history = []
-        for row in rows:
+        for row in page.items:
             try:
-                data = json.loads(row[2]) if row[2] else []
+                data = json.loads(row["data"]) if row["data"] else []
             except:
                 data = []
             
             history.append({
-                "id": row[0],
-                "category": row[1],
+                "id": row["id"],
+                "category": row["category"],
                 "data": data,
-                "rows_count": row[3],
-                "imported_at": row[4]
+                "rows_count": row["rows_count"],
+                "imported_at": row["imported_at"]
             })
         
         return JSONResponse({
             "status": "ok",
-            "history": history
+            "history": history,
+            **page.envelope()
         })
+    except PaginationError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
     except Exception as e:
         logging.error(f"Error fetching upload history: {e}")
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
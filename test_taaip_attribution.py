@@ -0,0 +1,82 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend.attribution import activity_attribution, rebuild, refresh, stage_attribution
+from taaip_service import app
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(
+        """
+        CREATE TABLE funnel_stages (stage_id TEXT PRIMARY KEY, stage_name TEXT, sequence_order INTEGER);
+        CREATE TABLE funnel_transitions (transition_id INTEGER PRIMARY KEY AUTOINCREMENT, lead_id TEXT, from_stage TEXT, to_stage TEXT, transition_date TEXT, created_at TEXT);
+        CREATE TABLE capture_survey (survey_id TEXT PRIMARY KEY, event_id TEXT, lead_id TEXT, timestamp TEXT);
+        CREATE TABLE marketing_activities (activity_id TEXT PRIMARY KEY, event_id TEXT, channel TEXT, campaign_name TEXT, data_source TEXT,
+            impressions INTEGER, engagement_count INTEGER, awareness_metric REAL, activation_conversions INTEGER, reporting_date TEXT);
+        INSERT INTO funnel_stages VALUES ('lead', 'Lead', 1), ('prospect', 'Prospect', 2);
+        INSERT INTO capture_survey VALUES
+            ('s1', 'E1', 'L1', '2025-03-01T10:00:00'),
+            ('s2', 'E2', 'L1', '2025-03-10T10:00:00'),
+            ('s3', 'E3', 'L1', '2024-01-01T10:00:00'),  -- outside the lookback window
+            ('s4', 'E9', 'L2', '2025-03-12T10:00:00');  -- event without activities
+        INSERT INTO marketing_activities VALUES
+            ('A1', 'E1', 'FB', 'c', 'emm', 100, 10, 0.5, 1, '2025-03-01'),
+            ('A2', 'E2', 'Radio', 'c', 'emm', 200, 20, 0.5, 2, '2025-03-10'),
+            ('A3', 'E2', 'Email', 'c', 'aiem', 300, 30, 0.5, 3, '2025-03-09'),
+            ('A4', 'E3', 'FB', 'c', 'emm', 999, 99, 0.5, 9, '2024-01-01');
+        INSERT INTO funnel_transitions (lead_id, from_stage, to_stage, created_at) VALUES ('L1', 'lead', 'prospect', '2025-03-15T00:00:00');
+        """
+    )
+    return conn
+
+
+def _credits(conn, model):
+    return dict(conn.execute("SELECT activity_id, credit FROM attribution_credits WHERE model = ?", (model,)).fetchall())
+
+
+def test_models_follow_touchpoints_within_lookback():
+    conn = _db()
+    assert refresh(conn) == 1
+    assert _credits(conn, "first_touch") == {"A1": 1.0}
+    assert _credits(conn, "last_touch") == {"A2": 0.5, "A3": 0.5}
+    assert _credits(conn, "linear") == {"A1": 0.5, "A2": 0.25, "A3": 0.25}
+
+    stages = {s["stage"]: s for s in stage_attribution(conn, "linear")}
+    assert stages["Prospect"]["leads_in_stage"] == 1 and stages["Prospect"]["attributed_transitions"] == 1.0
+    assert stages["Prospect"]["impressions"] == 600 and stages["Lead"]["credited_activities"] == 0
+    emm = {s["stage"]: s for s in stage_attribution(conn, "linear", data_source="emm")}
+    assert emm["Prospect"]["attributed_transitions"] == 0.75
+
+
+def test_refresh_is_incremental_and_rebuild_picks_up_late_touchpoints():
+    conn = _db()
+    refresh(conn)
+    conn.execute("INSERT INTO funnel_transitions (lead_id, from_stage, to_stage, created_at) VALUES ('L2', 'lead', 'prospect', '2025-03-20T00:00:00')")
+    assert refresh(conn) == 1
+    assert refresh(conn) == 0
+    top = activity_attribution(conn, "linear", stage="prospect")
+    assert [(a["activity_id"], a["event_id"], a["credit"]) for a in top][:2] == [(None, "E9", 1.0), ("A1", "E1", 0.5)]
+
+    conn.execute("INSERT INTO capture_survey VALUES ('s5', 'E1', 'L2', '2025-03-19T00:00:00')")
+    assert refresh(conn) == 0  # already credited
+    assert rebuild(conn) == 2
+    assert conn.execute("SELECT SUM(credit) FROM attribution_credits WHERE model = 'linear' AND lead_key = 'L2'").fetchone()[0] == 1.0
+    assert conn.execute("SELECT credit FROM attribution_credits WHERE model = 'linear' AND lead_key = 'L2' AND activity_id = 'A1'").fetchone()[0] == 0.5
+
+
+def test_prid_transitions_use_transition_date():
+    conn = _db()
+    conn.execute("DROP TABLE funnel_transitions")
+    conn.execute("CREATE TABLE funnel_transitions (transition_id INTEGER PRIMARY KEY AUTOINCREMENT, prid TEXT NOT NULL, from_stage TEXT, "
+                 "to_stage TEXT NOT NULL, transition_date DATETIME DEFAULT CURRENT_TIMESTAMP, notes TEXT, user_id TEXT)")
+    conn.execute("INSERT INTO funnel_transitions (prid, from_stage, to_stage, transition_date) VALUES ('L1', 'lead', 'prospect', '2025-03-15 00:00:00')")
+    assert refresh(conn) == 1
+    assert _credits(conn, "linear") == {"A1": 0.5, "A2": 0.25, "A3": 0.25}
+
+
+def test_attribution_endpoints_validate_model():
+    client = TestClient(app)
+    assert client.get("/api/v2/marketing/funnel-attribution?model=first_touch").json()["model"] == "first_touch"
+    assert client.get("/api/v2/marketing/attribution?model=bogus").status_code == 400
@@ -0,0 +1,41 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from taaip_service import app, compute_scores_batch
+
+
+def _lead(i, **kw):
+    lead = {"lead_id": f"B-{i}", "age": 20 + i % 10, "education_level": "High School", "cbsa_code": "12345", "campaign_source": "Organic"}
+    lead.update(kw)
+    return lead
+
+
+def test_compute_scores_batch_bounds_and_recommendations():
+    records = [_lead(i) for i in range(200)] + [_lead(999, education_level="Masters", campaign_source="High-Impact-Targeting-Campaign")]
+    results = compute_scores_batch(records)
+    assert len(results) == len(records)
+    assert [r["lead_id"] for r in results] == [r["lead_id"] for r in records]
+    for r in results:
+        assert 1 <= r["score"] <= 100
+        assert 0.0 <= r["predicted_probability"] <= 1.0
+        expected = "High" if r["score"] >= 85 else ("Medium" if r["score"] >= 60 else "Low")
+        assert r["recommendation"].startswith(expected)
+    assert compute_scores_batch([]) == []
+
+
+def test_batch_endpoints_score_and_ingest():
+    client = TestClient(app)
+    tag = uuid.uuid4().hex[:6]
+    leads = [_lead(i, lead_id=f"BATCH-{tag}-{i}") for i in range(50)]
+
+    r = client.post("/api/v1/scoreLeads:batch", json={"leads": leads})
+    assert r.status_code == 200 and r.json()["count"] == 50
+
+    before = client.get("/api/v1/metrics").json()["total_leads"]
+    r = client.post("/api/v1/ingestLeads:batch", json={"leads": leads})
+    assert r.status_code == 200 and r.json()["count"] == 50
+    assert client.get("/api/v1/metrics").json()["total_leads"] == before + 50
+
+    bad = client.post("/api/v1/scoreLeads:batch", json={"leads": [_lead(1, age=12)]})
+    assert bad.status_code == 422
@@ -0,0 +1,164 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.bulk_ingest import Field, IngestSpec, PartialIngest, generated_ids, ingest, ingest_frames, prepare, years_since
+from taaip_service import app
+
+EVENTS_DDL = """
+CREATE TABLE events (
+    event_id TEXT PRIMARY KEY, name TEXT, type TEXT, location TEXT, start_date TEXT, end_date TEXT,
+    budget REAL, team_size INTEGER, targeting_principles TEXT, status TEXT, created_at TEXT
+)
+"""
+
+
+def test_prepare_coerces_and_collects_row_errors():
+    spec = IngestSpec("people", [
+        Field("person_id", derive=generated_ids("P", "person_id")),
+        Field("name", kind="text", required=True),
+        Field("zip", kind="text", default=""),
+        Field("date_of_birth", kind="date", required=True),
+        Field("age", derive=lambda df: years_since(df["date_of_birth"], now=pd.Timestamp("2025-01-01"))),
+        Field("score", kind="int", default=0, check=lambda s: s.between(0, 100), message="score out of range"),
+    ])
+    df = pd.DataFrame({
+        "person_id": ["X1", None, None, None],
+        "name": ["Ann", "Bob", None, "Dee"],
+        "zip": [78701.0, None, 10001.0, 94103.0],
+        "date_of_birth": ["2000-01-01", "not a date", "2001-06-30", "1990-02-01"],
+        "score": [50, 10, None, 150],
+    })
+    rows, row_numbers, errors = prepare(df, spec)
+    assert row_numbers == [2]
+    assert rows == [("X1", "Ann", "78701", "2000-01-01", 25, 50)]
+    assert errors == [(3, "invalid date_of_birth"), (4, "missing name"), (5, "score out of range")]
+
+
+def test_ingest_bulk_inserts_in_one_transaction_and_reports_duplicates(tmp_path):
+    db = str(tmp_path / "ingest.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE people (person_id TEXT PRIMARY KEY, name TEXT)")
+    conn.execute("INSERT INTO people VALUES ('P-7', 'existing')")
+    conn.commit()
+    conn.close()
+
+    spec = IngestSpec("people", [Field("person_id", kind="text", required=True), Field("name", kind="text", required=True)])
+    df = pd.DataFrame({"person_id": [f"P-{i}" for i in range(20)], "name": [f"n{i}" for i in range(20)]})
+    result = ingest(db, df, spec, chunk_size=6)
+    assert result["imported"] == 19 and result["total_rows"] == 20
+    assert len(result["errors"]) == 1 and result["errors"][0].startswith("Row 9:")
+
+    result = ingest(db, df.head(3), spec, replace=True)
+    assert result["imported"] == 3 and result["inserted"] == 3
+    assert result["total_rows"] == 3 and result["errors"] == [] and result["error_count"] == 0
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM people").fetchone()[0] == 3
+    conn.close()
+
+
+def test_replace_keeps_original_rows_when_a_later_chunk_fails(tmp_path):
+    db = str(tmp_path / "replace.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE people (person_id TEXT PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO people VALUES (?, ?)", [("old-1", "a"), ("old-2", "b")])
+    conn.commit()
+    conn.close()
+
+    spec = IngestSpec("people", [Field("person_id", kind="text", required=True), Field("name", kind="text", required=True)])
+
+    def frames():
+        yield pd.DataFrame({"person_id": ["P-1", "P-2"], "name": ["x", "y"]})
+        raise ValueError("unreadable chunk")
+
+    with pytest.raises(ValueError):
+        ingest_frames(db, frames(), spec, replace=True)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT person_id FROM people ORDER BY person_id").fetchall() == [("old-1",), ("old-2",)]
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '_staging_%'").fetchone()[0] == 0
+    conn.close()
+
+    chunks = [pd.DataFrame({"person_id": ["P-1", "P-2"], "name": ["x", "y"]}), pd.DataFrame({"person_id": ["P-2", "P-3"], "name": ["y", "z"]})]
+    result = ingest_frames(db, iter(chunks), spec, replace=True)
+    assert result["inserted"] == 3 and result["errors"] == ["Row 2: UNIQUE constraint failed: people.person_id"]
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT person_id FROM people ORDER BY person_id").fetchall() == [("P-1",), ("P-2",), ("P-3",)]
+    conn.close()
+
+
+def test_keyed_ingest_touches_only_the_delta(tmp_path):
+    db = str(tmp_path / "upsert.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE people (person_id TEXT, prid TEXT, name TEXT, loaded_at TEXT)")
+    conn.commit()
+    conn.close()
+
+    spec = IngestSpec("people", [
+        Field("person_id", derive=generated_ids("P"), volatile=True),
+        Field("prid", kind="text", required=True),
+        Field("name", kind="text", required=True),
+        Field("loaded_at", derive=lambda df: str(pd.Timestamp.now()), volatile=True),
+    ], key="prid")
+    df = pd.DataFrame({"prid": ["A1", "A2", "A3"], "name": ["Ann", "Bob", "Cy"]})
+    first = ingest(db, df, spec)
+    assert (first["inserted"], first["updated"], first["unchanged"]) == (3, 0, 0)
+
+    again = ingest(db, df, spec)
+    assert (again["imported"], again["inserted"], again["updated"], again["unchanged"]) == (0, 0, 0, 3)
+
+    changed = pd.DataFrame({"prid": ["A1", "A2", "A4"], "name": ["Ann", "Robert", "Dee"]})
+    result = ingest(db, changed, spec, replace=True)
+    assert (result["inserted"], result["updated"], result["unchanged"], result["deleted"]) == (1, 1, 1, 1)
+
+    conn = sqlite3.connect(db)
+    rows = conn.execute("SELECT prid, name, person_id FROM people ORDER BY prid").fetchall()
+    conn.close()
+    assert [r[:2] for r in rows] == [("A1", "Ann"), ("A2", "Robert"), ("A4", "Dee")]
+    assert all(r[2].startswith("P-") for r in rows)
+
+
+def test_keyed_replace_that_fails_midway_reports_partial_and_deletes_nothing(tmp_path):
+    db = str(tmp_path / "partial.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE people (prid TEXT, name TEXT)")
+    conn.execute("INSERT INTO people VALUES ('OLD', 'kept')")
+    conn.commit()
+    conn.close()
+    spec = IngestSpec("people", [Field("prid", kind="text", required=True), Field("name", kind="text", required=True)], key="prid")
+
+    def frames():
+        yield pd.DataFrame({"prid": ["A1", "A2"], "name": ["Ann", "Bob"]})
+        raise ValueError("unreadable chunk")
+
+    with pytest.raises(PartialIngest) as exc:
+        ingest_frames(db, frames(), spec, replace=True)
+    assert (exc.value.result["inserted"], exc.value.result["deleted"], exc.value.result["total_rows"]) == (2, 0, 2)
+    conn = sqlite3.connect(db)
+    assert [r[0] for r in conn.execute("SELECT prid FROM people ORDER BY prid")] == ["A1", "A2", "OLD"]
+    conn.close()
+
+
+def test_upload_events_endpoint(tmp_path, monkeypatch):
+    db = tmp_path / "upload.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute(EVENTS_DDL)
+    conn.commit()
+    conn.close()
+    monkeypatch.setenv("DB_PATH", str(db))
+
+    csv = "name,location,start_date,end_date,team_size\nFair,Austin,2025-12-01,2025-12-01,3\nExpo,Waco,12/05/2025,2025-12-06,\nBad,Dallas,someday,2025-12-06,2\n"
+    r = TestClient(app).post("/api/v2/upload/events", files={"file": ("events.csv", csv, "text/csv")})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["imported"] == 2 and body["total_rows"] == 3
+    assert body["errors"] == ["Row 4: invalid start_date"]
+
+    conn = sqlite3.connect(str(db))
+    rows = conn.execute("SELECT name, type, start_date, team_size, status FROM events ORDER BY name").fetchall()
+    conn.close()
+    assert rows == [("Expo", "recruitment_event", "2025-12-05", 0, "planned"), ("Fair", "recruitment_event", "2025-12-01", 3, "planned")]
+
+    missing = TestClient(app).post("/api/v2/upload/events", files={"file": ("events.csv", "name\nx\n", "text/csv")})
+    assert missing.status_code == 400
@@ -0,0 +1,64 @@
+import csv
+import gzip
+import io
+import sqlite3
+import zlib
+
+from fastapi.testclient import TestClient
+
+from backend.csv_export import csv_response, iter_dicts_csv, iter_query_csv
+from taaip_service import app
+
+
+def _db(tmp_path, n):
+    db = str(tmp_path / "export.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE activities (activity_id TEXT, channel TEXT, cost REAL)")
+    conn.executemany("INSERT INTO activities VALUES (?, ?, ?)", [(f"A{i}", "social, paid" if i % 2 else None, i * 1.5) for i in range(n)])
+    conn.commit()
+    conn.close()
+    return db
+
+
+def test_query_csv_streams_in_chunks(tmp_path):
+    db = _db(tmp_path, 1000)
+    chunks = list(iter_query_csv(db, "SELECT * FROM activities ORDER BY rowid", fetch_rows=50, chunk_bytes=512))
+    assert chunks[0] == b"activity_id,channel,cost\r\n"
+    assert len(chunks) > 10 and all(len(c) < 1024 for c in chunks)
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 1001
+    assert rows[1] == ["A0", "", "0.0"] and rows[2] == ["A1", "social, paid", "1.5"]
+
+    gz = b"".join(iter_query_csv(db, "SELECT * FROM activities ORDER BY rowid", compress=True))
+    assert gzip.decompress(gz) == b"".join(chunks)
+
+
+def test_gzip_header_is_flushed_first_and_dicts_fill_missing_keys():
+    stream = iter_dicts_csv(iter([{"a": 1}, {"a": 2, "b": "x"}]), ["a", "b"], compress=True)
+    first = next(stream)
+    assert zlib.decompressobj(31).decompress(first) == b"a,b\r\n"
+    assert gzip.decompress(first + b"".join(stream)) == b"a,b\r\n1,\r\n2,x\r\n"
+
+
+def test_csv_response_runs_query_eagerly(tmp_path):
+    db = _db(tmp_path, 3)
+    resp = csv_response(iter_query_csv(db, "SELECT activity_id FROM activities"), "a.csv", compress=False)
+    assert resp.headers["content-disposition"] == "attachment; filename=a.csv"
+    try:
+        csv_response(iter_query_csv(db, "SELECT * FROM missing_table"))
+    except sqlite3.OperationalError:
+        pass
+    else:
+        raise AssertionError("expected the query error before streaming")
+
+
+def test_activities_export_is_gzip_encoded_for_gzip_clients():
+    client = TestClient(app)
+    r = client.get("/api/v2/exports/activities.csv", headers={"X-API-KEY": "devtoken123", "Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.text.startswith("activity_id,event_id,activity_type")
+
+    plain = client.get("/api/v2/exports/activities.csv", headers={"X-API-KEY": "devtoken123", "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.text == r.text
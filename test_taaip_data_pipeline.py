@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+
+from backend import data_pipeline
+from backend.data_pipeline import get_dataset, ingest_dataset, iter_rows, list_datasets, process_csv, read_manifest, save_mapping
+
+
+def _stage(tmp_path, monkeypatch, n=25, part_rows=10):
+    monkeypatch.setattr(data_pipeline, "PROCESSED_DIR", str(tmp_path / "processed"))
+    monkeypatch.setattr(data_pipeline, "MAPPINGS_FILE", str(tmp_path / "data_mappings.json"))
+    monkeypatch.setattr(data_pipeline, "STAGING_PART_ROWS", part_rows)
+    os.makedirs(tmp_path / "processed")
+    src = tmp_path / "upload.csv"
+    src.write_text("First Name,Zip Code,region\n" + "".join(f" Ann{i} ,7870{i % 10},1A{i}\n" for i in range(n)))
+    return process_csv(str(src))
+
+
+def test_process_csv_stages_parts_and_streams_rows(tmp_path, monkeypatch):
+    name, meta = _stage(tmp_path, monkeypatch)
+    assert meta["rows"] == 25 and meta["columns"] == ["first_name", "zip", "region"]
+    manifest = read_manifest(name)
+    assert [p["rows"] for p in manifest["parts"]] == [10, 10, 5]
+    assert not os.path.exists(tmp_path / "data_mappings.json")
+
+    page = list(iter_rows(name, offset=18, limit=4, columns=["first_name"]))
+    assert page == [{"first_name": f"Ann{i}"} for i in range(18, 22)]
+    assert get_dataset(name)["rows"][0] == {"first_name": "Ann0", "zip": "78700", "region": "1A0"}
+    assert name in list_datasets()
+
+
+def test_save_mapping_only_rewrites_manifest(tmp_path, monkeypatch):
+    name, _ = _stage(tmp_path, monkeypatch)
+    part = tmp_path / "processed" / name / "part-00000.ndjson"
+    before = part.read_bytes()
+    meta = save_mapping(name, {"Zip Code": "postal_code"})
+    assert part.read_bytes() == before
+    assert meta["mapping"] == {"First Name": "first_name", "Zip Code": "postal_code", "region": "region"}
+    assert next(iter_rows(name)) == {"first_name": "Ann0", "postal_code": "78700", "region": "1A0"}
+
+
+def test_ingest_dataset_types_columns_and_indexes(tmp_path, monkeypatch):
+    _stage(tmp_path, monkeypatch, part_rows=5)
+    src = tmp_path / "typed.csv"
+    src.write_text(
+        "prid,zip,amount,score,signup,notes\n"
+        + "".join(f"P{i},0{i % 10}123,{i},{i}.5,2025-01-{i % 28 + 1:02d},n{i}\n" for i in range(22))
+        + "P99,00123,,,03/15/2025,\n"
+    )
+    name, _ = process_csv(str(src))
+    save_mapping(name, {"prid": "prid"})
+    db = str(tmp_path / "ingest.db")
+    result = ingest_dataset(name, db)
+    table = f"uploaded_{name}"
+    assert result["rows"] == 23 and result["table"] == table
+    assert result["column_types"] == {"prid": "TEXT", "zip": "TEXT", "amount": "INTEGER", "score": "REAL", "signup": "DATE", "notes": "TEXT"}
+    assert result["indexes"] == ["prid", "zip", "signup"]
+
+    conn = sqlite3.connect(db)
+    assert conn.execute(f'SELECT zip, amount, score, signup FROM "{table}" WHERE prid = ?', ("P3",)).fetchone() == ("03123", 3, 3.5, "2025-01-04")
+    assert conn.execute(f'SELECT amount, signup FROM "{table}" WHERE prid = ?', ("P99",)).fetchone() == (None, "2025-03-15")
+    assert conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE amount > 9').fetchone()[0] == 12
+    plan = " ".join(r[3] for r in conn.execute(f'EXPLAIN QUERY PLAN SELECT * FROM "{table}" WHERE zip = ?', ("01123",)))
+    assert "USING INDEX" in plan
+    conn.close()
+
+    # re-ingesting appends and keeps the schema
+    assert ingest_dataset(name, db)["rows"] == 46
+
+
+def test_legacy_json_dataset_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_pipeline, "PROCESSED_DIR", str(tmp_path))
+    monkeypatch.setattr(data_pipeline, "MAPPINGS_FILE", str(tmp_path / "data_mappings.json"))
+    legacy = {"mapping": {"First": "first_name", "Other": "Other"}, "rows": [{"first_name": "Bo", "Other": "x"}]}
+    (tmp_path / "dataset_legacy1.json").write_text(json.dumps(legacy))
+    assert get_dataset("dataset_legacy1") == legacy
+    assert not (tmp_path / "dataset_legacy1.json").exists()
+    assert read_manifest("dataset_legacy1")["headers"] == ["First", "Other"]
+
+
+def test_dataset_endpoint_pages_and_projects(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from taaip_service import app
+
+    name, _ = _stage(tmp_path, monkeypatch, n=25, part_rows=10)
+    client = TestClient(app)
+    body = client.get(f"/api/v2/data/{name}?offset=20&limit=10&columns=first_name,zip").json()["dataset"]
+    assert body["total_rows"] == 25 and body["offset"] == 20 and body["next_offset"] is None
+    assert body["columns"] == ["first_name", "zip"]
+    assert body["rows"][0] == {"first_name": "Ann20", "zip": "78700"} and len(body["rows"]) == 5
+
+    head = client.get(f"/api/v2/data/{name}?limit=0").json()["dataset"]
+    assert head["rows"] == [] and head["columns"] == ["first_name", "zip", "region"] and head["mapping"]["Zip Code"] == "zip"
+    assert client.get(f"/api/v2/data/{name}?limit=3").json()["dataset"]["next_offset"] == 3
+    assert client.get(f"/api/v2/data/{name}?columns=nope").status_code == 400
+    assert client.get("/api/v2/data/dataset_missing").status_code == 404
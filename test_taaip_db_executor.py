@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.db_executor import offload, run_db
+
+
+def test_offloaded_endpoint_runs_on_db_pool_and_keeps_params():
+    app = FastAPI()
+
+    @app.get("/echo/{item}")
+    @offload
+    def echo(item: str, limit: int = 5):
+        return {"item": item, "limit": limit, "thread": threading.current_thread().name}
+
+    client = TestClient(app)
+    body = client.get("/echo/abc?limit=7").json()
+    assert body["item"] == "abc" and body["limit"] == 7
+    assert body["thread"].startswith("taaip-db")
+
+
+def test_blocking_query_does_not_stall_event_loop():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await run_db(time.sleep, 0.2)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
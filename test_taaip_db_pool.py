@@ -0,0 +1,92 @@
+import os
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend.db_pool import ConnectionPool, get_connection, get_pool
+from backend.routers import project_mgmt as pm
+
+
+def test_pool_reuses_connections_and_rolls_back_on_close(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), pool_size=2, max_overflow=0)
+    pool.write(lambda conn: conn.execute("CREATE TABLE t (v INTEGER)"))
+
+    conn = pool.acquire()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()  # uncommitted insert is discarded, connection goes back to the pool
+    assert pool.stats()["idle"] == 1
+
+    again = pool.acquire()
+    assert again is conn
+    assert again.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    again.close()
+
+
+def test_pool_serializes_writers(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "writers.db"), pool_size=2)
+    pool.write(lambda conn: conn.execute("CREATE TABLE t (v INTEGER)"))
+
+    def worker(n):
+        for i in range(20):
+            pool.write(lambda conn: conn.execute("INSERT INTO t VALUES (?)", (n * 100 + i,)))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 80
+
+
+def test_pool_drops_connections_when_file_replaced(tmp_path):
+    path = str(tmp_path / "replaced.db")
+    pool = ConnectionPool(path)
+    pool.write(lambda conn: conn.execute("CREATE TABLE t (v INTEGER)"))
+    with pool.connection() as conn:
+        conn.execute("SELECT 1")
+
+    os.remove(path)
+    with pool.connection() as conn:
+        tables = conn.execute("SELECT name FROM sqlite_master").fetchall()
+    assert tables == []
+
+
+def test_failed_write_only_rolls_back_itself(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "batch.db"))
+    pool.write(lambda conn: conn.execute("CREATE TABLE t (v INTEGER UNIQUE)"))
+
+    futures = [pool.submit_write(lambda conn, v=v: conn.execute("INSERT INTO t VALUES (?)", (v,))) for v in (1, 2, 2, 3)]
+    errors = [f.exception() for f in futures]
+    assert [e is None for e in errors] == [True, True, False, True]
+
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert [r[0] for r in conn.execute("SELECT v FROM t ORDER BY v")] == [1, 2, 3]
+
+
+def test_router_writes_go_through_the_writer_queue(tmp_path, monkeypatch):
+    path = str(tmp_path / "pm.db")
+    monkeypatch.setenv("DB_FILE", path)
+    pm.run_migrations()
+    pid = pm.create_project(pm.ProjectCreate(name="p", estimated_benefit=100))["project_id"]
+
+    calls = []
+    pool = get_pool(path)
+    write = pool.write
+    monkeypatch.setattr(pool, "write", lambda fn, *a, **kw: calls.append(fn) or write(fn, *a, **kw))
+
+    assert pm.add_budget_transaction(pid, "expense", "venue", 40.0)["roi"] == 1.5
+    with pytest.raises(HTTPException):
+        pm.add_lesson("missing", lesson="x")
+    assert len(calls) == 2
+
+    conn = get_connection(path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM budget_transactions").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM roi_records").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM project_lessons").fetchone()[0] == 0
+    finally:
+        conn.close()
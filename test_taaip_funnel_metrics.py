@@ -0,0 +1,91 @@
+import sqlite3
+
+from backend.change_tracking import ensure_change_tracking
+from backend.db_pool import get_pool
+from backend.funnel_metrics import FunnelMetricsCache, compute_funnel_metrics, ensure_day_columns
+from backend.schema_registry import SchemaRegistry
+
+LEADS_DDL = """
+CREATE TABLE leads (
+    prid TEXT, current_stage TEXT, fiscal_year INTEGER, loss_reason TEXT, appointment_no_show INTEGER,
+    lead_date TEXT, prospect_date TEXT, appointment_made_date TEXT, appointment_conducted_date TEXT,
+    test_date TEXT, test_pass_date TEXT, enlistment_date TEXT, ship_date TEXT, dep_length_days INTEGER
+)
+"""
+
+ROWS = [
+    ("A", "enlistment", 2025, None, 0, "2025-01-01", "2025-01-05", "2025-01-10", "2025-01-12", "2025-01-20", "2025-01-21", "2025-02-01", None, 30),
+    ("B", "ship", 2025, None, 0, "2025-01-01", "2025-01-03", "2025-01-04", "2025-01-04", "2025-01-08", "2025-01-08", "2025-01-15T10:00:00", "2025-03-01", 45),
+    ("C", "loss", 2025, "medical", 1, "2025-01-01", "2025-01-02", "2025-01-09", None, None, None, None, None, None),
+    ("D", "loss", 2025, "medical", 0, "2025-02-01", None, None, None, None, None, None, None, None),
+    ("E", "loss", 2025, "moral", 0, "2025-02-01", None, None, None, None, None, None, None, None),
+    ("F", "lead", 2024, None, 0, "2024-05-01", None, None, None, None, None, None, None, None),
+    ("G", "prospect", 2025, None, 0, "2025-03-01", "2025-03-02", None, None, None, None, None, None, None),
+]
+
+
+def _setup(tmp_path):
+    path = str(tmp_path / "funnel_metrics.db")
+    pool = get_pool(path)
+
+    def init(conn):
+        conn.execute(LEADS_DDL)
+        conn.executemany(f"INSERT INTO leads VALUES ({', '.join('?' * 14)})", ROWS)
+        ensure_day_columns(conn)
+        ensure_change_tracking(conn, ("leads",))
+
+    pool.write(init)
+    return pool, SchemaRegistry(path)
+
+
+def test_single_pass_metrics_match_stage_and_flash_definitions(tmp_path):
+    pool, schema = _setup(tmp_path)
+    with pool.connection() as conn:
+        m = compute_funnel_metrics(conn, schema, 2025)
+        all_years = compute_funnel_metrics(conn, schema)
+
+    assert m["funnel_counts"]["enlistments"] == 1 and m["funnel_counts"]["ships"] == 1
+    assert m["funnel_counts"]["losses"] == 3 and m["funnel_counts"]["total_leads"] == 6
+    assert all_years["funnel_counts"]["total_leads"] == 7
+    # enlisted leads only: A (31 days) and B (14 days, time part ignored)
+    assert m["flash_to_bang"]["avg_lead_to_enlistment_days"] == 22.5
+    assert m["flash_to_bang"]["avg_lead_to_prospect_days"] == 3.0
+    assert m["flash_to_bang"]["avg_dep_length_days"] == 37.5
+    # appointments made: A, B, C; one no-show
+    assert m["appointment_metrics"]["no_show_rate"] == 33.33
+    assert m["loss_analysis"]["top_loss_reason"] == "medical"
+    assert m["loss_analysis"]["loss_rate"] == 50.0
+
+
+def test_cache_is_invalidated_by_lead_writes(tmp_path):
+    pool, schema = _setup(tmp_path)
+    cache = FunnelMetricsCache()
+    with pool.connection() as conn:
+        first = cache.get(conn, schema, 2025)
+        assert cache.get(conn, schema, 2025) is first
+
+    pool.write(lambda conn: conn.execute(
+        "INSERT INTO leads (prid, current_stage, fiscal_year, lead_date, enlistment_date) "
+        "VALUES ('H', 'enlistment', 2025, '2025-04-01', '2025-04-11')"))
+    with pool.connection() as conn:
+        again = cache.get(conn, schema, 2025)
+    assert again is not first
+    assert again["funnel_counts"]["enlistments"] == 2
+    # H has no day numbers until the next backfill; its dates are parsed instead
+    assert again["flash_to_bang"]["avg_lead_to_enlistment_days"] == 18.3
+
+
+def test_day_numbers_need_no_insert_trigger(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.execute("CREATE TABLE leads (prid TEXT, lead_date TEXT, lead_day INTEGER)")
+    conn.execute("CREATE TRIGGER trg_leads_day_numbers_insert AFTER INSERT ON leads "
+                 "BEGIN UPDATE leads SET lead_day = CAST(JULIANDAY(DATE(NEW.lead_date)) AS INTEGER) WHERE rowid = NEW.rowid; END")
+    conn.execute("INSERT INTO leads (prid, lead_date) VALUES ('A', '2025-01-01')")
+    ensure_day_columns(conn)
+    ensure_day_columns(conn)
+    conn.execute("INSERT INTO leads (prid, lead_date) VALUES ('B', '2025-01-11T09:30:00')")
+    assert conn.execute("SELECT lead_day FROM leads ORDER BY prid").fetchall() == [(2460676,), (None,)]
+    conn.execute("UPDATE leads SET lead_date = '2025-02-01' WHERE prid = 'B'")
+    assert conn.execute("SELECT lead_day FROM leads WHERE prid = 'B'").fetchone() == (2460707,)
+    triggers = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    assert triggers == ["trg_leads_day_numbers_changed"]
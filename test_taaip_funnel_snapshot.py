@@ -0,0 +1,61 @@
+import sqlite3
+import uuid
+
+from fastapi.testclient import TestClient
+
+from backend.funnel_snapshot import apply_transition, ensure_snapshot_tables, rebuild, stage_distribution
+import taaip_service
+from taaip_service import app
+
+
+def test_incremental_snapshot_matches_rebuild(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "funnel.db"))
+    conn.execute("CREATE TABLE funnel_transitions (prid TEXT, to_stage TEXT, created_at TEXT)")
+    ensure_snapshot_tables(conn)
+    moves = [
+        ("P1", "lead", "2025-01-01"), ("P2", "lead", "2025-01-02"), ("P1", "prospect", "2025-01-03"),
+        ("P3", "lead", "2025-01-03"), ("P2", "prospect", "2025-01-04"), ("P1", "enlist", "2025-01-05"),
+        ("P3", "prospect", "2025-01-01"),  # arrives out of order, older than P3's current stage
+    ]
+    for prid, stage, at in moves:
+        conn.execute("INSERT INTO funnel_transitions VALUES (?, ?, ?)", (prid, stage, at))
+        apply_transition(conn, prid, stage, at)
+
+    incremental = stage_distribution(conn)
+    assert incremental == {"enlist": 1, "lead": 1, "prospect": 1}
+    assert rebuild(conn) == incremental
+
+
+def test_transition_endpoint_updates_stage_distribution():
+    client = TestClient(app)
+    before = client.get("/api/v2/funnel/metrics").json()["stage_distribution"]
+    lead = f"SNAP-{uuid.uuid4().hex[:8]}"
+    for frm, to in ((None, "lead"), ("lead", "prospect")):
+        r = client.post("/api/v2/funnel/transition", json={"lead_id": lead, "from_stage": frm, "to_stage": to})
+        assert r.status_code == 200
+    after = client.get("/api/v2/funnel/metrics").json()["stage_distribution"]
+    assert after.get("prospect", 0) == before.get("prospect", 0) + 1
+    assert after.get("lead", 0) == before.get("lead", 0)
+
+    rebuilt = client.post("/api/v2/admin/funnel-snapshot/rebuild").json()
+    assert rebuilt["stage_distribution"] == after
+
+
+def test_startup_backfill_handles_prid_transitions(tmp_path, monkeypatch):
+    # the funnel_transitions layout created by migrate_recruiting_funnel.py
+    db = str(tmp_path / "prid.db")
+    conn = sqlite3.connect(db)
+    conn.execute("""CREATE TABLE funnel_transitions (transition_id INTEGER PRIMARY KEY AUTOINCREMENT, prid TEXT NOT NULL,
+        from_stage TEXT, to_stage TEXT NOT NULL, transition_date DATETIME DEFAULT CURRENT_TIMESTAMP, notes TEXT, user_id TEXT)""")
+    conn.executemany("INSERT INTO funnel_transitions (prid, to_stage, transition_date) VALUES (?, ?, ?)", [
+        ("P1", "prospect", "2025-01-03 00:00:00"), ("P1", "lead", "2025-01-01 00:00:00"), ("P2", "lead", "2025-01-02 00:00:00"),
+    ])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(taaip_service, "DB_FILE", db)
+    taaip_service.init_db()
+    conn = sqlite3.connect(db)
+    assert stage_distribution(conn) == {"lead": 1, "prospect": 1}
+    assert taaip_service.rebuild_funnel_snapshot(conn) == {"lead": 1, "prospect": 1}
+    conn.close()
@@ -0,0 +1,74 @@
+import csv
+import os
+import sqlite3
+
+from backend.change_tracking import ensure_change_tracking
+from backend.db_pool import get_pool
+from backend.incremental_export import export_incremental
+
+
+def _setup(tmp_path):
+    db = str(tmp_path / "exports.db")
+    conn = sqlite3.connect(db)
+    conn.executescript("""
+        CREATE TABLE events (event_id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE budgets (budget_id TEXT PRIMARY KEY, event_id TEXT, allocated_amount REAL);
+        CREATE TABLE marketing_activities (activity_id TEXT PRIMARY KEY, event_id TEXT, activity_type TEXT, campaign_name TEXT,
+            channel TEXT, data_source TEXT, impressions INTEGER, engagement_count INTEGER, awareness_metric REAL,
+            activation_conversions INTEGER, cost REAL, reporting_date TEXT, metadata TEXT, created_at TEXT, updated_at TEXT);
+        INSERT INTO events VALUES ('E1', 'Fair');
+        INSERT INTO marketing_activities (activity_id, event_id, cost, reporting_date, created_at) VALUES
+            ('A1', 'E1', 10, '2025-01-05', '2025-01-05T00:00:00'),
+            ('A2', 'E1', 20, '2025-02-07', '2025-02-07T00:00:00'),
+            ('A3', 'E1', 5, NULL, '2025-02-08T00:00:00');
+    """)
+    ensure_change_tracking(conn, ("marketing_activities", "events", "budgets"))
+    conn.commit()
+    conn.close()
+    return db
+
+
+def _write(db, sql, params=()):
+    get_pool(db).write(lambda conn: conn.execute(sql, params))
+
+
+def _ids(path):
+    with open(path, newline="") as f:
+        return [r["activity_id"] for r in csv.DictReader(f)]
+
+
+def test_incremental_export_rewrites_only_changed_months(tmp_path):
+    db = _setup(tmp_path)
+    out = str(tmp_path / "exports")
+
+    first = export_incremental(db, out)
+    assert sorted(first["partitions_written"]) == ["2025-01", "2025-02", "unknown"]
+    assert _ids(os.path.join(out, "activities.csv")) == ["A1", "A2", "A3"]
+    assert export_incremental(db, out)["status"] == "skipped"
+
+    _write(db, "INSERT INTO marketing_activities (activity_id, event_id, cost, reporting_date, created_at) VALUES ('A4', 'E1', 1, '2025-02-20', '2025-03-01T00:00:00')")
+    second = export_incremental(db, out)
+    assert second["partitions_written"] == ["2025-02"]
+    assert _ids(os.path.join(out, "activities", "activities_2025-02.csv")) == ["A2", "A4"]
+    assert _ids(os.path.join(out, "activities.csv")) == ["A1", "A2", "A4", "A3"]
+
+    _write(db, "DELETE FROM marketing_activities WHERE activity_id = 'A1'")
+    third = export_incremental(db, out)
+    assert third["partitions_written"] == [] and third["partitions_removed"] == ["2025-01"]
+    assert not os.path.exists(os.path.join(out, "activities", "activities_2025-01.csv"))
+    assert _ids(os.path.join(out, "activities.csv")) == ["A2", "A4", "A3"]
+
+    # budget changes only refresh the KPI file
+    _write(db, "INSERT INTO budgets VALUES ('B1', 'E1', 100)")
+    fourth = export_incremental(db, out)
+    assert fourth["status"] == "ok" and fourth["partitions_written"] == []
+    with open(os.path.join(out, "kpis.csv"), newline="") as f:
+        assert next(csv.DictReader(f))["total_cost"] == "126.0"
+    assert not [n for n in os.listdir(out) if n.endswith(".tmp")]
+
+    # a forced run starts without state but still drops partitions of vanished months
+    _write(db, "DELETE FROM marketing_activities WHERE reporting_date LIKE '2025-02%'")
+    forced = export_incremental(db, out, force=True)
+    assert forced["partitions_removed"] == ["2025-02"] and forced["partitions_written"] == ["unknown"]
+    assert sorted(os.listdir(os.path.join(out, "activities"))) == ["activities_unknown.csv"]
+    assert _ids(os.path.join(out, "activities.csv")) == ["A3"]
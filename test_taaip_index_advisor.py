@@ -0,0 +1,32 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend.index_plan import advise, ensure_indexes, explain, full_scans
+from taaip_service import app
+
+
+def test_ensure_indexes_skips_missing_columns_and_removes_full_scan(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "plan.db"))
+    conn.execute("CREATE TABLE leads (prid TEXT, current_stage TEXT, fiscal_year INTEGER)")
+    sql = "SELECT current_stage, COUNT(*) FROM leads WHERE fiscal_year = ? GROUP BY current_stage"
+    assert full_scans(explain(conn, sql)) == ["leads"]
+
+    created = ensure_indexes(conn)
+    assert "idx_leads_fy_stage" in created
+    assert "idx_leads_recruiter" not in created  # no recruiter_id column
+    assert full_scans(explain(conn, sql)) == []
+
+    report = advise(conn)
+    stage_q = next(q for q in report["queries"] if q["name"] == "funnel.stage_counts")
+    assert stage_q["status"] == "indexed"
+    assert next(q for q in report["queries"] if q["name"] == "leads.by_recruiter")["status"] == "unavailable"
+
+
+def test_index_advisor_endpoint():
+    client = TestClient(app)
+    r = client.get("/api/v2/admin/index-advisor")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "ok"
+    assert {"indexes", "queries", "full_scan_queries", "missing_indexes"} <= set(body)
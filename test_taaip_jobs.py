@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from backend import job_queue
+from taaip_service import app
+
+EVENTS_DDL = """
+CREATE TABLE events (
+    event_id TEXT PRIMARY KEY, name TEXT, type TEXT, location TEXT, start_date TEXT, end_date TEXT,
+    budget REAL, team_size INTEGER, targeting_principles TEXT, status TEXT, created_at TEXT
+)
+"""
+
+CSV = "name,location,start_date,end_date\nFair,Austin,2025-12-01,2025-12-01\nExpo,Waco,2025-12-05,2025-12-06\n"
+
+
+def _wait(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/v2/jobs/{job_id}").json()["job"]
+        if job["status"] in job_queue.TERMINAL:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_background_upload_runs_as_job(tmp_path, monkeypatch):
+    db = tmp_path / "upload.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute(EVENTS_DDL)
+    conn.commit()
+    conn.close()
+    monkeypatch.setenv("DB_PATH", str(db))
+    monkeypatch.setattr(job_queue, "_queue", job_queue.JobQueue(str(tmp_path / "jobs.db")))
+    client = TestClient(app)
+
+    r = client.post("/api/v2/upload/events?background=true&upload_id=evt-1", files={"file": ("events.csv", CSV, "text/csv")})
+    assert r.status_code == 202
+    assert r.json()["job_id"] == "evt-1"
+
+    job = _wait(client, "evt-1")
+    assert job["status"] == "completed" and job["kind"] == "upload:events"
+    assert job["result"]["imported"] == 2
+    assert job["progress"]["rows_processed"] == 2
+
+    events = client.get("/api/v2/jobs/evt-1/events").text
+    assert events.startswith("event: completed\n")
+    assert json.loads(events.split("data: ", 1)[1])["job_id"] == "evt-1"
+
+    # a retried request with the same upload_id does not import the file again
+    retry = client.post("/api/v2/upload/events?background=true&upload_id=evt-1", files={"file": ("events.csv", CSV, "text/csv")})
+    assert retry.status_code == 202 and retry.json()["status"] == "completed"
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 2
+    conn.close()
+
+    assert client.get("/api/v2/jobs/nope").status_code == 404
+
+
+def test_failed_job_records_error_and_restart_marks_running_jobs_failed(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"), workers=1)
+
+    def boom():
+        raise ValueError("bad input")
+
+    job_id = queue.submit("test", boom)
+    deadline = time.time() + 10
+    while queue.get(job_id)["status"] not in job_queue.TERMINAL and time.time() < deadline:
+        time.sleep(0.02)
+    assert queue.get(job_id)["error"] == "bad input"
+
+    conn = sqlite3.connect(str(tmp_path / "jobs.db"))
+    conn.execute("INSERT INTO jobs (job_id, kind, status) VALUES ('stale', 'test', 'running')")
+    conn.commit()
+    conn.close()
+    restarted = job_queue.JobQueue(str(tmp_path / "jobs.db"))
+    assert restarted.get("stale")["status"] == "failed"
+
+
+def test_concurrent_submits_with_one_id_run_the_job_once(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.db"), workers=2)
+    runs, duplicates = [], []
+    barrier = threading.Barrier(8)
+
+    def work():
+        time.sleep(0.05)
+        runs.append(1)
+
+    def submit():
+        barrier.wait()
+        queue.submit("test", work, job_id="same", on_duplicate=lambda: duplicates.append(1))
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    deadline = time.time() + 10
+    while queue.get("same")["status"] not in job_queue.TERMINAL and time.time() < deadline:
+        time.sleep(0.02)
+    assert queue.get("same")["status"] == "completed"
+    assert len(runs) == 1 and len(duplicates) == 7
+    assert queue.stats()["pending"] == 0
@@ -0,0 +1,43 @@
+import sqlite3
+
+from backend.kpi_engine import KPI_FIELDS, event_kpis, kpi_totals
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE events (event_id TEXT PRIMARY KEY, name TEXT);
+        CREATE TABLE marketing_activities (activity_id TEXT, event_id TEXT, data_source TEXT, cost REAL, impressions INTEGER,
+            engagement_count INTEGER, activation_conversions INTEGER, reporting_date TEXT);
+        CREATE TABLE budgets (budget_id TEXT, event_id TEXT, allocated_amount REAL);
+        INSERT INTO events VALUES ('E2', 'b'), ('E1', 'a'), ('E3', 'no activity');
+        INSERT INTO marketing_activities VALUES
+            ('A1', 'E1', 'emm', 100, 1000, 50, 5, '2025-01-10'),
+            ('A2', 'E1', 'ikrome', 50, 500, 0, 0, '2025-02-10'),
+            ('A3', 'E2', 'emm', 30, 0, 10, 3, '2025-01-15'),
+            ('A4', 'E9', 'emm', 999, 1, 1, 1, '2025-01-15');
+        INSERT INTO budgets VALUES ('B1', 'E1', 200), ('B2', 'E1', 50), ('B3', 'E3', 75);
+    """)
+    return conn
+
+
+def test_event_kpis_match_per_event_totals_in_one_query():
+    conn = _db()
+    rows = event_kpis(conn)
+    assert [r["event_id"] for r in rows] == ["E1", "E2", "E3"]
+    for r in rows:
+        assert {k: r[k] for k in KPI_FIELDS} == kpi_totals(conn, event_id=r["event_id"])
+
+    e1 = rows[0]
+    assert e1["total_cost"] == 400.0 and e1["budget_total"] == 250.0
+    assert e1["cpl"] == 80.0 and e1["cpe"] == 8.0 and e1["cpc"] == 0.2667
+    assert rows[2]["total_cost"] == 75.0 and rows[2]["cpl"] is None
+
+
+def test_filters_apply_to_activities_only():
+    conn = _db()
+    rows = event_kpis(conn, ["E1"], data_source="emm", end_date="2025-01-31")
+    assert rows == [dict(event_id="E1", **kpi_totals(conn, "E1", data_source="emm", end_date="2025-01-31"))]
+    assert rows[0]["activity_cost"] == 100 and rows[0]["budget_total"] == 250.0
+    assert event_kpis(conn, []) == []
+    assert kpi_totals(conn)["activity_cost"] == 1179
@@ -0,0 +1,58 @@
+import sqlite3
+import uuid
+
+from fastapi.testclient import TestClient
+
+from backend.change_tracking import ensure_change_tracking
+from backend.marketing_sync import apply_sync, ensure_sync_schema
+from taaip_service import app
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row  # as on pooled connections
+    conn.execute("""CREATE TABLE marketing_activities (activity_id TEXT PRIMARY KEY, event_id TEXT, activity_type TEXT, campaign_name TEXT,
+        channel TEXT, data_source TEXT, impressions INTEGER, engagement_count INTEGER, awareness_metric REAL,
+        activation_conversions INTEGER, reporting_date TEXT, metadata TEXT, created_at TEXT, updated_at TEXT)""")
+    conn.execute("CREATE TABLE data_source_mappings (mapping_id TEXT PRIMARY KEY, source_system TEXT, last_sync TEXT, sync_status TEXT, updated_at TEXT)")
+    conn.execute("INSERT INTO data_source_mappings (mapping_id, source_system) VALUES ('m1', 'emm')")
+    ensure_change_tracking(conn, ["marketing_activities"])
+    ensure_sync_schema(conn)
+    return conn
+
+
+def _item(campaign, impressions, **extra):
+    return dict({"campaign": campaign, "impressions": impressions, "engagement": 10, "reporting_date": "2025-05-01"}, **extra)
+
+
+def test_resync_updates_changed_items_and_skips_the_rest():
+    conn = _db()
+    batch = {"c1": _item("One", 100), "c2": _item("Two", 200), "bad": {"campaign": "no metrics"}}
+    first = apply_sync(conn, "emm", batch, watermark="2025-05-01T10:00:00")
+    assert (first["inserted"], first["updated"], first["skipped"], first["ignored"]) == (2, 0, 0, 1)
+
+    again = apply_sync(conn, "emm", batch)
+    assert (again["inserted"], again["updated"], again["skipped"]) == (0, 0, 2)
+    assert again["watermark"] == "2025-05-01T10:00:00"
+
+    batch["c2"] = _item("Two", 250)
+    batch["c3"] = _item("Three", 300, reporting_date="2025-05-02")
+    third = apply_sync(conn, "emm", batch, watermark="2025-04-01T00:00:00")
+    assert (third["inserted"], third["updated"], third["skipped"]) == (1, 1, 1)
+    assert third["watermark"] == "2025-05-01T10:00:00"  # an older cursor does not move it back
+
+    rows = [tuple(r) for r in conn.execute("SELECT source_key, impressions FROM marketing_activities ORDER BY source_key")]
+    assert rows == [("c1", 100), ("c2", 250), ("c3", 300)]
+    # the same vendor key from another source is a different activity
+    assert apply_sync(conn, "emm", {"x": _item("Vendor id", 1, id="c1", reporting_date="2025-05-01")})["updated"] == 1
+    assert apply_sync(conn, "ikrome", batch)["status"] == "error"
+
+
+def test_sync_endpoint_is_idempotent():
+    client = TestClient(app)
+    key = f"camp_{uuid.uuid4().hex[:8]}"
+    payload = {"source_system": "emm", "sync_data": {key: {"type": "social_media", "campaign": "Idem", "impressions": 5, "engagement": 1}}}
+    first = client.post("/api/v2/marketing/sync", json=payload).json()
+    assert first["inserted"] == 1 and first["activities_created"] == 1
+    again = client.post("/api/v2/marketing/sync", json=payload).json()
+    assert again["activities_created"] == 0 and again["skipped"] == 1
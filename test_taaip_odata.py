@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.odata import ENTITY_SETS, ODataError, compile_query, parse_filter, run_query
+from taaip_service import app
+
+ACTIVITIES = ENTITY_SETS["activities"]
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE marketing_activities (activity_id TEXT PRIMARY KEY, event_id TEXT, channel TEXT, data_source TEXT, cost REAL, reporting_date TEXT)")
+    conn.executemany("INSERT INTO marketing_activities VALUES (?, ?, ?, ?, ?, ?)", [
+        (f"A{i:02d}", f"E{i % 3}", "social" if i % 2 else "Radio ad", "emm" if i < 6 else "ikrome", float(i * 10), f"2025-0{1 + i % 3}-01" if i % 4 else None)
+        for i in range(10)
+    ])
+    return conn
+
+
+def _cols(conn):
+    return [r[1] for r in conn.execute("PRAGMA table_info(marketing_activities)")]
+
+
+def test_filter_compiles_to_parameterized_sql():
+    sql, params = parse_filter("data_source eq 'emm' and (cost gt 20 or not contains(channel,'dio')) and reporting_date ne null", ACTIVITIES.columns)
+    assert sql == '("data_source" = ? AND ("cost" > ? OR NOT (instr("channel", ?) > 0)) AND "reporting_date" IS NOT NULL)'
+    assert params == ["emm", 20, "dio"]
+    sql, params = parse_filter("startswith(activity_id,'A0') and reporting_date ge 2025-02-01 and channel eq 'O''Neil'", ACTIVITIES.columns)
+    assert params[0] == "A0" and params[2:] == ["2025-02-01", "O'Neil"]
+    for bad in ("cost gt", "secret eq 1", "cost gt 1; DROP TABLE x", "cost lt null"):
+        with pytest.raises(ODataError):
+            parse_filter(bad, ACTIVITIES.columns)
+
+
+def test_keyset_pages_cover_every_row_once_with_nulls_and_desc_order():
+    conn = _db()
+    for orderby in ("reporting_date desc, cost", "reporting_date", "event_id desc"):
+        seen, token = [], None
+        while True:
+            q = compile_query(ACTIVITIES, _cols(conn), select="activity_id", orderby=orderby, top=None, skiptoken=token)
+            q.page_size = 3
+            q.params[-1] = 4
+            page = run_query(conn, q)
+            seen += [r["activity_id"] for r in page["value"]]
+            token = page["skiptoken"]
+            if not token:
+                break
+        full = run_query(conn, compile_query(ACTIVITIES, _cols(conn), select="activity_id", orderby=orderby))["value"]
+        assert seen == [r["activity_id"] for r in full]
+        assert sorted(seen) == [f"A{i:02d}" for i in range(10)]
+
+
+def test_count_select_and_top():
+    conn = _db()
+    q = compile_query(ACTIVITIES, _cols(conn), select="activity_id,cost", filter="data_source eq 'emm' and cost ge 20", orderby="cost desc", top=2)
+    page = run_query(conn, q, count=True)
+    assert page["count"] == 4 and page["skiptoken"] is None
+    assert page["value"] == [{"activity_id": "A05", "cost": 50.0}, {"activity_id": "A04", "cost": 40.0}]
+    with pytest.raises(ODataError):
+        compile_query(ACTIVITIES, _cols(conn), select="activity_id,awareness_metric")
+    for fn, n in (("endswith(channel,'')", 10), ("endswith(channel,'ad')", 5), ("startswith(channel,'')", 10)):
+        assert run_query(conn, compile_query(ACTIVITIES, _cols(conn), filter=fn), count=True)["count"] == n
+
+
+def test_odata_endpoint():
+    client = TestClient(app)
+    headers = {"X-API-KEY": "devtoken123"}
+    r = client.get("/api/v2/odata/events", params={"$select": "event_id,name", "$top": "1", "$count": "true"}, headers=headers)
+    assert r.status_code == 200
+    body = r.json()
+    assert "@odata.count" in body and "@odata.context" not in body and isinstance(body["value"], list) and len(body["value"]) <= 1
+    assert client.get("/api/v2/odata/events", params={"$filter": "nope eq 1"}, headers=headers).status_code == 400
+    assert client.get("/api/v2/odata/secrets", headers=headers).status_code == 404
+    assert client.get("/api/v2/odata/events").status_code == 401
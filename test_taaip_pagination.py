@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import pagination
+from backend.pagination import PaginationError, fetch_page
+from taaip_service import app
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE posts (title TEXT, posted_date TEXT)")
+    # duplicate and NULL sort keys on purpose
+    conn.executemany("INSERT INTO posts VALUES (?, ?)", [
+        (f"P{i:02d}", None if i % 5 == 0 else f"2025-01-{1 + i % 4:02d}") for i in range(23)
+    ])
+    return conn
+
+
+def test_keyset_pages_cover_every_row_once():
+    conn = _db()
+    sql = "SELECT rowid AS __pk, * FROM posts WHERE title >= ?"
+    for desc in (True, False):
+        order = [("posted_date", desc), ("__pk", desc)]
+        seen, cursor = [], None
+        while True:
+            page = fetch_page(conn, sql, ["P"], order=order, limit=4, cursor=cursor)
+            assert len(page.items) <= 4 and page.limit == 4
+            assert all("__pk" not in item for item in page.items)
+            seen += [item["title"] for item in page.items]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        expected = [r[0] for r in conn.execute(
+            f"SELECT title FROM posts ORDER BY posted_date {'DESC' if desc else ''}, rowid {'DESC' if desc else ''}")]
+        assert seen == expected
+
+
+def test_limit_is_clamped_and_total_only_on_request(monkeypatch):
+    conn = _db()
+    monkeypatch.setattr(pagination, "PAGE_SIZE_MAX", 10)
+    page = fetch_page(conn, "SELECT rowid AS __pk, * FROM posts", (), order=[("__pk", False)], limit=500)
+    assert page.limit == 10 and len(page.items) == 10
+    assert "total" not in page.envelope()
+    page = fetch_page(conn, "SELECT rowid AS __pk, * FROM posts", (), order=[("__pk", False)], limit=0, include_total=True)
+    assert page.limit == 1 and page.envelope()["total"] == 23
+    with pytest.raises(PaginationError):
+        fetch_page(conn, "SELECT rowid AS __pk, * FROM posts", (), order=[("__pk", False)], cursor="not-a-cursor")
+
+
+def test_data_getter_pages_with_cursor(tmp_path, monkeypatch):
+    db = tmp_path / "pages.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE budgets (budget_id TEXT, allocated_amount REAL)")
+    conn.executemany("INSERT INTO budgets VALUES (?, ?)", [(f"B{i}", float(i)) for i in range(7)])
+    conn.commit()
+    conn.close()
+    monkeypatch.setenv("DB_PATH", str(db))
+
+    client = TestClient(app)
+    body = client.get("/api/v2/data/budgets?limit=5&include_total=true").json()
+    assert body["count"] == 5 and body["total"] == 7 and body["limit"] == 5
+    rest = client.get(f"/api/v2/data/budgets?limit=5&cursor={body['next_cursor']}").json()
+    assert [r["budget_id"] for r in body["data"] + rest["data"]] == [f"B{i}" for i in range(7)]
+    assert rest["next_cursor"] is None and "total" not in rest
+    assert client.get("/api/v2/data/budgets?cursor=%%%").status_code == 400
@@ -0,0 +1,34 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+import taaip_service
+from taaip_service import app
+
+
+def test_dashboard_cache_etag_and_write_invalidation():
+    client = TestClient(app)
+    url = "/api/v2/analytics/dashboard"
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get(url)
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # an unrelated table's write keeps the entry
+    taaip_service.db_write(lambda conn: conn.execute(
+        "INSERT INTO marketing_activities (activity_id, event_id, created_at) VALUES (?, 'e', 'now')", (uuid.uuid4().hex,)))
+    assert client.get(url).headers["x-cache"] == "HIT"
+
+    taaip_service.db_write(lambda conn: conn.execute(
+        "INSERT INTO event_metrics (event_id, leads_generated, conversion_count) VALUES ('e', 10, 2)"))
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["x-cache"] == "MISS"
+    assert fresh.headers["etag"] != etag
@@ -0,0 +1,40 @@
+import sqlite3
+
+from backend.db_pool import get_pool
+from backend.schema_registry import SchemaRegistry, get_schema, invalidate_schema
+
+
+def test_registry_resolves_aliases_and_memoizes_sql(tmp_path):
+    path = str(tmp_path / "schema.db")
+    get_pool(path).write(lambda conn: conn.execute("CREATE TABLE leads (lead_id TEXT, stage TEXT, score REAL)"))
+    schema = get_schema(path)
+
+    assert schema.resolve("leads", "stage") == "stage"
+    assert schema.resolve("leads", "score") == "score"
+    assert schema.resolve("leads", "source") is None
+    assert schema.columns("missing") == frozenset()
+
+    built = []
+    build = lambda s: built.append(1) or f"SELECT {s.resolve('leads', 'stage')} FROM leads"
+    assert schema.sql("stage_q", build) == "SELECT stage FROM leads"
+    assert schema.sql("stage_q", build) == "SELECT stage FROM leads"
+    assert len(built) == 1
+
+    get_pool(path).write(lambda conn: conn.execute("ALTER TABLE leads ADD COLUMN current_stage TEXT"))
+    invalidate_schema(path)
+    assert schema.resolve("leads", "stage") == "current_stage"
+    assert schema.sql("stage_q", build) == "SELECT current_stage FROM leads"
+
+
+def test_registry_notices_external_ddl(tmp_path):
+    path = str(tmp_path / "external.db")
+    get_pool(path).write(lambda conn: conn.execute("CREATE TABLE projects (project_id TEXT)"))
+    schema = SchemaRegistry(path, check_interval=0)
+    assert not schema.has_column("projects", "is_archived")
+
+    other = sqlite3.connect(path)
+    other.execute("ALTER TABLE projects ADD COLUMN is_archived INTEGER DEFAULT 0")
+    other.commit()
+    other.close()
+
+    assert schema.has_column("projects", "is_archived")
@@ -0,0 +1,53 @@
+import json
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend.segment_index import ensure_segment_index, rebuild, segment_filter
+from taaip_service import app
+
+PROFILES_DDL = "CREATE TABLE segment_profiles (profile_id TEXT PRIMARY KEY, lead_id TEXT, segments TEXT, attributes TEXT, last_updated TEXT, created_at TEXT)"
+
+
+def _attrs(conn):
+    return sorted(conn.execute("SELECT profile_id, lead_id, key, value FROM segment_attributes").fetchall())
+
+
+def test_triggers_keep_attributes_in_step_with_profiles():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(PROFILES_DDL)
+    conn.execute("INSERT INTO segment_profiles (profile_id, lead_id, segments) VALUES ('p0', 'L0', ?)", (json.dumps({"tier": 1}),))
+    ensure_segment_index(conn)
+    assert _attrs(conn) == [("p0", "L0", "tier", "1")]  # backfilled
+
+    conn.execute("INSERT INTO segment_profiles (profile_id, lead_id, segments) VALUES ('p1', 'L1', ?)",
+                 (json.dumps({"age_group": "18-24", "veteran": False}),))
+    conn.execute("REPLACE INTO segment_profiles (profile_id, lead_id, segments) VALUES ('p1', 'L1', ?)",
+                 (json.dumps({"age_group": "25-34"}),))
+    conn.execute("INSERT INTO segment_profiles (profile_id, lead_id, segments) VALUES ('p2', 'L2', 'not json')")
+    assert _attrs(conn) == [("p0", "L0", "tier", "1"), ("p1", "L1", "age_group", "25-34")]
+
+    conn.execute("UPDATE segment_profiles SET segments = ? WHERE profile_id = 'p0'", ('{"tier":2,"tags":["a", "b"]}',))
+    conn.execute("DELETE FROM segment_profiles WHERE profile_id = 'p1'")
+    assert _attrs(conn) == [("p0", "L0", "tags", '["a","b"]'), ("p0", "L0", "tier", "2")]
+    assert rebuild(conn) == 2
+
+    sql, params = segment_filter("tier", 2, "sp.lead_id")
+    assert conn.execute(f"SELECT profile_id FROM segment_profiles sp WHERE {sql}", params).fetchall() == [("p0",)]
+    plan = " ".join(r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN SELECT 1 FROM segment_profiles sp WHERE {sql}", params))
+    assert "idx_segment_attributes_kv" in plan
+
+
+def test_kpis_segment_breakdown_uses_segment_attributes():
+    client = TestClient(app)
+    ev = {"name": "Segment KPI Event", "type": "recruiting", "location": "Test", "start_date": "2025-11-01", "end_date": "2025-11-30", "budget": 1000, "team_size": 2, "targeting_principles": "test"}
+    event_id = client.post("/api/v2/events", json=ev).json()["event_id"]
+    act = {"event_id": event_id, "activity_type": "email", "campaign_name": "seg", "channel": "Email", "data_source": "emm", "impressions": 400, "engagement_count": 40, "awareness_metric": 0.1, "activation_conversions": 4, "reporting_date": "2025-11-15", "metadata": None}
+    assert client.post("/api/v2/marketing/activities", json=act).status_code == 200
+    # segment profiles are keyed by the id the activities are joined on
+    assert client.post("/api/v2/ingest/survey", json={"lead_id": event_id, "survey_id": "sv_seg", "responses": {"age": "30"}}).status_code == 200
+
+    seg = client.get(f"/api/v2/kpis?event_id={event_id}&segment_key=age_group&segment_value=25-34").json()["segment"]
+    assert seg["impressions"] == 400 and seg["activations"] == 4
+    other = client.get(f"/api/v2/kpis?event_id={event_id}&segment_key=age_group&segment_value=18-24").json()["segment"]
+    assert other["impressions"] == 0
@@ -0,0 +1,89 @@
+import json
+import sqlite3
+import uuid
+
+from fastapi.testclient import TestClient
+
+from backend.segment_index import ensure_segment_index
+from backend.segment_store import apply_segment_updates, compact_history, ensure_segment_history, replay
+from taaip_service import app
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE segment_profiles (profile_id TEXT PRIMARY KEY, lead_id TEXT, segments TEXT, attributes TEXT, last_updated TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE segment_history (history_id INTEGER PRIMARY KEY AUTOINCREMENT, profile_id TEXT, lead_id TEXT, segments TEXT, attributes TEXT, changed_at TEXT, source TEXT, notes TEXT)")
+    # a profile written the old way, without history
+    conn.execute("INSERT INTO segment_profiles VALUES ('profile_L0', 'L0', ?, '{}', 't', 't')", (json.dumps({"tier": "gold", "region": "NE"}),))
+    ensure_segment_history(conn)
+    ensure_segment_index(conn)
+    return conn
+
+
+def _profile(conn, lead):
+    row = conn.execute("SELECT segments, attributes FROM segment_profiles WHERE lead_id = ?", (lead,)).fetchone()
+    return json.loads(row[0]), json.loads(row[1])
+
+
+def _history(conn, lead):
+    return conn.execute("SELECT segments, attributes, diff FROM segment_history WHERE lead_id = ? ORDER BY history_id", (lead,)).fetchall()
+
+
+def test_batch_merges_in_sql_and_skips_no_ops():
+    conn = _db()
+    result = apply_segment_updates(conn, [
+        {"lead_id": "L0", "segments": {"tier": "silver", "region": None}},
+        {"lead_id": "L1", "segments": {"age_group": "18-24"}, "attributes": {"survey": {"q1": 1}}},
+        {"lead_id": "L1", "attributes": {"survey": {"q2": 2}}},
+        {"lead_id": "L1", "segments": {"age_group": "18-24"}},
+    ])
+    assert result["received"] == 4 and result["changed"] == 3 and result["unchanged"] == 1
+    assert _profile(conn, "L0") == ({"tier": "silver"}, {})
+    assert _profile(conn, "L1") == ({"age_group": "18-24"}, {"survey": {"q1": 1, "q2": 2}})
+    # first change to a profile without history is a snapshot; the rest are diffs
+    h0 = _history(conn, "L0")
+    assert len(h0) == 1 and h0[0][2] is None and json.loads(h0[0][0]) == {"tier": "silver"}
+    assert [json.loads(d) for _, _, d in _history(conn, "L1")] == [
+        {"segments": {"age_group": "18-24"}, "attributes": {"survey": {"q1": 1}}},
+        {"segments": {}, "attributes": {"survey": {"q2": 2}}},
+    ]
+    assert replay(_history(conn, "L1")) == {"segments": {"age_group": "18-24"}, "attributes": {"survey": {"q1": 1, "q2": 2}}}
+    assert conn.execute("SELECT value FROM segment_attributes WHERE lead_id = 'L0' AND key = 'tier'").fetchone() == ("silver",)
+
+
+def test_compaction_folds_old_history_into_one_snapshot():
+    conn = _db()
+    for i in range(8):
+        apply_segment_updates(conn, [{"lead_id": "L2", "segments": {"step": i, f"k{i}": i}}], compact=False)
+    before = replay(_history(conn, "L2"))
+    assert compact_history(conn, keep=3) == 0  # all within the retention window
+    assert compact_history(conn, keep=3, retention_days=0) == 4
+    rows = _history(conn, "L2")
+    assert len(rows) == 4 and rows[0][2] is None
+    assert replay(rows) == before == {"segments": {"step": 7, **{f"k{i}": i for i in range(8)}}, "attributes": {}}
+    assert compact_history(conn, keep=3, retention_days=0) == 0
+
+
+def test_compaction_keeps_the_newest_rows_even_when_old():
+    conn = _db()
+    for i in range(6):
+        apply_segment_updates(conn, [{"lead_id": "L3", "segments": {"step": i}}], compact=False)
+    # age the first four changes past the retention window
+    conn.execute("UPDATE segment_history SET changed_at = '2020-01-01T00:00:00' "
+                 "WHERE history_id IN (SELECT history_id FROM segment_history WHERE lead_id = 'L3' ORDER BY history_id LIMIT 4)")
+    before = replay(_history(conn, "L3"))
+    assert compact_history(conn, keep=1, retention_days=30) == 3  # the two recent rows stay
+    rows = _history(conn, "L3")
+    assert len(rows) == 3 and rows[0][2] is None and replay(rows) == before
+    conn.execute("UPDATE segment_history SET changed_at = '2020-01-01T00:00:00' WHERE lead_id = 'L3'")
+    assert compact_history(conn, keep=2, retention_days=30) == 0  # one snapshot plus the newest two
+
+
+def test_batch_endpoint():
+    client = TestClient(app)
+    run = uuid.uuid4().hex[:8]
+    body = {"updates": [{"lead_id": f"batch_{run}_1", "segments": {"tier": "a"}}, {"lead_id": f"batch_{run}_2", "segments": {"tier": "b"}}]}
+    r = client.post("/api/v2/segments/batch", json=body)
+    assert r.status_code == 200 and r.json()["changed"] == 2
+    assert client.post("/api/v2/segments/batch", json=body).json()["unchanged"] == 2
+    assert client.get(f"/api/v2/segments/batch_{run}_2").json()["segments"] == {"tier": "b"}
@@ -0,0 +1,61 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend import upload_stream
+from backend.upload_stream import count_rows, get_progress, iter_frames
+from taaip_service import app
+
+
+def _events_csv(n, bad_rows=()):
+    lines = ["name,location,start_date,end_date"]
+    for i in range(n):
+        start = "someday" if i in bad_rows else "2025-12-01"
+        lines.append(f"Event {i},Austin,{start},2025-12-02")
+    return "\n".join(lines) + "\n"
+
+
+def test_iter_frames_chunks_keep_row_positions(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text(_events_csv(25))
+    frames = list(iter_frames(str(path), "rows.csv", chunk_rows=10))
+    assert [len(f) for f in frames] == [10, 10, 5]
+    assert list(frames[2].index) == list(range(20, 25))
+    assert count_rows(str(path), "rows.csv", chunk_rows=7) == 25
+
+
+def test_streaming_upload_ingests_chunks_and_reports_progress(tmp_path, monkeypatch):
+    db = tmp_path / "stream.db"
+    conn = sqlite3.connect(str(db))
+    conn.execute(
+        "CREATE TABLE events (event_id TEXT PRIMARY KEY, name TEXT, type TEXT, location TEXT, start_date TEXT, "
+        "end_date TEXT, budget REAL, team_size INTEGER, targeting_principles TEXT, status TEXT, created_at TEXT)"
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setenv("DB_PATH", str(db))
+    monkeypatch.setattr(upload_stream, "UPLOAD_CSV_CHUNK_ROWS", 40)
+    monkeypatch.setattr(upload_stream, "UPLOAD_SPOOL_DIR", str(tmp_path / "spool"))
+
+    client = TestClient(app)
+    csv = _events_csv(100, bad_rows={57})
+    r = client.post("/api/v2/upload/events?upload_id=stream-test", files={"file": ("events.csv", csv, "text/csv")})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["upload_id"] == "stream-test"
+    assert body["imported"] == 99 and body["total_rows"] == 100
+    assert body["errors"] == ["Row 59: invalid start_date"]
+
+    progress = client.get("/api/v2/upload/progress/stream-test").json()["progress"]
+    assert progress["status"] == "completed"
+    assert progress["chunks"] == 3 and progress["rows_processed"] == 100 and progress["rows_imported"] == 99
+    assert get_progress("missing") is None
+    assert client.get("/api/v2/upload/progress/missing").status_code == 404
+    assert list((tmp_path / "spool").iterdir()) == []
+
+    conn = sqlite3.connect(str(db))
+    assert conn.execute("SELECT COUNT(DISTINCT event_id) FROM events").fetchone()[0] == 99
+    conn.close()
+
+    preview = client.post("/api/v2/upload/preview", files={"file": ("events.csv", csv, "text/csv")}).json()
+    assert preview["row_count"] == 100 and len(preview["sample_rows"]) == 5
@@ -6,9 +6,12 @@ import json
 import csv
 import sqlite3
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import io
 
+from backend.csv_export import iter_query_csv
+from backend.db_pool import get_connection
+
 
 class DataExporter:
     """Export TAAIP data in various formats"""
@@ -18,8 +21,7 @@ class DataExporter:
     
     def _execute_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
         """Execute SQL query and return results as list of dicts"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(self.db_path)
         cursor = conn.cursor()
         cursor.execute(query, params)
         results = [dict(row) for row in cursor.fetchall()]
@@ -57,17 +59,7 @@ class DataExporter:
         
         return json_content
     
-    def export_projects(self, rsid: Optional[str] = None, status: Optional[str] = None, 
-                       format: str = 'csv', filename: str = None) -> str:
-        """
-        Export projects data with optional filtering
-        
-        Args:
-            rsid: Filter by RSID (e.g., "1BDE", "1BDE-1BN", "1BDE-1BN-1-1")
-            status: Filter by status (planning, in_progress, etc.)
-            format: 'csv' or 'json'
-            filename: Optional output filename
-        """
+    def _projects_query(self, rsid: Optional[str] = None, status: Optional[str] = None) -> Tuple[str, tuple]:
         query = """
             SELECT 
                 project_id, name, status, owner_id, rsid, brigade, battalion, station,
@@ -94,18 +86,33 @@ class DataExporter:
             params.append(status)
         
         query += " ORDER BY created_at DESC"
+        return query, tuple(params)
+
+    def export_projects(self, rsid: Optional[str] = None, status: Optional[str] = None, 
+                       format: str = 'csv', filename: str = None) -> str:
+        """
+        Export projects data with optional filtering
         
-        data = self._execute_query(query, tuple(params))
+        Args:
+            rsid: Filter by RSID (e.g., "1BDE", "1BDE-1BN", "1BDE-1BN-1-1")
+            status: Filter by status (planning, in_progress, etc.)
+            format: 'csv' or 'json'
+            filename: Optional output filename
+        """
+        query, params = self._projects_query(rsid, status)
+        data = self._execute_query(query, params)
         
         if format == 'json':
             return self.export_to_json(data, filename)
         else:
             return self.export_to_csv(data, filename)
     
-    def export_tasks(self, project_id: Optional[str] = None, status: Optional[str] = None,
-                    assigned_to: Optional[str] = None, format: str = 'csv', 
-                    filename: str = None) -> str:
-        """Export tasks data with filtering"""
+    def stream_projects_csv(self, rsid: Optional[str] = None, status: Optional[str] = None, compress: bool = False) -> Iterator[bytes]:
+        """Same rows as export_projects, as CSV chunks read from the cursor with fetchmany"""
+        query, params = self._projects_query(rsid, status)
+        return iter_query_csv(self.db_path, query, params, compress=compress)
+
+    def _tasks_query(self, project_id: Optional[str] = None, status: Optional[str] = None, assigned_to: Optional[str] = None) -> Tuple[str, tuple]:
         query = """
             SELECT 
                 t.task_id, t.project_id, p.name as project_name, p.rsid,
@@ -134,14 +141,25 @@ class DataExporter:
             params.append(assigned_to)
         
         query += " ORDER BY t.due_date ASC"
-        
-        data = self._execute_query(query, tuple(params))
+        return query, tuple(params)
+
+    def export_tasks(self, project_id: Optional[str] = None, status: Optional[str] = None,
+                    assigned_to: Optional[str] = None, format: str = 'csv', 
+                    filename: str = None) -> str:
+        """Export tasks data with filtering"""
+        query, params = self._tasks_query(project_id, status, assigned_to)
+        data = self._execute_query(query, params)
         
         if format == 'json':
             return self.export_to_json(data, filename)
         else:
             return self.export_to_csv(data, filename)
     
+    def stream_tasks_csv(self, project_id: Optional[str] = None, status: Optional[str] = None, assigned_to: Optional[str] = None, compress: bool = False) -> Iterator[bytes]:
+        """Same rows as export_tasks, as CSV chunks read from the cursor with fetchmany"""
+        query, params = self._tasks_query(project_id, status, assigned_to)
+        return iter_query_csv(self.db_path, query, params, compress=compress)
+
     def export_events(self, rsid: Optional[str] = None, format: str = 'csv', 
                      filename: str = None) -> str:
         """Export events data"""
@@ -245,9 +263,7 @@ class DataExporter:
         else:
             return self.export_to_csv(data, filename)
     
-    def export_budget_analysis(self, rsid: Optional[str] = None, format: str = 'csv',
-                              filename: str = None) -> str:
-        """Export detailed budget analysis"""
+    def _budget_analysis_query(self, rsid: Optional[str] = None) -> Tuple[str, tuple]:
         query = """
             SELECT 
                 project_id, name, rsid, brigade, battalion,
@@ -276,13 +292,23 @@ class DataExporter:
             params.extend([f"{rsid}%", rsid])
         
         query += " ORDER BY utilization_percent DESC"
-        
-        data = self._execute_query(query, tuple(params))
+        return query, tuple(params)
+
+    def export_budget_analysis(self, rsid: Optional[str] = None, format: str = 'csv',
+                              filename: str = None) -> str:
+        """Export detailed budget analysis"""
+        query, params = self._budget_analysis_query(rsid)
+        data = self._execute_query(query, params)
         
         if format == 'json':
             return self.export_to_json(data, filename)
         else:
             return self.export_to_csv(data, filename)
+    
+    def stream_budget_analysis_csv(self, rsid: Optional[str] = None, compress: bool = False) -> Iterator[bytes]:
+        """Same rows as export_budget_analysis, as CSV chunks read from the cursor with fetchmany"""
+        query, params = self._budget_analysis_query(rsid)
+        return iter_query_csv(self.db_path, query, params, compress=compress)
 
 
 # Convenience functions for API endpoints